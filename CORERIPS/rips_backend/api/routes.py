@@ -9,22 +9,21 @@ from models.models import User
 from models.schemas import (
     UserCreate, UserResponse, LoginRequest, Token,
     UploadResponse, ValidationRequest, ValidationResultsResponse,
-    FileResponse
+    ValidationSummaryResponse, FileResponse
 )
 from services.auth import (
     authenticate_user, create_access_token, get_current_active_user,
     get_password_hash, require_role, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from services.file_service import FileService
-from services.validation_service import ValidationService
+from services.validation_service import get_validation_service
 from models.models import User as UserModel
 
 router = APIRouter()
 security = HTTPBearer()
 
-# Servicios
+# Servicios (el de validación se obtiene con get_validation_service())
 file_service = FileService()
-validation_service = ValidationService()
 
 # Endpoints de autenticación
 @router.post("/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -145,10 +144,11 @@ async def validate_file(
     """Validar archivo RIPS"""
     
     try:
-        results = validation_service.validate_file(
+        results = get_validation_service().validate_file(
             validation_request.file_id,
             validation_request.validation_types,
-            db
+            db,
+            include_metrics=validation_request.include_metrics
         )
         return results
         
@@ -172,7 +172,7 @@ async def get_validation_results(
     """Obtener resultados de validación"""
     
     try:
-        results = validation_service.get_validation_results(file_id, db)
+        results = get_validation_service().get_validation_results(file_id, db)
         return results
         
     except ValueError as e:
@@ -186,6 +186,28 @@ async def get_validation_results(
             detail=f"Error al obtener resultados: {str(e)}"
         )
 
+@router.get("/results/{file_id}/summary", response_model=ValidationSummaryResponse)
+async def get_validation_summary(
+    file_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Obtener el resumen precalculado de la última validación"""
+    
+    try:
+        return get_validation_service().get_validation_summary(file_id, db)
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=404,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener resumen: {str(e)}"
+        )
+
 # Endpoints administrativos
 @router.get("/admin/users", response_model=List[UserResponse])
 async def get_all_users(
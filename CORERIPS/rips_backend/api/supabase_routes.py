@@ -1,13 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from db.database import get_db
+from db.database import get_bulk_db, get_db
+from db.executors import executor_stats, run_bulk, run_db
+from db.http_pool import http_pool_stats
 from supabase import Client
 import os
 import hashlib
 import secrets
 import json
 from typing import List, Optional
-from services.rips_data_service import RIPSDataService
+from services.rips_data_service import (
+    RIPS_DATA_PAGE_SIZE, RIPSDataService, decode_data_cursor, resolve_data_types, select_columns
+)
+from services.validation_service import get_validation_service
+from services.incremental_validation import document_state_key
+from services.findings_writer import insert_findings_supabase
+from services.findings_store import get_findings_store, store_findings_run, table_findings
+from services.results_query import fetch_findings_page, iter_findings
+from services.findings_export import (
+    EXPORT_ASYNC_THRESHOLD, EXPORT_FORMATS, export_jobs, export_key, iter_csv, write_temp_export
+)
+from services.validation_summary import build_summary, get_summary_supabase, save_summary_supabase
+from services.admission import AdmissionRejected, admission_stats, ingest_admission, validation_admission
+from validators.instrumentation import rule_metrics
+from validators.progress import PHASE_ERROR, track_progress
+from services.validation_progress import progress_hub, sse_stream
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +34,9 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 security = HTTPBearer()
 
+# Servicios: el de validación se obtiene con get_validation_service() (se crea
+# en el calentamiento del arranque o en el primer uso)
+
 def get_password_hash(password: str) -> str:
     """Generar hash de contraseña"""
     try:
@@ -57,7 +79,7 @@ async def login(user_credentials: UserLogin, db: Client = Depends(get_db)):
     """Iniciar sesión"""
     try:
         # Buscar usuario
-        result = db.table("users").select("*").eq("username", user_credentials.username).execute()
+        result = await run_db(db.table("users").select("*").eq("username", user_credentials.username).execute)
         
         if not result.data:
             raise HTTPException(status_code=401, detail="Credenciales inválidas")
@@ -103,9 +125,10 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
 # Rutas de archivos
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...), db: Client = Depends(get_db)):
+async def upload_file(file: UploadFile = File(...), db: Client = Depends(get_db), bulk_db: Client = Depends(get_bulk_db)):
     """Subir archivo RIPS y procesar datos"""
     file_id = None
+    slot = None
     try:
         # Validar que sea archivo JSON
         if not file.filename.endswith('.json'):
@@ -114,14 +137,14 @@ async def upload_file(file: UploadFile = File(...), db: Client = Depends(get_db)
                 detail="Solo se permiten archivos JSON. Por favor suba un archivo .json"
             )
         
-        # Crear directorio uploads si no existe
-        os.makedirs("uploads", exist_ok=True)
+        # Esperar turno de ingesta antes de cargar el archivo en memoria
+        # (429/503 con Retry-After si la cola está llena o la espera se vence)
+        slot = await _admit(ingest_admission, file.size or 0)
         
-        # Guardar archivo
+        # Guardar archivo (escritura en disco fuera del event loop)
+        content = await file.read()
         file_path = f"uploads/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        await run_bulk(_write_upload, file_path, content)
         
         # Guardar información en base de datos
         file_data = {
@@ -133,22 +156,22 @@ async def upload_file(file: UploadFile = File(...), db: Client = Depends(get_db)
             "user_id": 1  # En producción, obtener del token
         }
         
-        result = db.table("files").insert(file_data).execute()
+        result = await run_db(db.table("files").insert(file_data).execute)
         file_id = result.data[0]["id"]
         
         logger.info(f"Archivo guardado con ID: {file_id}")
         
         # Actualizar estado a procesando
-        db.table("files").update({"status": "processing"}).eq("id", file_id).execute()
+        await _set_file_status(db, file_id, "processing")
         
-        # PROCESAR E INSERTAR DATOS RIPS
+        # PROCESAR E INSERTAR DATOS RIPS (en el pool de trabajos pesados)
         try:
             logger.info(f"Iniciando procesamiento de datos RIPS del archivo {file_id}")
-            rips_service = RIPSDataService(db)
-            stats = rips_service.process_rips_file(file_path, file_id)
+            rips_service = RIPSDataService(bulk_db)
+            stats = await run_bulk(rips_service.process_rips_file, file_path, file_id)
             
             # Actualizar estado a procesado exitosamente
-            db.table("files").update({"status": "validated"}).eq("id", file_id).execute()
+            await _set_file_status(db, file_id, "validated")
             
             logger.info(f"Datos RIPS insertados exitosamente: {stats}")
             
@@ -175,7 +198,7 @@ async def upload_file(file: UploadFile = File(...), db: Client = Depends(get_db)
             
         except Exception as processing_error:
             # Si hay error en el procesamiento, actualizar estado
-            db.table("files").update({"status": "error"}).eq("id", file_id).execute()
+            await _set_file_status(db, file_id, "error")
             logger.error(f"Error procesando datos RIPS: {str(processing_error)}")
             
             return {
@@ -192,47 +215,120 @@ async def upload_file(file: UploadFile = File(...), db: Client = Depends(get_db)
         # Si el archivo ya fue creado, actualizar estado a error
         if file_id:
             try:
-                db.table("files").update({"status": "error"}).eq("id", file_id).execute()
+                await _set_file_status(db, file_id, "error")
             except:
                 pass
         
         logger.error(f"Error al subir archivo: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al subir archivo: {str(e)}")
+    finally:
+        if slot is not None:
+            slot.release()
 
 @router.get("/files")
 async def get_files(db: Client = Depends(get_db)):
     """Listar archivos del usuario"""
     try:
-        result = db.table("files").select("*").eq("user_id", 1).execute()
+        result = await run_db(db.table("files").select("*").eq("user_id", 1).execute)
         return {"files": result.data}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener archivos: {str(e)}")
 
+def _split_param(value: Optional[str]) -> Optional[List[str]]:
+    """Parámetro separado por comas ("US,AC") como lista"""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+@router.get("/files/{file_id}/data")
+async def get_file_data(
+    file_id: int,
+    types: Optional[str] = None,
+    columns: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    cursors: Optional[str] = None,
+    stream: bool = False,
+    db: Client = Depends(get_db)
+):
+    """
+    Datos RIPS de un archivo (pantalla de revisión)
+    
+    Las tablas se consultan en paralelo. types y columns son listas separadas
+    por comas; con limit o cursors ("US:120,AC:87") se pagina por tabla; con
+    stream=true se devuelve NDJSON, una línea por página de tabla.
+    """
+    try:
+        await _get_file_or_404(db, file_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener datos: {str(e)}")
+    
+    data_types = _split_param(types)
+    projection = _split_param(columns)
+    table_cursors = {}
+    try:
+        if data_types is not None:
+            resolve_data_types(data_types)
+        select_columns(projection)
+        for item in _split_param(cursors) or []:
+            tipo, _, cursor = item.partition(":")
+            decode_data_cursor(cursor)
+            table_cursors[tipo] = cursor
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    rips_service = RIPSDataService(db)
+    
+    if stream:
+        pages = rips_service.iter_rips_data(file_id, data_types, projection, limit or RIPS_DATA_PAGE_SIZE)
+        
+        async def ndjson_lines():
+            while True:
+                page = await run_db(next, pages, None)
+                if page is None:
+                    return
+                tipo, rows = page
+                yield json.dumps({"type": tipo, "rows": rows}, ensure_ascii=False, default=str) + "\n"
+        
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+    
+    try:
+        if limit is None and not table_cursors:
+            return {"file_id": file_id, "data": await run_db(rips_service.get_rips_data, file_id, data_types, projection)}
+        page = await run_db(
+            rips_service.get_rips_data_page, file_id, data_types, projection,
+            limit or RIPS_DATA_PAGE_SIZE, table_cursors
+        )
+        return {"file_id": file_id, **page}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener datos: {str(e)}")
+
 class ValidateRequest(BaseModel):
     file_id: int
     validation_types: Optional[List[str]] = ["deterministic"]
+    include_metrics: Optional[bool] = False
 
 @router.post("/validate")
-async def validate_file(request: ValidateRequest, db: Client = Depends(get_db)):
-    """Validar archivo RIPS"""
+async def validate_file(request: ValidateRequest, db: Client = Depends(get_db), bulk_db: Client = Depends(get_bulk_db)):
+    """Validar archivo RIPS (el progreso se publica en /validate/{file_id}/events)"""
+    progress = None
+    slot = None
     try:
         file_id = request.file_id
-        validation_types = request.validation_types
+        validation_types = request.validation_types or ["deterministic"]
         # Obtener archivo
-        result = db.table("files").select("*").eq("id", file_id).execute()
+        file_info = await _get_file_or_404(db, file_id)
+        progress = progress_hub.tracker(file_id)
+        progress.set_phase("en_cola")
         
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Archivo no encontrado")
-        
-        file_info = result.data[0]
+        # Esperar turno de validación (los archivos pequeños pasan primero)
+        slot = await _admit(validation_admission, file_info.get("file_size") or 0, progress)
         
         # Actualizar estado a procesando
-        db.table("files").update({"status": "processing"}).eq("id", file_id).execute()
+        await _set_file_status(db, file_id, "processing")
         
         # Ejecutar validaciones reales
-        from validators.deterministic_enhanced import EnhancedDeterministicValidator
-        
-        validator = EnhancedDeterministicValidator()
         file_path = file_info["file_path"]
         
         # Determinar tipo de archivo
@@ -256,66 +352,275 @@ async def validate_file(request: ValidateRequest, db: Client = Depends(get_db)):
         else:
             file_type = "AC"
         
-        # Ejecutar validación
-        errors = validator.validate_file(file_path, file_type)
-        
-        # Guardar resultados en la base de datos
-        total_errors = 0
-        total_warnings = 0
-        
-        for error in errors:
-            validation_data = {
-                "file_id": file_id,
-                "line_number": error.line,
-                "field_name": error.field,
-                "rule_name": "deterministic_validation",
-                "error_message": error.error,
-                "status": "failed",
-                "validator_type": "deterministic"
-            }
-            db.table("validations").insert(validation_data).execute()
-            total_errors += 1
-        
-        # Actualizar estado a validado
-        db.table("files").update({"status": "validated"}).eq("id", file_id).execute()
-        
-        return {
+        # Ejecutar validación (el archivo se lee una sola vez para todos los validadores)
+        # en el pool de trabajos pesados, para que el event loop siga atendiendo
+        run = await run_bulk(
+            _run_validations_tracked, progress,
+            file_path, file_type, validation_types,
+            document_key=document_state_key(
+                file_info.get("user_id"), file_info.get("original_filename") or file_info["filename"]
+            ),
+            file_id=file_id
+        )
+        progress.set_phase("guardado")
+        
+        # Guardar hallazgos y resumen (inserciones por lotes, en el pool de trabajos pesados)
+        summary = await run_bulk(_save_validation_run, bulk_db, file_id, run)
+        total_validations = summary["total_findings"]
+        total_errors = summary["total_errors"]
+        total_warnings = summary["total_warnings"]
+        
+        # Las exportaciones de la validación anterior dejan de ser válidas
+        await run_db(export_jobs.invalidate, file_id)
+        
+        # Actualizar estado a validado (solo después de confirmar el último lote)
+        await _set_file_status(db, file_id, "validated")
+        
+        response = {
             "message": "Validación completada",
             "file_id": file_id,
             "status": "validated",
             "errors": total_errors,
             "warnings": total_warnings,
-            "total_validations": len(errors)
+            "total_validations": total_validations,
+            "total_lines": run["total_lines"],
+            "total_records": run["total_records"],
+            "incremental": run["incremental"],
+            "cached": run["cached"]
         }
+        if request.include_metrics:
+            response["rule_metrics"] = run["rule_metrics"]
+        
+        progress.finish(findings=total_validations)
+        return response
         
     except HTTPException:
         raise
     except Exception as e:
+        if progress is not None:
+            progress.finish(PHASE_ERROR, detail=str(e))
         # Actualizar estado a error
-        db.table("files").update({"status": "error"}).eq("id", file_id).execute()
+        await _set_file_status(db, file_id, "error")
         raise HTTPException(status_code=500, detail=f"Error al validar archivo: {str(e)}")
+    finally:
+        if slot is not None:
+            slot.release()
+
+async def _admit(controller, size: int, progress=None):
+    """Turno del controlador de admisión, o 429/503 con Retry-After"""
+    try:
+        return await controller.acquire(size)
+    except AdmissionRejected as e:
+        if progress is not None:
+            progress.finish(PHASE_ERROR, detail=e.detail)
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+async def _get_file_or_404(db: Client, file_id: int) -> dict:
+    """Obtener el registro del archivo o responder 404"""
+    file_result = await run_db(db.table("files").select("*").eq("id", file_id).execute)
+    if not file_result.data:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    return file_result.data[0]
+
+async def _set_file_status(db: Client, file_id: int, status: str):
+    """Actualizar el estado de un archivo"""
+    await run_db(db.table("files").update({"status": status}).eq("id", file_id).execute)
+
+def _write_upload(file_path: str, content: bytes):
+    """Guardar el archivo subido en disco"""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as buffer:
+        buffer.write(content)
+
+def _save_validation_run(db: Client, file_id: int, run: dict) -> dict:
+    """
+    Guardar los hallazgos (en modo columnar solo los primeros en la tabla y el
+    conjunto completo en el almacén local) y el resumen de una validación
+    """
+    errors_for_table, columnar = table_findings(run["errors"])
+    insert_findings_supabase(db, file_id, errors_for_table)
+    store_findings_run(file_id, run["errors"], columnar)
+    
+    summary = build_summary(file_id, run["errors"], run["total_lines"], run["total_records"])
+    save_summary_supabase(db, summary)
+    return summary
+
+def _run_validations_tracked(progress, *args, **kwargs):
+    """run_validations con el seguimiento de progreso activo (en el hilo de trabajo)"""
+    with track_progress(progress):
+        return get_validation_service().run_validations(*args, **kwargs)
+
+@router.get("/validate/{file_id}/events")
+async def validation_events(file_id: int):
+    """
+    Progreso de la validación de un archivo como Server-Sent Events
+    
+    Eventos "progress" con fase, líneas procesadas, hallazgos y ETA hasta la
+    fase final ("completado" o "error"). No consulta la base de datos.
+    """
+    return StreamingResponse(
+        sse_stream(progress_hub, file_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/results/{file_id}")
-async def get_validation_results(file_id: int, db: Client = Depends(get_db)):
-    """Obtener resultados de validación"""
+async def get_validation_results(
+    file_id: int,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    field: Optional[str] = None,
+    rule: Optional[str] = None,
+    status: Optional[str] = None,
+    validator_type: Optional[str] = None,
+    line_from: Optional[int] = None,
+    line_to: Optional[int] = None,
+    db: Client = Depends(get_db)
+):
+    """Obtener resultados de validación (paginados por cursor y filtrables)"""
     try:
-        # Obtener archivo
-        file_result = db.table("files").select("*").eq("id", file_id).execute()
+        file_record = await _get_file_or_404(db, file_id)
         
-        if not file_result.data:
-            raise HTTPException(status_code=404, detail="Archivo no encontrado")
-        
-        # Obtener validaciones
-        validations_result = db.table("validations").select("*").eq("file_id", file_id).execute()
+        filters = {"field": field, "rule": rule, "status": status, "validator_type": validator_type}
+        try:
+            validations, next_cursor = await run_db(
+                fetch_findings_page, db, file_id, limit, cursor, filters, line_from, line_to
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "file_id": file_id,
-            "filename": file_result.data[0]["original_filename"],
-            "status": file_result.data[0]["status"],
-            "validations": validations_result.data
+            "filename": file_record["original_filename"],
+            "status": file_record["status"],
+            "validations": validations,
+            "next_cursor": next_cursor
         }
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener resultados: {str(e)}")
+
+@router.get("/results/{file_id}/summary")
+async def get_validation_summary(file_id: int, db: Client = Depends(get_db)):
+    """Resumen precalculado de la última validación (una fila, sin leer los hallazgos)"""
+    try:
+        summary = await run_db(get_summary_supabase, db, file_id)
+        if summary is None:
+            raise HTTPException(status_code=404, detail="Resumen no disponible: el archivo no ha sido validado")
+        return summary
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener resumen: {str(e)}")
+
+@router.get("/results/{file_id}/stream")
+async def stream_validation_results(
+    file_id: int,
+    field: Optional[str] = None,
+    rule: Optional[str] = None,
+    status: Optional[str] = None,
+    validator_type: Optional[str] = None,
+    line_from: Optional[int] = None,
+    line_to: Optional[int] = None,
+    db: Client = Depends(get_db)
+):
+    """Todos los hallazgos de un archivo en NDJSON (un hallazgo por línea)"""
+    try:
+        await _get_file_or_404(db, file_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al obtener resultados: {str(e)}")
+    
+    filters = {"field": field, "rule": rule, "status": status, "validator_type": validator_type}
+    
+    async def ndjson_lines():
+        cursor = None
+        while True:
+            rows, cursor = await run_db(fetch_findings_page, db, file_id, None, cursor, filters, line_from, line_to)
+            if rows:
+                yield "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+            if cursor is None:
+                return
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@router.get("/results/{file_id}/export")
+async def export_validation_results(
+    file_id: int,
+    format: str = "csv",
+    field: Optional[str] = None,
+    rule: Optional[str] = None,
+    status: Optional[str] = None,
+    validator_type: Optional[str] = None,
+    line_from: Optional[int] = None,
+    line_to: Optional[int] = None,
+    db: Client = Depends(get_db)
+):
+    """
+    Exportar los hallazgos de un archivo a CSV o XLSX
+    
+    Hasta EXPORT_ASYNC_THRESHOLD hallazgos la exportación se genera en la
+    respuesta; por encima se genera en segundo plano (202 mientras tanto) y se
+    sirve desde caché hasta que el archivo se vuelve a validar.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {format}. Use csv o xlsx")
+    try:
+        file_record = await _get_file_or_404(db, file_id)
+        summary = await run_db(get_summary_supabase, db, file_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar resultados: {str(e)}")
+    
+    query = {
+        "filters": {"field": field, "rule": rule, "status": status, "validator_type": validator_type},
+        "line_from": line_from,
+        "line_to": line_to
+    }
+    key = export_key(file_id, format, query)
+    download_name = f"{os.path.splitext(file_record['original_filename'])[0]}_hallazgos.{format}"
+    
+    cached_path = export_jobs.cached_path(key, format)
+    if cached_path:
+        return FileResponse(cached_path, media_type=EXPORT_FORMATS[format], filename=download_name)
+    
+    # Sin resumen (validaciones anteriores) no se conoce el tamaño: se trata como grande
+    total_findings = summary["total_findings"] if summary is not None else None
+    if total_findings is None or total_findings > EXPORT_ASYNC_THRESHOLD:
+        job = export_jobs.submit(db, file_id, format, query)
+        return JSONResponse(
+            status_code=202,
+            content={"file_id": file_id, "format": format, "status": job["status"], "error": job["error"]},
+            headers={"Retry-After": "5"}
+        )
+    
+    headers = {"Content-Disposition": f'attachment; filename="{download_name}"'}
+    if format == "csv":
+        return StreamingResponse(
+            iter_csv(iter_findings(db, file_id, **query)), media_type=EXPORT_FORMATS[format], headers=headers
+        )
+    try:
+        path = await run_bulk(write_temp_export, db, file_id, format, query)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar resultados: {str(e)}")
+    return FileResponse(path, media_type=EXPORT_FORMATS[format], filename=download_name,
+                        background=BackgroundTask(os.remove, path))
+
+# Métricas
+@router.get("/metrics")
+async def get_metrics():
+    """Métricas agregadas del proceso (reglas, caché de resultados, almacén columnar, pools de hilos y de conexiones, admisión)"""
+    result_cache = get_validation_service().result_cache
+    return {
+        "rules": rule_metrics.snapshot(),
+        "result_cache": await run_db(result_cache.stats) if result_cache is not None else None,
+        "findings_store": await run_db(lambda: get_findings_store().stats()),
+        "thread_pools": executor_stats(),
+        "http_pools": http_pool_stats(),
+        "admission": admission_stats()
+    }
@@ -44,6 +44,21 @@ CREATE TABLE validations (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Tabla: validation_summaries (resumen de la última validación de cada archivo)
+CREATE TABLE validation_summaries (
+    file_id INTEGER PRIMARY KEY REFERENCES files(id),
+    total_lines INTEGER DEFAULT 0 NOT NULL,
+    total_records INTEGER DEFAULT 0 NOT NULL,
+    total_findings INTEGER DEFAULT 0 NOT NULL,
+    total_errors INTEGER DEFAULT 0 NOT NULL,
+    total_warnings INTEGER DEFAULT 0 NOT NULL,
+    by_status JSONB DEFAULT '{}'::jsonb NOT NULL,
+    by_rule JSONB DEFAULT '{}'::jsonb NOT NULL,
+    by_field JSONB DEFAULT '{}'::jsonb NOT NULL,
+    by_validator_type JSONB DEFAULT '{}'::jsonb NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Crear índices para mejor rendimiento
 CREATE INDEX idx_users_username ON users(username);
 CREATE INDEX idx_users_email ON users(email);
@@ -51,6 +66,8 @@ CREATE INDEX idx_files_user_id ON files(user_id);
 CREATE INDEX idx_files_status ON files(status);
 CREATE INDEX idx_validations_file_id ON validations(file_id);
 CREATE INDEX idx_validations_status ON validations(status);
+-- Paginación por cursor de resultados: (file_id, line_number, id)
+CREATE INDEX idx_validations_file_line_id ON validations(file_id, line_number, id);
 
 -- Función para actualizar updated_at automáticamente
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -70,6 +87,10 @@ CREATE TRIGGER update_files_updated_at
     BEFORE UPDATE ON files 
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+CREATE TRIGGER update_validation_summaries_updated_at 
+    BEFORE UPDATE ON validation_summaries 
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
 -- Insertar usuario administrador por defecto
 -- Nota: La contraseña 'admin123' debe ser hasheada en tu aplicación
 INSERT INTO users (username, email, hashed_password, role) 
@@ -93,7 +114,7 @@ SELECT
     tableowner
 FROM pg_tables 
 WHERE schemaname = 'public' 
-    AND tablename IN ('users', 'files', 'validations')
+    AND tablename IN ('users', 'files', 'validations', 'validation_summaries')
 ORDER BY tablename;
 
 -- ========================================
@@ -351,39 +372,40 @@ CREATE TABLE rips_control (
 );
 
 -- Create indexes for RIPS tables
-CREATE INDEX idx_rips_consultations_file_id ON rips_consultations(file_id);
+-- (file_id, id): lectura por archivo paginada por id (RIPSDataService.get_rips_data_page)
+CREATE INDEX idx_rips_consultations_file_id ON rips_consultations(file_id, id);
 CREATE INDEX idx_rips_consultations_provider_code ON rips_consultations(provider_code);
 CREATE INDEX idx_rips_consultations_date ON rips_consultations(consultation_date);
 
-CREATE INDEX idx_rips_procedures_file_id ON rips_procedures(file_id);
+CREATE INDEX idx_rips_procedures_file_id ON rips_procedures(file_id, id);
 CREATE INDEX idx_rips_procedures_provider_code ON rips_procedures(provider_code);
 CREATE INDEX idx_rips_procedures_date ON rips_procedures(procedure_date);
 
-CREATE INDEX idx_rips_users_file_id ON rips_users(file_id);
+CREATE INDEX idx_rips_users_file_id ON rips_users(file_id, id);
 CREATE INDEX idx_rips_users_document ON rips_users(document_type, document_number);
 
-CREATE INDEX idx_rips_medications_file_id ON rips_medications(file_id);
+CREATE INDEX idx_rips_medications_file_id ON rips_medications(file_id, id);
 CREATE INDEX idx_rips_medications_provider_code ON rips_medications(provider_code);
 
-CREATE INDEX idx_rips_other_services_file_id ON rips_other_services(file_id);
+CREATE INDEX idx_rips_other_services_file_id ON rips_other_services(file_id, id);
 CREATE INDEX idx_rips_other_services_provider_code ON rips_other_services(provider_code);
 
-CREATE INDEX idx_rips_emergencies_file_id ON rips_emergencies(file_id);
+CREATE INDEX idx_rips_emergencies_file_id ON rips_emergencies(file_id, id);
 CREATE INDEX idx_rips_emergencies_provider_code ON rips_emergencies(provider_code);
 
-CREATE INDEX idx_rips_hospitalizations_file_id ON rips_hospitalizations(file_id);
+CREATE INDEX idx_rips_hospitalizations_file_id ON rips_hospitalizations(file_id, id);
 CREATE INDEX idx_rips_hospitalizations_provider_code ON rips_hospitalizations(provider_code);
 
-CREATE INDEX idx_rips_newborns_file_id ON rips_newborns(file_id);
+CREATE INDEX idx_rips_newborns_file_id ON rips_newborns(file_id, id);
 CREATE INDEX idx_rips_newborns_provider_code ON rips_newborns(provider_code);
 
-CREATE INDEX idx_rips_billing_file_id ON rips_billing(file_id);
+CREATE INDEX idx_rips_billing_file_id ON rips_billing(file_id, id);
 CREATE INDEX idx_rips_billing_invoice_number ON rips_billing(invoice_number);
 
-CREATE INDEX idx_rips_adjustments_file_id ON rips_adjustments(file_id);
+CREATE INDEX idx_rips_adjustments_file_id ON rips_adjustments(file_id, id);
 CREATE INDEX idx_rips_adjustments_invoice_number ON rips_adjustments(invoice_number);
 
-CREATE INDEX idx_rips_control_file_id ON rips_control(file_id);
+CREATE INDEX idx_rips_control_file_id ON rips_control(file_id, id);
 CREATE INDEX idx_rips_control_provider_code ON rips_control(provider_code);
 
 -- ========================================
@@ -480,7 +502,7 @@ SELECT
 FROM pg_tables 
 WHERE schemaname = 'public' 
     AND tablename IN (
-        'users', 'files', 'validations',
+        'users', 'files', 'validations', 'validation_summaries',
         'rips_consultations', 'rips_procedures', 'rips_users',
         'rips_medications', 'rips_other_services', 'rips_emergencies',
         'rips_hospitalizations', 'rips_newborns', 'rips_billing',
@@ -1,6 +1,8 @@
 from supabase import create_client, Client
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
+from db.http_pool import use_http_pool
 
 load_dotenv()
 
@@ -8,21 +10,45 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 
-if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-    raise ValueError("SUPABASE_URL y SUPABASE_ANON_KEY deben estar configurados en .env")
+def _create_client(pool: str) -> Client:
+    if not SUPABASE_URL or not SUPABASE_ANON_KEY:
+        raise ValueError("SUPABASE_URL y SUPABASE_ANON_KEY deben estar configurados en .env")
+    return use_http_pool(create_client(SUPABASE_URL, SUPABASE_ANON_KEY), pool)
 
-# Cliente de Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+# Los clientes se crean en el primer uso (no al importar), así el worker
+# arranca aunque la configuración o la base de datos no estén disponibles
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Cliente de Supabase (pool de conexiones de atención de peticiones)"""
+    return _create_client("request")
+
+@lru_cache(maxsize=1)
+def get_supabase_bulk() -> Client:
+    """Cliente para ingesta y escrituras masivas (pool de conexiones propio)"""
+    return _create_client("bulk")
+
+def __getattr__(name):
+    # Compatibilidad con "from db.database import supabase"
+    if name == "supabase":
+        return get_supabase()
+    if name == "supabase_bulk":
+        return get_supabase_bulk()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_db():
     """Dependency para obtener cliente de Supabase"""
-    return supabase
+    return get_supabase()
+
+def get_bulk_db():
+    """Dependency para obtener el cliente de Supabase de ingesta masiva"""
+    return get_supabase_bulk()
 
 def test_connection():
     """Probar conexión a Supabase"""
     try:
         # Probar una consulta simple
-        result = supabase.table("users").select("id").limit(1).execute()
+        result = get_supabase().table("users").select("id").limit(1).execute()
         return True
     except Exception as e:
         print(f"Error conectando a Supabase: {e}")
@@ -0,0 +1,110 @@
+"""
+Pools de hilos para el acceso bloqueante desde las rutas async
+
+El cliente de Supabase (PostgREST sobre httpx síncrono), las escrituras de
+archivos y la ingesta/validación RIPS son bloqueantes. Ejecutarlos dentro de
+una ruta async detiene el event loop y con él todas las peticiones del worker
+(incluido /health). Las rutas los envían a uno de dos pools con tamaño fijo:
+
+- "db": consultas cortas de atención de peticiones (DB_THREAD_POOL_SIZE)
+- "bulk": ingesta, validación y exportación (BULK_THREAD_POOL_SIZE)
+
+Al estar separados, una ráfaga de cargas pesadas ocupa solo el pool "bulk" y
+las consultas cortas siguen teniendo hilos libres.
+
+Uso:
+    result = await run_db(query.execute)
+    stats = await run_bulk(service.process_rips_file, file_path, file_id)
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+DB_THREAD_POOL_SIZE = int(os.getenv("DB_THREAD_POOL_SIZE", "16"))
+BULK_THREAD_POOL_SIZE = int(os.getenv("BULK_THREAD_POOL_SIZE", "2"))
+
+POOL_SIZES = {"db": DB_THREAD_POOL_SIZE, "bulk": BULK_THREAD_POOL_SIZE}
+
+
+class BlockingPool:
+    """ThreadPoolExecutor con contadores de tareas activas y en espera"""
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{name}-io")
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+
+    def _run(self, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecutar func en el pool conservando las variables de contexto del llamador"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        call = partial(context.run, func, *args, **kwargs)
+        with self._lock:
+            self.queued += 1
+        return await loop.run_in_executor(self._executor, self._run, call)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": self.size, "active": self.active, "queued": self.queued, "completed": self.completed}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_pools: Dict[str, BlockingPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: str) -> BlockingPool:
+    """Pool compartido del proceso (se crea en el primer uso)"""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = _pools[name] = BlockingPool(name, POOL_SIZES[name])
+        return pool
+
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Consulta corta bloqueante (p.ej. query.execute) fuera del event loop"""
+    return await get_pool("db").run(func, *args, **kwargs)
+
+
+async def run_bulk(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Trabajo pesado bloqueante (ingesta, validación, exportación) fuera del event loop"""
+    return await get_pool("bulk").run(func, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, int]]:
+    """Uso de cada pool creado"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
+
+
+def shutdown_executors():
+    """Cerrar los pools (apagado de la aplicación)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
@@ -0,0 +1,202 @@
+"""
+Pools de conexiones HTTP para el transporte PostgREST de Supabase
+
+supabase-py crea una sesión httpx por cliente con los valores por defecto
+(keep-alive de 5 s, HTTP/1.1, sin métricas). Aquí cada cliente usa el
+transporte de un pool con nombre, compartido por todos los clientes del
+proceso que usen ese nombre:
+
+- "request": consultas de atención de peticiones (db.database.supabase,
+  db.supabase_client)
+- "bulk": ingesta RIPS y escritura de hallazgos (db.database.supabase_bulk)
+
+Al ser transportes separados, una ingesta masiva no ocupa las conexiones de
+las consultas cortas ni al revés.
+
+Configuración (variables de entorno):
+- SUPABASE_HTTP_MAX_CONNECTIONS / SUPABASE_BULK_HTTP_MAX_CONNECTIONS
+  (por defecto, el tamaño del pool de hilos correspondiente)
+- SUPABASE_HTTP_MAX_KEEPALIVE / SUPABASE_BULK_HTTP_MAX_KEEPALIVE
+- SUPABASE_HTTP_KEEPALIVE_EXPIRY (segundos, 60)
+- SUPABASE_HTTP2 (true: HTTP/2 si el paquete h2 está instalado)
+- SUPABASE_HTTP_CONNECT_TIMEOUT (5), SUPABASE_HTTP_POOL_TIMEOUT (10)
+- SUPABASE_HTTP_READ_TIMEOUT (30) / SUPABASE_BULK_HTTP_READ_TIMEOUT (120)
+
+Uso:
+    client = use_http_pool(create_client(url, key), "bulk")
+    stats = http_pool_stats()
+"""
+
+import importlib.util
+import os
+import threading
+from functools import partial
+from typing import Any, Dict
+
+import httpx
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient
+from supabase import Client
+
+from db.executors import BULK_THREAD_POOL_SIZE, DB_THREAD_POOL_SIZE
+
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+SUPABASE_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "60"))
+SUPABASE_HTTP_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_HTTP_CONNECT_TIMEOUT", "5"))
+SUPABASE_HTTP_POOL_TIMEOUT = float(os.getenv("SUPABASE_HTTP_POOL_TIMEOUT", "10"))
+
+POOL_SETTINGS = {
+    "request": {
+        "max_connections": int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", str(DB_THREAD_POOL_SIZE))),
+        "max_keepalive": int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", str(DB_THREAD_POOL_SIZE))),
+        "read_timeout": float(os.getenv("SUPABASE_HTTP_READ_TIMEOUT", "30")),
+    },
+    "bulk": {
+        "max_connections": int(os.getenv("SUPABASE_BULK_HTTP_MAX_CONNECTIONS", str(BULK_THREAD_POOL_SIZE))),
+        "max_keepalive": int(os.getenv("SUPABASE_BULK_HTTP_MAX_KEEPALIVE", str(BULK_THREAD_POOL_SIZE))),
+        "read_timeout": float(os.getenv("SUPABASE_BULK_HTTP_READ_TIMEOUT", "120")),
+    },
+}
+
+
+def http2_available() -> bool:
+    """HTTP/2 requiere el paquete h2 (httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class PoolTransport(httpx.HTTPTransport):
+    """Transporte httpx con límites propios y contadores de uso"""
+
+    def __init__(self, name: str, max_connections: int, max_keepalive: int, read_timeout: float):
+        self.name = name
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.read_timeout = read_timeout
+        self.http2 = SUPABASE_HTTP2 and http2_available()
+        super().__init__(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self.pool_timeouts = 0
+        self.errors = 0
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=SUPABASE_HTTP_CONNECT_TIMEOUT,
+            read=self.read_timeout,
+            write=self.read_timeout,
+            pool=SUPABASE_HTTP_POOL_TIMEOUT,
+        )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            return super().handle_request(request)
+        except httpx.PoolTimeout:
+            with self._lock:
+                self.pool_timeouts += 1
+            raise
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        connections = list(self._pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        busy = len(connections) - idle
+        with self._lock:
+            return {
+                "http2": self.http2,
+                "max_connections": self.max_connections,
+                "max_keepalive": self.max_keepalive,
+                "connections": len(connections),
+                "busy": busy,
+                "idle": idle,
+                "utilization": round(busy / self.max_connections, 4) if self.max_connections else None,
+                "requests": self.requests,
+                "active_requests": self.active,
+                "peak_active_requests": self.peak_active,
+                "pool_timeouts": self.pool_timeouts,
+                "errors": self.errors,
+            }
+
+
+_transports: Dict[str, PoolTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(name: str) -> PoolTransport:
+    """Transporte compartido del pool (se crea en el primer uso)"""
+    with _transports_lock:
+        transport = _transports.get(name)
+        if transport is None:
+            transport = _transports[name] = PoolTransport(name, **POOL_SETTINGS[name])
+        return transport
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """Cliente PostgREST cuya sesión usa el transporte de un pool con nombre"""
+
+    def __init__(self, base_url: str, pool: str, **kwargs):
+        self.pool = pool
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url: str, headers: Dict[str, str], timeout: Any) -> SyncClient:
+        transport = get_transport(self.pool)
+        return SyncClient(base_url=base_url, headers=headers, timeout=transport.timeout, transport=transport)
+
+    def aclose(self) -> None:
+        # El transporte es compartido: se cierra con close_http_pools
+        pass
+
+
+def _init_postgrest_client(pool: str, rest_url: str, headers: Dict[str, str], schema: str, timeout: Any = None) -> SyncPostgrestClient:
+    return PooledPostgrestClient(rest_url, pool, headers=headers, schema=schema)
+
+
+def use_http_pool(client: Client, pool: str) -> Client:
+    """
+    Hacer que el cliente de Supabase use el pool de conexiones indicado
+
+    El cliente PostgREST se recrea tras eventos de autenticación; por eso se
+    reemplaza la fábrica del cliente y no solo su sesión actual. Los objetos
+    que no son un Client real (dobles de prueba) se devuelven sin cambios.
+    """
+    if pool not in POOL_SETTINGS:
+        raise ValueError(f"Pool HTTP desconocido: {pool}")
+    if isinstance(client, Client):
+        client._init_postgrest_client = partial(_init_postgrest_client, pool)
+        client._postgrest = None
+    return client
+
+
+def http_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Uso de cada pool de conexiones creado"""
+    with _transports_lock:
+        transports = list(_transports.values())
+    return {transport.name: transport.stats() for transport in transports}
+
+
+def close_http_pools():
+    """Cerrar las conexiones de todos los pools (apagado de la aplicación)"""
+    with _transports_lock:
+        transports = list(_transports.values())
+        _transports.clear()
+    for transport in transports:
+        transport.close()
@@ -0,0 +1,34 @@
+"""
+Almacenamiento local embebido (SQLite) para estado auxiliar de validación
+
+Guarda datos derivados que no pertenecen a Supabase (hashes de registros,
+índices y estadísticas) en archivos SQLite dentro de LOCAL_STORE_DIR.
+"""
+
+import os
+import sqlite3
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOCAL_STORE_DIR = os.getenv("LOCAL_STORE_DIR", "uploads/.local_store")
+
+
+def get_local_store_path(name: str) -> str:
+    """Ruta del archivo SQLite para un almacén"""
+    store_dir = os.getenv("LOCAL_STORE_DIR", LOCAL_STORE_DIR)
+    os.makedirs(store_dir, exist_ok=True)
+    return os.path.join(store_dir, f"{name}.sqlite3")
+
+
+def connect_local_store(name: str) -> sqlite3.Connection:
+    """
+    Abrir conexión a un almacén local
+
+    La conexión usa WAL para permitir lecturas concurrentes con una escritura.
+    Cada llamador es responsable de cerrarla.
+    """
+    connection = sqlite3.connect(get_local_store_path(name), timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
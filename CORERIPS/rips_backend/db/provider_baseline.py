@@ -0,0 +1,334 @@
+"""
+Línea base estadística por prestador (AI-PAT-002 y AI-FRAUD-002 contra históricos)
+
+Se actualiza de forma incremental en cada ingesta, sin volver a recorrer los
+datos históricos:
+
+- Volumen diario: media y varianza en streaming (Welford, combinadas con la
+  fórmula de Chan) del número de servicios por día, por prestador y día de la
+  semana. Un archivo nuevo se puntúa con z = (conteo - media) / desviación.
+- Mezcla de CUPS: un count-min sketch por prestador estima con memoria fija
+  cuántas veces ha facturado cada código de procedimiento. AI-FRAUD-002 compara
+  con él la concentración de CUPS de un archivo nuevo.
+
+La contribución de cada archivo se guarda aparte (agregada, no por registro)
+para poder retirarla al reingerir el archivo o excluirla al puntuarlo.
+"""
+
+import hashlib
+import logging
+import math
+import os
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from db.local_store import connect_local_store
+from db.service_index import parse_service_date
+
+logger = logging.getLogger(__name__)
+
+STORE_NAME = "provider_baseline"
+
+PROVIDER_BASELINE_ENABLED = os.getenv("PROVIDER_BASELINE_ENABLED", "true").lower() == "true"
+
+# Dimensiones del count-min sketch (error ~ e/ancho del total, con prob. 1 - e^-profundidad)
+SKETCH_WIDTH = int(os.getenv("PROVIDER_BASELINE_SKETCH_WIDTH", "2048"))
+SKETCH_DEPTH = int(os.getenv("PROVIDER_BASELINE_SKETCH_DEPTH", "4"))
+
+
+def merge_moments(a: Tuple[int, float, float], b: Tuple[int, float, float]) -> Tuple[int, float, float]:
+    """Combinar dos resúmenes (n, media, M2) de Welford (fórmula de Chan)"""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    mean = mean_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta * delta * n_a * n_b / n
+    return n, mean, m2
+
+
+def subtract_moments(total: Tuple[int, float, float], part: Tuple[int, float, float]) -> Tuple[int, float, float]:
+    """Retirar un resumen (n, media, M2) de otro que lo contiene (inversa de merge_moments)"""
+    n, mean, m2 = total
+    n_b, mean_b, m2_b = part
+    n_a = n - n_b
+    if n_a <= 0:
+        return 0, 0.0, 0.0
+    mean_a = (n * mean - n_b * mean_b) / n_a
+    delta = mean_b - mean_a
+    m2_a = m2 - m2_b - delta * delta * n_a * n_b / n
+    return n_a, mean_a, max(m2_a, 0.0)
+
+
+def moments_of(values: Iterable[float]) -> Tuple[int, float, float]:
+    """Resumen (n, media, M2) de una secuencia (algoritmo de Welford)"""
+    n, mean, m2 = 0, 0.0, 0.0
+    for value in values:
+        n += 1
+        delta = value - mean
+        mean += delta / n
+        m2 += delta * (value - mean)
+    return n, mean, m2
+
+
+class CountMinSketch:
+    """Count-min sketch de conteos de códigos con memoria fija (profundidad x ancho)"""
+
+    __slots__ = ("width", "depth", "table")
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, table: Optional[np.ndarray] = None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, item: str) -> np.ndarray:
+        digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=4 * self.depth).digest()
+        return np.frombuffer(digest, dtype='<u4').astype(np.int64) % self.width
+
+    def add(self, item: str, count: int = 1):
+        self.table[np.arange(self.depth), self._columns(item)] += count
+
+    def estimate(self, item: str) -> int:
+        """Conteo estimado (nunca menor al real)"""
+        return int(self.table[np.arange(self.depth), self._columns(item)].min())
+
+    def to_bytes(self) -> bytes:
+        return self.table.astype('<i8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob: bytes, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH) -> "CountMinSketch":
+        table = np.frombuffer(blob, dtype='<i8').astype(np.int64).reshape(depth, width)
+        return cls(width, depth, table)
+
+
+class ProviderBaseline:
+    """Almacén persistente (SQLite local) de la línea base por prestador"""
+
+    def __init__(self, store_name: str = STORE_NAME, sketch_width: int = SKETCH_WIDTH,
+                 sketch_depth: int = SKETCH_DEPTH):
+        self.store_name = store_name
+        self.sketch_width = sketch_width
+        self.sketch_depth = sketch_depth
+        connection = connect_local_store(store_name)
+        try:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS volume_stats (
+                    provider TEXT NOT NULL,
+                    weekday INTEGER NOT NULL,
+                    n INTEGER NOT NULL,
+                    mean REAL NOT NULL,
+                    m2 REAL NOT NULL,
+                    PRIMARY KEY (provider, weekday)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS cups_mix (
+                    provider TEXT PRIMARY KEY,
+                    total INTEGER NOT NULL,
+                    sketch BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS file_volume (
+                    file_id INTEGER NOT NULL,
+                    provider TEXT NOT NULL,
+                    weekday INTEGER NOT NULL,
+                    n INTEGER NOT NULL,
+                    mean REAL NOT NULL,
+                    m2 REAL NOT NULL,
+                    PRIMARY KEY (file_id, provider, weekday)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS file_cups (
+                    file_id INTEGER NOT NULL,
+                    provider TEXT NOT NULL,
+                    cups TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (file_id, provider, cups)
+                ) WITHOUT ROWID;
+            """)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _file_contribution(services: Iterable[Tuple[str, str, object]]):
+        """Resúmenes por (prestador, día de la semana) y conteos por (prestador, CUPS) de un archivo"""
+        daily_counts: Dict[Tuple[str, object], int] = defaultdict(int)
+        cups_counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        for provider, cups, service_date in services:
+            day = parse_service_date(service_date)
+            provider = str(provider or '').strip()
+            if not provider or day is None:
+                continue
+            daily_counts[(provider, day)] += 1
+            if cups:
+                cups_counts[(provider, str(cups).strip())] += 1
+
+        by_weekday: Dict[Tuple[str, int], List[int]] = defaultdict(list)
+        for (provider, day), count in daily_counts.items():
+            by_weekday[(provider, day.weekday())].append(count)
+        volume = {key: moments_of(counts) for key, counts in by_weekday.items()}
+        return volume, cups_counts
+
+    def _load_sketch(self, connection, provider: str) -> Tuple[int, CountMinSketch]:
+        row = connection.execute("SELECT total, sketch FROM cups_mix WHERE provider = ?", (provider,)).fetchone()
+        if row is None:
+            return 0, CountMinSketch(self.sketch_width, self.sketch_depth)
+        return row[0], CountMinSketch.from_bytes(row[1], self.sketch_width, self.sketch_depth)
+
+    def _apply_cups(self, connection, cups_counts: Dict[Tuple[str, str], int], sign: int):
+        by_provider: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        for (provider, cups), count in cups_counts.items():
+            by_provider[provider].append((cups, count))
+        for provider, items in by_provider.items():
+            total, sketch = self._load_sketch(connection, provider)
+            for cups, count in items:
+                sketch.add(cups, sign * count)
+                total += sign * count
+            connection.execute(
+                "INSERT OR REPLACE INTO cups_mix (provider, total, sketch) VALUES (?, ?, ?)",
+                (provider, max(total, 0), sketch.to_bytes())
+            )
+
+    def add_file(self, file_id: int, services: Iterable[Tuple[str, str, object]]) -> int:
+        """
+        Incorporar los servicios de un archivo ingerido a la línea base
+
+        Args:
+            file_id: ID del archivo en la tabla files
+            services: (codigo_prestador, codigo_cups, fecha_servicio); el CUPS puede ser vacío
+
+        Returns:
+            Número de días-prestador incorporados a las estadísticas de volumen
+        """
+        volume, cups_counts = self._file_contribution(services)
+        if not volume:
+            return 0
+
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                for (provider, weekday), moments in volume.items():
+                    row = connection.execute(
+                        "SELECT n, mean, m2 FROM volume_stats WHERE provider = ? AND weekday = ?", (provider, weekday)
+                    ).fetchone()
+                    n, mean, m2 = merge_moments(row or (0, 0.0, 0.0), moments)
+                    connection.execute(
+                        "INSERT OR REPLACE INTO volume_stats (provider, weekday, n, mean, m2) VALUES (?, ?, ?, ?, ?)",
+                        (provider, weekday, n, mean, m2)
+                    )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO file_volume (file_id, provider, weekday, n, mean, m2) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(file_id, provider, weekday, *moments) for (provider, weekday), moments in volume.items()]
+                )
+                self._apply_cups(connection, cups_counts, 1)
+                connection.executemany(
+                    "INSERT OR REPLACE INTO file_cups (file_id, provider, cups, count) VALUES (?, ?, ?, ?)",
+                    [(file_id, provider, cups, count) for (provider, cups), count in cups_counts.items()]
+                )
+        finally:
+            connection.close()
+        return sum(moments[0] for moments in volume.values())
+
+    def remove_file(self, file_id: int):
+        """Retirar la contribución de un archivo (p.ej. antes de reingerirlo)"""
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                contributions = connection.execute(
+                    "SELECT provider, weekday, n, mean, m2 FROM file_volume WHERE file_id = ?", (file_id,)
+                ).fetchall()
+                for provider, weekday, n, mean, m2 in contributions:
+                    row = connection.execute(
+                        "SELECT n, mean, m2 FROM volume_stats WHERE provider = ? AND weekday = ?", (provider, weekday)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    remaining = subtract_moments(row, (n, mean, m2))
+                    if remaining[0] == 0:
+                        connection.execute(
+                            "DELETE FROM volume_stats WHERE provider = ? AND weekday = ?", (provider, weekday)
+                        )
+                    else:
+                        connection.execute(
+                            "UPDATE volume_stats SET n = ?, mean = ?, m2 = ? WHERE provider = ? AND weekday = ?",
+                            (*remaining, provider, weekday)
+                        )
+                cups_counts = {
+                    (provider, cups): count
+                    for provider, cups, count in connection.execute(
+                        "SELECT provider, cups, count FROM file_cups WHERE file_id = ?", (file_id,)
+                    )
+                }
+                self._apply_cups(connection, cups_counts, -1)
+                connection.execute("DELETE FROM file_volume WHERE file_id = ?", (file_id,))
+                connection.execute("DELETE FROM file_cups WHERE file_id = ?", (file_id,))
+        finally:
+            connection.close()
+
+    def volume_stats(self, providers: Iterable[str],
+                     exclude_file_id: Optional[int] = None) -> Dict[Tuple[str, int], Tuple[int, float, float]]:
+        """
+        Estadísticas de volumen diario de los prestadores
+
+        Returns:
+            (prestador, día de la semana) -> (días observados, media, desviación estándar muestral)
+        """
+        providers = sorted({str(provider) for provider in providers if provider})
+        if not providers:
+            return {}
+
+        stats = {}
+        connection = connect_local_store(self.store_name)
+        try:
+            for provider in providers:
+                for weekday, n, mean, m2 in connection.execute(
+                    "SELECT weekday, n, mean, m2 FROM volume_stats WHERE provider = ?", (provider,)
+                ):
+                    stats[(provider, weekday)] = (n, mean, m2)
+                if exclude_file_id is not None:
+                    for weekday, n, mean, m2 in connection.execute(
+                        "SELECT weekday, n, mean, m2 FROM file_volume WHERE file_id = ? AND provider = ?",
+                        (exclude_file_id, provider)
+                    ):
+                        if (provider, weekday) in stats:
+                            stats[(provider, weekday)] = subtract_moments(stats[(provider, weekday)], (n, mean, m2))
+        finally:
+            connection.close()
+
+        return {
+            key: (n, mean, math.sqrt(m2 / (n - 1)) if n > 1 else 0.0)
+            for key, (n, mean, m2) in stats.items()
+            if n > 0
+        }
+
+    def cups_frequency(self, provider: str, cups_codes: Iterable[str],
+                       exclude_file_id: Optional[int] = None) -> Tuple[int, Dict[str, int]]:
+        """
+        Frecuencia histórica estimada de códigos CUPS en un prestador
+
+        Returns:
+            (total de servicios con CUPS del prestador, código -> conteo estimado)
+        """
+        provider = str(provider)
+        connection = connect_local_store(self.store_name)
+        try:
+            total, sketch = self._load_sketch(connection, provider)
+            if exclude_file_id is not None:
+                own_counts = connection.execute(
+                    "SELECT cups, count FROM file_cups WHERE file_id = ? AND provider = ?", (exclude_file_id, provider)
+                ).fetchall()
+                for cups, count in own_counts:
+                    sketch.add(cups, -count)
+                    total -= count
+        finally:
+            connection.close()
+        return max(total, 0), {cups: sketch.estimate(cups) for cups in cups_codes}
+
+
+@lru_cache(maxsize=1)
+def get_provider_baseline() -> Optional[ProviderBaseline]:
+    """Línea base compartida del proceso (None si está desactivada con PROVIDER_BASELINE_ENABLED=false)"""
+    if not PROVIDER_BASELINE_ENABLED:
+        return None
+    return ProviderBaseline()
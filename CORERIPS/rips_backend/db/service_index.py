@@ -0,0 +1,231 @@
+"""
+Índice histórico de servicios facturados (AI-PAT-001 entre envíos)
+
+Guarda una entrada compacta por procedimiento ingerido:
+(paciente, código CUPS, fecha del servicio, file_id). Con él la validación de IA
+detecta el mismo procedimiento facturado al mismo paciente en envíos distintos
+(p.ej. la misma cesárea en dos facturas mensuales).
+
+- El paciente se guarda como hash de 64 bits de tipo + número de documento, de
+  modo que el índice no contiene documentos en claro.
+- La fecha se guarda como ordinal (días), así la ventana es un rango de enteros.
+- La tabla es WITHOUT ROWID con clave primaria (paciente, cups, fecha, file_id):
+  cada consulta de ventana es una búsqueda por rango en el B-tree, O(log n),
+  del orden de microsegundos aun con millones de servicios.
+- Las consultas de un archivo se resuelven en un solo JOIN contra una tabla
+  temporal con (paciente, cups, ventana) por registro, no una consulta por
+  registro.
+- Cada archivo puede registrar su documento (obligado a facturar + número de
+  factura). Una versión corregida del mismo documento reemplaza las filas de
+  las versiones anteriores, así no colisiona consigo misma.
+"""
+
+import hashlib
+import logging
+import os
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+from db.local_store import connect_local_store
+
+logger = logging.getLogger(__name__)
+
+STORE_NAME = "service_index"
+
+SERVICE_INDEX_ENABLED = os.getenv("SERVICE_INDEX_ENABLED", "true").lower() == "true"
+
+
+def patient_key(tipo_documento: str, numero_documento: str) -> int:
+    """Hash (entero con signo de 64 bits) del documento del paciente"""
+    digest = hashlib.blake2b(
+        f"{(tipo_documento or '').strip().upper()}_{(numero_documento or '').strip()}".encode('utf-8'),
+        digest_size=8
+    ).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def parse_service_date(value) -> Optional[date]:
+    """Fecha de servicio en formato YYYY-MM-DD[ HH:MM] o DD/MM/YYYY (None si no es válida)"""
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        if '-' in value:
+            return date.fromisoformat(value[:10])
+        return datetime.strptime(value[:10], '%d/%m/%Y').date()
+    except ValueError:
+        return None
+
+
+def document_key(obligado: str, numero_factura: str) -> Optional[int]:
+    """Hash (entero con signo de 64 bits) del documento facturado; None si falta algún dato"""
+    obligado = (obligado or '').strip()
+    numero_factura = (numero_factura or '').strip().upper()
+    if not obligado or not numero_factura:
+        return None
+    digest = hashlib.blake2b(f"{obligado}_{numero_factura}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class ServiceIndex:
+    """Índice persistente (SQLite local) de servicios por paciente y código CUPS"""
+
+    def __init__(self, store_name: str = STORE_NAME):
+        self.store_name = store_name
+        connection = connect_local_store(store_name)
+        try:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS services (
+                    patient INTEGER NOT NULL,
+                    cups TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    file_id INTEGER NOT NULL,
+                    PRIMARY KEY (patient, cups, day, file_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_services_file ON services(file_id);
+                CREATE TABLE IF NOT EXISTS documents (
+                    file_id INTEGER PRIMARY KEY,
+                    document INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_documents_document ON documents(document);
+            """)
+        finally:
+            connection.close()
+
+    def add_services(self, file_id: int, services: Iterable[Tuple[str, str, str, object]]) -> int:
+        """
+        Registrar los servicios de un archivo ingerido
+
+        Args:
+            file_id: ID del archivo en la tabla files
+            services: (tipo_documento, numero_documento, codigo_cups, fecha_servicio)
+
+        Returns:
+            Número de servicios indexados (se omiten los que no tienen datos completos)
+        """
+        rows = []
+        for tipo_documento, numero_documento, cups, service_date in services:
+            day = parse_service_date(service_date)
+            if not numero_documento or not cups or day is None:
+                continue
+            rows.append((patient_key(tipo_documento, numero_documento), str(cups).strip(), day.toordinal(), file_id))
+
+        if not rows:
+            return 0
+
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO services (patient, cups, day, file_id) VALUES (?, ?, ?, ?)", rows
+                )
+        finally:
+            connection.close()
+        return len(rows)
+
+    def remove_file(self, file_id: int):
+        """Eliminar los servicios de un archivo (p.ej. antes de reingerirlo)"""
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                connection.execute("DELETE FROM services WHERE file_id = ?", (file_id,))
+                connection.execute("DELETE FROM documents WHERE file_id = ?", (file_id,))
+        finally:
+            connection.close()
+
+    def register_document(self, file_id: int, document: Optional[int]) -> List[int]:
+        """
+        Registrar el documento de un archivo y retirar las versiones anteriores
+
+        Los servicios de otros archivos con el mismo documento (versiones
+        anteriores de la misma factura) se eliminan del índice.
+
+        Returns:
+            file_id de las versiones reemplazadas
+        """
+        if document is None:
+            return []
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                replaced = [
+                    row[0] for row in connection.execute(
+                        "SELECT file_id FROM documents WHERE document = ? AND file_id != ?", (document, file_id)
+                    )
+                ]
+                connection.executemany("DELETE FROM services WHERE file_id = ?", ((old,) for old in replaced))
+                connection.executemany("DELETE FROM documents WHERE file_id = ?", ((old,) for old in replaced))
+                connection.execute(
+                    "INSERT OR REPLACE INTO documents (file_id, document) VALUES (?, ?)", (file_id, document)
+                )
+        finally:
+            connection.close()
+        return replaced
+
+    def find_collisions(self, queries: Iterable[Tuple[str, str, str, object]], window_days: int,
+                        exclude_file_id: Optional[int] = None) -> List[List[Tuple[int, date]]]:
+        """
+        Servicios previos del mismo paciente y CUPS dentro de la ventana
+
+        Args:
+            queries: (tipo_documento, numero_documento, codigo_cups, fecha_servicio) por registro
+            window_days: Días a cada lado de la fecha del servicio
+            exclude_file_id: Archivo a ignorar (el propio archivo si ya fue ingerido)
+
+        Returns:
+            Por cada consulta, lista de (file_id, fecha) encontrados (vacía si no hay)
+        """
+        results: List[List[Tuple[int, date]]] = []
+        probes = []
+        for position, (tipo_documento, numero_documento, cups, service_date) in enumerate(queries):
+            results.append([])
+            day = parse_service_date(service_date)
+            if not numero_documento or not cups or day is None:
+                continue
+            ordinal = day.toordinal()
+            probes.append((
+                position, patient_key(tipo_documento, numero_documento), str(cups).strip(),
+                ordinal - window_days, ordinal + window_days
+            ))
+        if not probes:
+            return results
+
+        connection = connect_local_store(self.store_name)
+        try:
+            # Tabla temporal de la conexión (desaparece al cerrarla)
+            connection.execute(
+                "CREATE TEMP TABLE probes "
+                "(position INTEGER PRIMARY KEY, patient INTEGER, cups TEXT, first_day INTEGER, last_day INTEGER)"
+            )
+            connection.executemany("INSERT INTO probes VALUES (?, ?, ?, ?, ?)", probes)
+            # CROSS JOIN fija el orden: una búsqueda por rango en services por cada consulta
+            rows = connection.execute(
+                "SELECT p.position, s.file_id, s.day FROM probes p CROSS JOIN services s "
+                "ON s.patient = p.patient AND s.cups = p.cups AND s.day BETWEEN p.first_day AND p.last_day "
+                "WHERE s.file_id != ? ORDER BY p.position, s.day, s.file_id",
+                (exclude_file_id if exclude_file_id is not None else -1,)
+            )
+            for position, file_id, found_day in rows:
+                results[position].append((file_id, date.fromordinal(found_day)))
+        finally:
+            connection.close()
+        return results
+
+    def count(self) -> int:
+        """Número de servicios indexados"""
+        connection = connect_local_store(self.store_name)
+        try:
+            return connection.execute("SELECT COUNT(*) FROM services").fetchone()[0]
+        finally:
+            connection.close()
+
+
+@lru_cache(maxsize=1)
+def get_service_index() -> Optional[ServiceIndex]:
+    """Índice compartido del proceso (None si está desactivado con SERVICE_INDEX_ENABLED=false)"""
+    if not SERVICE_INDEX_ENABLED:
+        return None
+    return ServiceIndex()
@@ -1,6 +1,8 @@
 from supabase import create_client, Client
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
+from db.http_pool import use_http_pool
 
 load_dotenv()
 
@@ -14,7 +16,8 @@ class SupabaseClient:
         if not self.url or not self.key:
             raise ValueError("SUPABASE_URL y SUPABASE_ANON_KEY deben estar configurados en .env")
         
-        self.client: Client = create_client(self.url, self.key)
+        # Comparte el pool de conexiones "request" con db.database
+        self.client: Client = use_http_pool(create_client(self.url, self.key), "request")
     
     def test_connection(self) -> bool:
         """Probar conexión a Supabase"""
@@ -30,15 +33,17 @@ class SupabaseClient:
         """Obtener cliente de Supabase"""
         return self.client
 
-# Instancia global del cliente
-supabase_client = SupabaseClient()
+@lru_cache(maxsize=1)
+def get_supabase_instance() -> SupabaseClient:
+    """Instancia global del cliente (se crea en el primer uso, no al importar)"""
+    return SupabaseClient()
 
 def get_supabase() -> Client:
     """Dependency para obtener cliente de Supabase"""
-    return supabase_client.get_client()
+    return get_supabase_instance().get_client()
 
 def test_supabase_connection() -> bool:
     """Probar conexión a Supabase"""
-    return supabase_client.test_connection()
+    return get_supabase_instance().test_connection()
 
 
@@ -1,18 +1,33 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from api.supabase_routes import router
-from db.database import test_connection
+from db.executors import shutdown_executors
+from db.http_pool import close_http_pools
+from services.readiness import STARTUP_WARMUP, readiness
+from validators.ai_parallel import shutdown_process_pool
 
-# Verificar conexión a Supabase
-if not test_connection():
-    print("⚠️  Advertencia: No se pudo conectar a Supabase")
-else:
-    print("✅ Conexión a Supabase exitosa")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque perezoso: la conexión a Supabase y los catálogos se calientan en
+    segundo plano (ver GET /ready); el worker acepta peticiones de inmediato
+    """
+    warmup = asyncio.create_task(readiness.warm_up()) if STARTUP_WARMUP else None
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    shutdown_process_pool()
+    shutdown_executors()
+    close_http_pools()
 
 app = FastAPI(
     title="RIPS Validator API",
     description="API para validación de archivos RIPS (Registros Individuales de Prestación de Servicios de Salud)",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -35,6 +50,12 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "rips-validator"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Dependencias y catálogos listos (503 mientras calientan o si fallan)"""
+    state = await readiness.refresh()
+    return JSONResponse(state, status_code=200 if state["status"] == "ready" else 503)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
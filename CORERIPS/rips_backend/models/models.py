@@ -4,7 +4,7 @@ NOTA: Esta aplicación usa Supabase directamente, estos modelos son solo referen
 Los enums activos están en models/types.py
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, JSON
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 from models.types import UserRole, FileStatus, ValidationStatus
@@ -43,6 +43,7 @@ class File(Base):
     # Relaciones
     user = relationship("User", back_populates="files")
     validations = relationship("Validation", back_populates="file")
+    summary = relationship("ValidationSummary", back_populates="file", uselist=False)
 
 class Validation(Base):
     __tablename__ = "validations"
@@ -59,3 +60,22 @@ class Validation(Base):
     
     # Relaciones
     file = relationship("File", back_populates="validations")
+
+class ValidationSummary(Base):
+    """Resumen precalculado de los hallazgos de la última validación de un archivo"""
+    __tablename__ = "validation_summaries"
+    
+    file_id = Column(Integer, ForeignKey("files.id"), primary_key=True)
+    total_lines = Column(Integer, nullable=False, default=0)
+    total_records = Column(Integer, nullable=False, default=0)
+    total_findings = Column(Integer, nullable=False, default=0)
+    total_errors = Column(Integer, nullable=False, default=0)
+    total_warnings = Column(Integer, nullable=False, default=0)
+    by_status = Column(JSON, nullable=False, default=dict)
+    by_rule = Column(JSON, nullable=False, default=dict)
+    by_field = Column(JSON, nullable=False, default=dict)
+    by_validator_type = Column(JSON, nullable=False, default=dict)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relaciones
+    file = relationship("File", back_populates="summary")
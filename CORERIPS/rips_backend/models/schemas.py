@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime
 from models.types import UserRole, FileStatus, ValidationStatus
 
@@ -77,6 +77,7 @@ class UploadResponse(BaseModel):
 class ValidationRequest(BaseModel):
     file_id: int
     validation_types: List[str] = ["deterministic"]  # ["deterministic", "ai"]
+    include_metrics: bool = False  # Incluir métricas por regla en la respuesta
 
 class ValidationResultsResponse(BaseModel):
     file_id: int
@@ -85,6 +86,21 @@ class ValidationResultsResponse(BaseModel):
     total_errors: int
     total_warnings: int
     validations: List[ValidationResponse]
+    rule_metrics: Optional[Dict[str, Dict[str, Any]]] = None
+    
+class ValidationSummaryResponse(BaseModel):
+    file_id: int
+    total_lines: int
+    total_records: int
+    total_findings: int
+    total_errors: int
+    total_warnings: int
+    by_status: Dict[str, int]
+    by_rule: Dict[str, int]
+    by_field: Dict[str, int]
+    by_validator_type: Dict[str, int]
+    
+    model_config = ConfigDict(from_attributes=True)
     
 class ErrorResponse(BaseModel):
     line: int
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las reglas de patrones de IA (AI-PAT-001 duplicados, AI-PAT-002 volúmenes)
+
+Compara la implementación vectorizada con la implementación de referencia
+(diccionarios anidados + strptime, ver validators/pattern_reference.py) y
+verifica que los hallazgos sean idénticos.
+
+Uso:
+    python scripts/benchmark_ai_patterns.py                 # 1.000.000 registros
+    python scripts/benchmark_ai_patterns.py --records 200000 --skip-reference
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Directorio raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validators.ai_validator_enhanced import EnhancedAIValidator
+from validators.pattern_reference import random_records, reference_duplicates, reference_volumes
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de AI-PAT-001 / AI-PAT-002")
+    parser.add_argument("--records", type=int, default=1_000_000, help="Número de registros sintéticos")
+    parser.add_argument("--users", type=int, default=200_000, help="Usuarios distintos")
+    parser.add_argument("--providers", type=int, default=50, help="Prestadores distintos")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip-reference", action="store_true", help="No ejecutar la implementación de referencia")
+    args = parser.parse_args()
+
+    print(f"🔄 Generando {args.records:,} registros...")
+    records = random_records(args.seed, args.records, users=args.users, providers=args.providers, cups=300, days=365)
+
+    validator = EnhancedAIValidator()
+    rules = [
+        ("AI-PAT-001 duplicados", validator._detect_duplicate_procedures, reference_duplicates),
+        ("AI-PAT-002 volúmenes", validator._detect_atypical_volumes, reference_volumes),
+    ]
+
+    print("-" * 70)
+    for name, vectorized, reference in rules:
+        findings, elapsed = timed(vectorized, records)
+        line = f"{name:<24} vectorizado: {elapsed:8.2f} s  ({len(findings):,} hallazgos)"
+        if not args.skip_reference:
+            expected, reference_elapsed = timed(reference, records)
+            status = "✅ idénticos" if findings == expected else "❌ DIFERENTES"
+            line += f" | referencia: {reference_elapsed:8.2f} s  x{reference_elapsed / elapsed:5.1f}  {status}"
+        print(line)
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria de los registros del validador de IA
+
+Compara el pico de memoria (tracemalloc) al leer un archivo AC sintético:
+
+- anterior: parse_text_file + un dict por registro con raw_fields
+- compacto: lectura en una pasada a registros con __slots__ (validators.ai_records)
+
+Uso:
+    python scripts/benchmark_ai_records.py                  # 1.000.000 líneas AC
+    python scripts/benchmark_ai_records.py --lines 200000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+# Directorio raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validators.ai_validator_enhanced import EnhancedAIValidator
+from validators.rips_parser import parse_text_file
+
+
+def legacy_records(file_path):
+    """Registros como dicts, igual que el mapeo AC anterior"""
+    records = []
+    for line_number, _, fields in parse_text_file(file_path).lines:
+        record = {"line_number": line_number, "file_type": "AC", "raw_fields": fields}
+        if len(fields) >= 10:
+            record.update({
+                "codigo_prestador": fields[0] if len(fields) > 0 else "",
+                "tipo_documento": fields[2] if len(fields) > 2 else "",
+                "numero_documento": fields[3] if len(fields) > 3 else "",
+                "fecha_nacimiento": fields[5] if len(fields) > 5 else "",
+                "sexo": fields[6] if len(fields) > 6 else "",
+                "fecha_consulta": fields[10] if len(fields) > 10 else "",
+                "diagnostico_principal": fields[15] if len(fields) > 15 else "",
+                "diagnostico_relacionado": fields[16] if len(fields) > 16 else ""
+            })
+        records.append(record)
+    return records
+
+
+def write_ac_file(path, lines, seed):
+    rng = random.Random(seed)
+    base = date(2024, 1, 1).toordinal()
+    with open(path, 'w', encoding='utf-8') as file:
+        for line in range(lines):
+            service_date = date.fromordinal(base + rng.randrange(365)).isoformat()
+            birth_date = date.fromordinal(base - rng.randrange(30000)).isoformat()
+            file.write(
+                f"{rng.randrange(50):012d}|FAC{line}|CC|{rng.randrange(200000)}|01|{birth_date}|"
+                f"{rng.choice('MF')}|170|11001|AUT{line}|{service_date}|890{rng.randrange(300):03d}|10|13|"
+                f"{rng.randrange(10000)}|A{rng.randrange(100):02d}{rng.randrange(10)}|Z000|||1|35000|0|35000\n"
+            )
+
+
+def measure(func, *args):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memoria de registros de IA")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Líneas del archivo AC sintético")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    validator = EnhancedAIValidator()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "AC_benchmark.txt")
+        print(f"🔄 Generando {args.lines:,} líneas AC...")
+        write_ac_file(path, args.lines, args.seed)
+
+        legacy, legacy_peak, legacy_elapsed = measure(legacy_records, path)
+        legacy_count = len(legacy)
+        del legacy
+
+        compact, compact_peak, compact_elapsed = measure(validator._parse_file, path, "AC")
+        compact_count = len(compact)
+        del compact
+
+    mb = 1024 * 1024
+    print("-" * 70)
+    print(f"anterior (dict + raw_fields): {legacy_peak / mb:9.1f} MB pico  {legacy_elapsed:6.2f} s  ({legacy_count:,} registros)")
+    print(f"compacto (__slots__):         {compact_peak / mb:9.1f} MB pico  {compact_elapsed:6.2f} s  ({compact_count:,} registros)")
+    print(f"reducción de memoria:         x{legacy_peak / compact_peak:.1f}")
+    print("-" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque en frío de la API
+
+Cada iteración arranca un proceso nuevo que importa main, entra al ciclo de
+vida de la aplicación (lifespan) y consulta GET /ready hasta que responde
+200. Se mide:
+
+- import: tiempo de "import main"
+- arranque: import + lifespan hasta aceptar peticiones (el worker ya
+  responde /health)
+- listo: hasta que /ready responde 200 (dependencias y catálogos listos)
+
+Supabase se reemplaza por un cliente simulado cuya primera consulta tarda
+--db-latency-ms (conexión lenta o base de datos recién reiniciada).
+
+Uso:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --runs 10 --db-latency-ms 3000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+
+# Directorio raíz del proyecto
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def child(db_latency: float, ready_timeout: float):
+    """Una medición en un proceso recién iniciado (resultado JSON por stdout)"""
+    start = time.perf_counter()
+
+    class FakeQuery:
+        first = True
+
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: self
+
+        def execute(self):
+            if FakeQuery.first:
+                FakeQuery.first = False
+                time.sleep(db_latency)
+            return type("Result", (), {"data": []})()
+
+    class FakeSupabase:
+        def table(self, name):
+            return FakeQuery()
+
+    import supabase
+    supabase.create_client = lambda *args, **kwargs: FakeSupabase()
+
+    from main import app
+    imported = time.perf_counter()
+
+    from fastapi.testclient import TestClient
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        assert client.get("/health").status_code == 200
+        while True:
+            response = client.get("/ready")
+            if response.status_code in (200, 404):
+                # 404: versión sin /ready, lista al arrancar
+                break
+            if time.perf_counter() - start > ready_timeout:
+                raise SystemExit(f"/ready no respondió 200 en {ready_timeout} s: {response.text}")
+            time.sleep(0.01)
+        ready = time.perf_counter()
+
+    print(json.dumps({
+        "import": imported - start,
+        "arranque": started - start,
+        "listo": ready - start,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Arranques en frío a medir")
+    parser.add_argument("--db-latency-ms", type=float, default=2000, help="Latencia de la primera consulta a Supabase")
+    parser.add_argument("--ready-timeout", type=float, default=60, help="Espera máxima por /ready (s)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.db_latency_ms / 1000, args.ready_timeout)
+        return
+
+    results = []
+    for _ in range(args.runs):
+        # Almacenes locales nuevos en cada arranque (en frío y fuera del árbol de código)
+        store_dir = tempfile.mkdtemp(prefix="rips_startup_")
+        env = dict(os.environ, SUPABASE_URL=os.getenv("SUPABASE_URL", "http://supabase.invalid"),
+                   SUPABASE_ANON_KEY=os.getenv("SUPABASE_ANON_KEY", "a.b.c"), LOCAL_STORE_DIR=store_dir)
+        try:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child",
+                 "--db-latency-ms", str(args.db_latency_ms), "--ready-timeout", str(args.ready_timeout)],
+                cwd=ROOT, env=env, capture_output=True, text=True, check=True
+            ).stdout
+        finally:
+            shutil.rmtree(store_dir, ignore_errors=True)
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{args.runs} arranques en frío, primera consulta a Supabase de {args.db_latency_ms:.0f} ms")
+    print(f"{'fase':<10} {'mediana s':>10} {'mín s':>8} {'máx s':>8}")
+    for phase in ("import", "arranque", "listo"):
+        values = [result[phase] for result in results]
+        print(f"{phase:<10} {median(values):>10.2f} {min(values):>8.2f} {max(values):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
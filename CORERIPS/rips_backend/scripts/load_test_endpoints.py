@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga: latencia de endpoints livianos con cargas pesadas en curso
+
+Mide p50/p95/p99 de GET /health y GET /api/v1/files en dos escenarios:
+
+- base: solo peticiones livianas
+- con cargas: las mismas peticiones mientras corren N POST /upload de
+  archivos RIPS JSON grandes (ingesta real con RIPSDataService)
+
+La aplicación corre en proceso (httpx sobre ASGI) contra un cliente de
+Supabase simulado cuyas consultas tardan --db-latency-ms (latencia de red).
+Con el acceso bloqueante fuera del event loop (db.executors), la latencia de
+los endpoints livianos con cargas debe quedar cerca de la de base.
+
+Uso:
+    python scripts/load_test_endpoints.py
+    python scripts/load_test_endpoints.py --uploads 8 --users 5000 --db-latency-ms 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from statistics import quantiles
+
+# Directorio raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SUPABASE_URL", "http://supabase.invalid")
+os.environ.setdefault("SUPABASE_ANON_KEY", "load-test")
+os.environ["LOCAL_STORE_DIR"] = tempfile.mkdtemp(prefix="rips_load_test_")
+
+
+class FakeQuery:
+    """Consulta encadenable de supabase-py con latencia simulada"""
+
+    def __init__(self, client, action):
+        self.client = client
+        self.action = action
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def insert(self, payload, *args, **kwargs):
+        self.action = "insert"
+        self.payload = payload
+        return self
+
+    def execute(self):
+        time.sleep(self.client.latency)
+        if self.action == "insert":
+            rows = self.payload if isinstance(self.payload, list) else [self.payload]
+            return type("Result", (), {"data": [dict(row, id=i + 1) for i, row in enumerate(rows)]})()
+        return type("Result", (), {"data": []})()
+
+
+class FakeSupabase:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def table(self, name):
+        return FakeQuery(self, "select")
+
+
+def rips_json(users):
+    """Factura RIPS JSON con una consulta y un procedimiento por usuario"""
+    return {
+        "numFactura": "FAC-CARGA", "tipoRegistro": "1", "fechaGeneracion": "2024-03-15",
+        "usuarios": [
+            {
+                "tipoDocumentoIdentificacion": "CC", "numDocumentoIdentificacion": str(10000000 + i),
+                "fechaNacimiento": "1990-03-15", "codSexo": "M" if i % 2 else "F", "tipoUsuario": "01",
+                "codPaisResidencia": "170", "codMunicipioResidencia": "11001",
+                "servicios": {
+                    "consultas": [{
+                        "codPrestador": f"{i % 40:012d}", "fechaInicioAtencion": "2024-03-15",
+                        "codConsulta": "890101", "finalidadTecnologiaSalud": "10", "codDiagnosticoPrincipal": "Z000"
+                    }],
+                    "procedimientos": [{
+                        "codPrestador": f"{i % 40:012d}", "fechaInicioAtencion": "2024-03-15",
+                        "codProcedimiento": "890201", "codDiagnosticoPrincipal": "Z000"
+                    }],
+                }
+            }
+            for i in range(users)
+        ]
+    }
+
+
+def percentiles(latencies):
+    cuts = quantiles(latencies, n=100)
+    return {"n": len(latencies), "p50": cuts[49] * 1000, "p95": cuts[94] * 1000, "p99": cuts[98] * 1000}
+
+
+async def light_load(client, requests, concurrency):
+    latencies = {"/health": [], "/api/v1/files": []}
+    paths = list(latencies)
+
+    async def worker(worker_id):
+        for i in range(worker_id, requests, concurrency):
+            path = paths[i % len(paths)]
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies[path].append(time.perf_counter() - start)
+            assert response.status_code == 200, (path, response.status_code)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies
+
+
+async def run(args):
+    import supabase
+    fake = FakeSupabase(args.db_latency_ms / 1000)
+    supabase.create_client = lambda *a, **k: fake
+
+    import httpx
+    from main import app
+    from db.database import get_db
+    app.dependency_overrides[get_db] = lambda: fake
+
+    payload = json.dumps(rips_json(args.users)).encode("utf-8")
+    upload_names = [f"carga_{i}_{os.getpid()}.json" for i in range(args.uploads)]
+
+    async with httpx.AsyncClient(app=app, base_url="http://test", timeout=None) as client:
+        # Calentamiento (pools, imports perezosos)
+        await light_load(client, 20, 2)
+
+        baseline = await light_load(client, args.light_requests, args.concurrency)
+
+        async def upload(name):
+            response = await client.post("/api/v1/upload", files={"file": (name, payload, "application/json")})
+            assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        uploads = [asyncio.create_task(upload(name)) for name in upload_names]
+        await asyncio.sleep(0.05)
+        loaded = await light_load(client, args.light_requests, args.concurrency)
+        uploads_pending = sum(1 for task in uploads if not task.done())
+        await asyncio.gather(*uploads)
+        upload_seconds = time.perf_counter() - start
+
+    for name in upload_names:
+        try:
+            os.remove(os.path.join("uploads", name))
+        except OSError:
+            pass
+
+    print(f"Cargas: {args.uploads} x {len(payload) / 1e6:.1f} MB ({args.users} usuarios), "
+          f"latencia BD simulada {args.db_latency_ms} ms, {upload_seconds:.1f} s en total; "
+          f"{uploads_pending} seguían en curso al terminar la medición")
+    print(f"{'endpoint':<16} {'escenario':<12} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for path in baseline:
+        for label, data in (("base", baseline), ("con cargas", loaded)):
+            stats = percentiles(data[path])
+            print(f"{path:<16} {label:<12} {stats['n']:>5} {stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=4, help="Cargas pesadas concurrentes")
+    parser.add_argument("--users", type=int, default=3000, help="Usuarios por archivo cargado")
+    parser.add_argument("--db-latency-ms", type=float, default=5, help="Latencia simulada por consulta")
+    parser.add_argument("--light-requests", type=int, default=400, help="Peticiones livianas por escenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes livianos concurrentes")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Control de admisión de los endpoints pesados (/upload y /validate)
+
+Cada tipo de trabajo tiene su propio controlador con un límite de ejecuciones
+simultáneas por worker y una cola de espera acotada:
+
+- ingesta: INGEST_MAX_CONCURRENT (2), INGEST_MAX_QUEUE (8),
+  INGEST_MAX_WAIT_SECONDS (30)
+- validacion: VALIDATION_MAX_CONCURRENT (2), VALIDATION_MAX_QUEUE (8),
+  VALIDATION_MAX_WAIT_SECONDS (60)
+
+La cola atiende primero los archivos pequeños: la prioridad es la hora de
+llegada más size / ADMISSION_PRIORITY_BYTES_PER_SECOND, así un archivo de
+50 MB espera como si hubiera llegado 50 s después (con 1 MB/s) pero termina
+pasando delante de los que llegan mucho más tarde (sin inanición).
+
+Con la cola llena la petición se rechaza de inmediato (429); si la espera
+supera el máximo, 503. Ambos con un Retry-After estimado con la duración
+media reciente de los trabajos.
+
+El estado es del event loop del worker (sin hilos): acquire y release se
+llaman desde las rutas async.
+
+Uso:
+    slot = await ingest_admission.acquire(file_size)
+    try:
+        ...
+    finally:
+        slot.release()
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+from collections import deque
+from time import monotonic
+from typing import Any, Dict, List, Optional
+
+ADMISSION_PRIORITY_BYTES_PER_SECOND = float(os.getenv("ADMISSION_PRIORITY_BYTES_PER_SECOND", "1000000"))
+ADMISSION_DEFAULT_RETRY_AFTER = int(os.getenv("ADMISSION_DEFAULT_RETRY_AFTER", "5"))
+ADMISSION_MAX_RETRY_AFTER = 300
+
+
+class AdmissionRejected(Exception):
+    """Petición no admitida: 429 (cola llena) o 503 (espera vencida)"""
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class AdmissionSlot:
+    """Turno concedido; release() lo devuelve (idempotente)"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+        self.started = monotonic()
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """Límite de concurrencia con cola acotada y prioridad por tamaño"""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float,
+                 priority_bytes_per_second: float = ADMISSION_PRIORITY_BYTES_PER_SECOND):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.priority_bytes_per_second = priority_bytes_per_second
+        self._waiting: List[list] = []
+        self._sequence = itertools.count()
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.completed = 0
+        self._waits = deque(maxlen=1024)
+        self._durations = deque(maxlen=256)
+
+    def _admit(self, enqueued: float) -> AdmissionSlot:
+        self.active += 1
+        self.admitted += 1
+        self._waits.append(monotonic() - enqueued)
+        return AdmissionSlot(self)
+
+    async def acquire(self, size: int = 0) -> AdmissionSlot:
+        """Esperar turno (size en bytes: los archivos pequeños pasan primero)"""
+        enqueued = monotonic()
+        if self.active < self.max_concurrent and self.queued == 0:
+            return self._admit(enqueued)
+        if self.queued >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(
+                429, self.retry_after(),
+                f"Demasiadas solicitudes de {self.name} en espera; intente de nuevo más tarde"
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        priority = enqueued + size / self.priority_bytes_per_second
+        heapq.heappush(self._waiting, [priority, next(self._sequence), future, enqueued])
+        self.queued += 1
+        try:
+            return await asyncio.wait_for(future, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.queued -= 1
+            self.rejected_timeout += 1
+            raise AdmissionRejected(
+                503, self.retry_after(),
+                f"Tiempo de espera agotado en la cola de {self.name}; intente de nuevo más tarde"
+            )
+        except asyncio.CancelledError:
+            # Cliente desconectado: devolver el turno si ya se había concedido
+            if future.done() and not future.cancelled():
+                future.result().release()
+            else:
+                self.queued -= 1
+            raise
+
+    def _release(self, slot: AdmissionSlot):
+        self.active -= 1
+        self.completed += 1
+        self._durations.append(monotonic() - slot.started)
+        while self._waiting and self.active < self.max_concurrent:
+            _, _, future, enqueued = heapq.heappop(self._waiting)
+            if future.done():
+                # Espera vencida o cancelada (ya descontada de la cola)
+                continue
+            self.queued -= 1
+            future.set_result(self._admit(enqueued))
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que haya turno, con la duración media reciente"""
+        if not self._durations:
+            return ADMISSION_DEFAULT_RETRY_AFTER
+        mean = sum(self._durations) / len(self._durations)
+        estimate = mean * (self.queued + 1) / max(1, self.max_concurrent)
+        return max(1, min(ADMISSION_MAX_RETRY_AFTER, math.ceil(estimate)))
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 1)
+
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+            "duration_ms_mean": round(sum(self._durations) / len(self._durations) * 1000, 1) if self._durations else None,
+        }
+
+
+# Controladores compartidos del worker
+ingest_admission = AdmissionController(
+    "ingesta",
+    max_concurrent=int(os.getenv("INGEST_MAX_CONCURRENT", "2")),
+    max_queue=int(os.getenv("INGEST_MAX_QUEUE", "8")),
+    max_wait=float(os.getenv("INGEST_MAX_WAIT_SECONDS", "30")),
+)
+validation_admission = AdmissionController(
+    "validacion",
+    max_concurrent=int(os.getenv("VALIDATION_MAX_CONCURRENT", "2")),
+    max_queue=int(os.getenv("VALIDATION_MAX_QUEUE", "8")),
+    max_wait=float(os.getenv("VALIDATION_MAX_WAIT_SECONDS", "60")),
+)
+
+
+def admission_stats() -> Dict[str, Dict[str, Any]]:
+    return {controller.name: controller.stats() for controller in (ingest_admission, validation_admission)}
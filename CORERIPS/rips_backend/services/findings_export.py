@@ -0,0 +1,220 @@
+"""
+Exportación de hallazgos de validación a CSV y XLSX
+
+Los hallazgos se leen página a página con services.results_query (tabla
+validations o almacén columnar), así que la memoria no depende del número de
+hallazgos:
+
+- CSV: se genera y se envía por bloques de EXPORT_CSV_FLUSH_ROWS filas
+- XLSX: openpyxl en modo write-only escribe las filas a un archivo temporal
+  sin mantener la hoja en memoria; el libro se envía al terminar
+
+Las exportaciones de más de EXPORT_ASYNC_THRESHOLD hallazgos se generan en un
+trabajo en segundo plano y quedan en EXPORT_DIR hasta que el archivo se
+vuelve a validar (ExportJobs.invalidate).
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from db.local_store import LOCAL_STORE_DIR
+from services.results_query import iter_findings
+
+logger = logging.getLogger(__name__)
+
+EXPORT_ASYNC_THRESHOLD = int(os.getenv("EXPORT_ASYNC_THRESHOLD", "100000"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "1"))
+EXPORT_CSV_FLUSH_ROWS = int(os.getenv("EXPORT_CSV_FLUSH_ROWS", "1000"))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Columna de validations -> encabezado de la exportación
+EXPORT_COLUMNS = {
+    "line_number": "Línea",
+    "field_name": "Campo",
+    "rule_name": "Regla",
+    "error_message": "Mensaje",
+    "status": "Estado",
+    "validator_type": "Tipo de validador",
+}
+
+
+def get_export_dir() -> str:
+    """Directorio de exportaciones en caché"""
+    export_dir = os.getenv("EXPORT_DIR") or os.path.join(os.getenv("LOCAL_STORE_DIR", LOCAL_STORE_DIR), "exports")
+    os.makedirs(export_dir, exist_ok=True)
+    return export_dir
+
+
+def _row_values(row: Dict[str, Any]):
+    return [row.get(column) for column in EXPORT_COLUMNS]
+
+
+def iter_csv(rows: Iterable[Dict[str, Any]], flush_rows: Optional[int] = None) -> Iterator[str]:
+    """CSV por bloques (con BOM para que Excel lo abra como UTF-8)"""
+    flush_rows = flush_rows or EXPORT_CSV_FLUSH_ROWS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS.values())
+    pending = 0
+    for row in rows:
+        writer.writerow(_row_values(row))
+        pending += 1
+        if pending >= flush_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def write_csv(rows: Iterable[Dict[str, Any]], path: str):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        for chunk in iter_csv(rows):
+            file.write(chunk)
+
+
+def write_xlsx(rows: Iterable[Dict[str, Any]], path: str):
+    """Libro XLSX en modo write-only (las filas no se acumulan en memoria)"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Hallazgos")
+    try:
+        sheet.append(list(EXPORT_COLUMNS.values()))
+        for row in rows:
+            sheet.append(_row_values(row))
+    except Exception:
+        # Liberar el archivo temporal de la hoja antes de propagar el error
+        sheet.close()
+        raise
+    workbook.save(path)
+
+
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx}
+
+
+def export_key(file_id: int, export_format: str, query: Dict[str, Any]) -> str:
+    """Identificador de una exportación (archivo, formato y filtros)"""
+    parts = json.dumps([file_id, export_format, sorted((k, v) for k, v in query.items() if v is not None)], default=str)
+    return f"{file_id}_{hashlib.blake2b(parts.encode('utf-8'), digest_size=8).hexdigest()}"
+
+
+def write_export(client, file_id: int, export_format: str, path: str, query: Dict[str, Any]):
+    """Escribir la exportación completa en path (vía archivo temporal)"""
+    tmp_path = f"{path}.tmp"
+    try:
+        WRITERS[export_format](iter_findings(client, file_id, **query), tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_temp_export(client, file_id: int, export_format: str, query: Dict[str, Any]) -> str:
+    """Exportación a un archivo temporal (el llamador lo borra)"""
+    fd, path = tempfile.mkstemp(suffix=f".{export_format}", dir=get_export_dir())
+    os.close(fd)
+    try:
+        write_export(client, file_id, export_format, path, query)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+class ExportJobs:
+    """Trabajos de exportación en segundo plano y su caché en disco"""
+
+    def __init__(self, workers: int = EXPORT_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # Se incrementa al revalidar un archivo: un trabajo de una generación
+        # anterior descarta su resultado
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, export_format: str) -> str:
+        return os.path.join(get_export_dir(), f"{key}.{export_format}")
+
+    def cached_path(self, key: str, export_format: str) -> Optional[str]:
+        """Ruta de una exportación ya generada, o None"""
+        path = self._path(key, export_format)
+        return path if os.path.exists(path) else None
+
+    def submit(self, client, file_id: int, export_format: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Encolar la exportación si no está en curso
+
+        Returns:
+            Estado del trabajo ({"key", "status", "error"})
+        """
+        key = export_key(file_id, export_format, query)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job["status"] in ("pending", "running"):
+                return dict(job)
+            job = {"key": key, "file_id": file_id, "status": "pending", "error": None,
+                   "generation": self._generations.get(file_id, 0)}
+            self._jobs[key] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export")
+            self._executor.submit(self._run, job, client, export_format, query)
+            return dict(job)
+
+    def _run(self, job: Dict[str, Any], client, export_format: str, query: Dict[str, Any]):
+        job["status"] = "running"
+        path = self._path(job["key"], export_format)
+        try:
+            write_export(client, job["file_id"], export_format, path, query)
+            with self._lock:
+                if self._generations.get(job["file_id"], 0) != job["generation"]:
+                    os.remove(path)
+                    return
+                job["status"] = "ready"
+        except Exception as e:
+            logger.error(f"Error al exportar hallazgos del archivo {job['file_id']}: {str(e)}")
+            job.update(status="error", error=str(e))
+
+    def status(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(key)
+            return dict(job) if job is not None else None
+
+    def invalidate(self, file_id: int):
+        """Borrar las exportaciones de un archivo (se llama al revalidarlo)"""
+        prefix = f"{file_id}_"
+        with self._lock:
+            self._generations[file_id] = self._generations.get(file_id, 0) + 1
+            for key in [key for key, job in self._jobs.items() if job["file_id"] == file_id]:
+                self._jobs.pop(key)
+        export_dir = get_export_dir()
+        for name in os.listdir(export_dir):
+            if name.startswith(prefix):
+                try:
+                    os.remove(os.path.join(export_dir, name))
+                except OSError as e:
+                    logger.warning(f"No se pudo borrar la exportación {name}: {str(e)}")
+
+    def wait(self):
+        """Esperar los trabajos en curso (tests y apagado)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+export_jobs = ExportJobs()
@@ -0,0 +1,335 @@
+"""
+Almacenamiento columnar comprimido de hallazgos
+
+Para archivos con cientos de miles de hallazgos, una fila por hallazgo en
+validations hace lentas la inserción, los índices y las consultas. En modo
+columnar los hallazgos de una validación se guardan en el almacén local como
+un conjunto de bloques comprimidos:
+
+- los hallazgos se ordenan por línea y reciben un id de posición (1..n), así
+  que el orden (line_number, id) de las páginas es el orden de posición
+- cada bloque de FINDINGS_CHUNK_SIZE hallazgos guarda cuatro columnas int32
+  (línea, tipo de validador, campo, mensaje) comprimidas con zlib; campos y
+  mensajes se codifican con un diccionario por validación, porque se repiten
+  mucho
+- un índice por bloque (ids y líneas primera y última) permite decodificar
+  solo los bloques de la página pedida y saltar bloques fuera del rango de
+  líneas
+
+A la tabla validations solo van los primeros FINDINGS_TOP_N hallazgos (por
+línea) y a validation_summaries el resumen completo. Las lecturas paginadas
+de services.results_query usan este almacén cuando el archivo tiene una
+validación columnar.
+
+FINDINGS_STORAGE elige el modo: "rows" (una fila por hallazgo, por defecto),
+"columnar" (siempre) o "auto" (columnar desde FINDINGS_COLUMNAR_THRESHOLD
+hallazgos).
+"""
+
+import json
+import logging
+import os
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from db.local_store import connect_local_store
+from models.schemas import ErrorResponse
+from models.types import ValidationStatus
+
+logger = logging.getLogger(__name__)
+
+STORE_NAME = "findings_store"
+
+FINDINGS_STORAGE = os.getenv("FINDINGS_STORAGE", "rows").lower()
+FINDINGS_COLUMNAR_THRESHOLD = int(os.getenv("FINDINGS_COLUMNAR_THRESHOLD", "50000"))
+FINDINGS_TOP_N = int(os.getenv("FINDINGS_TOP_N", "1000"))
+FINDINGS_CHUNK_SIZE = int(os.getenv("FINDINGS_CHUNK_SIZE", "4096"))
+
+# Filas de las columnas dentro de un bloque
+_LINE, _VALIDATOR, _FIELD, _MESSAGE = range(4)
+_COLUMNS = 4
+
+_STATUS = ValidationStatus.FAILED.value
+
+
+def use_columnar_storage(total_findings: int) -> bool:
+    """Si una validación con total_findings hallazgos se guarda en modo columnar"""
+    if FINDINGS_STORAGE == "columnar":
+        return True
+    return FINDINGS_STORAGE == "auto" and total_findings >= FINDINGS_COLUMNAR_THRESHOLD
+
+
+def top_findings(errors_by_type: Dict[str, List[ErrorResponse]], n: int) -> Dict[str, List[ErrorResponse]]:
+    """Los primeros n hallazgos por línea, agrupados por tipo de validador"""
+    flat = sorted(
+        ((error.line, order, validator_type, error)
+         for order, (validator_type, errors) in enumerate(errors_by_type.items())
+         for error in errors),
+        key=lambda item: (item[0], item[1])
+    )[:n]
+    selected: Dict[str, List[ErrorResponse]] = {validator_type: [] for validator_type in errors_by_type}
+    for _, _, validator_type, error in flat:
+        selected[validator_type].append(error)
+    return selected
+
+
+def _encode_chunk(columns: np.ndarray) -> bytes:
+    return zlib.compress(np.ascontiguousarray(columns, dtype="<i4").tobytes())
+
+
+def _decode_chunk(blob: bytes) -> np.ndarray:
+    data = np.frombuffer(zlib.decompress(blob), dtype="<i4")
+    return data.reshape(_COLUMNS, len(data) // _COLUMNS)
+
+
+def _dictionary_codes(values: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Códigos int32 en orden de aparición y el diccionario correspondiente"""
+    index: Dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int32, count=len(values))
+    return codes, list(index)
+
+
+class ColumnarFindingsStore:
+    """Hallazgos de la última validación de cada archivo en bloques columnares comprimidos"""
+
+    def __init__(self, store_name: str = STORE_NAME, chunk_size: int = FINDINGS_CHUNK_SIZE):
+        self.store_name = store_name
+        self.chunk_size = chunk_size
+        connection = connect_local_store(store_name)
+        try:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    file_id INTEGER PRIMARY KEY,
+                    total INTEGER NOT NULL,
+                    dictionaries BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    file_id INTEGER NOT NULL,
+                    chunk_no INTEGER NOT NULL,
+                    first_id INTEGER NOT NULL,
+                    last_id INTEGER NOT NULL,
+                    first_line INTEGER NOT NULL,
+                    last_line INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (file_id, chunk_no)
+                );
+            """)
+        finally:
+            connection.close()
+
+    def save_run(self, file_id: int, errors_by_type: Dict[str, List[ErrorResponse]]) -> int:
+        """
+        Guardar (reemplazar) los hallazgos de una validación
+
+        Returns:
+            Número de hallazgos guardados
+        """
+        validator_types = list(errors_by_type)
+        lines: List[int] = []
+        validators: List[int] = []
+        fields: List[str] = []
+        messages: List[str] = []
+        for code, errors in enumerate(errors_by_type.values()):
+            for error in errors:
+                lines.append(error.line)
+                validators.append(code)
+                fields.append(error.field)
+                messages.append(error.error)
+
+        field_codes, field_labels = _dictionary_codes(fields)
+        message_codes, message_labels = _dictionary_codes(messages)
+        columns = np.vstack([
+            np.asarray(lines, dtype=np.int32),
+            np.asarray(validators, dtype=np.int32),
+            field_codes,
+            message_codes,
+        ]) if lines else np.empty((_COLUMNS, 0), dtype=np.int32)
+        # Orden por línea; a igual línea se conserva el orden de los validadores
+        columns = columns[:, np.argsort(columns[_LINE], kind="stable")]
+
+        dictionaries = zlib.compress(json.dumps({
+            "validator_types": validator_types,
+            "fields": field_labels,
+            "messages": message_labels,
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+        total = columns.shape[1]
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                connection.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO runs (file_id, total, dictionaries) VALUES (?, ?, ?)",
+                    (file_id, total, dictionaries)
+                )
+                connection.executemany(
+                    "INSERT INTO chunks (file_id, chunk_no, first_id, last_id, first_line, last_line, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (file_id, start // self.chunk_size, start + 1, min(start + self.chunk_size, total),
+                         int(columns[_LINE, start]), int(columns[_LINE, min(start + self.chunk_size, total) - 1]),
+                         _encode_chunk(columns[:, start:start + self.chunk_size]))
+                        for start in range(0, total, self.chunk_size)
+                    )
+                )
+        finally:
+            connection.close()
+        return total
+
+    def delete_run(self, file_id: int):
+        """Borrar la validación columnar de un archivo (si existe)"""
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                connection.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+                connection.execute("DELETE FROM runs WHERE file_id = ?", (file_id,))
+        finally:
+            connection.close()
+
+    def has_run(self, file_id: int) -> bool:
+        connection = connect_local_store(self.store_name)
+        try:
+            return connection.execute("SELECT 1 FROM runs WHERE file_id = ?", (file_id,)).fetchone() is not None
+        finally:
+            connection.close()
+
+    def fetch_page(self, file_id: int, limit: int, after_id: int = 0, filters: Optional[Dict[str, Any]] = None,
+                   line_from: Optional[int] = None, line_to: Optional[int] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Hallazgos con id > after_id que cumplen los filtros, decodificando solo
+        los bloques necesarios
+
+        Returns:
+            (hasta limit filas con la forma de la tabla validations, hay más)
+        """
+        rows: List[Dict[str, Any]] = []
+        for row in self._iter_rows(file_id, after_id, filters or {}, line_from, line_to):
+            if len(rows) == limit:
+                return rows, True
+            rows.append(row)
+        return rows, False
+
+    def _iter_rows(self, file_id: int, after_id: int, filters: Dict[str, Any], line_from: Optional[int],
+                   line_to: Optional[int]) -> Iterator[Dict[str, Any]]:
+        connection = connect_local_store(self.store_name)
+        try:
+            run = connection.execute("SELECT dictionaries FROM runs WHERE file_id = ?", (file_id,)).fetchone()
+            if run is None:
+                return
+            dictionaries = json.loads(zlib.decompress(run[0]).decode('utf-8'))
+            validator_types = dictionaries["validator_types"]
+            fields = dictionaries["fields"]
+            messages = dictionaries["messages"]
+
+            wanted = self._wanted_codes(filters, validator_types, fields)
+            if wanted is None:
+                return
+
+            query = "SELECT first_id, data FROM chunks WHERE file_id = ? AND last_id > ?"
+            params: List[Any] = [file_id, after_id]
+            if line_from is not None:
+                query += " AND last_line >= ?"
+                params.append(line_from)
+            if line_to is not None:
+                query += " AND first_line <= ?"
+                params.append(line_to)
+            query += " ORDER BY chunk_no"
+
+            for first_id, blob in connection.execute(query, params):
+                columns = _decode_chunk(blob)
+                ids = np.arange(first_id, first_id + columns.shape[1])
+                mask = ids > after_id
+                if line_from is not None:
+                    mask &= columns[_LINE] >= line_from
+                if line_to is not None:
+                    mask &= columns[_LINE] <= line_to
+                for row_index, codes in wanted.items():
+                    mask &= np.isin(columns[row_index], codes)
+
+                for position in np.flatnonzero(mask):
+                    validator_type = validator_types[columns[_VALIDATOR, position]]
+                    yield {
+                        "id": int(ids[position]),
+                        "file_id": file_id,
+                        "line_number": int(columns[_LINE, position]),
+                        "field_name": fields[columns[_FIELD, position]],
+                        "rule_name": f"{validator_type}_validation",
+                        "error_message": messages[columns[_MESSAGE, position]],
+                        "status": _STATUS,
+                        "validator_type": validator_type,
+                    }
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _wanted_codes(filters: Dict[str, Any], validator_types: List[str],
+                      fields: List[str]) -> Optional[Dict[int, List[int]]]:
+        """Filtros de igualdad traducidos a códigos por columna (None si nada puede cumplirlos)"""
+        wanted: Dict[int, List[int]] = {}
+        if filters.get("status") is not None and filters["status"] != _STATUS:
+            return None
+        allowed = set(range(len(validator_types)))
+        if filters.get("validator_type") is not None:
+            allowed &= {code for code, name in enumerate(validator_types) if name == filters["validator_type"]}
+        if filters.get("rule") is not None:
+            allowed &= {code for code, name in enumerate(validator_types) if f"{name}_validation" == filters["rule"]}
+        if len(allowed) < len(validator_types):
+            if not allowed:
+                return None
+            wanted[_VALIDATOR] = sorted(allowed)
+        if filters.get("field") is not None:
+            if filters["field"] not in fields:
+                return None
+            wanted[_FIELD] = [fields.index(filters["field"])]
+        return wanted
+
+    def stats(self) -> Dict[str, Any]:
+        """Validaciones, hallazgos y bytes comprimidos en el almacén"""
+        connection = connect_local_store(self.store_name)
+        try:
+            runs, findings = connection.execute("SELECT COUNT(*), COALESCE(SUM(total), 0) FROM runs").fetchone()
+            size = connection.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM chunks").fetchone()[0]
+        finally:
+            connection.close()
+        return {"runs": runs, "findings": findings, "bytes": size}
+
+
+@lru_cache(maxsize=1)
+def get_findings_store() -> ColumnarFindingsStore:
+    """Almacén columnar compartido del proceso"""
+    return ColumnarFindingsStore()
+
+
+def table_findings(errors_by_type: Dict[str, List[ErrorResponse]]) -> Tuple[Dict[str, List[ErrorResponse]], bool]:
+    """
+    Hallazgos que van a la tabla validations
+
+    Returns:
+        (hallazgos para la tabla, True si el conjunto completo va al almacén columnar)
+    """
+    total = sum(len(errors) for errors in errors_by_type.values())
+    if not use_columnar_storage(total):
+        return errors_by_type, False
+    return top_findings(errors_by_type, FINDINGS_TOP_N), True
+
+
+def store_findings_run(file_id: int, errors_by_type: Dict[str, List[ErrorResponse]], columnar: bool):
+    """
+    Guardar la validación en el almacén columnar, o borrar la anterior si
+    esta validación se guardó como filas (para no leer hallazgos obsoletos)
+    """
+    store = get_findings_store()
+    if columnar:
+        store.save_run(file_id, errors_by_type)
+    else:
+        store.delete_run(file_id)
+
+
+def discard_findings_run(file_id: int):
+    """Borrar la validación columnar de un archivo sin propagar errores (limpieza tras un fallo)"""
+    try:
+        get_findings_store().delete_run(file_id)
+    except Exception as e:
+        logger.warning(f"No se pudo borrar la validación columnar del archivo {file_id}: {e}")
@@ -0,0 +1,106 @@
+"""
+Escritura por lotes de los hallazgos de validación
+
+Los hallazgos se insertan en lotes de FINDINGS_BATCH_SIZE filas en lugar de
+una inserción por hallazgo:
+
+- SQLAlchemy: un INSERT de varias filas por lote (executemany, que SQLAlchemy 2
+  agrupa en INSERT ... VALUES de muchas filas) dentro de la transacción de la
+  sesión. No se hace commit aquí: el llamador confirma los hallazgos y el
+  estado "validated" del archivo en un solo commit.
+- Supabase (PostgREST): una petición por lote. PostgREST no ofrece
+  transacciones entre peticiones, así que si un lote falla se borran las filas
+  ya insertadas por esta escritura (compensación) y se propaga el error; el
+  llamador marca el archivo como validado solo después del último lote.
+"""
+
+import logging
+import os
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models.models import Validation
+from models.schemas import ErrorResponse
+from models.types import ValidationStatus
+
+logger = logging.getLogger(__name__)
+
+FINDINGS_BATCH_SIZE = int(os.getenv("FINDINGS_BATCH_SIZE", "1000"))
+
+
+def finding_rows(file_id: int, errors_by_type: Dict[str, List[ErrorResponse]],
+                 status: Any = ValidationStatus.FAILED) -> Iterator[Dict[str, Any]]:
+    """Filas de la tabla validations para los hallazgos de cada validador"""
+    for validator_type, errors in errors_by_type.items():
+        rule_name = f"{validator_type}_validation"
+        for error in errors:
+            yield {
+                "file_id": file_id,
+                "line_number": error.line,
+                "field_name": error.field,
+                "rule_name": rule_name,
+                "error_message": error.error,
+                "status": status,
+                "validator_type": validator_type
+            }
+
+
+def batched(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Agrupar filas en listas de a lo sumo size elementos"""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_findings(db: Session, file_id: int, errors_by_type: Dict[str, List[ErrorResponse]],
+                    batch_size: Optional[int] = None) -> int:
+    """
+    Insertar los hallazgos en la sesión SQLAlchemy (sin commit)
+
+    Returns:
+        Número de filas insertadas
+    """
+    inserted = 0
+    for batch in batched(finding_rows(file_id, errors_by_type), batch_size or FINDINGS_BATCH_SIZE):
+        db.execute(insert(Validation), batch)
+        inserted += len(batch)
+    return inserted
+
+
+def insert_findings_supabase(client, file_id: int, errors_by_type: Dict[str, List[ErrorResponse]],
+                             batch_size: Optional[int] = None) -> int:
+    """
+    Insertar los hallazgos en Supabase, una petición por lote
+
+    Si un lote falla se borran las filas insertadas por los lotes anteriores
+    y se relanza la excepción.
+
+    Returns:
+        Número de filas insertadas
+    """
+    inserted_ids: List[int] = []
+    inserted = 0
+    try:
+        for batch in batched(finding_rows(file_id, errors_by_type, status="failed"), batch_size or FINDINGS_BATCH_SIZE):
+            result = client.table("validations").insert(batch).execute()
+            inserted_ids.extend(row["id"] for row in (result.data or []) if "id" in row)
+            inserted += len(batch)
+    except Exception:
+        _delete_inserted(client, inserted_ids, batch_size or FINDINGS_BATCH_SIZE)
+        raise
+    return inserted
+
+
+def _delete_inserted(client, ids: List[int], batch_size: int):
+    """Compensación: borrar las filas ya insertadas de una escritura fallida"""
+    try:
+        for start in range(0, len(ids), batch_size):
+            client.table("validations").delete().in_("id", ids[start:start + batch_size]).execute()
+    except Exception as e:
+        logger.error(f"No se pudieron borrar {len(ids)} hallazgos de una escritura fallida: {str(e)}")
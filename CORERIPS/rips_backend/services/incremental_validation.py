@@ -0,0 +1,362 @@
+"""
+Revalidación incremental de archivos RIPS corregidos
+
+Cuando un prestador corrige unas pocas líneas y vuelve a subir el mismo archivo,
+solo se reevalúan los registros cuyo contenido cambió. Por cada versión validada
+se guarda, por registro, un hash de contenido y sus hallazgos; en la siguiente
+versión:
+
+- Reglas por registro (determinísticas por línea y AI-CLIN): se reutilizan los
+  hallazgos de los registros sin cambios y se evalúan solo los nuevos.
+- Reglas entre registros: AI-PAT-001 agrupa por usuario y AI-FRAUD-002 por
+  prestador. Solo se reevalúan los grupos que contienen registros nuevos o
+  eliminados; los hallazgos de los demás grupos se conservan.
+- AI-PAT-002 se recalcula siempre sobre el archivo completo (una pasada
+  vectorizada): su mensaje cita la primera y la última línea del día, que
+  cambian al insertar o borrar líneas aunque el grupo no cambie.
+
+Los hallazgos conservados se reubican en el número de línea actual del registro.
+
+El estado se guarda por documento: usuario que sube el archivo más nombre
+original (document_state_key). Nombres genéricos como "AC.txt" de usuarios
+distintos no comparten estado.
+"""
+
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from db.local_store import connect_local_store
+from models.schemas import ErrorResponse
+from validators.ai_features import FeatureTable
+from validators.rips_parser import ParsedRIPSFile
+from validators.ruleset import get_ruleset_version
+
+logger = logging.getLogger(__name__)
+
+STORE_NAME = "validation_state"
+
+# Cambiar al modificar el formato del estado guardado
+STATE_FORMAT_VERSION = "2"
+
+# Familias de reglas entre registros y la clave que las agrupa
+USER_FAMILY = "user"
+PROVIDER_FAMILY = "provider"
+
+
+def compute_record_keys(parsed_file: ParsedRIPSFile) -> List[str]:
+    """
+    Clave de contenido por línea: hash del texto + número de aparición
+
+    El número de aparición distingue líneas idénticas dentro del mismo archivo.
+    """
+    occurrences = defaultdict(int)
+    keys = []
+    for line in parsed_file.lines:
+        digest = hashlib.blake2b(line.text.encode('utf-8'), digest_size=12).hexdigest()
+        keys.append(f"{digest}:{occurrences[digest]}")
+        occurrences[digest] += 1
+    return keys
+
+
+def _dump_findings(errors: Optional[List[ErrorResponse]]) -> Optional[str]:
+    if errors is None:
+        return None
+    return json.dumps([[error.field, error.error] for error in errors], ensure_ascii=False)
+
+
+def _load_findings(data: Optional[str], line_number: int) -> Optional[List[ErrorResponse]]:
+    if data is None:
+        return None
+    if data == "[]":
+        return []
+    return [ErrorResponse(line=line_number, field=field, error=error) for field, error in json.loads(data)]
+
+
+class RecordStateStore:
+    """Estado por registro de la última versión validada de cada documento"""
+
+    def __init__(self, store_name: str = STORE_NAME):
+        self.store_name = store_name
+        connection = connect_local_store(store_name)
+        try:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_key TEXT PRIMARY KEY,
+                    state_version TEXT NOT NULL,
+                    validation_types TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS record_state (
+                    document_key TEXT NOT NULL,
+                    record_key TEXT NOT NULL,
+                    user_key TEXT,
+                    provider_key TEXT,
+                    deterministic TEXT,
+                    clinical TEXT,
+                    PRIMARY KEY (document_key, record_key)
+                );
+                CREATE TABLE IF NOT EXISTS group_findings (
+                    document_key TEXT NOT NULL,
+                    family TEXT NOT NULL,
+                    group_key TEXT NOT NULL,
+                    record_key TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    error TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_group_findings_document ON group_findings(document_key);
+            """)
+        finally:
+            connection.close()
+
+    def load(self, document_key: str, state_version: str) -> Optional[Dict[str, Any]]:
+        """Estado guardado del documento, o None si no existe o es de otra versión"""
+        connection = connect_local_store(self.store_name)
+        try:
+            row = connection.execute(
+                "SELECT state_version, validation_types FROM documents WHERE document_key = ?",
+                (document_key,)
+            ).fetchone()
+            if row is None or row[0] != state_version:
+                return None
+
+            records = {
+                record_key: (user_key, provider_key, deterministic, clinical)
+                for record_key, user_key, provider_key, deterministic, clinical in connection.execute(
+                    "SELECT record_key, user_key, provider_key, deterministic, clinical "
+                    "FROM record_state WHERE document_key = ?",
+                    (document_key,)
+                )
+            }
+            groups = defaultdict(list)
+            for family, group_key, record_key, field, error in connection.execute(
+                "SELECT family, group_key, record_key, field, error FROM group_findings WHERE document_key = ? "
+                "ORDER BY rowid",
+                (document_key,)
+            ):
+                groups[(family, group_key)].append((record_key, field, error))
+
+            return {
+                "validation_types": set(row[1].split(",")) if row[1] else set(),
+                "records": records,
+                "groups": groups
+            }
+        finally:
+            connection.close()
+
+    def save(self, document_key: str, state_version: str, validation_types: List[str],
+             records: List[Tuple[str, str, str, Optional[str], Optional[str]]],
+             group_findings: List[Tuple[str, str, str, str, str]]):
+        """Reemplazar el estado del documento por el de la versión recién validada"""
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                connection.execute("DELETE FROM record_state WHERE document_key = ?", (document_key,))
+                connection.execute("DELETE FROM group_findings WHERE document_key = ?", (document_key,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO documents (document_key, state_version, validation_types) VALUES (?, ?, ?)",
+                    (document_key, state_version, ",".join(sorted(validation_types)))
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO record_state "
+                    "(document_key, record_key, user_key, provider_key, deterministic, clinical) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((document_key, *record) for record in records)
+                )
+                connection.executemany(
+                    "INSERT INTO group_findings (document_key, family, group_key, record_key, field, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    ((document_key, *finding) for finding in group_findings)
+                )
+        finally:
+            connection.close()
+
+
+def document_state_key(user_id: Any, filename: str) -> str:
+    """Clave del documento en el estado incremental: usuario + nombre original del archivo"""
+    return f"{user_id}/{filename}"
+
+
+class IncrementalValidationRunner:
+    """Ejecuta los validadores reutilizando el estado de la versión anterior del documento"""
+
+    def __init__(self, deterministic_validator, ai_validator, store: Optional[RecordStateStore] = None):
+        self.deterministic_validator = deterministic_validator
+        self.ai_validator = ai_validator
+        self.store = store or RecordStateStore()
+
+    def state_version(self, file_type: str) -> str:
+        """Versión del estado: un cambio de reglas o catálogos invalida lo guardado"""
+        return (
+            f"{STATE_FORMAT_VERSION}:{file_type}:{get_ruleset_version()}:"
+            f"{self.deterministic_validator.catalog_version}"
+        )
+
+    def run(self, parsed_file: ParsedRIPSFile, file_type: str, validation_types: List[str],
+            document_key: str) -> Tuple[Dict[str, List[ErrorResponse]], Dict[str, int]]:
+        """
+        Validar el archivo reutilizando lo que no cambió
+
+        Returns:
+            (errores por tipo de validador, estadísticas de reutilización)
+        """
+        state_version = self.state_version(file_type)
+        previous = self.store.load(document_key, state_version)
+        previous_records = previous["records"] if previous else {}
+        previous_types = previous["validation_types"] if previous else set()
+
+        record_keys = compute_record_keys(parsed_file)
+        line_numbers = [line.line_number for line in parsed_file.lines]
+        key_to_line = dict(zip(record_keys, line_numbers))
+
+        errors = {}
+        stats = {"records": len(record_keys), "reused": 0, "revalidated": 0}
+        deterministic_state = {}
+        clinical_state = {}
+        group_findings = []
+        user_keys = {}
+        provider_keys = {}
+        saved_types = list(validation_types)
+
+        # Reglas determinísticas por línea
+        if "deterministic" in validation_types:
+            cached = {}
+            if "deterministic" in previous_types:
+                for record_key, line_number in zip(record_keys, line_numbers):
+                    state = previous_records.get(record_key)
+                    if state is not None and state[2] is not None:
+                        cached[line_number] = _load_findings(state[2], line_number)
+
+            line_errors = {}
+            errors["deterministic"] = self.deterministic_validator.validate_parsed_file(
+                parsed_file, file_type, cached_line_errors=cached, line_errors_out=line_errors
+            )
+            for record_key, line_number in zip(record_keys, line_numbers):
+                if line_number in line_errors:
+                    deterministic_state[record_key] = line_errors[line_number]
+            stats["reused"] = len(cached)
+
+        # Reglas de IA
+        if "ai" in validation_types:
+            records = self.ai_validator._records_from_parsed(parsed_file, file_type)
+            ai_previous = previous_records if "ai" in previous_types else {}
+            try:
+                errors["ai"], group_findings, reused = self._run_ai(
+                    records, record_keys, key_to_line, ai_previous,
+                    previous["groups"] if previous and ai_previous else {},
+                    file_type, clinical_state, user_keys, provider_keys
+                )
+                if "deterministic" not in validation_types:
+                    stats["reused"] = reused
+            except Exception as e:
+                errors["ai"] = [self.ai_validator._ai_error(e)]
+                # Estado de IA incompleto: no se guarda para no conservar hallazgos erróneos
+                saved_types.remove("ai")
+                clinical_state.clear()
+                group_findings = []
+
+        stats["revalidated"] = stats["records"] - stats["reused"]
+
+        try:
+            self.store.save(
+                document_key, state_version, saved_types,
+                [
+                    (
+                        record_key,
+                        user_keys.get(record_key),
+                        provider_keys.get(record_key),
+                        _dump_findings(deterministic_state.get(record_key)),
+                        _dump_findings(clinical_state.get(record_key))
+                    )
+                    for record_key in record_keys
+                ],
+                group_findings
+            )
+        except Exception as e:
+            # El estado es solo una optimización: si no se puede guardar, la próxima vez se valida todo
+            logger.warning(f"No se pudo guardar el estado incremental de {document_key}: {str(e)}")
+
+        return errors, stats
+
+    def _run_ai(self, records, record_keys, key_to_line, previous_records, previous_groups,
+                file_type, clinical_state, user_keys, provider_keys):
+        ai = self.ai_validator
+        clinical_errors = []
+        changed = []
+        reused = 0
+
+        # AI-CLIN: por registro; los registros nuevos se evalúan en un solo lote
+        changed_records = []
+        for record, record_key in zip(records, record_keys):
+            user_keys[record_key] = ai._user_key(record)
+            provider_keys[record_key] = ai._provider_key(record)
+            state = previous_records.get(record_key)
+            if state is not None and state[3] is not None:
+                clinical_state[record_key] = _load_findings(state[3], record["line_number"])
+                reused += 1
+            else:
+                changed.append(record_key)
+                changed_records.append(record)
+
+        findings_by_line = defaultdict(list)
+        for error in ai._validate_clinical_coherence(changed_records, file_type) if changed_records else []:
+            findings_by_line[error.line].append(error)
+        for record_key, record in zip(changed, changed_records):
+            clinical_state[record_key] = findings_by_line.get(record["line_number"], [])
+
+        for record_key in record_keys:
+            clinical_errors.extend(clinical_state[record_key])
+
+        # Grupos afectados: los de registros nuevos y los de registros eliminados
+        removed = [key for key in previous_records if key not in key_to_line]
+        affected = {
+            USER_FAMILY: {user_keys[key] for key in changed} | {previous_records[key][0] for key in removed},
+            PROVIDER_FAMILY: {provider_keys[key] for key in changed} | {previous_records[key][1] for key in removed},
+        }
+        full_run = not previous_records
+
+        line_to_key = {line: key for key, line in key_to_line.items()}
+        family_errors = {}
+        group_findings = []
+
+        table = FeatureTable(records)
+        for family, rule, group_of, validate in (
+            (USER_FAMILY, "AI-PAT-001", user_keys, ai._detect_duplicate_procedures),
+            (PROVIDER_FAMILY, "AI-FRAUD-002", provider_keys, ai._detect_suspicious_billing_patterns),
+        ):
+            subset = [
+                record for record, record_key in zip(records, record_keys)
+                if full_run or group_of[record_key] in affected[family]
+            ]
+            found = validate(subset) if subset else []
+
+            # Conservar hallazgos de grupos no afectados
+            if not full_run:
+                for (stored_family, group_key), findings in previous_groups.items():
+                    if stored_family != family or group_key in affected[family]:
+                        continue
+                    for record_key, field, error in findings:
+                        line_number = key_to_line.get(record_key)
+                        if line_number is not None:
+                            found.append(ErrorResponse(line=line_number, field=field, error=error))
+
+            # Orden de la ejecución secuencial: grupos por su primera línea (orden
+            # estable: los hallazgos de un grupo son todos nuevos o todos conservados)
+            group_lines = ai._group_first_lines(rule, found, table)
+            found = [error for _, error in sorted(zip(group_lines, found), key=lambda item: item[0])]
+            family_errors[family] = found
+            for error in found:
+                record_key = line_to_key.get(error.line)
+                if record_key is not None:
+                    group_findings.append((family, group_of[record_key], record_key, error.field, error.error))
+
+        # AI-PAT-002 cita líneas en el mensaje: se recalcula siempre y no se guarda en el estado
+        volume_errors = ai._detect_atypical_volumes(records, table)
+
+        # AI-ANOM-001 depende de la distribución del archivo completo: se puntúa siempre todo el lote
+        anomaly_errors = ai._score_anomalies(records, table)
+
+        # Mismo orden de reglas que EnhancedAIValidator._validate_records
+        errors = (clinical_errors + family_errors[USER_FAMILY] + volume_errors
+                  + family_errors[PROVIDER_FAMILY] + anomaly_errors)
+        return errors, group_findings, reused
@@ -0,0 +1,144 @@
+"""
+Estado de preparación del proceso (GET /ready)
+
+/health solo indica que el worker está vivo. /ready indica si sus
+dependencias están listas, con un estado por comprobación:
+
+- supabase: una consulta mínima a la tabla users
+- validadores: servicio de validación, motor de reglas y puntuador de anomalías
+- almacenes_locales: índice de servicios, línea base de prestadores y
+  almacén columnar de hallazgos
+
+El arranque no espera nada de esto: el lifespan de la aplicación lanza el
+calentamiento en segundo plano y el worker acepta peticiones de inmediato (lo
+que aún no esté caliente se crea en el primer uso). Una comprobación fallida
+se repite desde /ready como máximo cada READY_RECHECK_SECONDS segundos, así
+una caída breve de la base de datos no deja el worker fuera para siempre.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from db.database import get_supabase
+from db.executors import run_bulk, run_db
+from db.provider_baseline import get_provider_baseline
+from db.service_index import get_service_index
+from services.findings_store import get_findings_store
+from services.validation_service import get_validation_service
+from validators.rule_engine import get_rule_engine
+
+logger = logging.getLogger(__name__)
+
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+READY_RECHECK_SECONDS = float(os.getenv("READY_RECHECK_SECONDS", "10"))
+
+STATUS_PENDING = "pendiente"
+STATUS_RUNNING = "en_curso"
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+
+
+def check_database() -> None:
+    """Consulta mínima a Supabase (crea el cliente si aún no existe)"""
+    get_supabase().table("users").select("id").limit(1).execute()
+
+
+def warm_validators() -> Dict[str, Any]:
+    service = get_validation_service()
+    return {
+        "tipos_archivo": len(get_rule_engine().supported_file_types),
+        "puntuador_anomalias": service.ai_validator.model_loaded,
+    }
+
+
+def warm_local_stores() -> Dict[str, Any]:
+    return {
+        "indice_servicios": get_service_index() is not None,
+        "linea_base_prestadores": get_provider_baseline() is not None,
+        "almacen_hallazgos": get_findings_store() is not None,
+    }
+
+
+class Readiness:
+    """Comprobaciones de preparación y su último resultado"""
+
+    def __init__(self, checks: Dict[str, Tuple[Callable[[], Any], Callable[..., Awaitable[Any]]]],
+                 recheck_seconds: float = READY_RECHECK_SECONDS):
+        # checks: nombre -> (función bloqueante, ejecutor: run_db o run_bulk)
+        self.checks = checks
+        self.recheck_seconds = recheck_seconds
+        self.started = monotonic()
+        self.ready_after_s: Optional[float] = None
+        self._state: Dict[str, Dict[str, Any]] = {name: {"status": STATUS_PENDING} for name in checks}
+        self._lock = threading.Lock()
+
+    def _claim(self, name: str, force: bool) -> bool:
+        """Marcar la comprobación en curso si corresponde ejecutarla"""
+        with self._lock:
+            state = self._state[name]
+            if state["status"] in (STATUS_OK, STATUS_RUNNING):
+                return False
+            if not force and state["status"] == STATUS_ERROR and monotonic() - state["checked_at"] < self.recheck_seconds:
+                return False
+            state["status"] = STATUS_RUNNING
+            return True
+
+    async def _run(self, name: str):
+        func, executor = self.checks[name]
+        start = monotonic()
+        try:
+            detail = await executor(func)
+            status = STATUS_OK
+        except asyncio.CancelledError:
+            # Calentamiento cancelado (apagado): queda pendiente para el próximo /ready
+            with self._lock:
+                self._state[name] = {"status": STATUS_PENDING}
+            raise
+        except Exception as e:
+            logger.warning(f"Comprobación de preparación '{name}' fallida: {e}")
+            detail, status = str(e), STATUS_ERROR
+        with self._lock:
+            self._state[name] = {
+                "status": status,
+                "duration_ms": round((monotonic() - start) * 1000, 1),
+                "detail": detail,
+                "checked_at": monotonic(),
+            }
+            if self.ready_after_s is None and all(s["status"] == STATUS_OK for s in self._state.values()):
+                self.ready_after_s = round(monotonic() - self.started, 3)
+
+    async def warm_up(self, force: bool = True):
+        """Ejecutar en paralelo las comprobaciones pendientes o fallidas"""
+        names = [name for name in self.checks if self._claim(name, force)]
+        await asyncio.gather(*(self._run(name) for name in names))
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Estado para /ready: ejecuta lo nunca comprobado y repite fallos vencidos"""
+        await self.warm_up(force=False)
+        return self.snapshot()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            checks = {
+                name: {key: value for key, value in state.items() if key != "checked_at"}
+                for name, state in self._state.items()
+            }
+        ready = all(check["status"] == STATUS_OK for check in checks.values())
+        return {
+            "status": "ready" if ready else "not_ready",
+            "uptime_s": round(monotonic() - self.started, 3),
+            "ready_after_s": self.ready_after_s,
+            "checks": checks,
+        }
+
+
+# Estado compartido del proceso
+readiness = Readiness({
+    "supabase": (check_database, run_db),
+    "validadores": (warm_validators, run_bulk),
+    "almacenes_locales": (warm_local_stores, run_bulk),
+})
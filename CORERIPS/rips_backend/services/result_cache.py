@@ -0,0 +1,194 @@
+"""
+Caché de resultados de validación
+
+Evita revalidar un archivo idéntico (reintentos, clics repetidos en la UI).
+La clave combina:
+
+- hash del contenido del archivo
+- tipo de archivo RIPS y tipos de validación solicitados
+- versión del conjunto de reglas (validators.ruleset)
+- versión de los catálogos cargados en el validador determinístico
+
+Un cambio de reglas o catálogos produce claves nuevas, por lo que las entradas
+anteriores dejan de usarse y terminan saliendo por LRU. Las entradas se guardan
+comprimidas en un almacén SQLite local con un tamaño máximo en bytes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from db.local_store import connect_local_store
+from models.schemas import ErrorResponse
+
+logger = logging.getLogger(__name__)
+
+STORE_NAME = "result_cache"
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Cambiar al modificar el formato de las entradas
+CACHE_FORMAT_VERSION = "1"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_content(content: bytes) -> str:
+    """Hash de un contenido ya leído"""
+    return hashlib.blake2b(content, digest_size=20).hexdigest()
+
+
+def hash_file_content(file_path: str) -> str:
+    """Hash del contenido del archivo leído por bloques"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_cache_key(content_hash: str, file_type: str, validation_types: List[str],
+                    ruleset_version: str, catalog_version: str) -> str:
+    """Clave de caché de una validación"""
+    parts = [
+        CACHE_FORMAT_VERSION,
+        content_hash,
+        file_type,
+        ",".join(sorted(set(validation_types))),
+        ruleset_version,
+        catalog_version,
+    ]
+    return hashlib.blake2b("|".join(parts).encode('utf-8'), digest_size=20).hexdigest()
+
+
+def _encode(result: Dict[str, Any]) -> bytes:
+    payload = {
+        "errors": {
+            validator_type: [[error.line, error.field, error.error] for error in errors]
+            for validator_type, errors in result["errors"].items()
+        },
+        "total_lines": result["total_lines"],
+        "total_records": result["total_records"],
+    }
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def _decode(blob: bytes) -> Dict[str, Any]:
+    payload = json.loads(zlib.decompress(blob).decode('utf-8'))
+    payload["errors"] = {
+        validator_type: [ErrorResponse(line=line, field=field, error=error) for line, field, error in errors]
+        for validator_type, errors in payload["errors"].items()
+    }
+    return payload
+
+
+class ValidationResultCache:
+    """Caché LRU en disco de resultados de validación"""
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES, store_name: str = STORE_NAME):
+        self.max_bytes = max_bytes
+        self.store_name = store_name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        connection = connect_local_store(store_name)
+        try:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS results (
+                    cache_key TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_results_last_access ON results(last_access);
+            """)
+        finally:
+            connection.close()
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Resultado guardado ({"errors", "total_lines", "total_records"}) o None"""
+        connection = connect_local_store(self.store_name)
+        try:
+            row = connection.execute("SELECT payload FROM results WHERE cache_key = ?", (cache_key,)).fetchone()
+            if row is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            with connection:
+                connection.execute("UPDATE results SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key))
+        finally:
+            connection.close()
+
+        with self._lock:
+            self.hits += 1
+        return _decode(row[0])
+
+    def put(self, cache_key: str, result: Dict[str, Any]):
+        """Guardar un resultado y desalojar las entradas menos usadas si se excede el tamaño"""
+        blob = _encode(result)
+        if len(blob) > self.max_bytes:
+            return
+
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results (cache_key, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                    (cache_key, blob, len(blob), time.time())
+                )
+                evicted = self._evict(connection)
+        finally:
+            connection.close()
+
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def _evict(self, connection) -> int:
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = []
+        for cache_key, size in connection.execute("SELECT cache_key, size FROM results ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((cache_key,))
+            total -= size
+        connection.executemany("DELETE FROM results WHERE cache_key = ?", evicted)
+        return len(evicted)
+
+    def clear(self):
+        connection = connect_local_store(self.store_name)
+        try:
+            with connection:
+                connection.execute("DELETE FROM results")
+        finally:
+            connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso del caché"""
+        connection = connect_local_store(self.store_name)
+        try:
+            entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        finally:
+            connection.close()
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,154 @@
+"""
+Consulta paginada de los hallazgos de validación
+
+Los hallazgos de un archivo se leen por páginas ordenadas por
+(line_number, id) con paginación por cursor (keyset): el cursor codifica la
+última (línea, id) entregada y la página siguiente empieza justo después, sin
+OFFSET, así que cada página cuesta lo mismo aunque el archivo tenga cientos
+de miles de hallazgos (índice idx_validations_file_line_id).
+
+PostgREST 0.13 no expone or_() en el cliente, así que la condición
+(line_number, id) > (L, I) se resuelve con dos consultas simples: primero el
+resto de la línea L (line_number = L, id > I) y, si la página no se llenó,
+las líneas siguientes (line_number > L).
+
+Si la última validación del archivo se guardó en modo columnar
+(services.findings_store), las páginas se decodifican de sus bloques con el
+mismo cursor: allí el id es la posición del hallazgo en orden de línea.
+
+iter_findings recorre todas las páginas para la variante NDJSON: en memoria
+solo hay una página a la vez.
+"""
+
+import base64
+import binascii
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from services.findings_store import get_findings_store
+
+RESULTS_PAGE_SIZE = int(os.getenv("RESULTS_PAGE_SIZE", "500"))
+RESULTS_MAX_PAGE_SIZE = int(os.getenv("RESULTS_MAX_PAGE_SIZE", "5000"))
+
+# Filtros de igualdad admitidos: parámetro de consulta -> columna de validations
+EQUALITY_FILTERS = {
+    "field": "field_name",
+    "rule": "rule_name",
+    "status": "status",
+    "validator_type": "validator_type",
+}
+
+
+def encode_cursor(line_number: int, validation_id: int) -> str:
+    """Cursor opaco con la última (línea, id) entregada"""
+    raw = f"{line_number}:{validation_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    Decodificar un cursor de encode_cursor
+
+    Raises:
+        ValueError: si el cursor no es válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        line_number, validation_id = raw.split(":")
+        return int(line_number), int(validation_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Cursor no válido: {cursor}") from e
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Tamaño de página acotado a [1, RESULTS_MAX_PAGE_SIZE]"""
+    if not limit:
+        return RESULTS_PAGE_SIZE
+    return max(1, min(int(limit), RESULTS_MAX_PAGE_SIZE))
+
+
+def _base_query(client, file_id: int, filters: Dict[str, Any], line_from: Optional[int],
+                line_to: Optional[int]):
+    query = client.table("validations").select("*").eq("file_id", file_id)
+    for name, column in EQUALITY_FILTERS.items():
+        value = filters.get(name)
+        if value is not None:
+            query = query.eq(column, value)
+    if line_from is not None:
+        query = query.gte("line_number", line_from)
+    if line_to is not None:
+        query = query.lte("line_number", line_to)
+    return query
+
+
+def fetch_findings_page(client, file_id: int, limit: Optional[int] = None, cursor: Optional[str] = None,
+                        filters: Optional[Dict[str, Any]] = None, line_from: Optional[int] = None,
+                        line_to: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Obtener una página de hallazgos de un archivo
+
+    Args:
+        client: Cliente de Supabase
+        file_id: ID del archivo
+        limit: Tamaño de página (por defecto RESULTS_PAGE_SIZE)
+        cursor: Cursor devuelto por la página anterior
+        filters: Filtros de igualdad (claves de EQUALITY_FILTERS)
+        line_from / line_to: Rango de líneas (inclusive)
+
+    Returns:
+        (filas, cursor de la página siguiente o None si no hay más)
+
+    Raises:
+        ValueError: si el cursor no es válido
+    """
+    size = page_size(limit)
+    filters = filters or {}
+    last_line, last_id = decode_cursor(cursor) if cursor else (None, 0)
+
+    store = get_findings_store()
+    if store.has_run(file_id):
+        rows, more = store.fetch_page(file_id, size, last_id, filters, line_from, line_to)
+        next_cursor = encode_cursor(rows[-1]["line_number"], rows[-1]["id"]) if more else None
+        return rows, next_cursor
+
+    # Se pide una fila de más para saber si hay página siguiente
+    wanted = size + 1
+    rows: List[Dict[str, Any]] = []
+
+    if cursor:
+        same_line = (
+            _base_query(client, file_id, filters, line_from, line_to)
+            .eq("line_number", last_line).gt("id", last_id)
+            .order("id").limit(wanted).execute()
+        )
+        rows.extend(same_line.data or [])
+        if len(rows) < wanted:
+            next_lines = (
+                _base_query(client, file_id, filters, line_from, line_to)
+                .gt("line_number", last_line)
+                .order("line_number").order("id").limit(wanted - len(rows)).execute()
+            )
+            rows.extend(next_lines.data or [])
+    else:
+        first = (
+            _base_query(client, file_id, filters, line_from, line_to)
+            .order("line_number").order("id").limit(wanted).execute()
+        )
+        rows.extend(first.data or [])
+
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor(last["line_number"], last["id"])
+
+
+def iter_findings(client, file_id: int, limit: Optional[int] = None, cursor: Optional[str] = None,
+                  filters: Optional[Dict[str, Any]] = None, line_from: Optional[int] = None,
+                  line_to: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Recorrer todos los hallazgos página a página (una página en memoria)"""
+    while True:
+        rows, cursor = fetch_findings_page(client, file_id, limit, cursor, filters, line_from, line_to)
+        yield from rows
+        if cursor is None:
+            return
@@ -4,7 +4,11 @@ Maneja la conversión de JSON (español) a formato de Base de Datos (inglés)
 """
 
 import json
-from typing import Dict, List, Any, Optional
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Any, Optional, Sequence, Tuple, Union
 from pathlib import Path
 from supabase import Client
 import logging
@@ -13,9 +17,79 @@ import logging
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from validators.field_mappings import map_json_to_db, get_table_name
+from db.service_index import document_key, get_service_index
+from db.provider_baseline import get_provider_baseline
 
 logger = logging.getLogger(__name__)
 
+# Tipos de archivo RIPS con tabla propia, en el orden de las respuestas
+RIPS_DATA_TYPES = ["US", "AC", "AP", "AM", "AT", "AU", "AH", "AN", "AF", "AD", "CT"]
+
+# Consultas por tabla en paralelo y tamaño de página por tabla
+RIPS_FETCH_WORKERS = int(os.getenv("RIPS_FETCH_WORKERS", str(len(RIPS_DATA_TYPES))))
+RIPS_DATA_PAGE_SIZE = int(os.getenv("RIPS_DATA_PAGE_SIZE", "1000"))
+
+_COLUMN_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+_fetch_pool: Optional[ThreadPoolExecutor] = None
+_fetch_pool_lock = threading.Lock()
+
+
+def get_fetch_pool() -> ThreadPoolExecutor:
+    """Pool de hilos compartido para las consultas por tabla (se crea en el primer uso)"""
+    global _fetch_pool
+    with _fetch_pool_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=RIPS_FETCH_WORKERS, thread_name_prefix="rips-fetch")
+        return _fetch_pool
+
+
+def fetch_concurrently(calls: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+    """
+    Ejecutar una consulta por tabla en paralelo
+
+    El total tarda lo que la consulta más lenta y no la suma. Los resultados
+    conservan el orden de calls; el primer error se propaga.
+    """
+    if len(calls) <= 1:
+        return {key: call() for key, call in calls.items()}
+    pool = get_fetch_pool()
+    futures = {key: pool.submit(call) for key, call in calls.items()}
+    return {key: future.result() for key, future in futures.items()}
+
+
+def resolve_data_types(data_type: Optional[Union[str, Sequence[str]]]) -> List[str]:
+    """Tipos solicitados (todos si es None); ValueError si alguno no existe"""
+    if data_type is None:
+        return list(RIPS_DATA_TYPES)
+    types = [data_type] if isinstance(data_type, str) else list(data_type)
+    unknown = [tipo for tipo in types if tipo not in RIPS_DATA_TYPES]
+    if unknown:
+        raise ValueError(f"Tipo de datos RIPS no válido: {', '.join(unknown)}")
+    return types
+
+
+def select_columns(columns: Optional[Sequence[str]], paged: bool = False) -> str:
+    """Lista de columnas para select (el id se agrega al paginar: es el cursor)"""
+    if not columns:
+        return "*"
+    invalid = [column for column in columns if not _COLUMN_NAME.match(column)]
+    if invalid:
+        raise ValueError(f"Columna no válida: {', '.join(invalid)}")
+    if paged and "id" not in columns:
+        columns = ["id", *columns]
+    return ",".join(columns)
+
+
+def decode_data_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Cursor de tabla (id de la última fila entregada)"""
+    if cursor is None:
+        return None
+    try:
+        return int(cursor)
+    except (TypeError, ValueError):
+        raise ValueError("Cursor no válido")
+
 
 class RIPSDataService:
     """Servicio para procesar y almacenar datos RIPS en Supabase"""
@@ -59,9 +133,18 @@ class RIPSDataService:
             "facturacion": 0,
             "ajustes": 0,
             "control": 0,
+            "servicios_indexados": 0,
+            "dias_prestador_linea_base": 0,
             "errores": []
         }
         
+        # Procedimientos para el índice histórico de servicios (AI-PAT-001 entre envíos)
+        indexed_services = []
+        # Servicios (prestador, CUPS, fecha) para la línea base por prestador (AI-PAT-002):
+        # los mismos que lee el validador de IA (consultas, procedimientos, urgencias y
+        # hospitalizaciones, ver validators.rips_json_reader.SERVICE_FIELD_MAPPINGS)
+        baseline_services = []
+        
         try:
             # Procesar datos de control si existen
             if self._is_control_data(data):
@@ -80,11 +163,28 @@ class RIPSDataService:
                         if "consultas" in servicios:
                             for consulta in servicios["consultas"]:
                                 self._insert_consultation(consulta, file_id, stats)
+                                # La mezcla de CUPS es de procedimientos, como AI-FRAUD-002
+                                baseline_services.append((
+                                    consulta.get("codPrestador"),
+                                    None,
+                                    consulta.get("fechaInicioAtencion")
+                                ))
                         
                         # Procedimientos
                         if "procedimientos" in servicios:
                             for proc in servicios["procedimientos"]:
                                 self._insert_procedure(proc, file_id, stats)
+                                indexed_services.append((
+                                    proc.get("tipoDocumentoIdentificacion") or usuario.get("tipoDocumentoIdentificacion"),
+                                    proc.get("numDocumentoIdentificacion") or usuario.get("numDocumentoIdentificacion"),
+                                    proc.get("codProcedimiento"),
+                                    proc.get("fechaInicioAtencion")
+                                ))
+                                baseline_services.append((
+                                    proc.get("codPrestador"),
+                                    proc.get("codProcedimiento"),
+                                    proc.get("fechaInicioAtencion")
+                                ))
                         
                         # Medicamentos
                         if "medicamentos" in servicios:
@@ -100,11 +200,13 @@ class RIPSDataService:
                         if "urgencias" in servicios:
                             for urg in servicios["urgencias"]:
                                 self._insert_emergency(urg, file_id, stats)
+                                baseline_services.append((urg.get("codPrestador"), None, urg.get("fechaIngreso")))
                         
                         # Hospitalizaciones
                         if "hospitalizaciones" in servicios:
                             for hosp in servicios["hospitalizaciones"]:
                                 self._insert_hospitalization(hosp, file_id, stats)
+                                baseline_services.append((hosp.get("codPrestador"), None, hosp.get("fechaIngreso")))
                         
                         # Recién nacidos
                         if "recien_nacidos" in servicios:
@@ -120,6 +222,10 @@ class RIPSDataService:
                 for ajuste in data["ajustes"]:
                     self._insert_adjustment(ajuste, file_id, stats)
             
+            document = document_key(data.get("numDocumentoIdObligado"), data.get("numFactura"))
+            replaced = self._index_services(indexed_services, file_id, stats, document)
+            self._update_provider_baseline(baseline_services, file_id, stats, replaced)
+            
             logger.info(f"Archivo procesado exitosamente: {stats}")
             return stats
             
@@ -128,6 +234,50 @@ class RIPSDataService:
             stats["errores"].append(str(e))
             raise
     
+    def _index_services(self, services: List[tuple], file_id: int, stats: Dict,
+                        document: Optional[int] = None) -> List[int]:
+        """
+        Registrar los procedimientos del archivo en el índice histórico de servicios
+        
+        Returns:
+            file_id de versiones anteriores del mismo documento (misma factura) retiradas del índice
+        """
+        service_index = get_service_index()
+        if service_index is None:
+            return []
+        try:
+            # Reingestar el mismo archivo o una versión corregida de la factura reemplaza sus servicios
+            service_index.remove_file(file_id)
+            replaced = service_index.register_document(file_id, document)
+            stats["servicios_indexados"] = service_index.add_services(file_id, services)
+            if replaced:
+                stats["versiones_reemplazadas"] = replaced
+            return replaced
+        except Exception as e:
+            # El índice es auxiliar: la ingesta no falla si no se puede actualizar
+            error_msg = f"Error indexando servicios: {str(e)}"
+            logger.error(error_msg)
+            stats["errores"].append(error_msg)
+            return []
+    
+    def _update_provider_baseline(self, services: List[tuple], file_id: int, stats: Dict,
+                                  replaced: Optional[List[int]] = None):
+        """Incorporar los volúmenes y CUPS del archivo a la línea base por prestador"""
+        provider_baseline = get_provider_baseline()
+        if provider_baseline is None:
+            return
+        try:
+            # Reingestar el mismo archivo (o una versión corregida) reemplaza su contribución
+            for old_file_id in replaced or ():
+                provider_baseline.remove_file(old_file_id)
+            provider_baseline.remove_file(file_id)
+            stats["dias_prestador_linea_base"] = provider_baseline.add_file(file_id, services)
+        except Exception as e:
+            # La línea base es auxiliar: la ingesta no falla si no se puede actualizar
+            error_msg = f"Error actualizando línea base de prestadores: {str(e)}"
+            logger.error(error_msg)
+            stats["errores"].append(error_msg)
+    
     def _is_control_data(self, data: Dict) -> bool:
         """Verificar si los datos incluyen información de control"""
         control_fields = ["tipoRegistro", "fechaGeneracion", "versionAnexoTecnico"]
@@ -342,38 +492,95 @@ class RIPSDataService:
             logger.error(error_msg)
             stats["errores"].append(error_msg)
     
-    def get_rips_data(self, file_id: int, data_type: Optional[str] = None) -> Dict[str, Any]:
+    def get_rips_data(self, file_id: int, data_type: Optional[Union[str, Sequence[str]]] = None,
+                      columns: Optional[Union[Sequence[str], Dict[str, Sequence[str]]]] = None) -> Dict[str, Any]:
         """
         Obtener datos RIPS de Supabase
         
+        Las tablas se consultan en paralelo (el total tarda lo que la más lenta).
+        
         Args:
             file_id: ID del archivo
-            data_type: Tipo de datos a obtener (US, AC, AP, etc.) o None para todos
+            data_type: Tipo o tipos de datos a obtener (US, AC, AP, etc.) o None para todos
+            columns: Columnas a traer (todas las tablas) o {tipo: columnas}; None para todas
         
         Returns:
             Diccionario con los datos solicitados
         """
-        results = {}
-        
         try:
-            if data_type:
-                # Obtener solo un tipo de datos
-                table_name = get_table_name(data_type)
-                data = self.supabase.table(table_name).select("*").eq("file_id", file_id).execute()
-                results[data_type] = data.data
-            else:
-                # Obtener todos los tipos de datos
-                types = ["US", "AC", "AP", "AM", "AT", "AU", "AH", "AN", "AF", "AD", "CT"]
-                for tipo in types:
-                    table_name = get_table_name(tipo)
-                    data = self.supabase.table(table_name).select("*").eq("file_id", file_id).execute()
-                    results[tipo] = data.data
-            
-            return results
+            types = resolve_data_types(data_type)
+            return fetch_concurrently({
+                tipo: (lambda tipo=tipo: self._fetch_table(file_id, tipo, select_columns(self._table_columns(tipo, columns))))
+                for tipo in types
+            })
             
         except Exception as e:
             logger.error(f"Error obteniendo datos RIPS: {str(e)}")
             raise
+    
+    def get_rips_data_page(self, file_id: int, data_type: Optional[Union[str, Sequence[str]]] = None,
+                           columns: Optional[Union[Sequence[str], Dict[str, Sequence[str]]]] = None,
+                           limit: int = RIPS_DATA_PAGE_SIZE,
+                           cursors: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
+        """
+        Obtener una página de cada tabla, en paralelo
+        
+        Cada tabla devuelve a lo sumo limit filas ordenadas por id, después de
+        cursors[tipo] si se indica.
+        
+        Returns:
+            {"data": {tipo: filas}, "next_cursors": {tipo: cursor o None en la última página}}
+        """
+        types = resolve_data_types(data_type)
+        cursors = cursors or {}
+        after_ids = {tipo: decode_data_cursor(cursors.get(tipo)) for tipo in types}
+        
+        pages = fetch_concurrently({
+            tipo: (lambda tipo=tipo: self._fetch_table(
+                file_id, tipo, select_columns(self._table_columns(tipo, columns), paged=True), limit + 1, after_ids[tipo]
+            ))
+            for tipo in types
+        })
+        
+        data, next_cursors = {}, {}
+        for tipo, rows in pages.items():
+            more = len(rows) > limit
+            data[tipo] = rows[:limit]
+            next_cursors[tipo] = str(rows[limit - 1]["id"]) if more else None
+        return {"data": data, "next_cursors": next_cursors}
+    
+    def iter_rips_data(self, file_id: int, data_type: Optional[Union[str, Sequence[str]]] = None,
+                       columns: Optional[Union[Sequence[str], Dict[str, Sequence[str]]]] = None,
+                       page_size: int = RIPS_DATA_PAGE_SIZE) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Recorrer todas las filas por páginas: (tipo, filas) a medida que llegan
+        
+        Cada ronda trae en paralelo la página siguiente de las tablas que aún
+        tienen filas; la memoria queda acotada a una página por tabla.
+        """
+        cursors: Dict[str, Optional[str]] = {tipo: None for tipo in resolve_data_types(data_type)}
+        while cursors:
+            page = self.get_rips_data_page(file_id, list(cursors), columns, page_size, cursors)
+            for tipo in list(cursors):
+                if page["data"][tipo]:
+                    yield tipo, page["data"][tipo]
+                if page["next_cursors"][tipo] is None:
+                    del cursors[tipo]
+                else:
+                    cursors[tipo] = page["next_cursors"][tipo]
+    
+    @staticmethod
+    def _table_columns(tipo: str, columns: Optional[Union[Sequence[str], Dict[str, Sequence[str]]]]) -> Optional[Sequence[str]]:
+        return columns.get(tipo) if isinstance(columns, dict) else columns
+    
+    def _fetch_table(self, file_id: int, tipo: str, select: str,
+                     limit: Optional[int] = None, after_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        query = self.supabase.table(get_table_name(tipo)).select(select).eq("file_id", file_id)
+        if after_id is not None:
+            query = query.gt("id", after_id)
+        if limit is not None:
+            query = query.order("id").limit(limit)
+        return query.execute().data
 
 
 # Función de utilidad para uso directo
@@ -0,0 +1,131 @@
+"""
+Difusión del progreso de validación a los clientes (Server-Sent Events)
+
+La validación de un archivo publica sus eventos (validators.progress) en el
+ProgressHub del proceso, que guarda solo el último evento de cada archivo. Cada
+cliente suscrito espera una señal de "hay evento nuevo" y lee ese último
+evento: un cliente lento se salta eventos intermedios en lugar de acumularlos,
+y cualquier número de clientes se sirve de la misma validación sin consultar
+la base de datos.
+
+La validación corre en un hilo de trabajo y los clientes en el event loop: la
+señal se entrega con loop.call_soon_threadsafe.
+
+El estado es por proceso: con varios workers, el cliente debe llegar al
+worker que ejecuta la validación (o ver "sin_validacion").
+"""
+
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from validators.progress import TERMINAL_PHASES, ValidationProgress
+
+PROGRESS_KEEPALIVE_SECONDS = float(os.getenv("PROGRESS_KEEPALIVE_SECONDS", "15"))
+PROGRESS_KEEP_FINISHED = int(os.getenv("PROGRESS_KEEP_FINISHED", "256"))
+
+PHASE_NO_VALIDATION = "sin_validacion"
+
+
+class ProgressHub:
+    """Último evento de progreso por archivo y suscriptores esperándolo"""
+
+    def __init__(self, keep_finished: int = PROGRESS_KEEP_FINISHED):
+        self.keep_finished = keep_finished
+        self._events: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._subscribers: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._lock = threading.Lock()
+
+    def tracker(self, file_id: int) -> ValidationProgress:
+        """Seguimiento de una validación que publica en este hub"""
+        return ValidationProgress(lambda event: self.publish(file_id, event))
+
+    def publish(self, file_id: int, event: Dict[str, Any]):
+        with self._lock:
+            previous = self._events.pop(file_id, None)
+            event = dict(event, file_id=file_id, seq=(previous["seq"] + 1) if previous else 1)
+            self._events[file_id] = event
+            self._trim()
+            subscribers = list(self._subscribers.get(file_id, ()))
+        for loop, signal in subscribers:
+            try:
+                loop.call_soon_threadsafe(signal.set)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró
+                pass
+
+    def _trim(self):
+        """Olvidar los eventos finales más antiguos (los de validaciones en curso se conservan)"""
+        finished = [file_id for file_id, event in self._events.items() if event["phase"] in TERMINAL_PHASES]
+        for file_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._events[file_id]
+
+    def last_event(self, file_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            event = self._events.get(file_id)
+            return dict(event) if event is not None else None
+
+    def active_validations(self) -> int:
+        with self._lock:
+            return sum(1 for event in self._events.values() if event["phase"] not in TERMINAL_PHASES)
+
+    async def subscribe(self, file_id: int, keepalive: float = PROGRESS_KEEPALIVE_SECONDS) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Eventos de un archivo hasta el evento final
+
+        Entrega primero el último evento conocido. Entrega None cada keepalive
+        segundos sin eventos (para mantener viva la conexión). Si el archivo
+        no tiene validación registrada termina con un único evento
+        "sin_validacion".
+        """
+        loop = asyncio.get_running_loop()
+        signal = asyncio.Event()
+        subscriber = (loop, signal)
+        with self._lock:
+            self._subscribers.setdefault(file_id, set()).add(subscriber)
+        try:
+            event = self.last_event(file_id)
+            if event is None:
+                yield {"file_id": file_id, "phase": PHASE_NO_VALIDATION, "seq": 0}
+                return
+            last_seq = event["seq"]
+            yield event
+            while event["phase"] not in TERMINAL_PHASES:
+                try:
+                    await asyncio.wait_for(signal.wait(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                signal.clear()
+                event = self.last_event(file_id)
+                if event is None:
+                    return
+                if event["seq"] != last_seq:
+                    last_seq = event["seq"]
+                    yield event
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(file_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[file_id]
+
+
+def format_sse(event: Optional[Dict[str, Any]]) -> str:
+    """Evento SSE (o comentario de keepalive si event es None)"""
+    if event is None:
+        return ": keepalive\n\n"
+    return f"id: {event['seq']}\nevent: progress\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def sse_stream(hub: "ProgressHub", file_id: int) -> AsyncIterator[str]:
+    async for event in hub.subscribe(file_id):
+        yield format_sse(event)
+
+
+# Hub compartido del proceso
+progress_hub = ProgressHub()
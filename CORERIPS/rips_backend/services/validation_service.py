@@ -1,10 +1,32 @@
-from typing import List
+import os
+import logging
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from models.models import File, Validation
 from models.types import ValidationStatus, FileStatus
-from models.schemas import ValidationResultsResponse, ValidationResponse, ErrorResponse
+from models.schemas import ValidationResultsResponse, ValidationResponse, ErrorResponse, ValidationSummaryResponse
 from validators.deterministic_enhanced import EnhancedDeterministicValidator
 from validators.ai_validator_enhanced import EnhancedAIValidator
+from validators.rips_parser import is_text_file, parse_text_file
+from validators.rips_json_reader import is_json_file
+from validators.instrumentation import collect_rule_metrics
+from validators.progress import report_findings, report_phase
+from validators.ruleset import get_ruleset_version
+from services.incremental_validation import IncrementalValidationRunner, document_state_key
+from services.findings_writer import insert_findings
+from services.findings_store import discard_findings_run, store_findings_run, table_findings
+from services.validation_summary import build_summary, get_summary, save_summary
+from db.service_index import get_service_index
+from db.provider_baseline import get_provider_baseline
+from services.result_cache import (
+    ValidationResultCache, RESULT_CACHE_ENABLED, build_cache_key, hash_content, hash_file_content
+)
+
+logger = logging.getLogger(__name__)
+
+# Revalidación incremental de versiones corregidas del mismo documento
+INCREMENTAL_VALIDATION = os.getenv("INCREMENTAL_VALIDATION", "true").lower() == "true"
 
 class ValidationService:
     """Servicio para validación de archivos RIPS"""
@@ -13,13 +35,15 @@ class ValidationService:
         self.deterministic_validator = EnhancedDeterministicValidator()
         self.ai_validator = EnhancedAIValidator()
     
-    def validate_file(self, file_id: int, validation_types: List[str], db: Session) -> ValidationResultsResponse:
+    def validate_file(self, file_id: int, validation_types: List[str], db: Session,
+                      include_metrics: bool = False) -> ValidationResultsResponse:
         """
         Validar archivo RIPS
         Args:
             file_id: ID del archivo a validar
             validation_types: Tipos de validación a ejecutar ['deterministic', 'ai']
             db: Sesión de base de datos
+            include_metrics: Incluir métricas por regla en la respuesta
         """
         
         # Obtener archivo
@@ -31,61 +55,266 @@ class ValidationService:
         db_file.status = FileStatus.PROCESSING
         db.commit()
         
-        all_errors = []
-        
+        findings_stored = False
         try:
-            # Ejecutar validaciones determinísticas
-            if "deterministic" in validation_types:
-                det_errors = self.deterministic_validator.validate_file(
-                    db_file.file_path, 
-                    self._get_file_type(db_file.original_filename)
-                )
-                all_errors.extend(det_errors)
-                
-                # Guardar errores en base de datos
-                self._save_validation_errors(db_file.id, det_errors, "deterministic", db)
+            run = self.run_validations(
+                db_file.file_path,
+                self._get_file_type(db_file.original_filename),
+                validation_types,
+                document_key=document_state_key(db_file.user_id, db_file.original_filename),
+                file_id=db_file.id
+            )
             
-            # Ejecutar validaciones de IA
-            if "ai" in validation_types:
-                ai_errors = self.ai_validator.validate_file(
-                    db_file.file_path,
-                    self._get_file_type(db_file.original_filename)
-                )
-                all_errors.extend(ai_errors)
-                
-                # Guardar errores en base de datos
-                self._save_validation_errors(db_file.id, ai_errors, "ai", db)
+            # Guardar errores en base de datos (por lotes, en la misma transacción);
+            # en modo columnar solo los primeros hallazgos (services.findings_store)
+            errors_for_table, columnar = table_findings(run["errors"])
+            for validator_type, errors in errors_for_table.items():
+                self._save_validation_errors(db_file.id, errors, validator_type, db)
+            
+            # Resumen precalculado de esta validación (misma transacción)
+            summary = build_summary(db_file.id, run["errors"], run["total_lines"], run["total_records"])
+            save_summary(db, summary)
             
-            # Actualizar estado del archivo
+            # Almacén columnar antes del commit: si falla, la transacción se descarta
+            # y el archivo queda en error sin hallazgos a medias
+            store_findings_run(db_file.id, run["errors"], columnar)
+            findings_stored = columnar
+            
+            # Actualizar estado del archivo: un solo commit con todos los hallazgos
             db_file.status = FileStatus.VALIDATED
             db.commit()
             
-            # Contar líneas del archivo
-            total_lines = self._count_file_lines(db_file.file_path)
-            
             # Obtener validaciones de la base de datos
             validations = db.query(Validation).filter(Validation.file_id == file_id).all()
             validation_responses = [ValidationResponse.from_orm(v) for v in validations]
             
-            # Contar errores y warnings
-            total_errors = sum(1 for v in validations if v.status == ValidationStatus.FAILED)
-            total_warnings = sum(1 for v in validations if v.status == ValidationStatus.WARNING)
-            
             return ValidationResultsResponse(
                 file_id=file_id,
                 filename=db_file.original_filename,
-                total_lines=total_lines,
-                total_errors=total_errors,
-                total_warnings=total_warnings,
-                validations=validation_responses
+                total_lines=summary["total_lines"],
+                total_errors=summary["total_errors"],
+                total_warnings=summary["total_warnings"],
+                validations=validation_responses,
+                rule_metrics=run["rule_metrics"] if include_metrics else None
             )
             
         except Exception as e:
-            # Actualizar estado a error
+            # Descartar los hallazgos parciales y actualizar estado a error
+            db.rollback()
+            if findings_stored:
+                # El commit falló tras guardar la validación columnar: no dejarla huérfana
+                discard_findings_run(db_file.id)
             db_file.status = FileStatus.ERROR
             db.commit()
             raise ValueError(f"Error durante validación: {str(e)}")
     
+    @property
+    def incremental_runner(self) -> IncrementalValidationRunner:
+        """Ejecutor incremental (se crea en el primer uso porque abre el almacén local)"""
+        if getattr(self, "_incremental_runner", None) is None:
+            self._incremental_runner = IncrementalValidationRunner(self.deterministic_validator, self.ai_validator)
+        return self._incremental_runner
+    
+    @property
+    def result_cache(self) -> Optional[ValidationResultCache]:
+        """Caché de resultados (None si está desactivado con RESULT_CACHE_ENABLED=false)"""
+        if not RESULT_CACHE_ENABLED:
+            return None
+        if getattr(self, "_result_cache", None) is None:
+            self._result_cache = ValidationResultCache()
+        return self._result_cache
+    
+    def _result_cache_key(self, file_path: str, content: Optional[bytes], file_type: str,
+                          validation_types: List[str]) -> Optional[str]:
+        try:
+            content_hash = hash_content(content) if content is not None else hash_file_content(file_path)
+        except OSError:
+            # Sin acceso al contenido no hay clave; los validadores reportan el error
+            return None
+        return build_cache_key(
+            content_hash, file_type, validation_types,
+            get_ruleset_version(), self.deterministic_validator.catalog_version
+        )
+    
+    def run_validations(self, file_path: str, file_type: str, validation_types: List[str],
+                        document_key: Optional[str] = None, file_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Ejecutar los validadores solicitados leyendo el archivo una sola vez
+        
+        Los archivos de texto se leen con validators.rips_parser y el mismo
+        resultado alimenta al validador determinístico y al de IA. El conteo de
+        líneas y registros sale de esa misma lectura. Las métricas por regla de
+        la ejecución se agregan también a validators.instrumentation.rule_metrics.
+        
+        Si se indica document_key (usuario + nombre original, ver
+        services.incremental_validation.document_state_key) y la
+        revalidación incremental está activa, solo se reevalúan los registros que
+        cambiaron respecto a la última versión validada de ese documento.
+        
+        Un archivo idéntico validado antes con las mismas reglas, catálogos y
+        tipos de validación se responde desde services.result_cache.
+        
+        Con validación de IA, los procedimientos se comparan además contra los
+        envíos anteriores (db.service_index) y los volúmenes diarios y la mezcla
+        de CUPS contra la línea base de cada prestador (db.provider_baseline);
+        file_id excluye el propio archivo.
+        
+        Returns:
+            {"errors": {tipo_validador: [ErrorResponse]}, "total_lines": int,
+             "total_records": int, "rule_metrics": {regla: métricas},
+             "incremental": estadísticas de reutilización o None,
+             "cached": True si el resultado salió del caché}
+        """
+        report_phase("lectura")
+        content = None
+        if is_text_file(file_path):
+            try:
+                with open(file_path, 'rb') as file:
+                    content = file.read()
+            except OSError:
+                # Cada validador reporta el error de lectura a su manera
+                content = None
+        
+        result_cache = self.result_cache
+        cache_key = None
+        cached = None
+        if result_cache is not None:
+            cache_key = self._result_cache_key(file_path, content, file_type, validation_types)
+            cached = result_cache.get(cache_key) if cache_key else None
+        
+        parsed_file = None
+        if content is not None:
+            try:
+                parsed_file = parse_text_file(file_path, content)
+            except UnicodeDecodeError:
+                parsed_file = None
+        
+        # Archivos JSON: los registros de IA se leen una vez para las reglas del archivo y las históricas
+        ai_records = None
+        ai_read_error = None
+        if parsed_file is None and "ai" in validation_types and is_json_file(file_path):
+            try:
+                ai_records = self.ai_validator.read_json_records(file_path)
+            except Exception as e:
+                ai_read_error = e
+        
+        if cached is not None:
+            cached.update({"rule_metrics": {}, "incremental": None, "cached": True})
+            historical = self._historical_findings(parsed_file, file_type, validation_types, file_id, ai_records)
+            if historical:
+                cached["errors"].setdefault("ai", []).extend(historical)
+            return cached
+        
+        errors = {}
+        
+        incremental = None
+        
+        total_lines_hint = parsed_file.total_lines if parsed_file is not None else None
+        
+        with collect_rule_metrics() as metrics:
+            if parsed_file is not None and document_key and INCREMENTAL_VALIDATION:
+                report_phase("incremental", total_lines_hint)
+                errors, incremental = self.incremental_runner.run(
+                    parsed_file, file_type, validation_types, document_key
+                )
+                if incremental is not None:
+                    report_findings(total_lines_hint, sum(len(found) for found in errors.values()))
+            
+            # Ejecutar validaciones determinísticas
+            if "deterministic" in validation_types and incremental is None:
+                report_phase("deterministica", total_lines_hint)
+                if parsed_file is not None:
+                    errors["deterministic"] = self.deterministic_validator.validate_parsed_file(parsed_file, file_type)
+                else:
+                    errors["deterministic"] = self.deterministic_validator.validate_file(file_path, file_type)
+            
+            # Ejecutar validaciones de IA
+            if "ai" in validation_types and incremental is None:
+                report_phase("ia", total_lines_hint)
+                if parsed_file is not None:
+                    errors["ai"] = self.ai_validator.validate_parsed_file(parsed_file, file_type)
+                elif ai_records is not None:
+                    errors["ai"] = self.ai_validator.validate_records(ai_records, file_type)
+                elif ai_read_error is not None:
+                    errors["ai"] = [self.ai_validator._ai_error(ai_read_error)]
+                else:
+                    errors["ai"] = self.ai_validator.validate_file(file_path, file_type)
+                report_findings(total_lines_hint or 0, len(errors["ai"]))
+            
+            if "ai" in validation_types:
+                report_phase("historico")
+            historical = self._historical_findings(parsed_file, file_type, validation_types, file_id, ai_records)
+        
+        if parsed_file is not None:
+            total_lines = parsed_file.total_lines
+            total_records = parsed_file.total_records
+        else:
+            total_lines = self._count_file_lines(file_path)
+            total_records = total_lines
+        
+        result = {
+            "errors": errors,
+            "total_lines": total_lines,
+            "total_records": total_records,
+            "rule_metrics": metrics.snapshot(),
+            "incremental": incremental,
+            "cached": False
+        }
+        
+        # Un fallo de IA puede ser transitorio: ese resultado no se guarda
+        ai_failed = any(error.field == "ai_validation" for error in errors.get("ai", []))
+        if cache_key and not ai_failed:
+            try:
+                result_cache.put(cache_key, result)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar el resultado en caché: {str(e)}")
+        
+        # Los hallazgos históricos no se guardan en caché: dependen de lo ingerido después
+        if historical:
+            errors.setdefault("ai", []).extend(historical)
+        
+        return result
+    
+    def _historical_findings(self, parsed_file, file_type: str, validation_types: List[str],
+                             file_id: Optional[int], records: Optional[List[Dict]] = None) -> List[ErrorResponse]:
+        """
+        AI-PAT-001, AI-PAT-002 y AI-FRAUD-002 contra envíos anteriores (índice de servicios y línea base)
+        
+        Usa los registros de IA ya leídos (archivos JSON) o los obtiene del archivo de texto.
+        """
+        service_index = get_service_index()
+        provider_baseline = get_provider_baseline()
+        if (parsed_file is None and records is None) or "ai" not in validation_types:
+            return []
+        if service_index is None and provider_baseline is None:
+            return []
+        
+        try:
+            if records is None:
+                records = self.ai_validator._records_from_parsed(parsed_file, file_type)
+        except Exception as e:
+            logger.warning(f"No se pudieron preparar los registros para las reglas históricas: {str(e)}")
+            return []
+        findings = []
+        if service_index is not None:
+            try:
+                findings.extend(
+                    self.ai_validator.detect_historical_duplicates(records, service_index, exclude_file_id=file_id)
+                )
+            except Exception as e:
+                logger.warning(f"No se pudo consultar el índice histórico de servicios: {str(e)}")
+        if provider_baseline is not None:
+            try:
+                findings.extend(
+                    self.ai_validator.detect_baseline_volume_anomalies(records, provider_baseline, exclude_file_id=file_id)
+                )
+                findings.extend(
+                    self.ai_validator.detect_baseline_billing_patterns(records, provider_baseline, exclude_file_id=file_id)
+                )
+            except Exception as e:
+                logger.warning(f"No se pudo consultar la línea base de prestadores: {str(e)}")
+        return findings
+    
     def get_validation_results(self, file_id: int, db: Session) -> ValidationResultsResponse:
         """Obtener resultados de validación de un archivo"""
         
@@ -96,9 +325,16 @@ class ValidationService:
         validations = db.query(Validation).filter(Validation.file_id == file_id).all()
         validation_responses = [ValidationResponse.from_orm(v) for v in validations]
         
-        total_lines = self._count_file_lines(db_file.file_path)
-        total_errors = sum(1 for v in validations if v.status == ValidationStatus.FAILED)
-        total_warnings = sum(1 for v in validations if v.status == ValidationStatus.WARNING)
+        summary = get_summary(db, file_id)
+        if summary is not None:
+            total_lines = summary["total_lines"]
+            total_errors = summary["total_errors"]
+            total_warnings = summary["total_warnings"]
+        else:
+            # Archivos validados antes de existir los resúmenes
+            total_lines = self._count_file_lines(db_file.file_path)
+            total_errors = sum(1 for v in validations if v.status == ValidationStatus.FAILED)
+            total_warnings = sum(1 for v in validations if v.status == ValidationStatus.WARNING)
         
         return ValidationResultsResponse(
             file_id=file_id,
@@ -109,22 +345,26 @@ class ValidationService:
             validations=validation_responses
         )
     
-    def _save_validation_errors(self, file_id: int, errors: List[ErrorResponse], validator_type: str, db: Session):
-        """Guardar errores de validación en base de datos"""
+    def get_validation_summary(self, file_id: int, db: Session) -> ValidationSummaryResponse:
+        """
+        Obtener el resumen precalculado de la última validación de un archivo
         
-        for error in errors:
-            validation = Validation(
-                file_id=file_id,
-                line_number=error.line,
-                field_name=error.field,
-                rule_name=f"{validator_type}_validation",
-                error_message=error.error,
-                status=ValidationStatus.FAILED,
-                validator_type=validator_type
-            )
-            db.add(validation)
+        Lee una sola fila de validation_summaries; no consulta los hallazgos
+        ni el archivo en disco.
+        """
+        summary = get_summary(db, file_id)
+        if summary is None:
+            raise ValueError("Resumen no disponible: el archivo no ha sido validado")
+        return ValidationSummaryResponse(**summary)
+    
+    def _save_validation_errors(self, file_id: int, errors: List[ErrorResponse], validator_type: str, db: Session):
+        """
+        Guardar errores de validación en base de datos
         
-        db.commit()
+        Inserciones de varias filas por lote (services.findings_writer); el
+        commit lo hace validate_file junto con el estado del archivo.
+        """
+        insert_findings(db, file_id, {validator_type: errors})
     
     def _get_file_type(self, filename: str) -> str:
         """Determinar tipo de archivo RIPS basado en el nombre"""
@@ -156,3 +396,9 @@ class ValidationService:
                 return sum(1 for line in file if line.strip())
         except Exception:
             return 0
+
+
+@lru_cache(maxsize=1)
+def get_validation_service() -> ValidationService:
+    """Servicio de validación del proceso (se crea en el primer uso o en el calentamiento)"""
+    return ValidationService()
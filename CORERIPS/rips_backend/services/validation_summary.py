@@ -0,0 +1,96 @@
+"""
+Resúmenes precalculados de validación por archivo
+
+Al guardar los hallazgos de una validación se guarda también una fila en
+validation_summaries con los totales por estado, regla, campo y tipo de
+validador, más las líneas y registros del archivo. Los endpoints de resumen
+leen esa única fila: no recorren la tabla validations ni vuelven a abrir el
+archivo en disco.
+
+El resumen describe la última validación del archivo y se reemplaza completo
+en cada validación (upsert por file_id).
+"""
+
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from models.models import ValidationSummary
+from models.schemas import ErrorResponse
+from models.types import ValidationStatus
+from services.findings_writer import finding_rows
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_COLUMNS = (
+    "file_id", "total_lines", "total_records", "total_findings", "total_errors", "total_warnings",
+    "by_status", "by_rule", "by_field", "by_validator_type"
+)
+
+
+def _status_key(status: Any) -> str:
+    return status.value if isinstance(status, ValidationStatus) else str(status)
+
+
+def build_summary(file_id: int, errors_by_type: Dict[str, List[ErrorResponse]], total_lines: int,
+                  total_records: int, status: Any = ValidationStatus.FAILED) -> Dict[str, Any]:
+    """
+    Calcular el resumen de los hallazgos que se van a guardar
+
+    Usa las mismas filas que services.findings_writer, así que las claves por
+    regla, campo y tipo de validador coinciden con las columnas de validations.
+    """
+    by_status: Counter = Counter()
+    by_rule: Counter = Counter()
+    by_field: Counter = Counter()
+    by_validator_type: Counter = Counter()
+    for row in finding_rows(file_id, errors_by_type, status):
+        by_status[_status_key(row["status"])] += 1
+        by_rule[row["rule_name"]] += 1
+        by_field[row["field_name"]] += 1
+        by_validator_type[row["validator_type"]] += 1
+    # Los tipos de validación ejecutados sin hallazgos aparecen con 0
+    for validator_type in errors_by_type:
+        by_validator_type.setdefault(validator_type, 0)
+
+    return {
+        "file_id": file_id,
+        "total_lines": total_lines,
+        "total_records": total_records,
+        "total_findings": sum(by_status.values()),
+        "total_errors": by_status[ValidationStatus.FAILED.value],
+        "total_warnings": by_status[ValidationStatus.WARNING.value],
+        "by_status": dict(by_status),
+        "by_rule": dict(by_rule),
+        "by_field": dict(by_field),
+        "by_validator_type": dict(by_validator_type),
+    }
+
+
+def save_summary(db: Session, summary: Dict[str, Any]):
+    """Guardar (reemplazar) el resumen en la sesión SQLAlchemy, sin commit"""
+    db.merge(ValidationSummary(**summary))
+
+
+def get_summary(db: Session, file_id: int) -> Optional[Dict[str, Any]]:
+    """Resumen guardado de un archivo (None si nunca se validó con resumen)"""
+    row = db.get(ValidationSummary, file_id)
+    if row is None:
+        return None
+    return {column: getattr(row, column) for column in SUMMARY_COLUMNS}
+
+
+def save_summary_supabase(client, summary: Dict[str, Any]):
+    """Guardar (reemplazar) el resumen en Supabase"""
+    client.table("validation_summaries").upsert(summary, on_conflict="file_id").execute()
+
+
+def get_summary_supabase(client, file_id: int) -> Optional[Dict[str, Any]]:
+    """Resumen guardado de un archivo en Supabase (None si no existe)"""
+    result = client.table("validation_summaries").select("*").eq("file_id", file_id).execute()
+    if not result.data:
+        return None
+    row = result.data[0]
+    return {column: row.get(column) for column in SUMMARY_COLUMNS}
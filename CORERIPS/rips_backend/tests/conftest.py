@@ -7,6 +7,7 @@ import tempfile
 import os
 import json
 import sys
+import time
 from unittest.mock import Mock, MagicMock, patch, DEFAULT
 from fastapi.testclient import TestClient
 from pathlib import Path
@@ -17,6 +18,12 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 # Establecer variable de entorno para indicar modo test
 os.environ['TESTING'] = 'true'
 
+# Almacenes locales (SQLite) en un directorio temporal aislado
+os.environ['LOCAL_STORE_DIR'] = tempfile.mkdtemp(prefix="rips_local_store_")
+
+# Cada test valida de verdad; los tests del caché de resultados lo activan explícitamente
+os.environ['RESULT_CACHE_ENABLED'] = 'false'
+
 # Mockear create_client de supabase antes de cualquier importación
 mock_supabase_client = MagicMock()
 mock_supabase_client.table.return_value.select.return_value.eq.return_value.execute.return_value.data = []
@@ -340,6 +347,113 @@ def override_get_db(mock_db):
     app.dependency_overrides.clear()
 
 
+class FakePostgrestQuery:
+    """
+    Consulta encadenable mínima de supabase-py sobre filas en memoria
+
+    select / insert / delete, filtros eq/gt/gte/lte/in_, order y limit.
+    """
+
+    OPERATORS = {
+        "eq": lambda a, b: a == b,
+        "gt": lambda a, b: a > b,
+        "gte": lambda a, b: a >= b,
+        "lte": lambda a, b: a <= b,
+        "in_": lambda a, b: a in b,
+    }
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.payload = None
+        self.conditions = []
+        self.ordering = []
+        self.max_rows = None
+
+    def select(self, columns="*"):
+        self.columns = columns
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def __getattr__(self, name):
+        if name not in self.OPERATORS:
+            raise AttributeError(name)
+
+        def add_condition(column, value):
+            self.conditions.append((self.OPERATORS[name], column, value))
+            return self
+        return add_condition
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.max_rows = count
+        return self
+
+    def _matches(self, row):
+        return all(op(row[column], value) for op, column, value in self.conditions)
+
+    def execute(self):
+        self.client.requests += 1
+        if self.client.fail_on_request == self.client.requests:
+            raise RuntimeError("timeout")
+        time.sleep(self.client.latency)
+        rows = self.client.tables.setdefault(self.table, [])
+
+        if self.action == "insert":
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            next_id = max((row["id"] for row in rows), default=0) + 1
+            inserted = [dict(row, id=next_id + i) for i, row in enumerate(payload)]
+            rows.extend(inserted)
+            return type("Result", (), {"data": inserted})()
+        if self.action == "delete":
+            self.client.tables[self.table] = [row for row in rows if not self._matches(row)]
+            return type("Result", (), {"data": []})()
+
+        rows = [row for row in rows if self._matches(row)]
+        for column, desc in reversed(self.ordering):
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        rows = rows[:self.max_rows]
+        if self.columns != "*":
+            rows = [{column: row[column] for column in self.columns.split(",")} for row in rows]
+        return type("Result", (), {"data": rows})()
+
+
+class FakePostgrestClient:
+    """Cliente de supabase-py en memoria: tabla -> filas, con conteo de peticiones"""
+
+    def __init__(self, tables=None, latency=0.0, fail_on_request=None):
+        self.tables = tables if tables is not None else {}
+        self.latency = latency
+        self.fail_on_request = fail_on_request
+        self.requests = 0
+
+    def table(self, name):
+        return FakePostgrestQuery(self, name)
+
+
+@pytest.fixture
+def postgrest_client():
+    """
+    Fábrica de clientes supabase-py en memoria que sí filtran, ordenan y paginan
+
+    postgrest_client(tablas, latency=segundos, fail_on_request=n): la petición
+    número n falla con RuntimeError.
+    """
+    return FakePostgrestClient
+
+
 # ============================================================================
 # FIXTURES DE MODELOS
 # ============================================================================
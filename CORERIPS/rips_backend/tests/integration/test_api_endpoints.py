@@ -40,6 +40,25 @@ class TestHealthEndpoints:
         assert data["status"] == "healthy"
         assert "service" in data
 
+    def test_ready_endpoint(self, client, override_get_db):
+        """
+        Test: GET /ready - Dependencias y catálogos listos
+        Resultado esperado: 503 mientras calienta y luego 200 OK con el estado de cada comprobación
+        """
+        import time
+        for _ in range(100):
+            response = client.get("/ready")
+            if response.status_code == 200:
+                break
+            assert response.status_code == 503
+            time.sleep(0.05)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "ready"
+        assert set(data["checks"]) == {"supabase", "validadores", "almacenes_locales"}
+        assert all(check["status"] == "ok" for check in data["checks"].values())
+
 
 class TestAuthenticationEndpoints:
     """Tests para endpoints de autenticación"""
@@ -217,6 +236,23 @@ class TestFileUploadEndpoints:
         data = response.json()
         assert "file_id" in data or "message" in data
     
+    def test_upload_rejected_when_ingest_queue_full(self, client, override_get_db, valid_rips_json, monkeypatch):
+        """
+        Test: POST /api/v1/upload - Sin turno ni lugar en la cola de ingesta
+        Resultado esperado: 429 con Retry-After
+        """
+        from services.admission import ingest_admission
+        monkeypatch.setattr(ingest_admission, "max_concurrent", 0)
+        monkeypatch.setattr(ingest_admission, "max_queue", 0)
+        files = {
+            "file": ("test_rips.json", BytesIO(json.dumps(valid_rips_json).encode('utf-8')), "application/json")
+        }
+
+        response = client.post("/api/v1/upload", files=files)
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+    
     def test_upload_without_file(self, client):
         """
         Test: POST /api/v1/upload - Request sin archivo
@@ -426,6 +462,46 @@ class TestResultsEndpoints:
         # Assert
         assert response.status_code == 404
     
+    def test_get_results_invalid_cursor(self, client, override_get_db):
+        """
+        Test: GET /api/v1/results/{file_id} - Cursor no válido
+        Resultado esperado: 400 Bad Request
+        """
+        # Arrange
+        override_get_db.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+            {"id": 1, "original_filename": "test_AC.txt", "status": "validated"}
+        ]
+        
+        # Act
+        response = client.get("/api/v1/results/1?cursor=no-es-un-cursor")
+        
+        # Assert
+        assert response.status_code == 400
+    
+    def test_get_file_data_invalid_type(self, client, override_get_db):
+        """
+        Test: GET /api/v1/files/{file_id}/data con un tipo RIPS inexistente
+        Resultado esperado: 400 Bad Request
+        """
+        override_get_db.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+            {"id": 1, "filename": "test.json", "original_filename": "test.json", "status": "validated"}
+        ]
+
+        response = client.get("/api/v1/files/1/data?types=US,XX")
+
+        assert response.status_code == 400
+    
+    def test_export_results_unsupported_format(self, client, override_get_db):
+        """
+        Test: GET /api/v1/results/{file_id}/export - Formato no soportado
+        Resultado esperado: 400 Bad Request
+        """
+        # Act
+        response = client.get("/api/v1/results/1/export?format=pdf")
+        
+        # Assert
+        assert response.status_code == 400
+    
     def test_get_files_list(self, client, override_get_db):
         """
         Test: GET /api/v1/files - Listar archivos del usuario
@@ -498,3 +574,90 @@ class TestEndToEndFlows:
         results_response = client.get(f"/api/v1/results/{file_id}")
         assert results_response.status_code == 200
 
+
+
+class TestMetricsEndpoints:
+    """Tests para métricas de validación"""
+    
+    def test_validate_with_metrics(self, client, override_get_db, temp_rips_file):
+        """
+        Test: POST /api/v1/validate con include_metrics retorna métricas por regla
+        y GET /api/v1/metrics las expone agregadas
+        """
+        # Arrange
+        override_get_db.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+            {
+                "id": 1,
+                "filename": "test_AC.txt",
+                "file_path": temp_rips_file,
+                "status": "uploaded"
+            }
+        ]
+        
+        # Act
+        response = client.post("/api/v1/validate", json={
+            "file_id": 1,
+            "validation_types": ["deterministic", "ai"],
+            "include_metrics": True
+        })
+        metrics_response = client.get("/api/v1/metrics")
+        
+        # Assert
+        assert response.status_code == 200
+        assert "AI-CLIN-001" in response.json()["rule_metrics"]
+        assert metrics_response.status_code == 200
+        assert "AI-CLIN-001" in metrics_response.json()["rules"]
+    
+    def test_validate_without_metrics(self, client, override_get_db, temp_rips_file):
+        """
+        Test: Por defecto la respuesta de validación no incluye métricas
+        """
+        override_get_db.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+            {"id": 1, "filename": "test_AC.txt", "file_path": temp_rips_file, "status": "uploaded"}
+        ]
+        
+        response = client.post("/api/v1/validate", json={"file_id": 1})
+        
+        assert response.status_code == 200
+        assert "rule_metrics" not in response.json()
+
+
+class TestNonBlockingEndpoints:
+    """Las cargas pesadas no bloquean el event loop"""
+
+    def test_health_responds_during_slow_upload(self, override_get_db, valid_rips_json, monkeypatch):
+        """
+        Test: GET /health responde mientras un POST /api/v1/upload sigue procesando
+        """
+        import asyncio
+        import time
+        import httpx
+        from main import app
+        from services.rips_data_service import RIPSDataService
+
+        def slow_process(self, file_path, file_id):
+            time.sleep(1.0)
+            return {"usuarios": 0}
+
+        monkeypatch.setattr(RIPSDataService, "process_rips_file", slow_process)
+        json_content = json.dumps(valid_rips_json).encode('utf-8')
+
+        async def scenario():
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                upload = asyncio.create_task(client.post(
+                    "/api/v1/upload", files={"file": ("test_lento.json", json_content, "application/json")}
+                ))
+                await asyncio.sleep(0.1)
+                start = time.perf_counter()
+                health = await client.get("/health")
+                elapsed = time.perf_counter() - start
+                upload_pending = not upload.done()
+                upload_response = await upload
+                return health, elapsed, upload_pending, upload_response
+
+        health, elapsed, upload_pending, upload_response = asyncio.run(scenario())
+
+        assert health.status_code == 200
+        assert upload_pending
+        assert elapsed < 0.5
+        assert upload_response.status_code == 200
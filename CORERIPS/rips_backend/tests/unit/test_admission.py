@@ -0,0 +1,88 @@
+"""
+Tests unitarios para el control de admisión de endpoints pesados
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from services.admission import AdmissionController, AdmissionRejected
+
+
+class TestAdmissionController:
+    """Suite de tests para AdmissionController"""
+
+    def test_small_files_are_admitted_first(self):
+        """
+        Test: Con el único turno ocupado, la cola se atiende por tamaño (pequeños primero)
+        """
+        controller = AdmissionController("ingesta", max_concurrent=1, max_queue=10, max_wait=5,
+                                         priority_bytes_per_second=1)
+        order = []
+
+        async def job(size):
+            slot = await controller.acquire(size)
+            order.append(size)
+            await asyncio.sleep(0)
+            slot.release()
+
+        async def scenario():
+            first = await controller.acquire(0)
+            jobs = [asyncio.create_task(job(size)) for size in (900_000, 10, 50_000)]
+            await asyncio.sleep(0)
+            assert controller.queued == 3
+            first.release()
+            await asyncio.gather(*jobs)
+
+        asyncio.run(scenario())
+
+        assert order == [10, 50_000, 900_000]
+        stats = controller.stats()
+        assert stats["admitted"] == 4 and stats["completed"] == 4
+        assert stats["active"] == 0 and stats["queued"] == 0
+
+    def test_full_queue_is_rejected_with_429(self):
+        """
+        Test: Con la cola llena se rechaza de inmediato con 429 y Retry-After
+        """
+        controller = AdmissionController("validacion", max_concurrent=1, max_queue=1, max_wait=5)
+
+        async def scenario():
+            slot = await controller.acquire()
+            waiting = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as rejected:
+                await controller.acquire()
+            slot.release()
+            (await waiting).release()
+            return rejected.value
+
+        rejected = asyncio.run(scenario())
+
+        assert rejected.status_code == 429 and rejected.retry_after >= 1
+        assert controller.stats()["rejected_queue_full"] == 1
+
+    def test_wait_timeout_is_rejected_with_503_and_frees_queue(self):
+        """
+        Test: Una espera vencida responde 503 y su lugar en la cola se libera
+        """
+        controller = AdmissionController("validacion", max_concurrent=1, max_queue=1, max_wait=0.05)
+
+        async def scenario():
+            slot = await controller.acquire()
+            with pytest.raises(AdmissionRejected) as rejected:
+                await controller.acquire()
+            assert controller.queued == 0
+            slot.release()
+            (await controller.acquire()).release()
+            return rejected.value
+
+        rejected = asyncio.run(scenario())
+
+        assert rejected.status_code == 503
+        stats = controller.stats()
+        assert stats["rejected_timeout"] == 1 and stats["active"] == 0 and stats["admitted"] == 2
@@ -0,0 +1,122 @@
+"""
+Tests unitarios para la tabla de características de las reglas de IA
+"""
+import pytest
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import validators.ai_features as ai_features
+from validators.ai_features import NO_VALUE, FeatureTable, register_feature
+from validators.ai_records import MISSING_DATE, RecordFactory
+from validators.ai_validator_enhanced import EnhancedAIValidator
+from validators.pattern_arrays import INVALID_DATE
+
+RECORDS = [
+    {"line_number": 1, "codigo_prestador": "P1", "tipo_documento": "CC", "numero_documento": "1",
+     "sexo": "m", "diagnostico_principal": "o800", "codigo_cups": "890201", "fecha_procedimiento": "2024-03-01",
+     "fecha_nacimiento": "1990-01-01"},
+    {"line_number": 2, "codigo_prestador": "", "tipo_documento": "CC", "numero_documento": "2",
+     "sexo": "F", "diagnostico_principal": "", "codigo_consulta": "890301", "fecha_consulta": "01/03/2024"},
+    {"line_number": 3, "codigo_prestador": "P1", "tipo_documento": "CC", "numero_documento": "1",
+     "sexo": "M", "diagnostico_principal": "O800", "codigo_cups": "890202", "fecha_procedimiento": "2024-02-30"},
+]
+
+
+class TestFeatureTable:
+    """Suite de tests para FeatureTable"""
+
+    def test_coded_columns_are_normalized_and_empty_is_no_value(self):
+        """
+        Test: Códigos en orden de aparición, normalizados a mayúsculas y -1 para vacíos
+        """
+        table = FeatureTable(RECORDS)
+
+        assert table["prestador"].tolist() == [0, NO_VALUE, 0]
+        assert table["usuario"].tolist() == [0, 1, 0]
+        assert table["diagnostico"].tolist() == [0, NO_VALUE, 0]
+        assert table.labels("diagnostico") == ["O800"]
+        assert table.labels("sexo") == ["M", "F"]
+
+    def test_dates_and_derived_features(self):
+        """
+        Test: Fechas como ordinal (vacía / no válida) y características derivadas
+        """
+        table = FeatureTable(RECORDS)
+
+        assert table["dia_servicio"].tolist() == [date(2024, 3, 1).toordinal()] * 2 + [INVALID_DATE]
+        assert table["dia_nacimiento"].tolist() == [date(1990, 1, 1).toordinal(), MISSING_DATE, MISSING_DATE]
+        assert table["edad"][0] >= 34 and np.isnan(table["edad"][1:]).all()
+        assert table["volumen_diario_prestador"][0] == 1 and np.isnan(table["volumen_diario_prestador"][1:]).all()
+        groups = table["grupo_servicio"]
+        assert [table.labels("grupo_servicio")[code] for code in groups.tolist()] == ["8902", "8903", "8902"]
+
+    def test_compact_records_give_same_columns(self):
+        """
+        Test: Registros compactos y dicts producen las mismas columnas
+        """
+        factory = RecordFactory()
+        compact = [
+            factory.from_values(
+                "AP", record["line_number"],
+                {field: record.get(field, "") for field in
+                 ("codigo_prestador", "tipo_documento", "numero_documento", "sexo", "diagnostico_principal", "codigo_cups")},
+                service_date=record.get("fecha_procedimiento", ""), birth_date=record.get("fecha_nacimiento", "")
+            )
+            for record in RECORDS if "codigo_cups" in record
+        ]
+        expected = FeatureTable([record for record in RECORDS if "codigo_cups" in record])
+        table = FeatureTable(compact)
+
+        for name in ("linea", "prestador", "usuario", "cups", "diagnostico", "sexo", "dia_servicio", "edad"):
+            assert np.array_equal(table[name], expected[name], equal_nan=True), name
+
+    def test_each_feature_is_computed_once(self):
+        """
+        Test: Una característica se calcula una sola vez por tabla, aunque la pidan varias reglas
+        """
+        calls = []
+
+        @register_feature("prueba_doble_linea")
+        def _double_line(table):
+            calls.append(1)
+            return table["linea"] * 2
+
+        try:
+            table = FeatureTable(RECORDS).require(["prueba_doble_linea"])
+            assert table["prueba_doble_linea"].tolist() == [2, 4, 6]
+            assert len(calls) == 1
+        finally:
+            ai_features._FEATURES.pop("prueba_doble_linea")
+
+    def test_factorized_restricts_and_reorders_codes(self):
+        """
+        Test: factorized recodifica en orden de aparición dentro de las filas pedidas
+        """
+        table = FeatureTable(RECORDS + [dict(RECORDS[1], line_number=4, codigo_prestador="P2")])
+
+        codes, labels = table.factorized("prestador", np.array([3, 0]))
+
+        assert codes.tolist() == [0, 1] and labels == ["P2", "P1"]
+
+    def test_unknown_feature_raises(self):
+        """
+        Test: Pedir una característica no registrada es un error explícito
+        """
+        with pytest.raises(KeyError):
+            FeatureTable(RECORDS)["no_existe"]
+
+
+def test_rules_declare_registered_features():
+    """
+    Test: Las características declaradas por las reglas de IA están registradas
+    """
+    required = EnhancedAIValidator().required_features()
+
+    assert {"linea", "usuario", "cups", "dia_servicio", "edad", "diagnostico"} <= set(required)
+    assert set(required) <= set(ai_features.registered_features())
@@ -0,0 +1,143 @@
+"""
+Tests unitarios para la ejecución particionada de las reglas de IA
+"""
+import pytest
+import pickle
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import validators.ai_parallel as ai_parallel
+from validators.ai_parallel import partition_records, shutdown_process_pool, validate_partitioned
+from validators.ai_records import RecordFactory
+from validators.ai_validator_enhanced import EnhancedAIValidator
+from validators.instrumentation import RuleMetrics, collect_rule_metrics
+from validators.pattern_reference import random_records
+
+
+def _records_with_findings(seed=11, n=2000):
+    """Registros de varios prestadores con hallazgos clínicos, duplicados, volumen y fraude"""
+    records = random_records(seed, n, users=80, providers=6, cups=4, days=20)
+    for i, record in enumerate(records):
+        record["sexo"] = "M" if i % 2 else "F"
+        record["diagnostico_principal"] = "O800" if i % 7 == 0 else "K359"
+    return records
+
+
+def _sorted(errors):
+    return sorted((error.line, error.field, error.error) for error in errors)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def process_pool():
+    """Un pool por módulo (crear procesos con spawn es costoso)"""
+    yield
+    shutdown_process_pool()
+
+
+class TestPartitionRecords:
+    """Suite de tests para partition_records"""
+
+    def test_same_key_goes_to_same_partition_in_order(self):
+        """
+        Test: Cada clave queda en una sola partición y se conserva el orden de los registros
+        """
+        records = random_records(3, 500, providers=9)
+        partitions = partition_records(records, lambda record: record["codigo_prestador"], 4)
+
+        assert sum(len(partition) for partition in partitions) == len(records)
+        owners = {}
+        for index, partition in enumerate(partitions):
+            assert [r["line_number"] for r in partition] == sorted(r["line_number"] for r in partition)
+            for record in partition:
+                assert owners.setdefault(record["codigo_prestador"], index) == index
+
+
+class TestPartitionedValidation:
+    """La ejecución particionada da los mismos hallazgos que la secuencial"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup para cada test"""
+        self.validator = EnhancedAIValidator()
+        self.validator.volume_daily_threshold = 15
+
+    def test_matches_sequential_findings(self):
+        """
+        Test: Mismos hallazgos con 2 procesos y las cuatro familias de reglas representadas
+        """
+        records = _records_with_findings()
+        sequential = self.validator._validate_records(records, "AP")
+
+        partitioned = validate_partitioned(self.validator, records, "AP", workers=2)
+
+        assert partitioned is not None
+        assert _sorted(partitioned) == _sorted(sequential)
+        assert {error.field for error in partitioned} >= {"diagnostico_principal", "codigo_cups", "codigo_prestador"}
+
+    def test_output_equals_sequential_in_order(self):
+        """
+        Test: La salida particionada es idéntica a la secuencial, incluido el orden
+        (grupos de distintas particiones intercalados como los recorre cada regla)
+        """
+        for seed, workers in ((11, 2), (23, 3)):
+            records = _records_with_findings(seed=seed, n=3000)
+            sequential = self.validator._validate_records(records, "AP")
+
+            partitioned = validate_partitioned(self.validator, records, "AP", workers=workers)
+
+            assert partitioned == sequential
+            lines = [error.line for error in sequential if error.field == "codigo_prestador"]
+            assert lines != sorted(lines)
+
+    def test_compact_records_and_rule_metrics_from_workers(self):
+        """
+        Test: Los registros compactos viajan a los procesos y sus métricas se agregan al colector
+        """
+        factory = RecordFactory()
+        records = [
+            factory.from_values("AP", record["line_number"], {
+                field: record[field] for field in
+                ("codigo_prestador", "tipo_documento", "numero_documento", "codigo_cups", "sexo", "diagnostico_principal")
+            }, service_date=record.get("fecha_procedimiento", record.get("fecha_consulta", "")))
+            for record in _records_with_findings(seed=4)
+        ]
+
+        with collect_rule_metrics() as metrics:
+            partitioned = validate_partitioned(self.validator, records, "AP", workers=2)
+
+        assert _sorted(partitioned) == _sorted(self.validator._validate_records(records, "AP"))
+        snapshot = metrics.snapshot()
+        assert snapshot["AI-PAT-001"]["findings"] == sum(1 for e in partitioned if e.field == "codigo_cups")
+        assert snapshot["AI-CLIN-001"]["findings"] == sum(1 for e in partitioned if "masculino" in e.error or "femenino" in e.error)
+
+    def test_falls_back_to_sequential_when_pool_is_unavailable(self, monkeypatch):
+        """
+        Test: Sin pool de procesos la validación continúa de forma secuencial
+        """
+        def broken_pool(workers=None):
+            raise OSError("sin procesos")
+
+        records = _records_with_findings(n=300)
+        expected = self.validator._validate_records(records, "AP")
+        monkeypatch.setattr(ai_parallel, "get_process_pool", broken_pool)
+        monkeypatch.setattr(ai_parallel, "AI_PARALLEL_WORKERS", 2)
+        monkeypatch.setattr(ai_parallel, "AI_PARALLEL_MIN_RECORDS", 100)
+
+        assert validate_partitioned(self.validator, records, "AP") is None
+        assert self.validator._validate_records(records, "AP") == expected
+
+
+def test_rule_metrics_are_picklable():
+    """
+    Test: RuleMetrics se serializa sin su lock
+    """
+    metrics = RuleMetrics()
+    metrics.record("AI-PAT-001", 1000, 2)
+
+    restored = pickle.loads(pickle.dumps(metrics))
+
+    restored.record("AI-PAT-001", 1000)
+    assert restored.snapshot()["AI-PAT-001"]["count"] == 2
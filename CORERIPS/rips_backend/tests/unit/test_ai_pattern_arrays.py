@@ -0,0 +1,122 @@
+"""
+Tests de equivalencia de las reglas de patrones vectorizadas (AI-PAT-001, AI-PAT-002)
+
+Las implementaciones de referencia (diccionarios anidados y strptime) están en
+validators/pattern_reference.py.
+"""
+import pytest
+import sys
+from datetime import date
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from validators.ai_validator_enhanced import EnhancedAIValidator
+from validators.pattern_arrays import parse_date_ordinal, date_ordinals, factorize, INVALID_DATE
+from validators.pattern_reference import parse_date, random_records, reference_duplicates, reference_volumes
+
+
+class TestPatternArrays:
+    """Suite de tests para validators.pattern_arrays"""
+    
+    @pytest.mark.parametrize("value", ["2024-03-15", "2024-3-5", "15/03/2024", "2024-02-30", "", "x-y", "2024-03-15 "])
+    def test_parse_date_ordinal_matches_strptime(self, value):
+        """
+        Test: Mismo resultado que strptime (incluidos los casos inválidos)
+        """
+        try:
+            expected = parse_date(value).toordinal()
+        except ValueError:
+            expected = INVALID_DATE
+        
+        assert parse_date_ordinal(value) == expected
+    
+    def test_factorize_first_appearance_order(self):
+        """
+        Test: Los códigos siguen el orden de primera aparición
+        """
+        codes, values = factorize(["b", "a", "b", "c"])
+        
+        assert codes.tolist() == [0, 1, 0, 2]
+        assert values == ["b", "a", "c"]
+        assert date_ordinals(["2024-01-02", "mal"]).tolist() == [date(2024, 1, 2).toordinal(), INVALID_DATE]
+
+
+class TestVectorizedPatternRules:
+    """Equivalencia con las implementaciones anteriores"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup para cada test"""
+        self.validator = EnhancedAIValidator()
+    
+    @pytest.mark.parametrize("seed", range(5))
+    def test_duplicates_identical_to_reference(self, seed):
+        """
+        Test: AI-PAT-001 produce los mismos hallazgos y en el mismo orden
+        """
+        records = random_records(seed, 3000)
+        
+        expected = reference_duplicates(records)
+        
+        assert expected
+        assert self.validator._detect_duplicate_procedures(records) == expected
+    
+    @pytest.mark.parametrize("seed", range(5))
+    def test_volumes_identical_to_reference(self, seed):
+        """
+        Test: AI-PAT-002 produce los mismos hallazgos y en el mismo orden
+        """
+        records = random_records(seed, 6000, providers=3, days=20)
+        
+        expected = reference_volumes(records)
+        
+        assert expected  # el escenario debe generar volúmenes atípicos
+        assert self.validator._detect_atypical_volumes(records) == expected
+    
+    def test_volume_thresholds_are_configurable(self):
+        """
+        Test: Umbral general y umbral propio de un prestador de alto volumen
+        """
+        records = random_records(3, 6000, providers=3, days=20)
+        self.validator.volume_daily_threshold = 80
+        self.validator.provider_volume_thresholds = {"P0": 200}
+        
+        errors = self.validator._detect_atypical_volumes(records)
+        
+        assert errors == reference_volumes(records, 80, {"P0": 200})
+        assert all("prestador P0 " not in e.error for e in errors)
+    
+    def test_volume_reports_first_and_last_line_of_day(self):
+        """
+        Test: Cada día atípico se reporta en su primera línea con la última y el conteo
+        """
+        records = [
+            {"line_number": line, "codigo_prestador": "P1", "fecha_procedimiento": "2024-03-01" if line % 2 else "01/03/2024"}
+            for line in range(10, 13)
+        ]
+        self.validator.volume_daily_threshold = 2
+        
+        errors = self.validator._detect_atypical_volumes(records)
+        
+        assert [(e.line, e.field) for e in errors] == [(10, "codigo_prestador")]
+        assert "3 servicios en un día (2024-03-01)" in errors[0].error
+        assert "líneas 10 a 12" in errors[0].error
+    
+    def test_parse_provider_thresholds(self):
+        """
+        Test: Formato "codigo:umbral" con entradas inválidas ignoradas
+        """
+        from validators.ai_validator_enhanced import parse_provider_thresholds
+        
+        assert parse_provider_thresholds("A:100, B:20,C:x,:5") == {"A": 100, "B": 20}
+        assert parse_provider_thresholds("") == {}
+    
+    def test_empty_and_small_inputs(self):
+        """
+        Test: Sin registros válidos no hay hallazgos
+        """
+        assert self.validator._detect_duplicate_procedures([]) == []
+        assert self.validator._detect_atypical_volumes([]) == []
+        assert self.validator._detect_atypical_volumes([{"codigo_prestador": "P", "fecha_procedimiento": "mal"}]) == []
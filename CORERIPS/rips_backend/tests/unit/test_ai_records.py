@@ -0,0 +1,137 @@
+"""
+Tests unitarios para los registros compactos del validador de IA
+"""
+import pytest
+import pickle
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from validators.ai_records import ACRecord, APRecord, MISSING_DATE, RecordFactory
+from validators.pattern_arrays import INVALID_DATE
+from validators.ai_validator_enhanced import EnhancedAIValidator
+from validators.pattern_reference import random_records
+
+AC_LINE = "123456789012|1|CC|123|01|1990-03-15|F|170|11001|08001001|15/03/2024|123456|890201|10|A001|O800|Z001|||"
+
+
+def _compact(records):
+    """Mismos registros sintéticos como registros compactos AP"""
+    factory = RecordFactory()
+    return [
+        factory.from_values(
+            "AP", record["line_number"],
+            {field: record[field] for field in ("codigo_prestador", "tipo_documento", "numero_documento", "codigo_cups")},
+            service_date=record.get("fecha_procedimiento", record.get("fecha_consulta", ""))
+        )
+        for record in records
+    ]
+
+
+class TestRecordFactory:
+    """Suite de tests para RecordFactory"""
+
+    def test_ac_line_maps_same_fields_as_before(self):
+        """
+        Test: Una línea AC produce los mismos campos que el mapeo anterior (fechas en ISO)
+        """
+        record = RecordFactory().from_fields(AC_LINE.split("|"), "AC", 7)
+
+        assert isinstance(record, ACRecord)
+        assert record.to_dict() == {
+            "line_number": 7,
+            "file_type": "AC",
+            "codigo_prestador": "123456789012",
+            "tipo_documento": "CC",
+            "numero_documento": "123",
+            "sexo": "F",
+            "diagnostico_principal": "O800",
+            "diagnostico_relacionado": "Z001",
+            "codigo_consulta": "890201",
+            "fecha_nacimiento": "1990-03-15",
+            "fecha_consulta": "2024-03-15",
+        }
+
+    def test_dict_style_access(self):
+        """
+        Test: get, [] e in se comportan como en un dict
+        """
+        record = RecordFactory().from_fields(AC_LINE.split("|"), "AC", 1)
+
+        assert record.get("fecha_procedimiento", record.get("fecha_consulta", "")) == "2024-03-15"
+        assert record.get("codigo_cups", "") == ""
+        assert record["sexo"] == "F"
+        assert "codigo_cups" not in record
+        with pytest.raises(KeyError):
+            record["codigo_cups"]
+
+    def test_codes_are_interned_and_dates_encoded(self):
+        """
+        Test: Los códigos repetidos comparten la misma cadena; fechas vacías e inválidas se distinguen
+        """
+        factory = RecordFactory()
+        first = factory.from_fields("P1|1|CC|1|01|x|x|x|x|x|2024-03-01|x|740001".split("|"), "AP", 1)
+        second = factory.from_fields("P1|1|CC|2|01|x|x|x|x|x||x|740001".split("|"), "AP", 2)
+        third = factory.from_fields("P1|1|CC|3|01|x|x|x|x|x|2024-02-30|x|740001".split("|"), "AP", 3)
+
+        assert first.codigo_prestador is second.codigo_prestador
+        assert first.codigo_cups is third.codigo_cups
+        assert (second.service_day, third.service_day) == (MISSING_DATE, INVALID_DATE)
+        assert isinstance(first, APRecord) and not hasattr(first, "__dict__")
+
+    def test_short_lines_have_empty_fields(self):
+        """
+        Test: Líneas con menos campos que el mínimo no tienen datos para las reglas
+        """
+        record = RecordFactory().from_fields(["P1", "1"], "AC", 3)
+
+        assert (record.line_number, record.get("codigo_prestador", ""), record.get("fecha_consulta", "")) == (3, "", "")
+
+    def test_records_round_trip_through_pickle(self):
+        """
+        Test: Los registros se serializan como tupla de slots (envío a procesos de trabajo)
+        """
+        record = RecordFactory().from_fields(AC_LINE.split("|"), "AC", 7)
+    
+        restored = pickle.loads(pickle.dumps(record))
+    
+        assert type(restored) is ACRecord and restored.to_dict() == record.to_dict()
+        assert isinstance(record.__getstate__(), tuple)
+
+
+class TestRulesOnCompactRecords:
+    """Las reglas dan los mismos hallazgos con registros compactos y con dicts"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup para cada test"""
+        self.validator = EnhancedAIValidator()
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_pattern_rules_match_dict_records(self, seed):
+        """
+        Test: AI-PAT-001 y AI-PAT-002 con fechas ISO, DD/MM/YYYY, vacías e inválidas
+        """
+        records = random_records(seed, 3000, users=60, providers=3, cups=5, days=30)
+        compact = _compact(records)
+        self.validator.volume_daily_threshold = 20
+
+        assert self.validator._detect_duplicate_procedures(compact) == self.validator._detect_duplicate_procedures(records)
+        assert self.validator._detect_atypical_volumes(compact) == self.validator._detect_atypical_volumes(records)
+
+    def test_clinical_rules_match_dict_records(self):
+        """
+        Test: AI-CLIN-001 y AI-CLIN-002 sobre la misma línea como dict y como registro compacto
+        """
+        fields = AC_LINE.split("|")
+        fields[6] = "M"
+        fields[15] = "P070"
+        compact = RecordFactory().from_fields(fields, "AC", 1)
+        legacy = compact.to_dict()
+        legacy["fecha_nacimiento"] = "15/03/1990"
+
+        expected = self.validator._validate_clinical_coherence([legacy], "AC")
+
+        assert expected and self.validator._validate_clinical_coherence([compact], "AC") == expected
@@ -0,0 +1,158 @@
+"""
+Tests unitarios para la puntuación de anomalías por lotes (AI-ANOM-001)
+"""
+import pytest
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import validators.anomaly_scorer as anomaly_scorer
+from validators.ai_features import FeatureTable
+from validators.anomaly_scorer import AnomalyScorer, RobustZScorer, grouped_robust_z
+from validators.ai_records import RecordFactory
+from validators.ai_validator_enhanced import EnhancedAIValidator
+
+
+def _procedures(n, seed=5, provider="P1", days=30, value=100.0):
+    """Procedimientos del mismo grupo CUPS, repartidos en días y con valores cercanos a value"""
+    rng = random.Random(seed)
+    factory = RecordFactory()
+    start = date(2024, 1, 1)
+    return [
+        factory.from_values(
+            "AP", line,
+            {"codigo_prestador": provider, "tipo_documento": "CC", "numero_documento": str(line),
+             "codigo_cups": f"8902{rng.randrange(10):02d}", "diagnostico_principal": "K359"},
+            service_date=(start + timedelta(days=rng.randrange(days))).isoformat(),
+            service_value=value + rng.uniform(-10, 10)
+        )
+        for line in range(1, n + 1)
+    ]
+
+
+class TestGroupedRobustZ:
+    """Suite de tests para grouped_robust_z"""
+
+    def test_matches_median_and_mad_per_group(self):
+        """
+        Test: Coincide con mediana y MAD calculadas grupo por grupo
+        """
+        rng = np.random.default_rng(3)
+        values = rng.normal(50, 5, 300)
+        groups = rng.integers(0, 3, 300)
+
+        z = grouped_robust_z(values, groups, min_group_size=10)
+
+        for group in range(3):
+            members = values[groups == group]
+            median = np.median(members)
+            mad = np.median(np.abs(members - median))
+            assert np.allclose(z[groups == group], 0.6745 * (members - median) / mad)
+
+    def test_small_groups_missing_values_and_zero_mad_are_not_scored(self):
+        """
+        Test: Grupos pequeños, valores NaN, grupos -1 y MAD cero dan NaN
+        """
+        values = np.array([1.0, 2.0, 3.0, np.nan, 5.0, 7.0, 7.0, 7.0, 7.0])
+        groups = np.array([0, 0, 0, 0, -1, 1, 1, 1, 1])
+
+        z = grouped_robust_z(values, groups, min_group_size=4)
+
+        assert np.isnan(z).all()
+
+
+class TestBatchAnomalyScoring:
+    """Tests de AI-ANOM-001 en el validador de IA"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup para cada test"""
+        self.validator = EnhancedAIValidator()
+
+    def test_scorer_is_loaded_once_per_process(self):
+        """
+        Test: El puntuador por defecto se comparte entre instancias del validador
+        """
+        assert self.validator.model_loaded
+        assert isinstance(self.validator.anomaly_scorer, RobustZScorer)
+        assert EnhancedAIValidator().anomaly_scorer is self.validator.anomaly_scorer
+
+    def test_reports_outlier_service_value_with_score(self):
+        """
+        Test: Un valor 100 veces mayor que el de procedimientos comparables se reporta
+        """
+        records = _procedures(200)
+        records[49].valor_servicio = 10000.0
+
+        errors = self.validator._score_anomalies(records)
+
+        assert [(e.line, e.field) for e in errors] == [(50, "valor_servicio")]
+        assert "puntuación" in errors[0].error and "inusualmente alto" in errors[0].error
+
+    def test_reports_atypical_provider_day_once(self):
+        """
+        Test: Un día con volumen muy superior al resto del prestador se reporta una sola vez
+        """
+        records = _procedures(300)
+        factory = RecordFactory()
+        records += [
+            factory.from_values("AP", 1000 + i, {"codigo_prestador": "P1", "codigo_cups": "890201"},
+                                service_date="2024-01-15")
+            for i in range(60)
+        ]
+
+        errors = [e for e in self.validator._score_anomalies(records) if e.field == "volumen_diario_prestador"]
+
+        assert len(errors) == 1
+        assert errors[0].line == min(r.line_number for r in records if r.service_day == date(2024, 1, 15).toordinal())
+
+    def test_homogeneous_file_has_no_findings(self):
+        """
+        Test: Sin valores atípicos no hay hallazgos
+        """
+        assert self.validator._score_anomalies(_procedures(500)) == []
+
+    def test_features_from_dict_records(self):
+        """
+        Test: Las características también se extraen de registros dict
+        """
+        features = FeatureTable([
+            {"line_number": 3, "fecha_nacimiento": "2000-01-01", "diagnostico_principal": "J180", "sexo": "F",
+             "codigo_prestador": "P1", "fecha_consulta": "15/03/2024"}
+        ])
+
+        assert features["linea"].tolist() == [3]
+        assert features["edad"][0] >= 24
+        assert features["volumen_diario_prestador"].tolist() == [1.0]
+        assert np.isnan(features["valor_servicio"][0])
+
+    def test_scorer_can_be_disabled(self, monkeypatch):
+        """
+        Test: AI_ANOMALY_SCORER=none desactiva el modelo
+        """
+        monkeypatch.setattr(anomaly_scorer, "AI_ANOMALY_SCORER", "none")
+        anomaly_scorer.get_anomaly_scorer.cache_clear()
+        try:
+            validator = EnhancedAIValidator()
+            assert not validator.model_loaded
+            assert validator._score_anomalies(_procedures(50)) == []
+        finally:
+            anomaly_scorer.get_anomaly_scorer.cache_clear()
+
+    def test_scorer_must_implement_score(self):
+        """
+        Test: Un puntuador sin score no se puede instanciar
+        """
+        class Incompleto(AnomalyScorer):
+            name = "incompleto"
+
+        with pytest.raises(TypeError):
+            AnomalyScorer()
+        with pytest.raises(TypeError):
+            Incompleto()
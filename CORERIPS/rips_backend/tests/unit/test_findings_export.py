@@ -0,0 +1,113 @@
+"""
+Tests unitarios para la exportación de hallazgos
+"""
+import pytest
+import csv
+import io
+import os
+import sys
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import services.findings_export as findings_export
+from services.findings_export import ExportJobs, export_key, iter_csv, write_xlsx
+
+QUERY = {"filters": {"field": None}, "line_from": None, "line_to": None}
+
+
+def _rows(count):
+    for i in range(count):
+        yield {
+            "id": i + 1, "file_id": 1, "line_number": i + 1, "field_name": "sexo",
+            "rule_name": "deterministic_validation", "error_message": f"Valor inválido, línea {i + 1}",
+            "status": "failed", "validator_type": "deterministic",
+        }
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("EXPORT_DIR", str(tmp_path))
+    return tmp_path
+
+
+class TestWriters:
+    """Suite de tests para CSV y XLSX"""
+
+    def test_csv_is_generated_in_chunks(self):
+        """
+        Test: El CSV sale por bloques y se puede leer completo (comas en el mensaje incluidas)
+        """
+        chunks = list(iter_csv(_rows(25), flush_rows=10))
+
+        assert len(chunks) == 3
+        content = "".join(chunks).lstrip("\ufeff")
+        records = list(csv.reader(io.StringIO(content)))
+        assert records[0][0] == "Línea" and len(records) == 26
+        assert records[25][3] == "Valor inválido, línea 25"
+
+    def test_xlsx_write_only(self, tmp_path):
+        """
+        Test: El libro XLSX tiene encabezado y una fila por hallazgo
+        """
+        path = tmp_path / "hallazgos.xlsx"
+        write_xlsx(_rows(30), str(path))
+
+        workbook = load_workbook(path, read_only=True)
+        rows = list(workbook["Hallazgos"].iter_rows(values_only=True))
+        workbook.close()
+        assert len(rows) == 31 and rows[1][:2] == (1, "sexo")
+
+
+class TestExportJobs:
+    """Trabajos de exportación en segundo plano"""
+
+    def test_job_produces_cached_export(self, export_dir, monkeypatch):
+        """
+        Test: El trabajo deja la exportación en caché con la clave de archivo, formato y filtros
+        """
+        monkeypatch.setattr(findings_export, "iter_findings", lambda client, file_id, **query: _rows(50))
+        jobs = ExportJobs()
+        key = export_key(1, "csv", QUERY)
+
+        job = jobs.submit(None, 1, "csv", QUERY)
+        jobs.wait()
+
+        assert job["key"] == key and jobs.status(key)["status"] == "ready"
+        with open(jobs.cached_path(key, "csv"), encoding="utf-8") as file:
+            assert len(file.read().splitlines()) == 51
+
+    def test_revalidation_invalidates_cached_exports(self, export_dir, monkeypatch):
+        """
+        Test: Revalidar el archivo borra sus exportaciones y no toca las de otros archivos
+        """
+        monkeypatch.setattr(findings_export, "iter_findings", lambda client, file_id, **query: _rows(5))
+        jobs = ExportJobs()
+        jobs.submit(None, 1, "csv", QUERY)
+        jobs.submit(None, 12, "csv", QUERY)
+        jobs.wait()
+
+        jobs.invalidate(1)
+
+        assert jobs.cached_path(export_key(1, "csv", QUERY), "csv") is None
+        assert jobs.status(export_key(1, "csv", QUERY)) is None
+        assert jobs.cached_path(export_key(12, "csv", QUERY), "csv") is not None
+
+    def test_failed_job_reports_error(self, export_dir, monkeypatch):
+        """
+        Test: Un error del trabajo queda en su estado y no deja archivos parciales
+        """
+        def failing(client, file_id, **query):
+            yield from _rows(3)
+            raise RuntimeError("timeout")
+
+        monkeypatch.setattr(findings_export, "iter_findings", failing)
+        jobs = ExportJobs()
+        key = jobs.submit(None, 1, "xlsx", QUERY)["key"]
+        jobs.wait()
+
+        assert jobs.status(key)["status"] == "error"
+        assert os.listdir(export_dir) == []
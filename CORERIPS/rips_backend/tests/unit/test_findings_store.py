@@ -0,0 +1,122 @@
+"""
+Tests unitarios para el almacenamiento columnar de hallazgos
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import services.findings_store as findings_store
+from models.schemas import ErrorResponse
+from services.findings_store import ColumnarFindingsStore, table_findings, top_findings
+from services.results_query import fetch_findings_page, iter_findings
+
+
+def _errors():
+    """Hallazgos desordenados de dos validadores, con campos y mensajes repetidos"""
+    return {
+        "deterministic": [
+            ErrorResponse(line=(i * 7) % 50 + 1, field="sexo" if i % 3 else "codigo_cups", error=f"Valor inválido {i % 4}")
+            for i in range(120)
+        ],
+        "ai": [ErrorResponse(line=i + 1, field="codigo_cups", error="Volumen atípico") for i in range(0, 50, 5)],
+    }
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Almacén con bloques pequeños para que una página cruce varios bloques"""
+    store = ColumnarFindingsStore(store_name="findings_store_test", chunk_size=16)
+    monkeypatch.setattr(findings_store, "get_findings_store", lambda: store)
+    monkeypatch.setattr("services.results_query.get_findings_store", lambda: store)
+    yield store
+    for file_id in (1, 2):
+        store.delete_run(file_id)
+
+
+class TestColumnarFindingsStore:
+    """Suite de tests para ColumnarFindingsStore"""
+
+    def test_round_trip_in_line_order(self, store):
+        """
+        Test: Se recuperan todos los hallazgos en orden de línea, con ids de posición
+        """
+        errors = _errors()
+        assert store.save_run(1, errors) == 130
+
+        rows, more = store.fetch_page(1, 1000)
+
+        assert not more and [row["id"] for row in rows] == list(range(1, 131))
+        assert [row["line_number"] for row in rows] == sorted(row["line_number"] for row in rows)
+        expected = sorted((e.line, e.field, e.error, t) for t, es in errors.items() for e in es)
+        assert sorted((r["line_number"], r["field_name"], r["error_message"], r["validator_type"]) for r in rows) == expected
+        assert rows[0]["rule_name"] == f"{rows[0]['validator_type']}_validation" and rows[0]["status"] == "failed"
+
+    def test_filters_and_line_range(self, store):
+        """
+        Test: Filtros por validador, campo, estado y rango de líneas
+        """
+        store.save_run(1, _errors())
+
+        ai_rows, _ = store.fetch_page(1, 1000, filters={"validator_type": "ai"}, line_from=10, line_to=30)
+        sexo_rows, _ = store.fetch_page(1, 1000, filters={"field": "sexo", "rule": "deterministic_validation"})
+
+        assert [row["line_number"] for row in ai_rows] == [11, 16, 21, 26]
+        assert len(sexo_rows) == 80
+        assert store.fetch_page(1, 10, filters={"field": "no_existe"}) == ([], False)
+        assert store.fetch_page(1, 10, filters={"status": "warning"}) == ([], False)
+
+    def test_results_query_pages_through_the_blob(self, store):
+        """
+        Test: La paginación por cursor de results_query lee del almacén columnar sin consultar la tabla
+        """
+        store.save_run(2, _errors())
+        seen, cursor = [], None
+        while True:
+            page, cursor = fetch_findings_page(None, 2, limit=25, cursor=cursor, filters={"field": "codigo_cups"})
+            seen.extend(page)
+            if cursor is None:
+                break
+
+        assert len(seen) == 50 and len({row["id"] for row in seen}) == 50
+        assert len(list(iter_findings(None, 2, limit=7))) == 130
+
+    def test_delete_run(self, store):
+        """
+        Test: Una validación posterior guardada como filas borra la columnar
+        """
+        store.save_run(1, _errors())
+        findings_store.store_findings_run(1, _errors(), columnar=False)
+
+        assert not store.has_run(1)
+
+
+class TestTableFindings:
+    """Qué hallazgos van a la tabla validations"""
+
+    def test_auto_mode_keeps_top_n_above_threshold(self, monkeypatch):
+        """
+        Test: En modo auto sobre el umbral solo los primeros N por línea van a la tabla
+        """
+        monkeypatch.setattr(findings_store, "FINDINGS_STORAGE", "auto")
+        monkeypatch.setattr(findings_store, "FINDINGS_COLUMNAR_THRESHOLD", 100)
+        monkeypatch.setattr(findings_store, "FINDINGS_TOP_N", 10)
+
+        subset, columnar = table_findings(_errors())
+        small, small_columnar = table_findings({"ai": _errors()["ai"]})
+
+        assert columnar and sum(len(errors) for errors in subset.values()) == 10
+        all_lines = sorted(e.line for es in _errors().values() for e in es)
+        assert sorted(e.line for es in subset.values() for e in es) == all_lines[:10]
+        assert not small_columnar and small == {"ai": _errors()["ai"]}
+
+    def test_top_findings_orders_by_line(self):
+        """
+        Test: top_findings toma los de menor línea, agrupados por validador
+        """
+        selected = top_findings({"a": [ErrorResponse(line=5, field="f", error="e")],
+                                 "b": [ErrorResponse(line=1, field="f", error="e")]}, 1)
+
+        assert selected == {"a": [], "b": [ErrorResponse(line=1, field="f", error="e")]}
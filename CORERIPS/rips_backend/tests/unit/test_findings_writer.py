@@ -0,0 +1,85 @@
+"""
+Tests unitarios para la escritura por lotes de hallazgos
+"""
+import pytest
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from models.models import Base, Validation
+from models.schemas import ErrorResponse
+from models.types import ValidationStatus
+from services.findings_writer import batched, insert_findings, insert_findings_supabase
+
+
+def _errors(count, prefix="e"):
+    return [ErrorResponse(line=i + 1, field="campo", error=f"{prefix}{i}") for i in range(count)]
+
+
+class TestBatched:
+    """Suite de tests para batched"""
+
+    def test_splits_in_chunks(self):
+        """
+        Test: Lotes de a lo sumo size elementos, sin lote vacío al final
+        """
+        assert [len(batch) for batch in batched(iter(range(7)), 3)] == [3, 3, 1]
+        assert list(batched([], 3)) == []
+
+
+class TestInsertFindings:
+    """Inserción por lotes con SQLAlchemy"""
+
+    @pytest.fixture
+    def db(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[Validation.__table__])
+        with Session(engine) as session:
+            yield session
+
+    def test_rows_are_inserted_in_batches_without_commit(self, db):
+        """
+        Test: Todas las filas quedan en la transacción; un rollback las descarta
+        """
+        inserted = insert_findings(db, 7, {"deterministic": _errors(5), "ai": _errors(2, "ia")}, batch_size=2)
+
+        assert inserted == 7
+        rows = db.execute(select(Validation).order_by(Validation.id)).scalars().all()
+        assert [(row.validator_type, row.rule_name) for row in rows[-2:]] == [("ai", "ai_validation")] * 2
+        assert rows[0].status == ValidationStatus.FAILED and rows[0].file_id == 7
+
+        db.rollback()
+        assert db.execute(select(func.count()).select_from(Validation)).scalar() == 0
+
+
+class TestInsertFindingsSupabase:
+    """Inserción por lotes en Supabase"""
+
+    def test_one_request_per_batch(self, postgrest_client):
+        """
+        Test: 2.500 hallazgos se guardan en 3 peticiones de hasta 1.000 filas
+        """
+        client = postgrest_client()
+
+        inserted = insert_findings_supabase(client, 3, {"deterministic": _errors(2500)}, batch_size=1000)
+
+        rows = client.tables["validations"]
+        assert inserted == len(rows) == 2500
+        assert client.requests == 3
+        assert rows[0]["status"] == "failed" and rows[0]["rule_name"] == "deterministic_validation"
+
+    def test_failed_batch_removes_rows_already_inserted(self, postgrest_client):
+        """
+        Test: Si falla un lote se borran los lotes anteriores y se propaga el error
+        """
+        client = postgrest_client(fail_on_request=3)
+
+        with pytest.raises(RuntimeError):
+            insert_findings_supabase(client, 3, {"ai": _errors(25)}, batch_size=10)
+
+        assert client.tables["validations"] == []
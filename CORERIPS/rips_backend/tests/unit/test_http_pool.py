@@ -0,0 +1,106 @@
+"""
+Tests unitarios para los pools de conexiones HTTP de Supabase
+"""
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from supabase import Client
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import db.http_pool as http_pool
+from db.http_pool import PooledPostgrestClient, get_transport, http_pool_stats, use_http_pool
+
+
+class PostgrestHandler(BaseHTTPRequestHandler):
+    """PostgREST mínimo: responde [] a cualquier consulta"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps([]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def postgrest_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PostgrestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_pools():
+    http_pool.close_http_pools()
+    yield
+    http_pool.close_http_pools()
+
+
+class TestHttpPools:
+    """Suite de tests para los pools de conexiones"""
+
+    def test_queries_reuse_pooled_connections(self, postgrest_url):
+        """
+        Test: Consultas sucesivas usan el transporte del pool y una sola conexión keep-alive
+        """
+        postgrest = PooledPostgrestClient(postgrest_url, "bulk", headers={})
+
+        for _ in range(3):
+            assert postgrest.table("files").select("*").execute().data == []
+
+        stats = http_pool_stats()["bulk"]
+        assert stats["requests"] == 3
+        assert stats["connections"] == 1 and stats["busy"] == 0
+        assert stats["active_requests"] == 0 and stats["errors"] == 0
+
+    def test_pools_are_separate_and_shared_by_name(self, postgrest_url):
+        """
+        Test: Dos clientes del pool "request" comparten transporte; el pool "bulk" tiene el suyo
+        """
+        first = PooledPostgrestClient(postgrest_url, "request", headers={})
+        second = PooledPostgrestClient(postgrest_url, "request", headers={})
+        bulk = PooledPostgrestClient(postgrest_url, "bulk", headers={})
+
+        assert first.session._transport is second.session._transport is get_transport("request")
+        assert bulk.session._transport is get_transport("bulk")
+        assert get_transport("bulk") is not get_transport("request")
+
+    def test_use_http_pool_replaces_postgrest_factory(self):
+        """
+        Test: El cliente de Supabase crea su cliente PostgREST en el pool indicado
+        """
+        client = MagicMock(spec=Client)
+
+        use_http_pool(client, "bulk")
+        postgrest = client._init_postgrest_client(
+            rest_url="http://supabase.test/rest/v1", headers={}, schema="public", timeout=120
+        )
+
+        assert isinstance(postgrest, PooledPostgrestClient) and postgrest.pool == "bulk"
+        assert client._postgrest is None
+
+    def test_test_doubles_and_unknown_pools(self):
+        """
+        Test: Los dobles de prueba se devuelven sin cambios; un pool desconocido es un error
+        """
+        double = MagicMock()
+
+        assert use_http_pool(double, "request") is double
+        with pytest.raises(ValueError):
+            use_http_pool(double, "otro")
@@ -0,0 +1,181 @@
+"""
+Tests unitarios para la revalidación incremental de archivos corregidos
+"""
+import pytest
+import tempfile
+import os
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from services.incremental_validation import (
+    IncrementalValidationRunner, RecordStateStore, compute_record_keys, document_state_key
+)
+from validators.deterministic_enhanced import EnhancedDeterministicValidator
+from validators.ai_validator_enhanced import EnhancedAIValidator
+from validators.rips_parser import parse_text_file
+
+
+def _ac_line(document: str, sex: str = "M", diagnosis: str = "Z000", provider: str = "123456789012",
+             date: str = "2024-03-15", cups: str = "890101") -> str:
+    return f"{provider}|1|CC|{document}|01|1990-03-15|{sex}|170|11001|08001001|{date}|123456|{cups}|10|A001|{diagnosis}|||"
+
+
+def _findings(errors):
+    return sorted((e.line, e.field, e.error) for e in errors)
+
+
+class TestIncrementalValidation:
+    """Suite de tests para IncrementalValidationRunner"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        """Setup para cada test"""
+        self.deterministic = EnhancedDeterministicValidator()
+        self.ai = EnhancedAIValidator()
+        self.runner = IncrementalValidationRunner(
+            self.deterministic, self.ai, RecordStateStore(f"test_state_{os.getpid()}_{id(self)}")
+        )
+        self.tmp_path = tmp_path
+    
+    def _write(self, lines):
+        path = self.tmp_path / "archivo_AC.txt"
+        path.write_text("\n".join(lines), encoding="utf-8")
+        return parse_text_file(str(path))
+    
+    def _full(self, parsed):
+        return {
+            "deterministic": self.deterministic.validate_parsed_file(parsed, "AC"),
+            "ai": self.ai.validate_parsed_file(parsed, "AC")
+        }
+    
+    def test_record_keys_distinguish_identical_lines(self):
+        """
+        Test: Líneas idénticas obtienen claves distintas
+        """
+        parsed = self._write([_ac_line("1"), _ac_line("1")])
+        
+        keys = compute_record_keys(parsed)
+        
+        assert len(set(keys)) == 2
+    
+    def test_first_run_matches_full_validation(self):
+        """
+        Test: Sin estado previo el resultado es igual a una validación completa
+        """
+        parsed = self._write([_ac_line("1", sex="M", diagnosis="O800"), _ac_line("2"), "sin separador"])
+        
+        errors, stats = self.runner.run(parsed, "AC", ["deterministic", "ai"], "doc_AC.txt")
+        full = self._full(parsed)
+        
+        assert stats["reused"] == 0
+        assert errors["deterministic"] == full["deterministic"]
+        assert errors["ai"] == full["ai"]
+    
+    def test_rule_order_matches_full_validation(self):
+        """
+        Test: Primera ejecución y versión corregida dan los hallazgos de IA en el
+        mismo orden que una validación completa (volumen antes que fraude)
+        """
+        self.ai.volume_daily_threshold = 3
+        lines = [_ac_line(str(i), provider="111111111111", date=f"2024-03-{i + 1:02d}") for i in range(12)]
+        lines += [_ac_line(str(i), provider="222222222222", date="2024-03-20", cups=f"89{i}101") for i in range(20, 25)]
+        lines += [_ac_line("20", provider="222222222222", date="2024-03-22", cups="892101")]
+        parsed = self._write(lines)
+        
+        first, _ = self.runner.run(parsed, "AP", ["ai"], "orden_AP.txt")
+        expected = self.ai.validate_parsed_file(parsed, "AP")
+        
+        assert first["ai"] == expected
+        assert [e.line for e in expected if e.field == "codigo_prestador"] == [13, 1]
+        
+        lines[13] = _ac_line("21", provider="222222222222", date="2024-03-21", cups="891101")
+        parsed = self._write(lines)
+        corrected, stats = self.runner.run(parsed, "AP", ["ai"], "orden_AP.txt")
+        
+        assert stats["reused"] == len(lines) - 1
+        assert corrected["ai"] == self.ai.validate_parsed_file(parsed, "AP")
+    
+    def test_corrected_version_reuses_unchanged_records(self):
+        """
+        Test: Al corregir una línea solo esa línea se revalida y los hallazgos
+        coinciden con una validación completa de la nueva versión
+        """
+        lines = [_ac_line(str(i)) for i in range(20)]
+        lines[3] = _ac_line("3", sex="M", diagnosis="O800")  # embarazo en hombre
+        self.runner.run(self._write(lines), "AC", ["deterministic", "ai"], "doc_AC.txt")
+        
+        lines[3] = _ac_line("3")
+        lines.insert(0, _ac_line("99", sex="F", diagnosis="C61"))  # desplaza los números de línea
+        parsed = self._write(lines)
+        errors, stats = self.runner.run(parsed, "AC", ["deterministic", "ai"], "doc_AC.txt")
+        full = self._full(parsed)
+        
+        assert stats["records"] == 21
+        assert stats["reused"] == 19
+        assert _findings(errors["deterministic"]) == _findings(full["deterministic"])
+        assert _findings(errors["ai"]) == _findings(full["ai"])
+    
+    def test_cross_record_findings_follow_changes(self):
+        """
+        Test: Hallazgos entre registros (procedimientos duplicados) se recalculan
+        para los grupos afectados por la corrección
+        """
+        base = [
+            _ac_line("1", date="2024-03-01", cups="890201"), _ac_line("1", date="2024-03-03", cups="890201"),
+            _ac_line("2", date="2024-03-01", cups="890301"), _ac_line("2", date="2024-03-02", cups="890301"),
+        ]
+        self.runner.run(self._write(base), "AP", ["ai"], "dup_AP.txt")
+        
+        # Se corrige la fecha del segundo procedimiento (deja de ser duplicado)
+        corrected = list(base)
+        corrected[3] = _ac_line("2", date="2024-05-20", cups="890301")
+        parsed = self._write(corrected)
+        errors, _ = self.runner.run(parsed, "AP", ["ai"], "dup_AP.txt")
+        
+        assert _findings(errors["ai"]) == _findings(self.ai.validate_parsed_file(parsed, "AP"))
+        assert [e.line for e in errors["ai"] if e.field == "codigo_cups"] == [2]
+    
+    def test_volume_findings_follow_shifted_lines(self):
+        """
+        Test: El volumen atípico de un prestador no afectado cita la primera y la
+        última línea actuales del día, igual que una validación completa
+        """
+        self.ai.volume_daily_threshold = 3
+        lines = [_ac_line(str(i), provider="111111111111", date="2024-03-01") for i in range(5)]
+        self.runner.run(self._write(lines), "AP", ["ai"], "vol_AP.txt")
+        
+        lines.insert(0, _ac_line("99", provider="222222222222", date="2024-03-01"))
+        parsed = self._write(lines)
+        errors, stats = self.runner.run(parsed, "AP", ["ai"], "vol_AP.txt")
+        
+        assert stats["reused"] == 5
+        assert [e.line for e in errors["ai"] if e.field == "codigo_prestador"] == [2]
+        assert any("líneas 2 a 6" in e.error for e in errors["ai"])
+        assert _findings(errors["ai"]) == _findings(self.ai.validate_parsed_file(parsed, "AP"))
+    
+    def test_same_filename_from_other_user_does_not_share_state(self):
+        """
+        Test: Dos usuarios con el mismo nombre de archivo no reutilizan el estado del otro
+        """
+        parsed = self._write([_ac_line(str(i)) for i in range(5)])
+        self.runner.run(parsed, "AC", ["deterministic"], document_state_key(1, "AC.txt"))
+        
+        _, other_user = self.runner.run(parsed, "AC", ["deterministic"], document_state_key(2, "AC.txt"))
+        _, same_user = self.runner.run(parsed, "AC", ["deterministic"], document_state_key(1, "AC.txt"))
+        
+        assert other_user["reused"] == 0
+        assert same_user["reused"] == 5
+    
+    def test_file_type_change_invalidates_state(self):
+        """
+        Test: El estado guardado no se reutiliza para otro tipo de archivo
+        """
+        parsed = self._write([_ac_line("1")])
+        self.runner.run(parsed, "AC", ["deterministic"], "doc.txt")
+        
+        _, stats = self.runner.run(parsed, "AP", ["deterministic"], "doc.txt")
+        
+        assert stats["reused"] == 0
@@ -0,0 +1,110 @@
+"""
+Tests unitarios para la instrumentación por regla de los validadores
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from validators.instrumentation import (
+    RuleMetrics, RuleStats, collect_rule_metrics, current_rule_metrics, rule_metrics
+)
+from validators.deterministic_enhanced import EnhancedDeterministicValidator
+from validators.ai_validator_enhanced import EnhancedAIValidator
+
+
+class TestRuleStats:
+    """Tests de contadores e histograma"""
+    
+    def test_counts_and_failures(self):
+        """
+        Test: Se cuentan invocaciones, invocaciones con hallazgos y hallazgos
+        """
+        stats = RuleStats()
+        stats.add(1000, 0)
+        stats.add(2000, 3)
+        
+        data = stats.to_dict()
+        assert data["count"] == 2
+        assert data["failures"] == 1
+        assert data["findings"] == 3
+        assert data["max_ms"] == pytest.approx(0.002)
+    
+    def test_percentiles_are_bounded_by_max(self):
+        """
+        Test: Los percentiles son monótonos y no superan el máximo observado
+        """
+        stats = RuleStats()
+        for elapsed in range(1, 1001):
+            stats.add(elapsed * 100, 0)
+        
+        p50 = stats.percentile_ns(50)
+        p99 = stats.percentile_ns(99)
+        assert 0 < p50 <= p99 <= stats.max_ns
+    
+    def test_merge(self):
+        """
+        Test: Al agregar ejecuciones se suman los contadores
+        """
+        first = RuleMetrics()
+        second = RuleMetrics()
+        first.record("R1", 100, 1)
+        second.record("R1", 300, 0)
+        second.record("R2", 50, 0)
+        
+        first.merge(second)
+        snapshot = first.snapshot()
+        
+        assert snapshot["R1"]["count"] == 2
+        assert snapshot["R1"]["failures"] == 1
+        assert snapshot["R2"]["count"] == 1
+
+
+class TestRuleInstrumentation:
+    """Tests de la medición de reglas de los validadores"""
+    
+    def test_rules_not_measured_without_collector(self):
+        """
+        Test: Sin colector activo las reglas se ejecutan sin medir
+        """
+        validator = EnhancedDeterministicValidator()
+        
+        assert current_rule_metrics() is None
+        errors = validator.validate_us001_tipo_documento_catalogo("XX", 1)
+        assert len(errors) == 1
+    
+    def test_deterministic_rule_measured(self):
+        """
+        Test: Las reglas determinísticas registran invocaciones y fallas
+        """
+        validator = EnhancedDeterministicValidator()
+        
+        with collect_rule_metrics() as metrics:
+            validator.validate_us001_tipo_documento_catalogo("CC", 1)
+            validator.validate_us001_tipo_documento_catalogo("XX", 2)
+        
+        snapshot = metrics.snapshot()
+        assert snapshot["US-001"]["count"] == 2
+        assert snapshot["US-001"]["failures"] == 1
+    
+    def test_file_validation_records_field_and_ai_rules(self, temp_rips_file):
+        """
+        Test: Validar un archivo registra reglas por campo y reglas de IA
+        y las agrega a las métricas del proceso
+        """
+        deterministic = EnhancedDeterministicValidator()
+        ai = EnhancedAIValidator()
+        before = rule_metrics.snapshot().get("AI-CLIN-001", {}).get("count", 0)
+        
+        with collect_rule_metrics() as metrics:
+            deterministic.validate_file(temp_rips_file, "AC")
+            ai.validate_file(temp_rips_file, "AC")
+        
+        snapshot = metrics.snapshot()
+        assert snapshot["AC.CODIGO_PRESTADOR"]["count"] == 2
+        # Las reglas de IA se evalúan una vez por archivo sobre la tabla de características
+        assert snapshot["AI-CLIN-001"]["count"] == 1
+        assert snapshot["AI-PAT-001"]["count"] == 1
+        assert rule_metrics.snapshot()["AI-CLIN-001"]["count"] == before + 1
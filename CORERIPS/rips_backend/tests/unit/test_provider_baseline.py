@@ -0,0 +1,298 @@
+"""
+Tests unitarios para la línea base por prestador (AI-PAT-002 y AI-FRAUD-002 contra históricos)
+"""
+import pytest
+import json
+import os
+import statistics
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from db.provider_baseline import (
+    CountMinSketch,
+    ProviderBaseline,
+    merge_moments,
+    moments_of,
+    subtract_moments,
+)
+from db.service_index import ServiceIndex
+from validators.ai_features import FeatureTable
+from validators.ai_validator_enhanced import EnhancedAIValidator, _volume_rows
+from validators.rips_json_reader import iter_json_records
+from services.rips_data_service import RIPSDataService
+
+# Lunes
+MONDAY = date(2024, 1, 1)
+
+
+def _monday_services(provider: str, daily_counts, cups: str = "890201"):
+    """Servicios de un prestador en lunes consecutivos, con los conteos indicados"""
+    services = []
+    for week, count in enumerate(daily_counts):
+        day = MONDAY + timedelta(weeks=week)
+        services.extend((provider, cups, day.isoformat()) for _ in range(count))
+    return services
+
+
+class TestMoments:
+    """Tests de los resúmenes de Welford"""
+
+    def test_merge_and_subtract_match_direct_computation(self):
+        """
+        Test: Combinar y retirar resúmenes equivale a calcular sobre los datos
+        """
+        first, second = [3, 5, 8, 13], [2, 7, 1]
+
+        n, mean, m2 = merge_moments(moments_of(first), moments_of(second))
+
+        assert n == 7
+        assert mean == pytest.approx(statistics.mean(first + second))
+        assert m2 / (n - 1) == pytest.approx(statistics.variance(first + second))
+
+        n, mean, m2 = subtract_moments((n, mean, m2), moments_of(second))
+        assert (n, mean, m2 / (n - 1)) == pytest.approx((4, statistics.mean(first), statistics.variance(first)))
+
+    def test_count_min_sketch_never_underestimates(self):
+        """
+        Test: El sketch estima conteos >= a los reales y admite restas
+        """
+        sketch = CountMinSketch(width=64, depth=4)
+        for code in range(200):
+            sketch.add(f"{code:06d}", code % 5 + 1)
+
+        assert all(sketch.estimate(f"{code:06d}") >= code % 5 + 1 for code in range(200))
+
+        restored = CountMinSketch.from_bytes(sketch.to_bytes(), width=64, depth=4)
+        restored.add("000004", -5)
+        assert restored.estimate("000004") < sketch.estimate("000004")
+
+
+class TestProviderBaseline:
+    """Suite de tests para ProviderBaseline"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, request):
+        """Setup para cada test: una línea base por test"""
+        self.baseline = ProviderBaseline(store_name=f"test_baseline_{os.getpid()}_{request.node.name}")
+
+    def test_incremental_updates_match_full_history(self):
+        """
+        Test: Dos ingestas dan la misma media y desviación que toda la historia junta
+        """
+        self.baseline.add_file(1, _monday_services("P1", [10, 12, 11]))
+        self.baseline.add_file(2, _monday_services("P1", [0, 0, 0, 9, 14]))
+
+        n, mean, std = self.baseline.volume_stats(["P1"])[("P1", 0)]
+
+        assert n == 5
+        assert mean == pytest.approx(statistics.mean([10, 12, 11, 9, 14]))
+        assert std == pytest.approx(statistics.stdev([10, 12, 11, 9, 14]))
+
+    def test_remove_and_exclude_file(self):
+        """
+        Test: Retirar o excluir un archivo deja solo la contribución del resto
+        """
+        self.baseline.add_file(1, _monday_services("P1", [10, 12]))
+        self.baseline.add_file(2, _monday_services("P1", [0, 0, 40]))
+
+        excluded = self.baseline.volume_stats(["P1"], exclude_file_id=2)[("P1", 0)]
+        self.baseline.remove_file(2)
+
+        assert excluded == pytest.approx((2, 11.0, statistics.stdev([10, 12])))
+        assert self.baseline.volume_stats(["P1"])[("P1", 0)] == pytest.approx(excluded)
+        assert self.baseline.cups_frequency("P1", ["890201"]) == (22, {"890201": 22})
+
+    def test_cups_mix_by_provider(self):
+        """
+        Test: La frecuencia de CUPS se lleva por prestador
+        """
+        self.baseline.add_file(1, _monday_services("P1", [3], cups="890201") + _monday_services("P2", [2], cups="740001"))
+
+        total, frequency = self.baseline.cups_frequency("P1", ["890201", "740001"])
+
+        assert total == 3
+        assert frequency["890201"] == 3
+        assert frequency["740001"] <= 3
+
+    def test_services_without_provider_or_date_are_skipped(self):
+        """
+        Test: Servicios sin prestador o con fecha inválida no cuentan
+        """
+        assert self.baseline.add_file(1, [("", "890201", "2024-01-01"), ("P1", "890201", "fecha")]) == 0
+        assert self.baseline.volume_stats(["P1"]) == {}
+
+
+class TestBaselineVolumeDetection:
+    """Tests de AI-PAT-002 contra la línea base del prestador"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, request):
+        """Setup para cada test: 10 lunes de historia con 18 a 22 servicios"""
+        self.validator = EnhancedAIValidator()
+        self.baseline = ProviderBaseline(store_name=f"test_baseline_rule_{os.getpid()}_{request.node.name}")
+        self.baseline.add_file(1, _monday_services("P1", [18, 20, 22, 19, 21, 20, 18, 22, 20, 20]))
+
+    def _records(self, count: int, service_date: str, provider: str = "P1"):
+        return [
+            {"line_number": line, "codigo_prestador": provider, "fecha_consulta": service_date}
+            for line in range(1, count + 1)
+        ]
+
+    def test_reports_day_far_above_provider_history(self):
+        """
+        Test: 45 servicios un lunes (media 20) se reportan aunque no superen el umbral fijo
+        """
+        errors = self.validator.detect_baseline_volume_anomalies(self._records(45, "2024-04-01"), self.baseline)
+
+        assert [(e.line, e.field) for e in errors] == [(1, "codigo_prestador")]
+        assert "45 servicios el 2024-04-01" in errors[0].error
+        assert self.validator._detect_atypical_volumes(self._records(45, "2024-04-01")) == []
+
+    def test_normal_day_other_weekday_or_unknown_provider_not_reported(self):
+        """
+        Test: Volumen usual, día sin historia o prestador sin historia no se reportan
+        """
+        records = self._records(21, "2024-04-01") + self._records(45, "2024-04-02") + self._records(45, "2024-04-01", "P9")
+
+        assert self.validator.detect_baseline_volume_anomalies(records, self.baseline) == []
+
+    def test_own_file_is_excluded_from_baseline(self):
+        """
+        Test: Con exclude_file_id el propio archivo no cuenta como historia
+        """
+        self.baseline.add_file(2, _monday_services("P1", [0] * 13 + [45]))
+        records = self._records(45, "2024-04-01")
+
+        assert self.validator.detect_baseline_volume_anomalies(records, self.baseline, exclude_file_id=2) != []
+
+
+class TestBaselineBillingDetection:
+    """Tests de AI-FRAUD-002 contra la mezcla histórica de CUPS del prestador"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, request):
+        """Setup para cada test: P1 reparte 200 procedimientos en 20 CUPS; P2 siempre factura 890201"""
+        self.validator = EnhancedAIValidator()
+        self.baseline = ProviderBaseline(store_name=f"test_baseline_cups_{os.getpid()}_{request.node.name}")
+        history = []
+        for code in range(20):
+            history.extend(_monday_services("P1", [1] * 10, cups=f"89{code:04d}"))
+        history.extend(_monday_services("P2", [20] * 10, cups="890201"))
+        self.baseline.add_file(1, history)
+
+    def _records(self, provider: str, codes):
+        return [
+            {"line_number": line, "codigo_prestador": provider, "codigo_cups": code, "fecha_procedimiento": "2024-04-01"}
+            for line, code in enumerate(codes, start=1)
+        ]
+
+    def test_reports_dominant_code_far_above_its_history(self):
+        """
+        Test: 15 de 20 procedimientos con un CUPS que históricamente es el 5% se reportan
+        """
+        records = self._records("P1", ["890001", "890002"] + ["890003"] * 15 + ["890004"] * 3)
+
+        errors = self.validator.detect_baseline_billing_patterns(records, self.baseline)
+
+        assert [(e.line, e.field) for e in errors] == [(3, "codigo_prestador")]
+        assert "CUPS 890003 en 15 de 20 procedimientos" in errors[0].error
+        assert "histórico 5% de 200" in errors[0].error
+
+    def test_habitual_mix_short_history_or_spread_file_not_reported(self):
+        """
+        Test: Concentración habitual, prestador sin historia o archivo variado no se reportan
+        """
+        records = (
+            self._records("P2", ["890201"] * 20)
+            + self._records("P9", ["890003"] * 20)
+            + self._records("P1", [f"89{code % 10:04d}" for code in range(20)])
+        )
+
+        assert self.validator.detect_baseline_billing_patterns(records, self.baseline) == []
+
+    def test_own_file_is_excluded_from_cups_history(self):
+        """
+        Test: Con exclude_file_id los CUPS del propio archivo no cuentan como historia
+        """
+        self.baseline.add_file(2, _monday_services("P1", [600], cups="890003"))
+        records = self._records("P1", ["890003"] * 20)
+
+        assert self.validator.detect_baseline_billing_patterns(records, self.baseline) == []
+        assert self.baseline.cups_frequency("P1", ["890003"], exclude_file_id=2) == (200, {"890003": 10})
+        assert self.validator.detect_baseline_billing_patterns(records, self.baseline, exclude_file_id=2) != []
+
+
+class TestProviderBaselineIngestion:
+    """Tests de la actualización de la línea base al ingerir archivos JSON"""
+
+    def test_process_rips_file_updates_baseline(self, tmp_path, valid_rips_json, request):
+        """
+        Test: La ingesta incorpora consultas y procedimientos y reingestar no duplica
+        """
+        valid_rips_json["usuarios"][0]["servicios"]["procedimientos"] = [
+            {"codPrestador": "123456789012", "fechaInicioAtencion": "2024-03-15 10:00", "codProcedimiento": "740001"}
+        ]
+        path = tmp_path / "rips.json"
+        path.write_text(json.dumps(valid_rips_json), encoding="utf-8")
+        baseline = ProviderBaseline(store_name=f"test_baseline_ingest_{os.getpid()}_{request.node.name}")
+
+        with patch('services.rips_data_service.get_provider_baseline', return_value=baseline):
+            RIPSDataService(MagicMock()).process_rips_file(str(path), 42)
+            stats = RIPSDataService(MagicMock()).process_rips_file(str(path), 42)
+
+        assert stats["dias_prestador_linea_base"] >= 1
+        total, frequency = baseline.cups_frequency("123456789012", ["740001"])
+        assert frequency["740001"] == 1
+
+    def test_baseline_counts_the_services_scored_by_the_ai_validator(self, tmp_path, valid_rips_json, request):
+        """
+        Test: Urgencias y hospitalizaciones entran a la línea base igual que a AI-PAT-002
+        """
+        servicios = valid_rips_json["usuarios"][0]["servicios"]
+        servicios["urgencias"] = [
+            {"codPrestador": "123456789012", "fechaIngreso": "2024-03-15 08:30", "codDiagnosticoIngreso": "R104"},
+            {"codPrestador": "123456789012", "fechaIngreso": "2024-03-15 22:10", "codDiagnosticoIngreso": "R509"},
+        ]
+        servicios["hospitalizaciones"] = [
+            {"codPrestador": "123456789012", "fechaIngreso": "2024-03-15 23:00", "codDiagnosticoIngreso": "J189"},
+        ]
+        path = tmp_path / "rips.json"
+        path.write_text(json.dumps(valid_rips_json), encoding="utf-8")
+        baseline = ProviderBaseline(store_name=f"test_baseline_services_{os.getpid()}_{request.node.name}")
+
+        with patch('services.rips_data_service.get_provider_baseline', return_value=baseline):
+            RIPSDataService(MagicMock()).process_rips_file(str(path), 42)
+
+        records = list(iter_json_records(str(path)))
+        table = FeatureTable(records)
+        volume_rows = _volume_rows(table)
+        friday = date(2024, 3, 15).weekday()
+        # 1 consulta + 2 urgencias + 1 hospitalización el mismo día
+        assert volume_rows.size == 4
+        assert baseline.volume_stats(["123456789012"])[("123456789012", friday)] == (1, 4.0, 0.0)
+
+    def test_corrected_invoice_replaces_previous_contribution(self, tmp_path, valid_rips_json, request):
+        """
+        Test: Otra versión de la misma factura (otro file_id) retira la contribución de la anterior
+        """
+        valid_rips_json["numDocumentoIdObligado"] = "900123456"
+        valid_rips_json["usuarios"][0]["servicios"]["procedimientos"] = [
+            {"codPrestador": "123456789012", "fechaInicioAtencion": "2024-03-15 10:00", "codProcedimiento": "740001"}
+        ]
+        path = tmp_path / "rips.json"
+        path.write_text(json.dumps(valid_rips_json), encoding="utf-8")
+        store = f"test_baseline_versions_{os.getpid()}_{request.node.name}"
+        baseline = ProviderBaseline(store_name=store)
+
+        with patch('services.rips_data_service.get_provider_baseline', return_value=baseline), \
+             patch('services.rips_data_service.get_service_index', return_value=ServiceIndex(store_name=store + "_index")):
+            RIPSDataService(MagicMock()).process_rips_file(str(path), 42)
+            RIPSDataService(MagicMock()).process_rips_file(str(path), 43)
+
+        total, frequency = baseline.cups_frequency("123456789012", ["740001"])
+        assert frequency["740001"] == 1
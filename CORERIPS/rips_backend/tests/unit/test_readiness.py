@@ -0,0 +1,61 @@
+"""
+Tests unitarios para el estado de preparación (/ready)
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from services.readiness import STATUS_ERROR, STATUS_OK, Readiness
+
+
+async def inline(func):
+    return func()
+
+
+class TestReadiness:
+    """Suite de tests para Readiness"""
+
+    def test_warm_up_reports_each_check(self):
+        """
+        Test: Cada comprobación informa su estado; listo solo cuando todas están bien
+        """
+        def failing():
+            raise ConnectionError("sin conexión")
+
+        readiness = Readiness({"catalogos": (lambda: {"reglas": 3}, inline), "supabase": (failing, inline)})
+        assert readiness.snapshot()["status"] == "not_ready"
+
+        asyncio.run(readiness.warm_up())
+        state = readiness.snapshot()
+
+        assert state["status"] == "not_ready" and state["ready_after_s"] is None
+        assert state["checks"]["catalogos"]["status"] == STATUS_OK
+        assert state["checks"]["catalogos"]["detail"] == {"reglas": 3}
+        assert state["checks"]["supabase"] == {
+            "status": STATUS_ERROR, "duration_ms": state["checks"]["supabase"]["duration_ms"], "detail": "sin conexión"
+        }
+
+    def test_failed_check_is_retried_after_recheck_interval(self):
+        """
+        Test: Una dependencia caída se vuelve a comprobar desde /ready solo al vencer el intervalo
+        """
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ConnectionError("reiniciando")
+
+        readiness = Readiness({"supabase": (flaky, inline)}, recheck_seconds=60)
+        asyncio.run(readiness.warm_up())
+        assert asyncio.run(readiness.refresh())["status"] == "not_ready"
+        assert len(calls) == 1
+
+        readiness.recheck_seconds = 0
+        state = asyncio.run(readiness.refresh())
+
+        assert state["status"] == "ready" and state["ready_after_s"] is not None
+        assert len(calls) == 2
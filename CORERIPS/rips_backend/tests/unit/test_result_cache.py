@@ -0,0 +1,169 @@
+"""
+Tests unitarios para el caché de resultados de validación
+"""
+import pytest
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from services.result_cache import ValidationResultCache, build_cache_key, hash_file_content
+from services.validation_service import ValidationService
+from validators import ai_validator_enhanced, anomaly_scorer
+from validators.ruleset import get_ruleset_version
+from models.schemas import ErrorResponse
+
+
+def _result(errors=None, total_lines=2):
+    return {
+        "errors": errors if errors is not None else {
+            "deterministic": [ErrorResponse(line=1, field="codigo_prestador", error="Código inválido")]
+        },
+        "total_lines": total_lines,
+        "total_records": total_lines
+    }
+
+
+class TestValidationResultCache:
+    """Suite de tests para ValidationResultCache"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self, request):
+        """Setup para cada test: un almacén por test"""
+        self.store_name = f"test_result_cache_{os.getpid()}_{request.node.name}"
+        self.cache = ValidationResultCache(store_name=self.store_name)
+    
+    def test_put_and_get_roundtrip(self):
+        """
+        Test: Un resultado guardado se recupera con los mismos hallazgos
+        """
+        self.cache.put("k1", _result())
+        
+        cached = self.cache.get("k1")
+        
+        assert cached == _result()
+        assert self.cache.stats()["hits"] == 1
+    
+    def test_miss_returns_none(self):
+        """
+        Test: Clave desconocida retorna None y cuenta como fallo
+        """
+        assert self.cache.get("no_existe") is None
+        assert self.cache.stats()["misses"] == 1
+    
+    def test_key_changes_with_ruleset_catalog_and_types(self):
+        """
+        Test: Cambiar reglas, catálogos o tipos de validación cambia la clave
+        """
+        base = build_cache_key("abc", "AC", ["deterministic", "ai"], "r1", "c1")
+        
+        assert base == build_cache_key("abc", "AC", ["ai", "deterministic"], "r1", "c1")
+        assert base != build_cache_key("abc", "AC", ["deterministic"], "r1", "c1")
+        assert base != build_cache_key("abc", "AC", ["deterministic", "ai"], "r2", "c1")
+        assert base != build_cache_key("abc", "AC", ["deterministic", "ai"], "r1", "c2")
+        assert base != build_cache_key("abd", "AC", ["deterministic", "ai"], "r1", "c1")
+    
+    def test_ruleset_version_changes_with_thresholds(self, monkeypatch):
+        """
+        Test: Cambiar un umbral configurable de las reglas cambia la versión del conjunto de reglas
+        """
+        get_ruleset_version.cache_clear()
+        base = get_ruleset_version()
+        
+        monkeypatch.setattr(ai_validator_enhanced, "VOLUME_DAILY_THRESHOLD", 10)
+        get_ruleset_version.cache_clear()
+        changed_volume = get_ruleset_version()
+        monkeypatch.setattr(ai_validator_enhanced, "PROVIDER_VOLUME_THRESHOLDS", {"123456789012": 5})
+        get_ruleset_version.cache_clear()
+        changed_provider = get_ruleset_version()
+        monkeypatch.setattr(anomaly_scorer, "ANOMALY_SCORE_THRESHOLD", 3.0)
+        get_ruleset_version.cache_clear()
+        changed_anomaly = get_ruleset_version()
+        
+        monkeypatch.undo()
+        get_ruleset_version.cache_clear()
+        assert len({base, changed_volume, changed_provider, changed_anomaly}) == 4
+        assert get_ruleset_version() == base
+    
+    def test_lru_eviction_respects_max_bytes(self):
+        """
+        Test: Al exceder el tamaño máximo se desaloja la entrada usada hace más tiempo
+        """
+        self.cache.put("a", _result())
+        entry_size = self.cache.stats()["bytes"]
+        self.cache.max_bytes = entry_size * 2
+        
+        with patch('services.result_cache.time.time', side_effect=[100.0, 200.0, 300.0, 400.0]):
+            self.cache.put("a", _result())
+            self.cache.put("b", _result())
+            self.cache.get("a")  # "a" pasa a ser la más reciente
+            self.cache.put("c", _result())
+        
+        assert self.cache.get("b") is None
+        assert self.cache.get("a") is not None
+        assert self.cache.get("c") is not None
+        assert self.cache.stats()["bytes"] <= self.cache.max_bytes
+        assert self.cache.stats()["evictions"] == 1
+
+
+class TestValidationServiceResultCache:
+    """Tests del uso del caché desde ValidationService.run_validations"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self, request):
+        """Setup para cada test: servicio con caché activo y aislado"""
+        self.service = ValidationService()
+        self.service._result_cache = ValidationResultCache(
+            store_name=f"test_service_cache_{os.getpid()}_{request.node.name}"
+        )
+        with patch('services.validation_service.RESULT_CACHE_ENABLED', True):
+            yield
+    
+    def test_second_run_is_served_from_cache(self, temp_rips_file):
+        """
+        Test: El mismo archivo validado dos veces se responde desde caché con los mismos hallazgos
+        """
+        first = self.service.run_validations(temp_rips_file, "AC", ["deterministic", "ai"])
+        
+        with patch.object(self.service.deterministic_validator, 'validate_parsed_file') as mock_validate:
+            second = self.service.run_validations(temp_rips_file, "AC", ["deterministic", "ai"])
+        
+        mock_validate.assert_not_called()
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert second["errors"] == first["errors"]
+        assert second["total_lines"] == first["total_lines"]
+        assert second["total_records"] == first["total_records"]
+    
+    def test_catalog_change_invalidates(self, temp_rips_file):
+        """
+        Test: Cargar un catálogo nuevo obliga a revalidar
+        """
+        self.service.run_validations(temp_rips_file, "AC", ["deterministic"])
+        
+        self.service.deterministic_validator.load_cie10_catalog({"Z000", "J180"})
+        run = self.service.run_validations(temp_rips_file, "AC", ["deterministic"])
+        
+        assert run["cached"] is False
+    
+    def test_ruleset_change_invalidates(self, temp_rips_file):
+        """
+        Test: Un cambio en las reglas (otra versión del conjunto) obliga a revalidar
+        """
+        self.service.run_validations(temp_rips_file, "AC", ["deterministic"])
+        
+        with patch('services.validation_service.get_ruleset_version', return_value="otra_version"):
+            run = self.service.run_validations(temp_rips_file, "AC", ["deterministic"])
+        
+        assert run["cached"] is False
+    
+    def test_content_hash_matches_file(self, temp_rips_file):
+        """
+        Test: El hash del contenido leído coincide con el hash por bloques del archivo
+        """
+        from services.result_cache import hash_content
+        with open(temp_rips_file, 'rb') as file:
+            assert hash_content(file.read()) == hash_file_content(temp_rips_file)
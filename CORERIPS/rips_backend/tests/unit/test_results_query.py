@@ -0,0 +1,83 @@
+"""
+Tests unitarios para la consulta paginada de hallazgos
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from services.results_query import decode_cursor, encode_cursor, fetch_findings_page, iter_findings
+
+
+def _rows():
+    """Hallazgos con ids que no siguen el orden de línea y varias filas por línea"""
+    rows = []
+    for i in range(30):
+        rows.append({
+            "id": 100 - i,
+            "file_id": 1 if i < 27 else 2,
+            "line_number": i // 3 + 1,
+            "field_name": "sexo" if i % 2 else "codigo_cups",
+            "rule_name": "deterministic_validation",
+            "status": "failed",
+            "validator_type": "deterministic",
+        })
+    return rows
+
+
+class TestCursor:
+    """Suite de tests para el cursor"""
+
+    def test_round_trip_and_invalid(self, postgrest_client):
+        """
+        Test: El cursor se decodifica a (línea, id); uno mal formado da ValueError
+        """
+        assert decode_cursor(encode_cursor(1234, 98765)) == (1234, 98765)
+        with pytest.raises(ValueError):
+            decode_cursor("no-es-un-cursor")
+
+
+class TestFetchFindingsPage:
+    """Suite de tests para fetch_findings_page"""
+
+    def test_pages_cover_all_rows_once_in_line_id_order(self, postgrest_client):
+        """
+        Test: Las páginas recorren todos los hallazgos del archivo sin repetir, por (línea, id)
+        """
+        client = postgrest_client({"validations": _rows()})
+        seen, cursor = [], None
+        while True:
+            page, cursor = fetch_findings_page(client, 1, limit=4, cursor=cursor)
+            assert len(page) <= 4
+            seen.extend(page)
+            if cursor is None:
+                break
+
+        keys = [(row["line_number"], row["id"]) for row in seen]
+        assert keys == sorted(keys)
+        assert len(keys) == len(set(keys)) == 27
+
+    def test_filters_and_line_range(self, postgrest_client):
+        """
+        Test: Filtros de campo y rango de líneas se aplican en la consulta
+        """
+        client = postgrest_client({"validations": _rows()})
+
+        page, cursor = fetch_findings_page(client, 1, filters={"field": "sexo"}, line_from=2, line_to=4)
+
+        assert cursor is None
+        assert {row["field_name"] for row in page} == {"sexo"}
+        assert {row["line_number"] for row in page} <= {2, 3, 4} and len(page) == 5
+
+    def test_iter_findings_streams_every_page(self, postgrest_client):
+        """
+        Test: iter_findings entrega todos los hallazgos pidiendo una página a la vez
+        """
+        client = postgrest_client({"validations": _rows()})
+
+        rows = list(iter_findings(client, 1, limit=10))
+
+        assert len(rows) == 27
+        assert client.requests <= 6
@@ -0,0 +1,86 @@
+"""
+Tests unitarios para la lectura de datos RIPS por tabla (RIPSDataService.get_rips_data)
+"""
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from services.rips_data_service import RIPS_DATA_TYPES, RIPSDataService
+from validators.field_mappings import get_table_name
+
+
+def _tables(rows_per_table=5):
+    """Filas de los archivos 1 y 2 en cada tabla RIPS"""
+    tables = {}
+    for offset, tipo in enumerate(RIPS_DATA_TYPES):
+        tables[get_table_name(tipo)] = [
+            {"id": offset * 100 + i, "file_id": 1 if i < rows_per_table else 2, "provider_code": f"P{i}", "value": i}
+            for i in range(rows_per_table + 2)
+        ]
+    return tables
+
+
+class TestGetRipsData:
+    """Suite de tests para get_rips_data y su paginación"""
+
+    def test_tables_are_fetched_concurrently(self, postgrest_client):
+        """
+        Test: Las 11 tablas se consultan en paralelo: el total tarda cerca de la consulta más lenta
+        """
+        service = RIPSDataService(postgrest_client(_tables(), latency=0.1))
+
+        start = time.perf_counter()
+        data = service.get_rips_data(1)
+        elapsed = time.perf_counter() - start
+
+        assert list(data) == RIPS_DATA_TYPES
+        assert all(len(rows) == 5 for rows in data.values())
+        assert elapsed < 0.5
+
+    def test_column_projection(self, postgrest_client):
+        """
+        Test: Solo se traen las columnas pedidas (por tabla o para todas); al paginar se agrega id
+        """
+        service = RIPSDataService(postgrest_client(_tables()))
+
+        data = service.get_rips_data(1, ["US", "AC"], {"US": ["provider_code"]})
+        page = service.get_rips_data_page(1, "AC", ["value"], limit=2)
+
+        assert set(data["US"][0]) == {"provider_code"}
+        assert set(data["AC"][0]) == {"id", "file_id", "provider_code", "value"}
+        assert set(page["data"]["AC"][0]) == {"id", "value"}
+
+    def test_pages_and_stream_cover_all_rows(self, postgrest_client):
+        """
+        Test: Las páginas por tabla avanzan con su cursor y el recorrido completo trae todas las filas
+        """
+        service = RIPSDataService(postgrest_client(_tables()))
+
+        first = service.get_rips_data_page(1, ["US", "AC"], limit=3)
+        second = service.get_rips_data_page(1, ["US", "AC"], limit=3, cursors=first["next_cursors"])
+        streamed = {}
+        for tipo, rows in service.iter_rips_data(1, page_size=2):
+            streamed.setdefault(tipo, []).extend(rows)
+
+        assert [row["id"] for row in first["data"]["AC"]] == [100, 101, 102]
+        assert [row["id"] for row in second["data"]["AC"]] == [103, 104]
+        assert first["next_cursors"]["AC"] == "102" and second["next_cursors"]["AC"] is None
+        assert streamed == service.get_rips_data(1)
+
+    def test_invalid_arguments(self, postgrest_client):
+        """
+        Test: Tipo, columna o cursor no válidos producen ValueError
+        """
+        service = RIPSDataService(postgrest_client(_tables()))
+
+        with pytest.raises(ValueError):
+            service.get_rips_data(1, "XX")
+        with pytest.raises(ValueError):
+            service.get_rips_data(1, "US", ["provider_code;drop"])
+        with pytest.raises(ValueError):
+            service.get_rips_data_page(1, "US", cursors={"US": "abc"})
@@ -0,0 +1,93 @@
+"""
+Tests unitarios para la lectura de RIPS JSON en el validador de IA
+"""
+import pytest
+import json
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from validators.rips_json_reader import is_json_file, iter_json_records
+from validators.ai_validator_enhanced import EnhancedAIValidator
+
+
+def _write(tmp_path, data) -> str:
+    path = tmp_path / "rips.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return str(path)
+
+
+class TestRIPSJsonReader:
+    """Suite de tests para iter_json_records"""
+
+    def test_services_are_joined_with_patient_data(self, tmp_path, valid_rips_json):
+        """
+        Test: Cada servicio lleva el documento, sexo y fecha de nacimiento del usuario
+        """
+        valid_rips_json["usuarios"][0]["servicios"]["procedimientos"] = [
+            {"codPrestador": "123456789012", "fechaInicioAtencion": "2024-03-16 10:30",
+             "codProcedimiento": "740001", "codDiagnosticoPrincipal": "O800"}
+        ]
+
+        records = list(iter_json_records(_write(tmp_path, valid_rips_json)))
+
+        assert [(r["line_number"], r["file_type"]) for r in records] == [(1, "AC"), (2, "AP")]
+        assert records[0]["fecha_consulta"] == "2024-03-15"
+        assert records[0]["diagnostico_principal"] == "Z000"
+        assert records[1]["fecha_procedimiento"] == "2024-03-16"
+        assert records[1]["codigo_cups"] == "740001"
+        assert all(
+            (r["tipo_documento"], r["numero_documento"], r["sexo"], r["fecha_nacimiento"]) ==
+            ("CC", "12345678", "M", "1990-03-15")
+            for r in records
+        )
+
+    def test_service_document_overrides_patient_document(self, tmp_path, valid_rips_json):
+        """
+        Test: El documento del servicio, si viene, prevalece sobre el del usuario
+        """
+        valid_rips_json["usuarios"][0]["servicios"]["consultas"][0]["numDocumentoIdentificacion"] = "999"
+
+        record = next(iter_json_records(_write(tmp_path, valid_rips_json)))
+
+        assert (record["tipo_documento"], record["numero_documento"]) == ("CC", "999")
+
+    def test_is_json_file(self):
+        """
+        Test: Detección por extensión
+        """
+        assert is_json_file("/tmp/FEV001.JSON")
+        assert not is_json_file("/tmp/AC001.txt")
+
+
+class TestAIValidatorJsonInput:
+    """Tests del validador de IA con archivos JSON"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Setup para cada test"""
+        self.validator = EnhancedAIValidator()
+
+    def test_rules_see_json_services(self, tmp_path, valid_rips_json):
+        """
+        Test: Embarazo en paciente masculino se detecta en una consulta JSON
+        """
+        valid_rips_json["usuarios"][0]["servicios"]["consultas"][0]["codDiagnosticoPrincipal"] = "O800"
+
+        errors = self.validator.validate_file(_write(tmp_path, valid_rips_json), "AC")
+
+        assert [(e.line, e.field) for e in errors] == [(1, "diagnostico_principal")]
+        assert "masculino" in errors[0].error
+
+    def test_invalid_json_is_reported(self, tmp_path):
+        """
+        Test: Un JSON mal formado produce un error de validación de IA
+        """
+        path = tmp_path / "rips.json"
+        path.write_text("{\"usuarios\": [", encoding="utf-8")
+
+        errors = self.validator.validate_file(str(path), "AC")
+
+        assert [e.field for e in errors] == ["ai_validation"]
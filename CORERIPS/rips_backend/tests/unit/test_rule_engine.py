@@ -0,0 +1,102 @@
+"""
+Tests unitarios para el motor de reglas compilado desde rule_mappings
+"""
+import pytest
+import copy
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from validators.rule_engine import RuleEngine, compile_field_rule, get_rule_engine
+from validators.rule_mappings import (
+    RIPS_VALIDATION_RULES, AI_VALIDATION_RULES, RIPS_FILE_STRUCTURES, RuleCategory,
+    get_rules_by_file_type, get_rules_by_category
+)
+from validators.deterministic_enhanced import EnhancedDeterministicValidator
+
+
+class TestRuleEngine:
+    """Suite de tests para RuleEngine"""
+    
+    def test_engine_is_built_once(self):
+        """
+        Test: El motor del catálogo se compila una sola vez por proceso
+        """
+        assert get_rule_engine() is get_rule_engine()
+    
+    def test_rules_by_file_type_match_linear_scan(self):
+        """
+        Test: El índice por tipo devuelve lo mismo que recorrer el catálogo
+        """
+        for file_type in list(RIPS_FILE_STRUCTURES) + ["XX"]:
+            expected = [
+                rule for rule in RIPS_VALIDATION_RULES.values()
+                if rule["file_type"] in (file_type, "ALL")
+            ] + list(AI_VALIDATION_RULES.values())
+            assert get_rules_by_file_type(file_type) == expected
+    
+    def test_rules_by_category_match_linear_scan(self):
+        """
+        Test: El índice por categoría devuelve lo mismo que recorrer el catálogo
+        """
+        for category in RuleCategory:
+            expected = [rule for rule in RIPS_VALIDATION_RULES.values() if rule["category"] == category] + \
+                       [rule for rule in AI_VALIDATION_RULES.values() if rule["rule_category"] == category]
+            assert get_rules_by_category(category) == expected
+    
+    def test_compile_field_rule_translates_catalog(self):
+        """
+        Test: Traducción de tipos, longitudes, valores permitidos y formato de fecha
+        """
+        sexo = compile_field_rule(RIPS_VALIDATION_RULES["US-008"])
+        fecha = compile_field_rule(RIPS_VALIDATION_RULES["US-007"])
+        cups = compile_field_rule(RIPS_VALIDATION_RULES["AP-001"])
+        
+        assert sexo["type"] == "code" and sexo["values"] == ["M", "F"]
+        assert fecha["type"] == "date" and fecha["format"] == "YYYY-MM-DD" and fecha["min_len"] == 10
+        # Valores descriptivos ("CUPS vigente") no se aplican como dominio
+        assert "values" not in cups
+    
+    def test_common_rule_applies_to_layout_field(self):
+        """
+        Test: Un campo sin regla propia del tipo usa la regla "ALL"
+        """
+        engine = get_rule_engine()
+        
+        assert engine.file_rules("CT").field_rules["VERSION_ANEXO_TECNICO"]["id"] == "GEN-001"
+    
+    def test_new_rule_is_data_only(self):
+        """
+        Test: Agregar un campo al layout con su regla basta para que el validador lo aplique
+        """
+        rules = copy.deepcopy(RIPS_VALIDATION_RULES)
+        structures = copy.deepcopy(RIPS_FILE_STRUCTURES)
+        rules["AD-002"] = {
+            "id": "AD-002", "file_type": "AD", "field": "NUMERO_FACTURA_ORIGINAL", "data_type": "String",
+            "min_length": 1, "max_length": 20, "mandatory": True, "allowed_values": [],
+            "category": RuleCategory.FORMAT
+        }
+        structures["AD"]["layout"].append("NUMERO_FACTURA_ORIGINAL")
+        
+        validator = EnhancedDeterministicValidator()
+        validator.rule_engine = RuleEngine(rules, AI_VALIDATION_RULES, structures)
+        validator.file_structures = {
+            file_type: validator.rule_engine.file_rules(file_type).as_structure()
+            for file_type in validator.rule_engine.supported_file_types
+        }
+        
+        errors = validator._validate_line_enhanced(["NC", ""], 1, "AD")
+        
+        assert [(e.field, e.error) for e in errors] == [("NUMERO_FACTURA_ORIGINAL", "Campo obligatorio vacío")]
+    
+    def test_layout_field_without_rule_fails_compilation(self):
+        """
+        Test: Un layout que referencia un campo sin regla es un error del catálogo
+        """
+        structures = copy.deepcopy(RIPS_FILE_STRUCTURES)
+        structures["AM"]["layout"].append("CAMPO_INEXISTENTE")
+        
+        with pytest.raises(ValueError):
+            RuleEngine(RIPS_VALIDATION_RULES, AI_VALIDATION_RULES, structures)
@@ -0,0 +1,212 @@
+"""
+Tests unitarios para el índice histórico de servicios (AI-PAT-001 entre envíos)
+"""
+import pytest
+import json
+import os
+import sys
+from datetime import date
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from db.service_index import ServiceIndex, document_key, patient_key, parse_service_date
+from validators.ai_validator_enhanced import EnhancedAIValidator
+from services.rips_data_service import RIPSDataService
+
+
+def _ap_record(document: str, cups: str, service_date: str, line: int = 1) -> dict:
+    return {
+        "line_number": line,
+        "tipo_documento": "CC",
+        "numero_documento": document,
+        "codigo_cups": cups,
+        "fecha_procedimiento": service_date
+    }
+
+
+class TestServiceIndex:
+    """Suite de tests para ServiceIndex"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self, request):
+        """Setup para cada test: un índice por test"""
+        self.index = ServiceIndex(store_name=f"test_service_index_{os.getpid()}_{request.node.name}")
+        self.index.add_services(10, [
+            ("CC", "123", "740001", "2024-03-10"),
+            ("CC", "123", "890201", "2024-03-10"),
+            ("CC", "999", "740001", "2024-03-10 08:30"),
+        ])
+    
+    def test_patient_key_is_stable_and_normalized(self):
+        """
+        Test: La clave de paciente no depende de espacios ni mayúsculas del tipo
+        """
+        assert patient_key("cc", " 123 ") == patient_key("CC", "123")
+        assert patient_key("CC", "123") != patient_key("TI", "123")
+    
+    def test_parse_service_date_formats(self):
+        """
+        Test: Fechas ISO, con hora y DD/MM/YYYY
+        """
+        assert parse_service_date("2024-03-10 08:30") == date(2024, 3, 10)
+        assert parse_service_date("10/03/2024") == date(2024, 3, 10)
+        assert parse_service_date("no es fecha") is None
+    
+    def test_collision_inside_window(self):
+        """
+        Test: Mismo paciente y CUPS a 7 días o menos es colisión; a 8 días no
+        """
+        found = self.index.find_collisions([
+            ("CC", "123", "740001", "2024-03-17"),
+            ("CC", "123", "740001", "2024-03-18"),
+            ("CC", "123", "740001", "2024-03-03"),
+        ], 7)
+        
+        assert found[0] == [(10, date(2024, 3, 10))]
+        assert found[1] == []
+        assert found[2] == [(10, date(2024, 3, 10))]
+    
+    def test_other_patient_or_cups_do_not_collide(self):
+        """
+        Test: Otro paciente u otro CUPS no generan colisión
+        """
+        found = self.index.find_collisions([
+            ("CC", "555", "740001", "2024-03-10"),
+            ("CC", "123", "999999", "2024-03-10"),
+        ], 7)
+        
+        assert found == [[], []]
+    
+    def test_exclude_own_file_and_remove_file(self):
+        """
+        Test: El propio archivo se puede excluir y eliminar del índice
+        """
+        query = [("CC", "123", "740001", "2024-03-11")]
+        
+        assert self.index.find_collisions(query, 7, exclude_file_id=10) == [[]]
+        
+        self.index.remove_file(10)
+        assert self.index.find_collisions(query, 7) == [[]]
+        assert self.index.count() == 0
+    
+    def test_batched_lookup_keeps_query_positions(self):
+        """
+        Test: Las consultas se resuelven en un solo lote y cada resultado queda en su posición
+        """
+        self.index.add_services(12, [("CC", "123", "740001", "2024-03-09")])
+        
+        found = self.index.find_collisions([
+            ("CC", "", "740001", "2024-03-10"),
+            ("CC", "999", "740001", "2024-03-12"),
+            ("CC", "123", "740001", "fecha"),
+            ("CC", "123", "740001", "2024-03-11"),
+        ], 7)
+        
+        assert found == [
+            [], [(10, date(2024, 3, 10))], [],
+            [(12, date(2024, 3, 9)), (10, date(2024, 3, 10))],
+        ]
+    
+    def test_new_version_of_document_replaces_previous(self):
+        """
+        Test: Una versión corregida de la misma factura retira del índice la anterior
+        """
+        document = document_key("900123456", "FAC001")
+        self.index.register_document(10, document)
+        
+        replaced = self.index.register_document(11, document)
+        self.index.add_services(11, [("CC", "123", "740001", "2024-03-10")])
+        
+        assert replaced == [10]
+        assert self.index.find_collisions([("CC", "123", "740001", "2024-03-10")], 7, exclude_file_id=11) == [[]]
+        assert self.index.register_document(12, document_key("900123456", "FAC002")) == []
+        assert document_key("900123456", "") is None
+    
+    def test_incomplete_services_are_skipped(self):
+        """
+        Test: Servicios sin documento, CUPS o fecha válida no se indexan
+        """
+        added = self.index.add_services(11, [
+            ("CC", "", "740001", "2024-03-10"),
+            ("CC", "123", "", "2024-03-10"),
+            ("CC", "123", "740001", "fecha"),
+        ])
+        
+        assert added == 0
+
+
+class TestHistoricalDuplicateDetection:
+    """Tests de AI-PAT-001 contra envíos anteriores"""
+    
+    @pytest.fixture(autouse=True)
+    def setup(self, request):
+        """Setup para cada test"""
+        self.validator = EnhancedAIValidator()
+        self.index = ServiceIndex(store_name=f"test_hist_{os.getpid()}_{request.node.name}")
+        self.index.add_services(1, [("CC", "123", "740001", "2024-02-28")])
+    
+    def test_reports_service_billed_in_previous_submission(self):
+        """
+        Test: Cesárea facturada en el envío anterior se reporta en la línea del registro
+        """
+        records = [_ap_record("123", "740001", "2024-03-02", line=4), _ap_record("123", "740001", "2024-04-02", line=5)]
+        
+        errors = self.validator.detect_historical_duplicates(records, self.index)
+        
+        assert [(e.line, e.field) for e in errors] == [(4, "codigo_cups")]
+        assert "archivo 1 (2024-02-28)" in errors[0].error
+    
+    def test_ap_records_include_patient_document(self):
+        """
+        Test: Los registros AP llevan el documento del paciente para consultar el índice
+        """
+        fields = "123456789012|1|CC|123|01|1990-03-15|M|170|11001|08001001|2024-03-02|123456|740001|10|A001|O800|||".split("|")
+        
+        record = self.validator._map_fields_to_record(fields, "AP", 1)
+        
+        assert (record["tipo_documento"], record["numero_documento"]) == ("CC", "123")
+        assert len(self.validator.detect_historical_duplicates([record], self.index)) == 1
+
+
+class TestServiceIndexIngestion:
+    """Tests de la actualización del índice al ingerir archivos JSON"""
+    
+    def test_process_rips_file_indexes_procedures(self, tmp_path, valid_rips_json, request):
+        """
+        Test: La ingesta registra los procedimientos con el documento del usuario
+        """
+        valid_rips_json["usuarios"][0]["servicios"]["procedimientos"] = [
+            {"codPrestador": "123456789012", "fechaInicioAtencion": "2024-03-15 10:00", "codProcedimiento": "740001"}
+        ]
+        path = tmp_path / "rips.json"
+        path.write_text(json.dumps(valid_rips_json), encoding="utf-8")
+        index = ServiceIndex(store_name=f"test_ingest_{os.getpid()}_{request.node.name}")
+        
+        with patch('services.rips_data_service.get_service_index', return_value=index):
+            stats = RIPSDataService(MagicMock()).process_rips_file(str(path), 42)
+        
+        assert stats["servicios_indexados"] == 1
+        assert index.find_collisions([("CC", "12345678", "740001", "2024-03-20")], 7) == [[(42, date(2024, 3, 15))]]
+    
+    def test_reingesting_corrected_invoice_replaces_previous_version(self, tmp_path, valid_rips_json, request):
+        """
+        Test: Ingerir otra versión de la misma factura no deja colisiones con la versión anterior
+        """
+        valid_rips_json["numDocumentoIdObligado"] = "900123456"
+        valid_rips_json["usuarios"][0]["servicios"]["procedimientos"] = [
+            {"codPrestador": "123456789012", "fechaInicioAtencion": "2024-03-15 10:00", "codProcedimiento": "740001"}
+        ]
+        path = tmp_path / "rips.json"
+        path.write_text(json.dumps(valid_rips_json), encoding="utf-8")
+        index = ServiceIndex(store_name=f"test_ingest_{os.getpid()}_{request.node.name}")
+        
+        with patch('services.rips_data_service.get_service_index', return_value=index), \
+             patch('services.rips_data_service.get_provider_baseline', return_value=None):
+            RIPSDataService(MagicMock()).process_rips_file(str(path), 42)
+            stats = RIPSDataService(MagicMock()).process_rips_file(str(path), 43)
+        
+        assert stats["versiones_reemplazadas"] == [42]
+        assert index.find_collisions([("CC", "12345678", "740001", "2024-03-15")], 7, exclude_file_id=43) == [[]]
@@ -0,0 +1,118 @@
+"""
+Tests unitarios para el progreso de validación y su difusión por SSE
+"""
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from services.validation_progress import ProgressHub, format_sse
+from services.validation_service import ValidationService
+from validators.progress import PHASE_COMPLETED, ValidationProgress, track_progress
+
+
+class TestValidationProgress:
+    """Suite de tests para ValidationProgress"""
+
+    def test_advance_is_throttled_but_phases_always_publish(self):
+        """
+        Test: Miles de avances dentro del intervalo no publican eventos; cada fase publica
+        """
+        events = []
+        progress = ValidationProgress(events.append, min_interval=60)
+        progress.set_phase("deterministica", total_lines=10000)
+
+        for line in range(1, 10001):
+            progress.advance(line, line // 10)
+        progress.set_phase("ia")
+        progress.finish(findings=1500)
+
+        assert [event["phase"] for event in events] == ["deterministica", "ia", PHASE_COMPLETED]
+        assert events[1]["findings_total"] == 1000
+        assert events[-1]["findings_total"] == 1500 and events[-1]["percent"] == 100.0
+
+    def test_eta_from_phase_rate(self):
+        """
+        Test: A mitad de la fase hay ETA; al terminar no
+        """
+        events = []
+        progress = ValidationProgress(events.append, min_interval=0)
+        progress.set_phase("deterministica", total_lines=2000)
+        progress.advance(1000)
+
+        assert progress.eta_seconds() is not None and progress.eta_seconds() >= 0
+        progress.finish()
+        assert events[-1]["eta_s"] is None
+
+
+class TestProgressHub:
+    """Difusión a varios clientes"""
+
+    def test_watchers_receive_events_from_a_worker_thread(self):
+        """
+        Test: Dos clientes reciben el progreso de una validación que corre en otro hilo, hasta el evento final
+        """
+        hub = ProgressHub()
+
+        def validate():
+            progress = hub.tracker(7)
+            progress.min_interval = 0
+            progress.set_phase("deterministica", total_lines=3)
+            progress.advance(3, 2)
+            progress.finish(findings=2)
+
+        async def watch(ready):
+            events = []
+            async for event in hub.subscribe(7, keepalive=5):
+                if not events:
+                    ready.set()
+                events.append(event)
+            return events
+
+        async def scenario():
+            hub.tracker(7).set_phase("en_cola")
+            ready = [asyncio.Event(), asyncio.Event()]
+            watchers = [asyncio.create_task(watch(event)) for event in ready]
+            await asyncio.gather(*(event.wait() for event in ready))
+            worker = threading.Thread(target=validate)
+            worker.start()
+            results = await asyncio.wait_for(asyncio.gather(*watchers), timeout=10)
+            worker.join()
+            return results
+
+        for events in asyncio.run(scenario()):
+            assert events[0]["phase"] == "en_cola"
+            assert events[-1]["phase"] == PHASE_COMPLETED and events[-1]["findings_total"] == 2
+            assert [event["seq"] for event in events] == sorted({event["seq"] for event in events})
+
+    def test_unknown_file_ends_immediately(self):
+        """
+        Test: Sin validación registrada se envía un único evento "sin_validacion"
+        """
+        async def collect():
+            return [event async for event in ProgressHub().subscribe(99)]
+
+        events = asyncio.run(collect())
+
+        assert [event["phase"] for event in events] == ["sin_validacion"]
+        assert format_sse(events[0]).startswith("id: 0\nevent: progress\ndata: ")
+        assert format_sse(None) == ": keepalive\n\n"
+
+
+def test_run_validations_reports_phases(temp_rips_file):
+    """
+    Test: run_validations informa las fases de lectura, validación e histórico
+    """
+    events = []
+    progress = ValidationProgress(events.append, min_interval=0)
+
+    with track_progress(progress):
+        ValidationService().run_validations(temp_rips_file, "AC", ["deterministic", "ai"])
+
+    phases = [event["phase"] for event in events]
+    assert phases[0] == "lectura"
+    assert {"deterministica", "ia", "historico"} <= set(phases)
+    assert events[-1]["total_lines"] == 2
@@ -12,6 +12,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from services.validation_service import ValidationService
 from models.schemas import ErrorResponse, ValidationResultsResponse
+from validators.rips_parser import parse_text_file
 
 
 class TestValidationService:
@@ -222,6 +223,56 @@ class TestValidationService:
         
         assert "Archivo no encontrado" in str(exc_info.value)
     
+    def _validate_with_mock_db(self, mock_db, columnar):
+        """validate_file con la validación y la tabla simuladas"""
+        mock_file = Mock(id=1, file_path="/tmp/test.txt", original_filename="test_AC.txt")
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_file
+        run = {"errors": {"deterministic": [ErrorResponse(line=1, field="f", error="e")]},
+               "total_lines": 1, "total_records": 1, "rule_metrics": {}}
+        with patch.object(self.service, "run_validations", return_value=run), \
+             patch("services.validation_service.table_findings", return_value=(run["errors"], columnar)), \
+             patch.object(self.service, "_save_validation_errors"), \
+             patch("services.validation_service.save_summary"):
+            with pytest.raises(ValueError):
+                self.service.validate_file(file_id=1, validation_types=["deterministic"], db=mock_db)
+        return mock_file
+    
+    def test_validate_file_columnar_failure_rolls_back_before_commit(self):
+        """
+        Test: Si falla el almacén columnar no se confirma el estado validado
+        """
+        mock_db = Mock()
+        calls = []
+        mock_db.commit.side_effect = lambda: calls.append("commit")
+        
+        with patch("services.validation_service.store_findings_run", side_effect=OSError("disco lleno")):
+            mock_file = self._validate_with_mock_db(mock_db, columnar=True)
+        
+        # Solo el commit de "procesando" y el del estado de error
+        assert calls == ["commit", "commit"]
+        assert mock_db.rollback.called
+        assert mock_file.status.value == "error"
+    
+    def test_validate_file_commit_failure_discards_columnar_run(self):
+        """
+        Test: Si el commit final falla, la validación columnar ya guardada se borra
+        """
+        mock_db = Mock()
+        commits = iter([None, RuntimeError("conexión perdida"), None])
+        
+        def commit():
+            result = next(commits)
+            if isinstance(result, Exception):
+                raise result
+        mock_db.commit.side_effect = commit
+        
+        with patch("services.validation_service.store_findings_run") as store, \
+             patch("services.validation_service.discard_findings_run") as discard:
+            self._validate_with_mock_db(mock_db, columnar=True)
+        
+        assert store.called
+        discard.assert_called_once_with(1)
+    
     # ========================================================================
     # TESTS DE MÉTODO _save_validation_errors (CON MOCKS)
     # ========================================================================
@@ -245,14 +296,17 @@ class TestValidationService:
             db=mock_db
         )
         
-        # Assert
-        assert mock_db.add.call_count == len(errors)
-        assert mock_db.commit.called
+        # Assert: un solo INSERT de varias filas; el commit lo hace validate_file
+        assert mock_db.execute.call_count == 1
+        rows = mock_db.execute.call_args[0][1]
+        assert [row["line_number"] for row in rows] == [1, 2]
+        assert rows[0]["rule_name"] == "deterministic_validation"
+        assert not mock_db.commit.called
     
     def test_save_validation_errors_empty_list(self):
         """
         Test: Guardar lista vacía de errores
-        Resultado esperado: No inserta nada pero hace commit
+        Resultado esperado: No inserta nada
         """
         # Arrange
         mock_db = Mock()
@@ -267,8 +321,7 @@ class TestValidationService:
         )
         
         # Assert
-        assert mock_db.add.call_count == 0
-        assert mock_db.commit.called
+        assert mock_db.execute.call_count == 0
 
 
 class TestValidationServiceIntegration:
@@ -360,3 +413,54 @@ class TestValidationServiceEdgeCases:
             import os
             os.unlink(temp_path)
 
+
+
+class TestValidationServiceSinglePass:
+    """Tests de la lectura única compartida entre validadores"""
+    
+    def test_run_validations_parses_file_once(self, temp_rips_file):
+        """
+        Test: Con validación determinística + IA el archivo se lee una sola vez
+        """
+        # Arrange
+        service = ValidationService()
+        
+        # Act
+        with patch('services.validation_service.parse_text_file', wraps=parse_text_file) as mock_parse, \
+             patch('builtins.open', wraps=open) as mock_open:
+            run = service.run_validations(temp_rips_file, "AC", ["deterministic", "ai"])
+        
+        # Assert
+        assert mock_parse.call_count == 1
+        assert mock_open.call_count == 1
+        assert set(run["errors"].keys()) == {"deterministic", "ai"}
+        assert run["total_lines"] == 2
+        assert run["total_records"] == 2
+    
+    def test_run_validations_matches_individual_validators(self, temp_rips_file):
+        """
+        Test: La lectura compartida produce los mismos hallazgos que cada validador por separado
+        """
+        # Arrange
+        service = ValidationService()
+        
+        # Act
+        run = service.run_validations(temp_rips_file, "AC", ["deterministic", "ai"])
+        
+        # Assert
+        assert run["errors"]["deterministic"] == service.deterministic_validator.validate_file(temp_rips_file, "AC")
+        assert run["errors"]["ai"] == service.ai_validator.validate_file(temp_rips_file, "AC")
+    
+    def test_run_validations_non_text_file_falls_back(self, temp_json_rips_file):
+        """
+        Test: Archivos que no son de texto se validan por ruta
+        """
+        # Arrange
+        service = ValidationService()
+        
+        # Act
+        run = service.run_validations(temp_json_rips_file, "AC", ["deterministic"])
+        
+        # Assert
+        assert "deterministic" in run["errors"]
+        assert run["total_lines"] == service._count_file_lines(temp_json_rips_file)
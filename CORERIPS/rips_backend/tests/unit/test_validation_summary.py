@@ -0,0 +1,108 @@
+"""
+Tests unitarios para los resúmenes precalculados de validación
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from models.models import Base, File, Validation, ValidationSummary
+from models.schemas import ErrorResponse
+from models.types import FileStatus
+from services.validation_service import ValidationService
+from services.validation_summary import build_summary, get_summary, get_summary_supabase, save_summary
+
+ERRORS = {
+    "deterministic": [
+        ErrorResponse(line=1, field="sexo", error="Valor inválido"),
+        ErrorResponse(line=2, field="sexo", error="Valor inválido"),
+        ErrorResponse(line=2, field="codigo_cups", error="Código no encontrado"),
+    ],
+    "ai": [ErrorResponse(line=3, field="codigo_cups", error="Volumen atípico")],
+}
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[File.__table__, Validation.__table__, ValidationSummary.__table__])
+    with Session(engine) as session:
+        yield session
+
+
+class TestBuildSummary:
+    """Suite de tests para build_summary"""
+
+    def test_totals_by_status_rule_field_and_validator(self):
+        """
+        Test: Totales por estado, regla, campo y validador con las claves de la tabla validations
+        """
+        summary = build_summary(5, dict(ERRORS, empty=[]), total_lines=10, total_records=9)
+
+        assert summary["total_findings"] == summary["total_errors"] == 4
+        assert summary["total_warnings"] == 0
+        assert summary["by_status"] == {"failed": 4}
+        assert summary["by_rule"] == {"deterministic_validation": 3, "ai_validation": 1}
+        assert summary["by_field"] == {"sexo": 2, "codigo_cups": 2}
+        assert summary["by_validator_type"] == {"deterministic": 3, "ai": 1, "empty": 0}
+        assert (summary["total_lines"], summary["total_records"]) == (10, 9)
+
+
+class TestSummaryStorage:
+    """Guardado y lectura del resumen"""
+
+    def test_save_replaces_previous_summary(self, db):
+        """
+        Test: Revalidar un archivo reemplaza su resumen
+        """
+        save_summary(db, build_summary(1, ERRORS, 10, 9))
+        db.commit()
+        save_summary(db, build_summary(1, {"deterministic": []}, 10, 9))
+        db.commit()
+
+        summary = get_summary(db, 1)
+        assert summary["total_findings"] == 0 and summary["by_validator_type"] == {"deterministic": 0}
+        assert get_summary(db, 2) is None
+
+    def test_supabase_summary_reads_one_row(self):
+        """
+        Test: El resumen en Supabase se lee de validation_summaries filtrando por file_id
+        """
+        client = MagicMock()
+        client.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+            build_summary(7, ERRORS, 10, 9)
+        ]
+
+        summary = get_summary_supabase(client, 7)
+
+        client.table.assert_called_once_with("validation_summaries")
+        assert summary["by_field"] == {"sexo": 2, "codigo_cups": 2}
+
+
+class TestServiceSummary:
+    """El servicio responde los totales desde el resumen"""
+
+    def test_results_use_summary_without_reading_the_file(self, db, monkeypatch):
+        """
+        Test: get_validation_results no vuelve a contar las líneas del archivo si hay resumen
+        """
+        db.add(File(id=1, filename="AC.txt", original_filename="AC.txt", file_path="/no/existe",
+                    file_size=1, status=FileStatus.VALIDATED, user_id=1))
+        save_summary(db, build_summary(1, ERRORS, 120, 118))
+        db.commit()
+        service = ValidationService()
+        monkeypatch.setattr(service, "_count_file_lines", lambda path: pytest.fail("se leyó el archivo"))
+
+        results = service.get_validation_results(1, db)
+        summary = service.get_validation_summary(1, db)
+
+        assert (results.total_lines, results.total_errors) == (120, 4)
+        assert summary.total_records == 118 and summary.by_rule["ai_validation"] == 1
+        with pytest.raises(ValueError):
+            service.get_validation_summary(2, db)
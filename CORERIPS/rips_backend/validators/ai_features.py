@@ -0,0 +1,288 @@
+"""
+Tabla de características por registro compartida por las reglas de IA
+
+Las reglas de IA usan los mismos valores derivados de cada registro: clave del
+usuario, fechas como ordinal, edad, diagnóstico normalizado, prestador... En
+lugar de que cada regla los recalcule, FeatureTable los calcula una sola vez
+por archivo y los guarda por columnas (arreglos NumPy, una fila por registro):
+
+- columnas numéricas: int64 / float64 (NaN si no aplica)
+- columnas codificadas: códigos int64 en orden de primera aparición, -1 si el
+  valor viene vacío; los valores distintos se consultan con labels()
+
+Cada característica se registra con @register_feature y se calcula al pedirla
+por primera vez (puede depender de otras). Las reglas declaran las que usan
+con @requires_features, de modo que el validador las calcula antes de ejecutar
+las reglas:
+
+    @register_feature("mi_caracteristica")
+    def _mi_caracteristica(table):
+        return table["edad"] * 2
+
+    @requires_features("mi_caracteristica", "linea")
+    def mi_regla(self, records, features=None): ...
+"""
+
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from validators.ai_records import MISSING_DATE, birth_day_of, service_date_value
+from validators.pattern_arrays import date_ordinals, factorize
+
+# Longitud del prefijo del código CUPS que define su grupo
+CUPS_GROUP_LENGTH = 4
+
+# Código de las columnas codificadas para valores vacíos
+NO_VALUE = -1
+
+_FEATURES: Dict[str, Callable[["FeatureTable"], Any]] = {}
+
+
+def register_feature(name: str):
+    """
+    Registrar el extractor de una característica
+
+    El extractor recibe la tabla y retorna un arreglo (una fila por registro)
+    o, para columnas codificadas, (códigos, valores distintos).
+    """
+    def decorator(func):
+        _FEATURES[name] = func
+        return func
+    return decorator
+
+
+def requires_features(*names: str):
+    """Declarar las características que usa una regla (atributo features del método)"""
+    def decorator(func):
+        func.features = names
+        return func
+    return decorator
+
+
+def registered_features() -> List[str]:
+    return sorted(_FEATURES)
+
+
+def _coded(codes: np.ndarray, labels: List) -> Tuple[np.ndarray, List]:
+    """Quitar el valor vacío ("") de una columna codificada (queda como NO_VALUE)"""
+    if "" not in labels:
+        return codes, labels
+    empty = labels.index("")
+    codes = np.where(codes == empty, NO_VALUE, codes - (codes > empty))
+    return codes, labels[:empty] + labels[empty + 1:]
+
+
+def _relabel(codes: np.ndarray, labels: List, transform: Callable[[str], str]) -> Tuple[np.ndarray, List]:
+    """Aplicar transform a los valores distintos (no a cada registro) y recodificar"""
+    label_codes, new_labels = factorize(transform(label) for label in labels)
+    label_codes = np.append(label_codes, NO_VALUE)
+    return _coded(label_codes[codes], new_labels)
+
+
+class FeatureTable:
+    """Características por registro de un archivo, calculadas una vez y por columnas"""
+
+    def __init__(self, records: Sequence):
+        self.records = records
+        self._columns: Dict[str, np.ndarray] = {}
+        self._labels: Dict[str, List] = {}
+        # Los registros compactos se leen con getattr; los dicts (o listas mixtas) con get
+        self._dict_records = any(type(record) is dict for record in records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        column = self._columns.get(name)
+        if column is None:
+            extractor = _FEATURES.get(name)
+            if extractor is None:
+                raise KeyError(f"Característica no registrada: {name}")
+            result = extractor(self)
+            if isinstance(result, tuple):
+                column, self._labels[name] = result
+            else:
+                column = result
+            self._columns[name] = column
+        return column
+
+    def require(self, names: Iterable[str]) -> "FeatureTable":
+        """Calcular por adelantado las características indicadas"""
+        for name in names:
+            self[name]
+        return self
+
+    def labels(self, name: str) -> List:
+        """Valores distintos de una columna codificada (índice = código)"""
+        self[name]
+        return self._labels[name]
+
+    def factorized(self, name: str, rows: np.ndarray) -> Tuple[np.ndarray, List]:
+        """
+        Códigos de una columna codificada restringida a rows, recodificados en
+        orden de primera aparición dentro de esas filas
+
+        Returns:
+            (códigos 0..k-1, valores distintos en ese orden)
+        """
+        codes = self[name][rows]
+        if codes.size == 0:
+            return codes, []
+        unique_codes, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind="stable")
+        rank = np.empty(order.size, dtype=np.int64)
+        rank[order] = np.arange(order.size)
+        labels = self.labels(name)
+        return rank[inverse], [labels[code] for code in unique_codes[order].tolist()]
+
+    def values(self, field_name: str, default: Any = "") -> List:
+        """Valores de un campo de los registros (una pasada)"""
+        if self._dict_records:
+            return [record.get(field_name, default) for record in self.records]
+        return [getattr(record, field_name, default) for record in self.records]
+
+    def coded_field(self, field_name: str) -> Tuple[np.ndarray, List]:
+        """Columna codificada de un campo de texto de los registros"""
+        return _coded(*factorize(value or "" for value in self.values(field_name)))
+
+
+# Campos de los registros
+
+@register_feature("linea")
+def _line(table: FeatureTable) -> np.ndarray:
+    lines = table.values("line_number", 0)
+    return np.fromiter(lines, dtype=np.int64, count=len(lines))
+
+
+@register_feature("prestador")
+def _provider(table: FeatureTable):
+    return table.coded_field("codigo_prestador")
+
+
+@register_feature("cups")
+def _cups(table: FeatureTable):
+    return table.coded_field("codigo_cups")
+
+
+@register_feature("codigo_consulta")
+def _consultation(table: FeatureTable):
+    return table.coded_field("codigo_consulta")
+
+
+@register_feature("usuario")
+def _user(table: FeatureTable):
+    """Usuario (tipo, número de documento); mismo agrupamiento que EnhancedAIValidator._user_key"""
+    return factorize(zip(table.values("tipo_documento"), table.values("numero_documento")))
+
+
+@register_feature("diagnostico")
+def _diagnosis(table: FeatureTable):
+    """Diagnóstico principal en mayúsculas"""
+    return _relabel(*table.coded_field("diagnostico_principal"), str.upper)
+
+
+@register_feature("sexo")
+def _sex(table: FeatureTable):
+    """Sexo en mayúsculas"""
+    return _relabel(*table.coded_field("sexo"), str.upper)
+
+
+@register_feature("dia_servicio")
+def _service_day(table: FeatureTable) -> np.ndarray:
+    """Ordinal de la fecha del servicio (MISSING_DATE si viene vacía, INVALID_DATE si no es válida)"""
+    return date_ordinals(service_date_value(record) or MISSING_DATE for record in table.records)
+
+
+@register_feature("dia_nacimiento")
+def _birth_day(table: FeatureTable) -> np.ndarray:
+    """Ordinal de la fecha de nacimiento (MISSING_DATE / INVALID_DATE)"""
+    return np.fromiter((birth_day_of(record) for record in table.records), dtype=np.int64, count=len(table))
+
+
+@register_feature("valor_servicio")
+def _service_value(table: FeatureTable) -> np.ndarray:
+    """Valor del servicio (NaN si no viene o no es numérico)"""
+    values = np.full(len(table), np.nan)
+    for i, value in enumerate(table.values("valor_servicio", None)):
+        if value is None or value == "":
+            continue
+        try:
+            values[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return values
+
+
+# Características derivadas (vectorizadas sobre las columnas anteriores)
+
+@register_feature("edad")
+def _age(table: FeatureTable) -> np.ndarray:
+    """Edad en años cumplidos a hoy (NaN sin fecha de nacimiento válida)"""
+    birth_days = table["dia_nacimiento"]
+    ages = np.full(birth_days.size, np.nan)
+    known = birth_days > 0
+    ages[known] = (date.today().toordinal() - birth_days[known]) // 365
+    return ages
+
+
+@register_feature("grupo_edad")
+def _age_group(table: FeatureTable):
+    """Grupo de comparación de la edad: (capítulo del diagnóstico, sexo); -1 sin diagnóstico"""
+    chapter_codes, chapters = factorize(label[:1] for label in table.labels("diagnostico"))
+    diagnosis = table["diagnostico"]
+    sex = table["sexo"]
+    has_diagnosis = diagnosis >= 0
+    keys = np.full(diagnosis.size, NO_VALUE, dtype=np.int64)
+    # sexo vacío (-1) se desplaza a 0 para formar la clave
+    keys[has_diagnosis] = chapter_codes[diagnosis[has_diagnosis]] * (len(table.labels("sexo")) + 1) \
+        + sex[has_diagnosis] + 1
+    return keys
+
+
+@register_feature("grupo_servicio")
+def _service_group(table: FeatureTable):
+    """Grupo del código de servicio (CUPS o, si no hay, código de consulta) por prefijo"""
+    cups = table["cups"]
+    consultation = table["codigo_consulta"]
+    prefix_codes: Dict[str, int] = {}
+    cups_groups = np.fromiter(
+        (prefix_codes.setdefault(label[:CUPS_GROUP_LENGTH], len(prefix_codes)) for label in table.labels("cups")),
+        dtype=np.int64
+    )
+    consultation_groups = np.fromiter(
+        (prefix_codes.setdefault(label[:CUPS_GROUP_LENGTH], len(prefix_codes))
+         for label in table.labels("codigo_consulta")),
+        dtype=np.int64
+    )
+    groups = np.full(cups.size, NO_VALUE, dtype=np.int64)
+    with_consultation = consultation >= 0
+    groups[with_consultation] = consultation_groups[consultation[with_consultation]]
+    with_cups = cups >= 0
+    groups[with_cups] = cups_groups[cups[with_cups]]
+    return groups, list(prefix_codes)
+
+
+@register_feature("volumen_diario_prestador")
+def _provider_daily_volume(table: FeatureTable) -> np.ndarray:
+    """Servicios del mismo (prestador, día) de cada registro (NaN sin prestador o fecha válida)"""
+    providers = table["prestador"]
+    days = table["dia_servicio"]
+    volumes = np.full(providers.size, np.nan)
+    counted = (providers >= 0) & (days > 0)
+    if counted.any():
+        keys = providers[counted] * (int(days[counted].max()) + 1) + days[counted]
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        volumes[counted] = counts[inverse]
+    return volumes
+
+
+def feature_table(records: Sequence, features: Optional[FeatureTable] = None) -> FeatureTable:
+    """Tabla ya construida para estos registros o una nueva"""
+    if features is not None and features.records is records:
+        return features
+    return FeatureTable(records)
@@ -0,0 +1,184 @@
+"""
+Ejecución paralela de las familias de reglas de IA por particiones
+
+Las reglas entre registros solo relacionan registros del mismo prestador
+(AI-PAT-002, AI-FRAUD-002) o del mismo usuario (AI-PAT-001), y las reglas
+clínicas son por registro. Para archivos consolidados de varios prestadores los
+registros se reparten por hash:
+
+- por prestador: AI-CLIN-001/002, AI-PAT-002 y AI-FRAUD-002
+- por usuario (tipo + número de documento): AI-PAT-001
+
+Cada partición se valida en un pool de procesos y los hallazgos se combinan por
+regla, en el mismo orden de familias que la ejecución secuencial. Dentro de cada
+regla se recupera exactamente el orden secuencial: cada hallazgo lleva la
+primera línea de su grupo (prestador o usuario, o el propio registro en las
+reglas clínicas) y los grupos se intercalan por esa línea conservando el orden
+interno de cada partición. AI-ANOM-001 compara contra la distribución del
+archivo completo y se puntúa en el proceso principal mientras trabajan los
+procesos.
+
+Se activa con AI_PARALLEL_WORKERS > 1 y solo para archivos con al menos
+AI_PARALLEL_MIN_RECORDS registros. Un prestador nunca se divide entre
+particiones, de modo que un archivo dominado por un solo prestador no gana
+paralelismo en esa familia.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from models.schemas import ErrorResponse
+from validators.ai_features import FeatureTable
+from validators.instrumentation import collect_rule_metrics, current_rule_metrics
+
+logger = logging.getLogger(__name__)
+
+AI_PARALLEL_WORKERS = int(os.getenv("AI_PARALLEL_WORKERS", "0"))
+AI_PARALLEL_MIN_RECORDS = int(os.getenv("AI_PARALLEL_MIN_RECORDS", "100000"))
+# Particiones por proceso: más de una reparte mejor prestadores de tamaños distintos
+PARTITIONS_PER_WORKER = 2
+
+# Familias de particionado
+PROVIDER_FAMILY = "provider"
+USER_FAMILY = "user"
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def partition_records(records: Sequence, key_of: Callable, partitions: int) -> List[list]:
+    """
+    Repartir los registros en particiones por hash estable de su clave
+
+    Los registros conservan su orden dentro de cada partición; se omiten las
+    particiones vacías.
+    """
+    buckets = [[] for _ in range(partitions)]
+    assigned = {}
+    for record in records:
+        key = key_of(record)
+        index = assigned.get(key)
+        if index is None:
+            index = assigned[key] = zlib.crc32(key.encode("utf-8")) % partitions
+        buckets[index].append(record)
+    return [bucket for bucket in buckets if bucket]
+
+
+def should_partition(records: Sequence, workers: Optional[int] = None,
+                     min_records: Optional[int] = None) -> bool:
+    """True si el archivo es suficientemente grande para validarse en paralelo"""
+    workers = AI_PARALLEL_WORKERS if workers is None else workers
+    min_records = AI_PARALLEL_MIN_RECORDS if min_records is None else min_records
+    return workers > 1 and len(records) >= min_records
+
+
+def get_process_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Pool de procesos compartido (se crea en el primer uso)
+
+    Usa "spawn": el servidor tiene hilos y un fork podría heredar locks tomados.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers or AI_PARALLEL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_process_pool():
+    """Cerrar el pool compartido (p.ej. al detener el servidor o en tests)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def _validate_partition(validator, family: str, records: list, file_type: str):
+    """
+    Validar una partición en un proceso de trabajo
+
+    Returns:
+        (por regla, lista de (primera línea del grupo, hallazgo); métricas por
+        regla de la partición)
+    """
+    with collect_rule_metrics() as metrics:
+        features = FeatureTable(records).require(validator.required_features())
+        if family == PROVIDER_FAMILY:
+            rules = (
+                ("AI-CLIN", validator._validate_clinical_coherence(records, file_type, features)),
+                ("AI-PAT-002", validator._detect_atypical_volumes(records, features)),
+                ("AI-FRAUD-002", validator._detect_suspicious_billing_patterns(records, features)),
+            )
+        else:
+            rules = (("AI-PAT-001", validator._detect_duplicate_procedures(records, features)),)
+        findings = tuple(
+            list(zip(validator._group_first_lines(rule, errors, features), errors))
+            for rule, errors in rules
+        )
+    return findings, metrics
+
+
+def validate_partitioned(validator, records: Sequence, file_type: str,
+                         workers: Optional[int] = None) -> Optional[List[ErrorResponse]]:
+    """
+    Aplicar las familias de reglas de IA particionando por prestador y por usuario
+
+    Los hallazgos quedan exactamente en el orden de la ejecución secuencial:
+    clínicas, duplicados, volumen, fraude y anomalías, y dentro de cada regla
+    en el orden en que la regla recorre sus grupos.
+
+    Returns:
+        Hallazgos, o None si el pool de procesos no está disponible (el llamador
+        valida entonces de forma secuencial)
+    """
+    workers = workers or AI_PARALLEL_WORKERS
+    partitions = workers * PARTITIONS_PER_WORKER
+
+    clinical, duplicates, volumes, fraud = [], [], [], []
+    partition_metrics = []
+    try:
+        pool = get_process_pool(workers)
+        futures: List[Tuple[str, object]] = []
+        for family, key_of in ((PROVIDER_FAMILY, validator._provider_key), (USER_FAMILY, validator._user_key)):
+            for partition in partition_records(records, key_of, partitions):
+                futures.append((family, pool.submit(_validate_partition, validator, family, partition, file_type)))
+
+        # AI-ANOM-001 necesita el archivo completo: se puntúa aquí mientras trabajan los procesos
+        anomaly_errors = validator._score_anomalies(records)
+
+        for family, future in futures:
+            findings, metrics = future.result()
+            if family == PROVIDER_FAMILY:
+                clinical.extend(findings[0])
+                volumes.extend(findings[1])
+                fraud.extend(findings[2])
+            else:
+                duplicates.extend(findings[0])
+            partition_metrics.append(metrics)
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning(f"Pool de procesos de IA no disponible, se valida de forma secuencial: {str(e)}")
+        shutdown_process_pool()
+        return None
+
+    collector = current_rule_metrics()
+    if collector is not None:
+        for metrics in partition_metrics:
+            collector.merge(metrics)
+
+    errors = []
+    for rule_errors in (clinical, duplicates, volumes, fraud):
+        # Orden estable: un grupo está en una sola partición y conserva su orden interno
+        rule_errors.sort(key=lambda item: item[0])
+        errors.extend(error for _, error in rule_errors)
+    errors.extend(anomaly_errors)
+    return errors
@@ -0,0 +1,292 @@
+"""
+Registros compactos del validador de IA
+
+Cada tipo de archivo tiene una clase con __slots__ en lugar de un dict por
+registro:
+
+- solo se guardan los campos que usan las reglas (no la lista completa de
+  campos de la línea)
+- los códigos repetidos (prestador, tipo de documento, sexo, diagnósticos, CUPS)
+  se internan: todos los registros comparten la misma cadena
+- las fechas se guardan como ordinal (int): MISSING_DATE si vienen vacías e
+  INVALID_DATE si no son válidas
+- el valor del servicio se guarda como float (NaN si no viene)
+
+Los registros conservan la interfaz de lectura de los dict (get, [] e in) y
+exponen las fechas como texto ISO (fecha_consulta, fecha_procedimiento,
+fecha_nacimiento), de modo que las reglas aceptan indistintamente estos
+registros o dicts.
+"""
+
+import math
+import operator
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from validators.pattern_arrays import INVALID_DATE, parse_date_ordinal
+
+# Fecha vacía (los ordinales válidos empiezan en 1)
+MISSING_DATE = 0
+
+# Campos de código que se internan
+_CODE_FIELDS = frozenset([
+    "codigo_prestador", "tipo_documento", "sexo",
+    "diagnostico_principal", "diagnostico_relacionado", "codigo_cups", "codigo_consulta",
+])
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value) if value not in (None, "") else math.nan
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _date_text(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat() if ordinal > 0 else ""
+
+
+class AIRecord:
+    """Registro base: línea y tipo de archivo (tipos sin campos para las reglas de IA)"""
+
+    __slots__ = ("line_number", "file_type")
+
+    # Campos de texto del registro (además de line_number y file_type)
+    TEXT_FIELDS: Tuple[str, ...] = ()
+    # Posición de cada campo en las líneas de texto: (campo, posición)
+    TEXT_LAYOUT: Tuple[Tuple[str, int], ...] = ()
+    # Posición de las fechas en las líneas de texto
+    SERVICE_DATE_POSITION: Optional[int] = None
+    BIRTH_DATE_POSITION: Optional[int] = None
+    # Número mínimo de campos para mapear una línea de texto
+    MIN_FIELDS = 0
+
+    def __init__(self, line_number: int, file_type: str):
+        self.line_number = line_number
+        self.file_type = file_type
+        for field_name in self.TEXT_FIELDS:
+            setattr(self, field_name, "")
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._bind_state_slots()
+    
+    @classmethod
+    def _bind_state_slots(cls):
+        # Todos los slots de la jerarquía, para serializar el estado como tupla
+        cls._STATE_SLOTS = tuple(
+            slot for klass in reversed(cls.__mro__) for slot in klass.__dict__.get("__slots__", ())
+        )
+        cls._state_getter = operator.attrgetter(*cls._STATE_SLOTS)
+    
+    def __getstate__(self):
+        # Tupla de valores en lugar del dict de slots por defecto: la mitad del
+        # tiempo de pickle al enviar particiones a procesos de trabajo
+        return self._state_getter(self)
+    
+    def __setstate__(self, state):
+        for slot, value in zip(self._STATE_SLOTS, state):
+            setattr(self, slot, value)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            return default
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __contains__(self, name: str) -> bool:
+        return hasattr(self, name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Representación como dict (mismas claves que los registros anteriores, sin raw_fields)"""
+        record = {"line_number": self.line_number, "file_type": self.file_type}
+        for field_name in self.TEXT_FIELDS:
+            record[field_name] = getattr(self, field_name)
+        for field_name in ("fecha_nacimiento", "fecha_consulta", "fecha_procedimiento"):
+            if hasattr(self, field_name):
+                record[field_name] = getattr(self, field_name)
+        return record
+
+
+AIRecord._bind_state_slots()
+
+
+class _ServiceRecord(AIRecord):
+    """Servicio de un paciente: documento, sexo, fecha de nacimiento y fecha del servicio"""
+
+    __slots__ = ("codigo_prestador", "tipo_documento", "numero_documento", "sexo",
+                 "diagnostico_principal", "birth_day", "service_day", "valor_servicio")
+
+    def __init__(self, line_number: int, file_type: str):
+        super().__init__(line_number, file_type)
+        self.birth_day = MISSING_DATE
+        self.service_day = MISSING_DATE
+        self.valor_servicio = math.nan
+
+    @property
+    def fecha_nacimiento(self) -> str:
+        return _date_text(self.birth_day)
+
+
+class ACRecord(_ServiceRecord):
+    """Consulta (AC)"""
+
+    __slots__ = ("diagnostico_relacionado", "codigo_consulta")
+
+    TEXT_FIELDS = ("codigo_prestador", "tipo_documento", "numero_documento", "sexo",
+                   "diagnostico_principal", "diagnostico_relacionado", "codigo_consulta")
+    TEXT_LAYOUT = (("codigo_prestador", 0), ("tipo_documento", 2), ("numero_documento", 3), ("sexo", 6),
+                   ("codigo_consulta", 12), ("diagnostico_principal", 15), ("diagnostico_relacionado", 16))
+    SERVICE_DATE_POSITION = 10
+    BIRTH_DATE_POSITION = 5
+    MIN_FIELDS = 10
+
+    @property
+    def fecha_consulta(self) -> str:
+        return _date_text(self.service_day)
+
+
+class APRecord(_ServiceRecord):
+    """Procedimiento (AP); sexo y fecha de nacimiento solo vienen en la entrada JSON"""
+
+    __slots__ = ("codigo_cups",)
+
+    TEXT_FIELDS = ("codigo_prestador", "tipo_documento", "numero_documento", "sexo",
+                   "diagnostico_principal", "codigo_cups")
+    TEXT_LAYOUT = (("codigo_prestador", 0), ("tipo_documento", 2), ("numero_documento", 3),
+                   ("codigo_cups", 12), ("diagnostico_principal", 15))
+    SERVICE_DATE_POSITION = 10
+    MIN_FIELDS = 5
+
+    @property
+    def fecha_procedimiento(self) -> str:
+        return _date_text(self.service_day)
+
+
+class AdmissionRecord(_ServiceRecord):
+    """Urgencia (AU) u hospitalización (AH); solo en la entrada JSON, la fecha es la de ingreso"""
+
+    __slots__ = ()
+
+    TEXT_FIELDS = ("codigo_prestador", "tipo_documento", "numero_documento", "sexo", "diagnostico_principal")
+
+    @property
+    def fecha_consulta(self) -> str:
+        return _date_text(self.service_day)
+
+
+class USRecord(AIRecord):
+    """Usuario (US)"""
+
+    __slots__ = ("tipo_documento", "numero_documento", "sexo", "birth_day")
+
+    TEXT_FIELDS = ("tipo_documento", "numero_documento", "sexo")
+    TEXT_LAYOUT = (("tipo_documento", 0), ("numero_documento", 1), ("sexo", 3))
+    BIRTH_DATE_POSITION = 2
+    MIN_FIELDS = 4
+
+    def __init__(self, line_number: int, file_type: str):
+        super().__init__(line_number, file_type)
+        self.birth_day = MISSING_DATE
+
+    @property
+    def fecha_nacimiento(self) -> str:
+        return _date_text(self.birth_day)
+
+
+RECORD_CLASSES = {
+    "AC": ACRecord,
+    "AP": APRecord,
+    "AU": AdmissionRecord,
+    "AH": AdmissionRecord,
+    "US": USRecord,
+}
+
+
+def service_date_value(record) -> Any:
+    """
+    Fecha del servicio de un registro: ordinal (registros compactos) o texto (dicts)
+
+    En ambos casos es falsa si la fecha viene vacía; pattern_arrays.date_ordinals
+    acepta los dos tipos.
+    """
+    if type(record) is dict:
+        return record.get('fecha_procedimiento', record.get('fecha_consulta', ''))
+    return getattr(record, 'service_day', MISSING_DATE)
+
+
+def birth_day_of(record) -> int:
+    """Ordinal de la fecha de nacimiento (MISSING_DATE / INVALID_DATE si no hay o no es válida)"""
+    if type(record) is dict:
+        value = record.get("fecha_nacimiento", "")
+        return parse_date_ordinal(value) if value else MISSING_DATE
+    return getattr(record, 'birth_day', MISSING_DATE)
+
+
+class RecordFactory:
+    """
+    Construye registros compactos compartiendo códigos y fechas ya vistos
+
+    Una fábrica por lectura de archivo: el internado y la memoria de fechas se
+    liberan con ella.
+    """
+
+    def __init__(self):
+        self._strings: Dict[str, str] = {}
+        self._dates: Dict[str, int] = {}
+
+    def intern(self, value: str) -> str:
+        return self._strings.setdefault(value, value)
+
+    def date(self, value: str) -> int:
+        """Ordinal de una fecha de texto (se interpreta una vez por valor distinto)"""
+        if not value:
+            return MISSING_DATE
+        ordinal = self._dates.get(value)
+        if ordinal is None:
+            ordinal = self._dates[value] = parse_date_ordinal(value)
+        return ordinal
+
+    def from_fields(self, fields: List[str], file_type: str, line_number: int) -> AIRecord:
+        """Registro de una línea de texto ya separada por '|'"""
+        record_class = RECORD_CLASSES.get(file_type)
+        if record_class is None or record_class.MIN_FIELDS == 0:
+            return AIRecord(line_number, self.intern(file_type))
+
+        record = record_class(line_number, self.intern(file_type))
+        if len(fields) < record_class.MIN_FIELDS:
+            return record
+
+        size = len(fields)
+        for field_name, position in record_class.TEXT_LAYOUT:
+            if position < size:
+                value = fields[position]
+                setattr(record, field_name, self.intern(value) if field_name in _CODE_FIELDS else value)
+        if record_class.SERVICE_DATE_POSITION is not None and record_class.SERVICE_DATE_POSITION < size:
+            record.service_day = self.date(fields[record_class.SERVICE_DATE_POSITION])
+        if record_class.BIRTH_DATE_POSITION is not None and record_class.BIRTH_DATE_POSITION < size:
+            record.birth_day = self.date(fields[record_class.BIRTH_DATE_POSITION])
+        return record
+
+    def from_values(self, file_type: str, line_number: int, values: Dict[str, str],
+                    service_date: str = "", birth_date: str = "", service_value: Any = None) -> AIRecord:
+        """Registro a partir de valores ya nombrados (entrada JSON)"""
+        record = RECORD_CLASSES.get(file_type, AIRecord)(line_number, self.intern(file_type))
+        for field_name, value in values.items():
+            setattr(record, field_name, self.intern(value) if field_name in _CODE_FIELDS else value)
+        if isinstance(record, _ServiceRecord):
+            record.service_day = self.date(service_date)
+            record.valor_servicio = _to_float(service_value)
+        if hasattr(record, "birth_day"):
+            record.birth_day = self.date(birth_date)
+        return record
+
+    def from_lines(self, lines: Iterable[Tuple[int, List[str]]], file_type: str) -> List[AIRecord]:
+        """Registros de (número de línea, campos) en orden"""
+        return [self.from_fields(fields, file_type, line_number) for line_number, fields in lines]
@@ -1,14 +1,85 @@
-from typing import List, Dict, Any, Optional, Tuple
+import math
+import os
+from typing import List, Dict, Any, Optional
 from models.schemas import ErrorResponse
-import re
-from datetime import datetime, date
-from collections import defaultdict
+from validators.rips_parser import ParsedRIPSFile, iter_text_fields
+from validators.ai_records import MISSING_DATE, AIRecord, RecordFactory
+from validators.rips_json_reader import is_json_file, iter_json_records
+from validators.instrumentation import instrumented_rule
+from validators.ai_parallel import should_partition, validate_partitioned
+from validators.pattern_arrays import INVALID_DATE
+from validators.ai_features import FeatureTable, feature_table, requires_features
+from validators.anomaly_scorer import ANOMALY_MAX_FINDINGS, ANOMALY_SCORE_THRESHOLD, get_anomaly_scorer
+import numpy as np
+from datetime import date
+
+# Ventana (días) en la que un procedimiento repetido al mismo usuario es sospechoso (AI-PAT-001)
+DUPLICATE_WINDOW_DAYS = int(os.getenv("AI_DUPLICATE_WINDOW_DAYS", "7"))
+
+# Servicios de un prestador en un mismo día por encima de los cuales el volumen es atípico (AI-PAT-002)
+VOLUME_DAILY_THRESHOLD = int(os.getenv("AI_VOLUME_DAILY_THRESHOLD", "50"))
+
+
+def parse_provider_thresholds(value: str) -> Dict[str, int]:
+    """Umbrales por prestador en formato "codigo:umbral,codigo:umbral" (entradas inválidas se ignoran)"""
+    thresholds = {}
+    for item in (value or "").split(","):
+        provider, _, threshold = item.strip().partition(":")
+        if provider and threshold.strip().isdigit():
+            thresholds[provider.strip()] = int(threshold)
+    return thresholds
+
+
+# Umbrales propios de prestadores de alto volumen (p.ej. hospitales de referencia)
+PROVIDER_VOLUME_THRESHOLDS = parse_provider_thresholds(os.getenv("AI_VOLUME_PROVIDER_THRESHOLDS", ""))
+
+# Puntuación contra la línea base histórica del prestador (db.provider_baseline)
+BASELINE_Z_THRESHOLD = float(os.getenv("AI_BASELINE_Z_THRESHOLD", "4"))
+BASELINE_MIN_DAYS = int(os.getenv("AI_BASELINE_MIN_DAYS", "8"))
+# AI-FRAUD-002: procedimientos históricos mínimos del prestador y participación mínima
+# en el archivo del CUPS dominante para compararlo con su mezcla histórica
+BASELINE_MIN_PROCEDURES = int(os.getenv("AI_BASELINE_MIN_PROCEDURES", "100"))
+BASELINE_CUPS_MIN_SHARE = float(os.getenv("AI_BASELINE_CUPS_MIN_SHARE", "0.5"))
+
+
+# Filas que considera cada regla entre registros; sus grupos (usuario o prestador)
+# se recorren en orden de primera aparición dentro de esas filas
+
+def _duplicate_rows(table: FeatureTable) -> np.ndarray:
+    """AI-PAT-001: registros con procedimiento y fecha (aunque no sea válida)"""
+    return np.flatnonzero((table["cups"] >= 0) & (table["dia_servicio"] != MISSING_DATE))
+
+
+def _volume_rows(table: FeatureTable) -> np.ndarray:
+    """AI-PAT-002: registros con prestador y fecha válida"""
+    return np.flatnonzero((table["prestador"] >= 0) & (table["dia_servicio"] > 0))
+
+
+def _billing_rows(table: FeatureTable) -> np.ndarray:
+    """AI-FRAUD-002: registros con prestador y procedimiento"""
+    return np.flatnonzero((table["prestador"] >= 0) & (table["cups"] >= 0))
+
+
+# Regla -> (columna que agrupa sus hallazgos, filas que considera)
+GROUPED_RULES = {
+    "AI-PAT-001": ("usuario", _duplicate_rows),
+    "AI-PAT-002": ("prestador", _volume_rows),
+    "AI-FRAUD-002": ("prestador", _billing_rows),
+}
+
 
 class EnhancedAIValidator:
     """Validador de IA mejorado basado en reglas específicas de coherencia clínica y detección de fraudes"""
     
     def __init__(self):
-        self.model_loaded = False
+        # Puntuador de anomalías por lotes (AI-ANOM-001), compartido por el proceso
+        self.anomaly_scorer = get_anomaly_scorer()
+        self.model_loaded = self.anomaly_scorer is not None
+        self.anomaly_score_threshold = ANOMALY_SCORE_THRESHOLD
+        
+        # Umbrales de AI-PAT-002 (servicios por prestador y día)
+        self.volume_daily_threshold = VOLUME_DAILY_THRESHOLD
+        self.provider_volume_thresholds = dict(PROVIDER_VOLUME_THRESHOLDS)
         
         # Reglas de coherencia clínica basadas en el archivo RIPS_Validaciones_AI.xlsx
         self.clinical_coherence_rules = {
@@ -89,296 +160,540 @@ class EnhancedAIValidator:
             "P61", "P70", "P71", "P72", "P74", "P75", "P76", "P77", "P78", "P80",
             "P81", "P83", "P90", "P91", "P92", "P93", "P94", "P95", "P96"
         ]
+        
+        # Demencias
+        self.geriatric_codes = ["F03", "G30", "G31"]
     
     def validate_file(self, file_path: str, file_type: str = "AC") -> List[ErrorResponse]:
         """Validar archivo RIPS usando reglas de IA"""
-        errors = []
-        
         try:
             # Leer y procesar archivo
             records = self._parse_file(file_path, file_type)
+        except Exception as e:
+            return [self._ai_error(e)]
+        
+        return self._validate_records(records, file_type)
+    
+    def validate_records(self, records: List[Dict[str, Any]], file_type: str = "AC") -> List[ErrorResponse]:
+        """Validar registros ya leídos (p.ej. con read_json_records)"""
+        return self._validate_records(records, file_type)
+    
+    def validate_parsed_file(self, parsed_file: ParsedRIPSFile, file_type: str = "AC") -> List[ErrorResponse]:
+        """Validar un archivo de texto ya leído (ver validators.rips_parser)"""
+        return self._validate_records(self._records_from_parsed(parsed_file, file_type), file_type)
+    
+    def _validate_records(self, records: List[Dict[str, Any]], file_type: str) -> List[ErrorResponse]:
+        """
+        Aplicar todas las familias de reglas de IA sobre los registros
+        
+        Archivos grandes con AI_PARALLEL_WORKERS > 1 se validan por particiones
+        de prestador y usuario en un pool de procesos (validators.ai_parallel).
+        """
+        errors = []
+        
+        try:
+            if should_partition(records):
+                partitioned = validate_partitioned(self, records, file_type)
+                if partitioned is not None:
+                    return partitioned
+            
+            # Características compartidas por todas las reglas, calculadas una vez
+            features = FeatureTable(records).require(self.required_features())
             
             # Aplicar validaciones de IA
-            errors.extend(self._validate_clinical_coherence(records, file_type))
-            errors.extend(self._validate_pattern_detection(records, file_type))
-            errors.extend(self._validate_fraud_detection(records, file_type))
+            errors.extend(self._validate_clinical_coherence(records, file_type, features))
+            errors.extend(self._validate_pattern_detection(records, file_type, features))
+            errors.extend(self._validate_fraud_detection(records, file_type, features))
+            errors.extend(self._score_anomalies(records, features))
             
         except Exception as e:
-            errors.append(ErrorResponse(
-                line=0,
-                field="ai_validation",
-                error=f"Error en validación IA: {str(e)}"
-            ))
+            errors.append(self._ai_error(e))
         
         return errors
     
+    def required_features(self) -> List[str]:
+        """Características declaradas por las reglas de IA (ver validators.ai_features)"""
+        rules = (
+            self._validate_diagnosis_sex_coherence, self._validate_diagnosis_age_coherence,
+            self._detect_duplicate_procedures, self._detect_atypical_volumes,
+            self._detect_suspicious_billing_patterns,
+        )
+        names = {name for rule in rules for name in getattr(rule, "features", ())}
+        if self.anomaly_scorer is not None:
+            names.update(self.anomaly_scorer.required_features)
+        return sorted(names)
+    
+    def _ai_error(self, exc: Exception) -> ErrorResponse:
+        """Error genérico de la validación de IA"""
+        return ErrorResponse(
+            line=0,
+            field="ai_validation",
+            error=f"Error en validación IA: {str(exc)}"
+        )
+    
     def _parse_file(self, file_path: str, file_type: str) -> List[Dict[str, Any]]:
         """Parsear archivo y convertir a estructura de datos para IA"""
-        records = []
-        
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line_number, line in enumerate(file, 1):
-                line = line.strip()
-                if not line:
-                    continue
-                
-                fields = line.split('|')
-                record = self._map_fields_to_record(fields, file_type, line_number)
-                records.append(record)
-        
-        return records
+        if is_json_file(file_path):
+            return self.read_json_records(file_path)
+        # Una sola pasada: las líneas no se conservan, solo los registros compactos
+        return RecordFactory().from_lines(iter_text_fields(file_path), file_type)
     
-    def _map_fields_to_record(self, fields: List[str], file_type: str, line_number: int) -> Dict[str, Any]:
-        """Mapear campos a estructura de registro"""
-        record = {
-            "line_number": line_number,
-            "file_type": file_type,
-            "raw_fields": fields
-        }
-        
-        # Mapeo específico por tipo de archivo
-        if file_type == "AC" and len(fields) >= 10:  # Consultas
-            record.update({
-                "codigo_prestador": fields[0] if len(fields) > 0 else "",
-                "tipo_documento": fields[2] if len(fields) > 2 else "",
-                "numero_documento": fields[3] if len(fields) > 3 else "",
-                "fecha_nacimiento": fields[5] if len(fields) > 5 else "",
-                "sexo": fields[6] if len(fields) > 6 else "",
-                "fecha_consulta": fields[10] if len(fields) > 10 else "",
-                "diagnostico_principal": fields[15] if len(fields) > 15 else "",
-                "diagnostico_relacionado": fields[16] if len(fields) > 16 else ""
-            })
-        
-        elif file_type == "AP" and len(fields) >= 5:  # Procedimientos
-            record.update({
-                "codigo_prestador": fields[0] if len(fields) > 0 else "",
-                "codigo_cups": fields[12] if len(fields) > 12 else "",
-                "fecha_procedimiento": fields[10] if len(fields) > 10 else "",
-                "diagnostico_principal": fields[15] if len(fields) > 15 else ""
-            })
-        
-        elif file_type == "US" and len(fields) >= 4:  # Usuarios
-            record.update({
-                "tipo_documento": fields[0] if len(fields) > 0 else "",
-                "numero_documento": fields[1] if len(fields) > 1 else "",
-                "fecha_nacimiento": fields[2] if len(fields) > 2 else "",
-                "sexo": fields[3] if len(fields) > 3 else ""
-            })
-        
-        return record
+    def read_json_records(self, file_path: str) -> List[Dict[str, Any]]:
+        """
+        Registros para IA de un archivo RIPS JSON (usuarios -> servicios)
+        
+        Cada servicio es un registro con su propio file_type (AC, AP, AU, AH),
+        ver validators.rips_json_reader.
+        """
+        return list(iter_json_records(file_path))
+    
+    def _records_from_parsed(self, parsed_file: ParsedRIPSFile, file_type: str) -> List[AIRecord]:
+        """Convertir las líneas ya separadas en registros para IA"""
+        return RecordFactory().from_lines(
+            ((line_number, fields) for line_number, _, fields in parsed_file.lines), file_type
+        )
     
-    def _validate_clinical_coherence(self, records: List[Dict], file_type: str) -> List[ErrorResponse]:
+    def _map_fields_to_record(self, fields: List[str], file_type: str, line_number: int) -> AIRecord:
+        """Mapear campos a registro compacto (ver validators.ai_records)"""
+        return RecordFactory().from_fields(fields, file_type, line_number)
+    
+    def _validate_clinical_coherence(self, records: List[Dict], file_type: str,
+                                     features: Optional[FeatureTable] = None) -> List[ErrorResponse]:
         """Validar coherencia clínica usando IA"""
-        errors = []
+        table = feature_table(records, features)
         
-        for record in records:
-            # AI-CLIN-001: Diagnóstico incompatible con sexo
-            sex_errors = self._validate_diagnosis_sex_coherence(record)
-            errors.extend(sex_errors)
-            
-            # AI-CLIN-002: Diagnóstico incompatible con edad
-            age_errors = self._validate_diagnosis_age_coherence(record)
-            errors.extend(age_errors)
+        # AI-CLIN-001: Diagnóstico incompatible con sexo
+        # AI-CLIN-002: Diagnóstico incompatible con edad
+        errors = self._validate_diagnosis_sex_coherence(table)
+        errors.extend(self._validate_diagnosis_age_coherence(table))
         
+        # Hallazgos por registro, en el orden de los registros
+        errors.sort(key=lambda error: error.line)
         return errors
     
-    def _validate_diagnosis_sex_coherence(self, record: Dict) -> List[ErrorResponse]:
+    def _diagnosis_flags(self, table: FeatureTable, codes: List[str]) -> np.ndarray:
+        """Por registro: el diagnóstico empieza por alguno de los códigos (se evalúa una vez por diagnóstico distinto)"""
+        prefixes = tuple(codes)
+        by_label = np.fromiter(
+            (label.startswith(prefixes) for label in table.labels("diagnostico")), dtype=bool
+        )
+        diagnosis = table["diagnostico"]
+        # El código -1 (sin diagnóstico) toma el último elemento agregado: False
+        return np.append(by_label, False)[diagnosis]
+    
+    @instrumented_rule("AI-CLIN-001")
+    @requires_features("linea", "diagnostico", "sexo")
+    def _validate_diagnosis_sex_coherence(self, table: FeatureTable) -> List[ErrorResponse]:
         """Validar coherencia entre diagnóstico y sexo"""
         errors = []
-        
-        sexo = record.get("sexo", "").upper()
-        diagnostico = record.get("diagnostico_principal", "").upper()
-        line_number = record.get("line_number", 0)
-        
-        if not sexo or not diagnostico:
+        if not len(table):
             return errors
         
-        # Validar diagnósticos relacionados con embarazo en hombres
-        if sexo == "M":
-            for pregnancy_code in self.pregnancy_related_codes:
-                if diagnostico.startswith(pregnancy_code):
-                    errors.append(ErrorResponse(
-                        line=line_number,
-                        field="diagnostico_principal",
-                        error=f"Diagnóstico relacionado con embarazo ({diagnostico}) en paciente masculino"
-                    ))
-                    break
-        
-        # Validar diagnósticos específicos de hombres en mujeres
-        if sexo == "F":
-            for male_code in self.male_specific_codes:
-                if diagnostico.startswith(male_code):
-                    errors.append(ErrorResponse(
-                        line=line_number,
-                        field="diagnostico_principal",
-                        error=f"Diagnóstico específico masculino ({diagnostico}) en paciente femenino"
-                    ))
-                    break
+        sex_labels = table.labels("sexo")
+        sex = table["sexo"]
+        male = sex == (sex_labels.index("M") if "M" in sex_labels else -2)
+        female = sex == (sex_labels.index("F") if "F" in sex_labels else -2)
+        
+        # Diagnósticos relacionados con embarazo en hombres; específicos de hombres en mujeres
+        pregnancy = male & self._diagnosis_flags(table, self.pregnancy_related_codes)
+        male_specific = female & self._diagnosis_flags(table, self.male_specific_codes)
+        
+        lines = table["linea"]
+        diagnosis = table["diagnostico"]
+        diagnosis_labels = table.labels("diagnostico")
+        for row in np.flatnonzero(pregnancy | male_specific).tolist():
+            diagnostico = diagnosis_labels[diagnosis[row]]
+            if pregnancy[row]:
+                message = f"Diagnóstico relacionado con embarazo ({diagnostico}) en paciente masculino"
+            else:
+                message = f"Diagnóstico específico masculino ({diagnostico}) en paciente femenino"
+            errors.append(ErrorResponse(line=int(lines[row]), field="diagnostico_principal", error=message))
         
         return errors
     
-    def _validate_diagnosis_age_coherence(self, record: Dict) -> List[ErrorResponse]:
+    @instrumented_rule("AI-CLIN-002")
+    @requires_features("linea", "diagnostico", "edad")
+    def _validate_diagnosis_age_coherence(self, table: FeatureTable) -> List[ErrorResponse]:
         """Validar coherencia entre diagnóstico y edad"""
         errors = []
-        
-        fecha_nacimiento = record.get("fecha_nacimiento", "")
-        diagnostico = record.get("diagnostico_principal", "").upper()
-        line_number = record.get("line_number", 0)
-        
-        if not fecha_nacimiento or not diagnostico:
+        if not len(table):
             return errors
         
-        try:
-            # Calcular edad
-            if '-' in fecha_nacimiento:
-                birth_date = datetime.strptime(fecha_nacimiento, '%Y-%m-%d').date()
-            else:
-                birth_date = datetime.strptime(fecha_nacimiento, '%d/%m/%Y').date()
-            
-            age = (date.today() - birth_date).days // 365
-            
-            # Validar diagnósticos pediátricos en adultos
-            if age >= 18:
-                for pediatric_code in self.pediatric_codes:
-                    if diagnostico.startswith(pediatric_code):
-                        errors.append(ErrorResponse(
-                            line=line_number,
-                            field="diagnostico_principal",
-                            error=f"Diagnóstico pediátrico ({diagnostico}) en paciente adulto (edad: {age} años)"
-                        ))
-                        break
-            
-            # Validar diagnósticos geriátricos en jóvenes
-            geriatric_codes = ["F03", "G30", "G31"]  # Demencias
-            if age < 50:
-                for geriatric_code in geriatric_codes:
-                    if diagnostico.startswith(geriatric_code):
-                        errors.append(ErrorResponse(
-                            line=line_number,
-                            field="diagnostico_principal",
-                            error=f"Diagnóstico geriátrico ({diagnostico}) en paciente joven (edad: {age} años)"
-                        ))
-                        break
-        
-        except ValueError:
-            # Error de formato de fecha, ya se maneja en validaciones determinísticas
-            pass
+        # Sin fecha de nacimiento o no válida (ya se maneja en validaciones determinísticas): edad NaN
+        ages = table["edad"]
+        with np.errstate(invalid="ignore"):
+            # Diagnósticos pediátricos en adultos; geriátricos (demencias) en jóvenes
+            pediatric = (ages >= 18) & self._diagnosis_flags(table, self.pediatric_codes)
+            geriatric = (ages < 50) & self._diagnosis_flags(table, self.geriatric_codes)
+        
+        lines = table["linea"]
+        diagnosis = table["diagnostico"]
+        diagnosis_labels = table.labels("diagnostico")
+        for row in np.flatnonzero(pediatric | geriatric).tolist():
+            diagnostico = diagnosis_labels[diagnosis[row]]
+            age = int(ages[row])
+            if pediatric[row]:
+                errors.append(ErrorResponse(
+                    line=int(lines[row]),
+                    field="diagnostico_principal",
+                    error=f"Diagnóstico pediátrico ({diagnostico}) en paciente adulto (edad: {age} años)"
+                ))
+            if geriatric[row]:
+                errors.append(ErrorResponse(
+                    line=int(lines[row]),
+                    field="diagnostico_principal",
+                    error=f"Diagnóstico geriátrico ({diagnostico}) en paciente joven (edad: {age} años)"
+                ))
         
         return errors
     
-    def _validate_pattern_detection(self, records: List[Dict], file_type: str) -> List[ErrorResponse]:
+    def _validate_pattern_detection(self, records: List[Dict], file_type: str,
+                                    features: Optional[FeatureTable] = None) -> List[ErrorResponse]:
         """Detectar patrones atípicos usando IA"""
         errors = []
         
         # AI-PAT-001: Procedimientos duplicados
-        duplicate_errors = self._detect_duplicate_procedures(records)
+        duplicate_errors = self._detect_duplicate_procedures(records, features)
         errors.extend(duplicate_errors)
         
         # AI-PAT-002: Volumen atípico de servicios
-        volume_errors = self._detect_atypical_volumes(records)
+        volume_errors = self._detect_atypical_volumes(records, features)
         errors.extend(volume_errors)
         
         return errors
     
-    def _detect_duplicate_procedures(self, records: List[Dict]) -> List[ErrorResponse]:
-        """Detectar procedimientos duplicados sospechosos"""
+    def _group_first_lines(self, rule: str, errors: List[ErrorResponse], table: FeatureTable) -> List[int]:
+        """
+        Por hallazgo, primera línea de su grupo entre las filas que considera la regla
+        
+        Ordena los grupos como la ejecución secuencial (ver GROUPED_RULES); las
+        reglas por registro usan la línea del propio hallazgo.
+        """
+        if rule not in GROUPED_RULES or not errors:
+            return [error.line for error in errors]
+        column, rows_of = GROUPED_RULES[rule]
+        rows = rows_of(table)
+        codes = table[column]
+        lines = table["linea"]
+        group_codes, first = np.unique(codes[rows], return_index=True)
+        first_line = dict(zip(group_codes.tolist(), lines[rows][first].tolist()))
+        code_of_line = dict(zip(lines.tolist(), codes.tolist()))
+        return [first_line[code_of_line[error.line]] for error in errors]
+    
+    def _user_key(self, record: Dict) -> str:
+        """Clave de usuario (tipo + número de documento) usada por las reglas por paciente"""
+        return f"{record.get('tipo_documento', '')}_{record.get('numero_documento', '')}"
+    
+    def _provider_key(self, record: Dict) -> str:
+        """Clave de prestador usada por las reglas por prestador"""
+        return record.get('codigo_prestador', '')
+    
+    @instrumented_rule("AI-PAT-001")
+    @requires_features("linea", "usuario", "cups", "dia_servicio")
+    def _detect_duplicate_procedures(self, records: List[Dict],
+                                     features: Optional[FeatureTable] = None) -> List[ErrorResponse]:
+        """
+        Detectar procedimientos duplicados sospechosos
+        
+        Ordena los registros por (usuario, procedimiento, fecha, línea) y compara
+        cada registro con el anterior del mismo grupo (np.diff sobre ordinales).
+        Los grupos se recorren en orden de primera aparición del usuario y, dentro
+        de él, del procedimiento.
+        """
+        errors = []
+        table = feature_table(records, features)
+        if len(table) < 2:
+            return errors
+        
+        # Registros con procedimiento y fecha (aunque no sea válida)
+        service_days = table["dia_servicio"]
+        rows = _duplicate_rows(table)
+        if rows.size < 2:
+            return errors
+        
+        user_codes, _ = table.factorized("usuario", rows)
+        procedure_codes, procedure_values = table.factorized("cups", rows)
+        pairs = user_codes * len(procedure_values) + procedure_codes
+        # Primera aparición de cada (usuario, procedimiento), incluidas fechas no válidas
+        _, pair_first, pair_inverse = np.unique(pairs, return_index=True, return_inverse=True)
+        pair_order = pair_first[pair_inverse]
+        ordinals = service_days[rows]
+        
+        valid = ordinals != INVALID_DATE
+        user_codes, pair_order, pairs = user_codes[valid], pair_order[valid], pairs[valid]
+        ordinals = ordinals[valid]
+        line_numbers = table["linea"][rows][valid]
+        
+        # Grupos en orden de aparición del usuario y, dentro de él, del procedimiento
+        order = np.lexsort((line_numbers, ordinals, pair_order, user_codes))
+        pairs, ordinals, line_numbers = pairs[order], ordinals[order], line_numbers[order]
+        
+        # Verificar duplicados en menos de 7 días
+        days_diff = np.diff(ordinals)
+        duplicated = np.flatnonzero((pairs[1:] == pairs[:-1]) & (days_diff <= DUPLICATE_WINDOW_DAYS))
+        
+        for i in duplicated.tolist():
+            procedure_code = procedure_values[pairs[i + 1] % len(procedure_values)]
+            errors.append(ErrorResponse(
+                line=int(line_numbers[i + 1]),
+                field="codigo_cups",
+                error=f"Procedimiento duplicado ({procedure_code}) en {int(days_diff[i])} días para el mismo usuario"
+            ))
+        
+        return errors
+    
+    @instrumented_rule("AI-PAT-001-HIST")
+    def detect_historical_duplicates(self, records: List[Dict], service_index,
+                                     exclude_file_id: Optional[int] = None) -> List[ErrorResponse]:
+        """
+        Detectar procedimientos ya facturados al mismo usuario en envíos anteriores
+        
+        Consulta el índice histórico (db.service_index) por cada registro con
+        usuario, CUPS y fecha; reporta los servicios previos dentro de la ventana
+        de DUPLICATE_WINDOW_DAYS días.
+        """
         errors = []
         
-        # Agrupar por usuario y procedimiento
-        user_procedures = defaultdict(list)
+        candidates = [
+            record for record in records
+            if record.get('codigo_cups') and record.get('numero_documento')
+        ]
+        if not candidates:
+            return errors
         
-        for record in records:
-            user_key = f"{record.get('tipo_documento', '')}_{record.get('numero_documento', '')}"
-            procedure_code = record.get('codigo_cups', '')
-            date_str = record.get('fecha_procedimiento', record.get('fecha_consulta', ''))
-            
-            if user_key and procedure_code and date_str:
-                user_procedures[user_key].append({
-                    'procedure': procedure_code,
-                    'date': date_str,
-                    'line': record.get('line_number', 0)
-                })
-        
-        # Detectar duplicados sospechosos
-        for user_key, procedures in user_procedures.items():
-            procedure_dates = defaultdict(list)
-            
-            for proc in procedures:
-                procedure_dates[proc['procedure']].append(proc)
+        collisions = service_index.find_collisions(
+            (
+                (
+                    record.get('tipo_documento', ''),
+                    record.get('numero_documento', ''),
+                    record.get('codigo_cups', ''),
+                    record.get('fecha_procedimiento', record.get('fecha_consulta', ''))
+                )
+                for record in candidates
+            ),
+            DUPLICATE_WINDOW_DAYS,
+            exclude_file_id=exclude_file_id
+        )
+        
+        for record, found in zip(candidates, collisions):
+            if not found:
+                continue
+            previous = ", ".join(f"archivo {file_id} ({found_date.isoformat()})" for file_id, found_date in found[:3])
+            if len(found) > 3:
+                previous += f" y {len(found) - 3} más"
+            errors.append(ErrorResponse(
+                line=record.get('line_number', 0),
+                field="codigo_cups",
+                error=f"Procedimiento ({record['codigo_cups']}) ya facturado al mismo usuario en envíos anteriores "
+                      f"dentro de {DUPLICATE_WINDOW_DAYS} días: {previous}"
+            ))
+        
+        return errors
+    
+    def _provider_day_volumes(self, records: List[Dict],
+                              features: Optional[FeatureTable] = None) -> Optional[Dict[str, Any]]:
+        """
+        Índice (prestador, día) -> conteo, primera y última línea
+        
+        Los grupos quedan con los prestadores en orden de aparición y, dentro de
+        cada uno, los días en orden de aparición. None si no hay registros con
+        prestador y fecha válida.
+        """
+        table = feature_table(records, features)
+        if not len(table):
+            return None
+        
+        ordinals = table["dia_servicio"]
+        rows = _volume_rows(table)
+        if rows.size == 0:
+            return None
+        
+        provider_codes, provider_values = table.factorized("prestador", rows)
+        ordinals = ordinals[rows]
+        line_numbers = table["linea"][rows]
+        
+        # Clave entera (prestador, día) -> conteo, primera y última línea
+        first_day = int(ordinals.min())
+        span = int(ordinals.max()) - first_day + 1
+        keys = provider_codes * span + (ordinals - first_day)
+        unique_keys, first_index, inverse, counts = np.unique(
+            keys, return_index=True, return_inverse=True, return_counts=True
+        )
+        first_lines = np.full(unique_keys.size, np.iinfo(np.int64).max, dtype=np.int64)
+        last_lines = np.full(unique_keys.size, np.iinfo(np.int64).min, dtype=np.int64)
+        np.minimum.at(first_lines, inverse, line_numbers)
+        np.maximum.at(last_lines, inverse, line_numbers)
+        
+        group_providers = provider_codes[first_index]
+        order = np.lexsort((first_index, group_providers))
+        return {
+            "provider_values": provider_values,
+            "providers": group_providers[order],
+            "days": first_day + unique_keys[order] % span,
+            "counts": counts[order],
+            "first_lines": first_lines[order],
+            "last_lines": last_lines[order],
+        }
+    
+    @instrumented_rule("AI-PAT-002")
+    @requires_features("linea", "prestador", "dia_servicio")
+    def _detect_atypical_volumes(self, records: List[Dict],
+                                 features: Optional[FeatureTable] = None) -> List[ErrorResponse]:
+        """
+        Detectar volúmenes atípicos de servicios por prestador
+        
+        Se reporta cada día (prestador, fecha) que supera el umbral del prestador
+        (ver provider_volume_thresholds), en la primera línea del día, con la
+        última línea del día en el mensaje (la validación incremental recalcula
+        esta regla en cada versión en lugar de reutilizar el mensaje).
+        """
+        errors = []
+        
+        volumes = self._provider_day_volumes(records, features)
+        if volumes is None:
+            return errors
+        
+        # Umbral por grupo: el del prestador si tiene uno propio, si no el general
+        provider_values = volumes["provider_values"]
+        provider_thresholds = np.fromiter(
+            (self.provider_volume_thresholds.get(provider, self.volume_daily_threshold) for provider in provider_values),
+            dtype=np.int64, count=len(provider_values)
+        )
+        thresholds = provider_thresholds[volumes["providers"]]
+        counts = volumes["counts"]
+        
+        for group in np.flatnonzero(counts > thresholds).tolist():
+            provider = provider_values[volumes["providers"][group]]
+            service_date = date.fromordinal(int(volumes["days"][group]))
+            first_line = int(volumes["first_lines"][group])
+            last_line = int(volumes["last_lines"][group])
             
-            for procedure_code, proc_list in procedure_dates.items():
-                if len(proc_list) > 1:
-                    # Verificar si son en fechas muy cercanas
-                    dates = []
-                    for proc in proc_list:
-                        try:
-                            if '-' in proc['date']:
-                                parsed_date = datetime.strptime(proc['date'], '%Y-%m-%d').date()
-                            else:
-                                parsed_date = datetime.strptime(proc['date'], '%d/%m/%Y').date()
-                            dates.append((parsed_date, proc['line']))
-                        except ValueError:
-                            continue
-                    
-                    # Verificar duplicados en menos de 7 días
-                    dates.sort()
-                    for i in range(1, len(dates)):
-                        days_diff = (dates[i][0] - dates[i-1][0]).days
-                        if days_diff <= 7:
-                            errors.append(ErrorResponse(
-                                line=dates[i][1],
-                                field="codigo_cups",
-                                error=f"Procedimiento duplicado ({procedure_code}) en {days_diff} días para el mismo usuario"
-                            ))
+            errors.append(ErrorResponse(
+                line=first_line,
+                field="codigo_prestador",
+                error=f"Volumen atípico: {int(counts[group])} servicios en un día ({service_date}) para prestador "
+                      f"{provider} (umbral: {int(thresholds[group])}; líneas {first_line} a {last_line})"
+            ))
         
         return errors
     
-    def _detect_atypical_volumes(self, records: List[Dict]) -> List[ErrorResponse]:
-        """Detectar volúmenes atípicos de servicios por prestador"""
+    @instrumented_rule("AI-PAT-002-BASE")
+    def detect_baseline_volume_anomalies(self, records: List[Dict], provider_baseline,
+                                         exclude_file_id: Optional[int] = None) -> List[ErrorResponse]:
+        """
+        Detectar volúmenes diarios atípicos frente a la historia del prestador
+        
+        Cada día (prestador, fecha) del archivo se puntúa con
+        z = (conteo - media) / desviación contra la línea base del prestador para
+        ese día de la semana (db.provider_baseline). Solo se puntúa con al menos
+        BASELINE_MIN_DAYS días observados.
+        """
         errors = []
         
-        # Contar servicios por prestador por día
-        provider_daily_counts = defaultdict(lambda: defaultdict(int))
-        provider_records = defaultdict(list)
+        volumes = self._provider_day_volumes(records)
+        if volumes is None:
+            return errors
+        
+        provider_values = volumes["provider_values"]
+        stats = provider_baseline.volume_stats(provider_values, exclude_file_id=exclude_file_id)
+        if not stats:
+            return errors
         
-        for record in records:
-            provider = record.get('codigo_prestador', '')
-            date_str = record.get('fecha_procedimiento', record.get('fecha_consulta', ''))
+        for group in range(volumes["counts"].size):
+            provider = provider_values[volumes["providers"][group]]
+            service_date = date.fromordinal(int(volumes["days"][group]))
+            baseline = stats.get((provider, service_date.weekday()))
+            if baseline is None:
+                continue
+            observed_days, mean, std = baseline
+            count = int(volumes["counts"][group])
+            if observed_days < BASELINE_MIN_DAYS or count <= mean:
+                continue
             
-            if provider and date_str:
-                try:
-                    if '-' in date_str:
-                        service_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                    else:
-                        service_date = datetime.strptime(date_str, '%d/%m/%Y').date()
-                    
-                    provider_daily_counts[provider][service_date] += 1
-                    provider_records[provider].append(record)
-                
-                except ValueError:
-                    continue
+            # Desviación mínima de 1 servicio: prestadores muy regulares no generan z infinitos
+            z_score = (count - mean) / max(std, 1.0)
+            if z_score < BASELINE_Z_THRESHOLD:
+                continue
+            
+            errors.append(ErrorResponse(
+                line=int(volumes["first_lines"][group]),
+                field="codigo_prestador",
+                error=f"Volumen atípico frente a la historia del prestador {provider}: {count} servicios el "
+                      f"{service_date} (media {mean:.1f} ± {std:.1f} en {observed_days} días; z = {z_score:.1f})"
+            ))
         
-        # Detectar volúmenes anómalos (más de 50 servicios por día)
-        for provider, daily_counts in provider_daily_counts.items():
-            for service_date, count in daily_counts.items():
-                if count > 50:  # Umbral configurable
-                    # Encontrar una línea representativa para reportar el error
-                    representative_record = next(
-                        (r for r in provider_records[provider] 
-                         if r.get('fecha_procedimiento', r.get('fecha_consulta', '')) and 
-                         service_date.strftime('%Y-%m-%d') in r.get('fecha_procedimiento', r.get('fecha_consulta', ''))),
-                        provider_records[provider][0]
-                    )
-                    
-                    errors.append(ErrorResponse(
-                        line=representative_record.get('line_number', 0),
-                        field="codigo_prestador",
-                        error=f"Volumen atípico: {count} servicios en un día ({service_date}) para prestador {provider}"
-                    ))
+        return errors
+    
+    @instrumented_rule("AI-FRAUD-002-BASE")
+    def detect_baseline_billing_patterns(self, records: List[Dict], provider_baseline,
+                                         exclude_file_id: Optional[int] = None) -> List[ErrorResponse]:
+        """
+        Detectar concentración de CUPS atípica frente a la historia del prestador
+        
+        Para cada prestador con al menos 10 procedimientos en el archivo, su CUPS
+        más frecuente (si supera BASELINE_CUPS_MIN_SHARE del archivo) se compara con
+        la participación histórica de ese código según el count-min sketch del
+        prestador (db.provider_baseline): z = (conteo - n·p) / √(n·p·(1 - p)).
+        Solo se puntúa con al menos BASELINE_MIN_PROCEDURES procedimientos de
+        historia. El sketch nunca subestima, así que p es conservador.
+        """
+        errors = []
+        table = FeatureTable(records)
+        if not len(table):
+            return errors
+        
+        rows = _billing_rows(table)
+        if rows.size == 0:
+            return errors
+        provider_codes, provider_values = table.factorized("prestador", rows)
+        procedure_codes = table["cups"][rows]
+        procedure_labels = table.labels("cups")
+        line_numbers = table["linea"][rows]
+        
+        # Por prestador: procedimientos y, por (prestador, CUPS), conteo y primera fila
+        span = int(procedure_codes.max()) + 1
+        procedure_counts = np.bincount(provider_codes, minlength=len(provider_values))
+        pairs, first_rows, pair_counts = np.unique(
+            provider_codes * span + procedure_codes, return_index=True, return_counts=True
+        )
+        pair_providers = pairs // span
+        
+        for provider_code, provider in enumerate(provider_values):
+            procedures = int(procedure_counts[provider_code])
+            if procedures < 10:
+                continue
+            candidates = np.flatnonzero(pair_providers == provider_code)
+            dominant = int(candidates[np.argmax(pair_counts[candidates])])
+            count = int(pair_counts[dominant])
+            if count / procedures < BASELINE_CUPS_MIN_SHARE:
+                continue
+            
+            cups = procedure_labels[int(pairs[dominant] % span)]
+            total, frequency = provider_baseline.cups_frequency(provider, [cups], exclude_file_id=exclude_file_id)
+            if total < BASELINE_MIN_PROCEDURES:
+                continue
+            share = min(frequency[cups] / total, 1.0)
+            expected = procedures * share
+            if count <= expected:
+                continue
+            
+            # Desviación mínima de 1 procedimiento, como en AI-PAT-002-BASE
+            z_score = (count - expected) / max(math.sqrt(expected * (1 - share)), 1.0)
+            if z_score < BASELINE_Z_THRESHOLD:
+                continue
+            
+            errors.append(ErrorResponse(
+                line=int(line_numbers[first_rows[dominant]]),
+                field="codigo_prestador",
+                error=f"Patrón sospechoso frente a la historia del prestador {provider}: CUPS {cups} en "
+                      f"{count} de {procedures} procedimientos ({count / procedures:.0%}; histórico "
+                      f"{share:.0%} de {total}; z = {z_score:.1f})"
+            ))
         
         return errors
     
-    def _validate_fraud_detection(self, records: List[Dict], file_type: str) -> List[ErrorResponse]:
+    def _validate_fraud_detection(self, records: List[Dict], file_type: str,
+                                  features: Optional[FeatureTable] = None) -> List[ErrorResponse]:
         """Detectar posibles fraudes usando IA"""
         errors = []
         
@@ -387,37 +702,45 @@ class EnhancedAIValidator:
         # Por ahora, implementamos una versión básica
         
         # AI-FRAUD-002: Patrones de facturación sospechosos
-        pattern_errors = self._detect_suspicious_billing_patterns(records)
+        pattern_errors = self._detect_suspicious_billing_patterns(records, features)
         errors.extend(pattern_errors)
         
         return errors
     
-    def _detect_suspicious_billing_patterns(self, records: List[Dict]) -> List[ErrorResponse]:
+    @instrumented_rule("AI-FRAUD-002")
+    @requires_features("linea", "prestador", "cups")
+    def _detect_suspicious_billing_patterns(self, records: List[Dict],
+                                            features: Optional[FeatureTable] = None) -> List[ErrorResponse]:
         """Detectar patrones de facturación sospechosos"""
         errors = []
+        table = feature_table(records, features)
+        if not len(table):
+            return errors
         
         # Ejemplo: Detectar si un prestador siempre factura los mismos códigos
-        provider_procedures = defaultdict(list)
+        rows = _billing_rows(table)
+        if rows.size == 0:
+            return errors
+        provider_codes, provider_values = table.factorized("prestador", rows)
+        procedure_codes = table["cups"][rows]
+        line_numbers = table["linea"][rows]
         
-        for record in records:
-            provider = record.get('codigo_prestador', '')
-            procedure = record.get('codigo_cups', '')
-            
-            if provider and procedure:
-                provider_procedures[provider].append({
-                    'procedure': procedure,
-                    'line': record.get('line_number', 0)
-                })
+        # Por prestador: procedimientos, procedimientos distintos y línea del primero
+        span = int(procedure_codes.max()) + 1
+        procedure_counts = np.bincount(provider_codes, minlength=len(provider_values))
+        pairs = np.unique(provider_codes * span + procedure_codes)
+        unique_counts = np.bincount(pairs // span, minlength=len(provider_values))
+        _, first_rows = np.unique(provider_codes, return_index=True)
         
         # Detectar prestadores con muy poca variabilidad en procedimientos
-        for provider, procedures in provider_procedures.items():
-            if len(procedures) >= 10:  # Solo analizar prestadores con suficientes registros
-                unique_procedures = set(p['procedure'] for p in procedures)
-                variability_ratio = len(unique_procedures) / len(procedures)
+        for provider_code, provider in enumerate(provider_values):
+            procedures = int(procedure_counts[provider_code])
+            if procedures >= 10:  # Solo analizar prestadores con suficientes registros
+                variability_ratio = int(unique_counts[provider_code]) / procedures
                 
                 # Si la variabilidad es muy baja (menos del 10%), es sospechoso
                 if variability_ratio < 0.1:
-                    representative_line = procedures[0]['line']
+                    representative_line = int(line_numbers[first_rows[provider_code]])
                     errors.append(ErrorResponse(
                         line=representative_line,
                         field="codigo_prestador",
@@ -426,6 +749,53 @@ class EnhancedAIValidator:
         
         return errors
     
+    @instrumented_rule("AI-ANOM-001")
+    def _score_anomalies(self, records: List[Dict],
+                         features: Optional[FeatureTable] = None) -> List[ErrorResponse]:
+        """
+        Puntuar todos los registros del archivo con el modelo de anomalías
+        
+        Una sola llamada vectorizada sobre la matriz de características
+        (validators.anomaly_scorer). Se reportan los registros con puntuación
+        >= anomaly_score_threshold, con la característica dominante; como
+        máximo ANOMALY_MAX_FINDINGS registros, los de mayor puntuación.
+        """
+        errors = []
+        if self.anomaly_scorer is None or not records:
+            return errors
+        
+        features = feature_table(records, features)
+        scores = self.anomaly_scorer.score(features)
+        magnitude = np.abs(scores)
+        magnitude[np.isnan(magnitude)] = 0.0
+        dominant = magnitude.argmax(axis=1)
+        record_scores = magnitude[np.arange(len(records)), dominant]
+        
+        flagged = np.flatnonzero(record_scores >= self.anomaly_score_threshold)
+        if flagged.size > ANOMALY_MAX_FINDINGS:
+            flagged = flagged[np.argsort(-record_scores[flagged], kind="stable")[:ANOMALY_MAX_FINDINGS]]
+            flagged.sort()
+        
+        reported_days = set()
+        for index in flagged.tolist():
+            feature = self.anomaly_scorer.features[dominant[index]]
+            # Un volumen diario atípico se reporta una vez por (prestador, día), en su primer registro
+            if feature == "volumen_diario_prestador":
+                day_key = (int(features["prestador"][index]), int(features["dia_servicio"][index]))
+                if day_key in reported_days:
+                    continue
+                reported_days.add(day_key)
+            value = features[feature][index]
+            direction = "alto" if scores[index, dominant[index]] > 0 else "bajo"
+            errors.append(ErrorResponse(
+                line=int(features["linea"][index]),
+                field=feature,
+                error=f"Registro atípico (puntuación {record_scores[index]:.1f}): {feature} = {value:g} "
+                      f"inusualmente {direction} frente a registros comparables del archivo"
+            ))
+        
+        return errors
+    
     def get_ai_validation_summary(self, errors: List[ErrorResponse]) -> Dict[str, Any]:
         """Generar resumen de validaciones de IA"""
         if not errors:
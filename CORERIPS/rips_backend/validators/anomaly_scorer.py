@@ -0,0 +1,131 @@
+"""
+Puntuación de anomalías por lotes para las validaciones de IA (AI-ANOM-001)
+
+Los registros de un archivo se puntúan en una sola llamada vectorizada (NumPy,
+solo CPU) sobre su tabla de características (validators.ai_features). El
+puntuador se elige con AI_ANOMALY_SCORER y se carga una vez por proceso; "none"
+lo desactiva.
+
+Puntuador por defecto ("robust_z"): z robustos (mediana y MAD) de cada
+característica numérica dentro de su grupo de comparación:
+
+    edad                      dentro de (capítulo del diagnóstico, sexo)
+    valor_servicio            dentro del grupo de CUPS / código de consulta
+    volumen_diario_prestador  días del mismo prestador en el archivo
+
+La puntuación de un registro es el mayor |z|; grupos con menos de
+AI_ANOMALY_MIN_GROUP_SIZE valores no se puntúan.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+from validators.ai_features import FeatureTable
+
+AI_ANOMALY_SCORER = os.getenv("AI_ANOMALY_SCORER", "robust_z")
+ANOMALY_SCORE_THRESHOLD = float(os.getenv("AI_ANOMALY_SCORE_THRESHOLD", "6"))
+ANOMALY_MIN_GROUP_SIZE = int(os.getenv("AI_ANOMALY_MIN_GROUP_SIZE", "20"))
+# Máximo de hallazgos por archivo (los de mayor puntuación)
+ANOMALY_MAX_FINDINGS = int(os.getenv("AI_ANOMALY_MAX_FINDINGS", "200"))
+
+# Constante que hace el MAD comparable con la desviación estándar (distribución normal)
+_MAD_SCALE = 0.6745
+
+
+def grouped_robust_z(values: np.ndarray, groups: np.ndarray, min_group_size: int) -> np.ndarray:
+    """
+    z robusto de cada valor dentro de su grupo: 0.6745 * (x - mediana) / MAD
+
+    NaN para valores faltantes, grupos negativos, grupos con menos de
+    min_group_size valores y grupos con MAD cero.
+    """
+    z = np.full(values.shape, np.nan)
+    valid = np.flatnonzero((groups >= 0) & ~np.isnan(values))
+    if valid.size == 0:
+        return z
+
+    group_ids = groups[valid]
+    group_values = values[valid]
+    order = np.lexsort((group_values, group_ids))
+    sorted_groups = group_ids[order]
+    sorted_values = group_values[order]
+
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    counts = np.diff(np.r_[starts, sorted_groups.size])
+
+    def medians(sorted_data):
+        return (sorted_data[starts + (counts - 1) // 2] + sorted_data[starts + counts // 2]) / 2
+
+    median = medians(sorted_values)
+    group_of_sorted = np.repeat(np.arange(starts.size), counts)
+    deviations = np.abs(sorted_values - median[group_of_sorted])
+    # Desviaciones ordenadas dentro de cada grupo para su mediana (MAD)
+    deviations = deviations[np.lexsort((deviations, group_of_sorted))]
+    mad = medians(deviations)
+
+    scorable = (counts >= min_group_size) & (mad > 0)
+    sorted_z = np.full(sorted_values.size, np.nan)
+    rows = scorable[group_of_sorted]
+    sorted_z[rows] = _MAD_SCALE * (sorted_values[rows] - median[group_of_sorted][rows]) / mad[group_of_sorted][rows]
+
+    z[valid[order]] = sorted_z
+    return z
+
+
+class AnomalyScorer(ABC):
+    """Puntuador de anomalías: recibe las características de un archivo y puntúa todos sus registros"""
+
+    name = ""
+    # Características puntuadas (columnas de la matriz de puntuaciones)
+    features: Tuple[str, ...] = ()
+    # Características de la tabla que lee el puntuador
+    required_features: Tuple[str, ...] = ()
+
+    @abstractmethod
+    def score(self, features: FeatureTable) -> np.ndarray:
+        """Matriz (registros x características) de puntuaciones con signo; NaN si no aplica"""
+
+
+class RobustZScorer(AnomalyScorer):
+    """z robustos por grupo de comparación (ver docstring del módulo)"""
+
+    name = "robust_z"
+    features = ("edad", "valor_servicio", "volumen_diario_prestador")
+    required_features = features + ("linea", "grupo_edad", "grupo_servicio", "prestador", "dia_servicio")
+
+    def __init__(self, min_group_size: int = ANOMALY_MIN_GROUP_SIZE):
+        self.min_group_size = min_group_size
+
+    def score(self, features: FeatureTable) -> np.ndarray:
+        scores = np.full((len(features), len(self.features)), np.nan)
+        scores[:, 0] = grouped_robust_z(features["edad"], features["grupo_edad"], self.min_group_size)
+        scores[:, 1] = grouped_robust_z(features["valor_servicio"], features["grupo_servicio"], self.min_group_size)
+
+        # Volumen: un valor por (prestador, día), comparado con los días del mismo prestador
+        providers = features["prestador"]
+        days = features["dia_servicio"]
+        counted = np.flatnonzero((providers >= 0) & (days > 0))
+        if counted.size:
+            keys = providers[counted] * (int(days[counted].max()) + 1) + days[counted]
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            day_z = grouped_robust_z(
+                features["volumen_diario_prestador"][counted][first], providers[counted][first], self.min_group_size
+            )
+            scores[counted, 2] = day_z[inverse]
+        return scores
+
+
+SCORERS = {
+    RobustZScorer.name: RobustZScorer,
+}
+
+
+@lru_cache(maxsize=1)
+def get_anomaly_scorer() -> Optional[AnomalyScorer]:
+    """Puntuador del proceso según AI_ANOMALY_SCORER (None si es "none" o no existe)"""
+    scorer_class = SCORERS.get(AI_ANOMALY_SCORER.strip().lower())
+    return scorer_class() if scorer_class is not None else None
@@ -1,7 +1,13 @@
 import re
 from datetime import datetime, date
+from time import perf_counter_ns
 from typing import List, Dict, Any, Optional
 from models.schemas import ErrorResponse
+from validators.instrumentation import instrumented_rule, current_rule_metrics
+from validators.progress import current_progress
+from validators.rips_parser import ParsedRIPSFile, parse_text_file
+from validators.ruleset import fingerprint_catalog
+from validators.rule_engine import get_rule_engine
 
 class EnhancedDeterministicValidator:
     """Validador determinístico mejorado basado en reglas específicas de los archivos Excel"""
@@ -25,65 +31,13 @@ class EnhancedDeterministicValidator:
         self.codigos_cie11_validos = set()  # Catálogo CIE-11
         self.codigos_cups_validos = {}  # {código: {vigencia_inicio, vigencia_fin, tipo_servicio, etc}}
         self.mapa_cie_cups = {}  # Mapeo de correspondencia CIE-CUPS
+        self._catalog_fingerprints = {}  # Huella de cada catálogo cargado (ver catalog_version)
         
-        # Mapeo de archivos RIPS y sus campos obligatorios
+        # Reglas de campo por tipo de archivo, compiladas desde validators.rule_mappings
+        self.rule_engine = get_rule_engine()
         self.file_structures = {
-            "CT": {  # Control
-                "fields": ["TIPO_REGISTRO", "FECHA_GENERACION", "VERSION_ANEXO_TECNICO"],
-                "field_rules": {
-                    "TIPO_REGISTRO": {"type": "numeric", "min_len": 1, "max_len": 1, "mandatory": True, "values": ["1"]},
-                    "FECHA_GENERACION": {"type": "date", "min_len": 10, "max_len": 10, "mandatory": True, "format": "YYYY-MM-DD"},
-                    "VERSION_ANEXO_TECNICO": {"type": "string", "min_len": 1, "max_len": 20, "mandatory": True}
-                }
-            },
-            "US": {  # Usuarios
-                "fields": ["TIPO_DOCUMENTO_USUARIO", "NUMERO_DOCUMENTO_USUARIO", "FECHA_NACIMIENTO", "SEXO"],
-                "field_rules": {
-                    "TIPO_DOCUMENTO_USUARIO": {"type": "code", "min_len": 1, "max_len": 2, "mandatory": True, "values": self.valid_document_types},
-                    "NUMERO_DOCUMENTO_USUARIO": {"type": "string", "min_len": 1, "max_len": 20, "mandatory": True},
-                    "FECHA_NACIMIENTO": {"type": "date", "min_len": 10, "max_len": 10, "mandatory": True, "format": "YYYY-MM-DD"},
-                    "SEXO": {"type": "code", "min_len": 1, "max_len": 1, "mandatory": True, "values": self.valid_sexes}
-                }
-            },
-            "AC": {  # Consultas
-                "fields": ["CODIGO_PRESTADOR", "TIPO_DOCUMENTO_USUARIO", "NUMERO_DOCUMENTO_USUARIO", 
-                          "FECHA_CONSULTA", "DIAGNOSTICO_PRINCIPAL_CIE"],
-                "field_rules": {
-                    "CODIGO_PRESTADOR": {"type": "numeric", "min_len": 12, "max_len": 12, "mandatory": True},
-                    "TIPO_DOCUMENTO_USUARIO": {"type": "code", "min_len": 1, "max_len": 2, "mandatory": True, "values": self.valid_document_types},
-                    "NUMERO_DOCUMENTO_USUARIO": {"type": "string", "min_len": 1, "max_len": 20, "mandatory": True},
-                    "FECHA_CONSULTA": {"type": "date", "min_len": 10, "max_len": 10, "mandatory": True, "format": "YYYY-MM-DD"},
-                    "DIAGNOSTICO_PRINCIPAL_CIE": {"type": "code", "min_len": 3, "max_len": 7, "mandatory": True}
-                }
-            },
-            "AP": {  # Procedimientos
-                "fields": ["CODIGO_PRESTADOR", "CODIGO_CUPS", "FECHA_PROCEDIMIENTO"],
-                "field_rules": {
-                    "CODIGO_PRESTADOR": {"type": "numeric", "min_len": 12, "max_len": 12, "mandatory": True},
-                    "CODIGO_CUPS": {"type": "string", "min_len": 3, "max_len": 7, "mandatory": True},
-                    "FECHA_PROCEDIMIENTO": {"type": "date", "min_len": 10, "max_len": 10, "mandatory": True, "format": "YYYY-MM-DD"}
-                }
-            },
-            "AM": {  # Medicamentos
-                "fields": ["CODIGO_PRESTADOR", "CODIGO_PRODUCTO"],
-                "field_rules": {
-                    "CODIGO_PRESTADOR": {"type": "numeric", "min_len": 12, "max_len": 12, "mandatory": True},
-                    "CODIGO_PRODUCTO": {"type": "string", "min_len": 3, "max_len": 20, "mandatory": True}
-                }
-            },
-            "AF": {  # Facturación
-                "fields": ["CODIGO_PRESTADOR", "CUV"],
-                "field_rules": {
-                    "CODIGO_PRESTADOR": {"type": "numeric", "min_len": 12, "max_len": 12, "mandatory": True},
-                    "CUV": {"type": "string", "min_len": 10, "max_len": 64, "mandatory": False}  # Condicional
-                }
-            },
-            "AD": {  # Ajustes/Notas
-                "fields": ["TIPO_NOTA"],
-                "field_rules": {
-                    "TIPO_NOTA": {"type": "code", "min_len": 1, "max_len": 2, "mandatory": True, "values": self.valid_note_types}
-                }
-            }
+            file_type: self.rule_engine.file_rules(file_type).as_structure()
+            for file_type in self.rule_engine.supported_file_types
         }
     
     def validate_file(self, file_path: str, file_type: str = "AC") -> List[ErrorResponse]:
@@ -197,58 +151,18 @@ class EnhancedDeterministicValidator:
         errors = []
         
         if file_type not in self.file_structures:
-            errors.append(ErrorResponse(
-                line=0,
-                field="file_type",
-                error=f"Tipo de archivo '{file_type}' no soportado. Tipos válidos: {', '.join(self.file_structures.keys())}"
-            ))
-            return errors
+            return self._unsupported_file_type_errors(file_type)
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-                
-                if not lines:
-                    errors.append(ErrorResponse(
-                        line=0,
-                        field="archivo",
-                        error="El archivo está vacío"
-                    ))
-                    return errors
-                
-                for line_number, line in enumerate(lines, 1):
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # Verificar que tenga delimitador pipe
-                    if '|' not in line:
-                        errors.append(ErrorResponse(
-                            line=line_number,
-                            field="formato",
-                            error="Formato incorrecto: debe usar '|' como separador de campos"
-                        ))
-                        continue
-                    
-                    fields = line.split('|')
-                    line_errors = self._validate_line_enhanced(fields, line_number, file_type)
-                    errors.extend(line_errors)
-                    
-                    # Limitar errores
-                    if len(errors) >= 100:
-                        errors.append(ErrorResponse(
-                            line=line_number,
-                            field="validación",
-                            error="⚠️ Se encontraron más de 100 errores. Validación detenida."
-                        ))
-                        break
-                    
+            parsed_file = parse_text_file(file_path)
+            return self.validate_parsed_file(parsed_file, file_type)
         except UnicodeDecodeError:
             errors.append(ErrorResponse(
                 line=0,
                 field="archivo",
                 error="Error de codificación: el archivo debe estar en UTF-8"
             ))
+            return errors
         except Exception as e:
             errors.append(ErrorResponse(
                 line=0,
@@ -258,6 +172,75 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    def validate_parsed_file(self, parsed_file: ParsedRIPSFile, file_type: str,
+                             cached_line_errors: Optional[Dict[int, List[ErrorResponse]]] = None,
+                             line_errors_out: Optional[Dict[int, List[ErrorResponse]]] = None) -> List[ErrorResponse]:
+        """
+        Validar un archivo de texto ya leído (ver validators.rips_parser)
+        
+        Args:
+            parsed_file: Archivo leído con parse_text_file
+            file_type: Tipo de archivo RIPS
+            cached_line_errors: Errores ya conocidos por número de línea; esas líneas no se revalidan
+            line_errors_out: Si se indica, recibe los errores de cada línea evaluada
+        """
+        errors = []
+        
+        if file_type not in self.file_structures:
+            return self._unsupported_file_type_errors(file_type)
+        
+        if parsed_file.is_empty:
+            errors.append(ErrorResponse(
+                line=0,
+                field="archivo",
+                error="El archivo está vacío"
+            ))
+            return errors
+        
+        progress = current_progress()
+        for line_number, line, fields in parsed_file.lines:
+            if cached_line_errors is not None and line_number in cached_line_errors:
+                line_errors = cached_line_errors[line_number]
+            else:
+                line_errors = self._validate_parsed_line(line, fields, line_number, file_type)
+            
+            if line_errors_out is not None:
+                line_errors_out[line_number] = line_errors
+            errors.extend(line_errors)
+            if progress is not None:
+                progress.advance(line_number, len(errors))
+            
+            # Limitar errores (las líneas sin separador no cortan la validación)
+            if '|' in line and len(errors) >= 100:
+                errors.append(ErrorResponse(
+                    line=line_number,
+                    field="validación",
+                    error="⚠️ Se encontraron más de 100 errores. Validación detenida."
+                ))
+                break
+        
+        return errors
+    
+    def _validate_parsed_line(self, line: str, fields: List[str], line_number: int, file_type: str) -> List[ErrorResponse]:
+        """Validar una línea de texto ya separada en campos"""
+        # Verificar que tenga delimitador pipe
+        if '|' not in line:
+            return [ErrorResponse(
+                line=line_number,
+                field="formato",
+                error="Formato incorrecto: debe usar '|' como separador de campos"
+            )]
+        
+        return self._validate_line_enhanced(fields, line_number, file_type)
+    
+    def _unsupported_file_type_errors(self, file_type: str) -> List[ErrorResponse]:
+        """Error para tipos de archivo sin estructura definida"""
+        return [ErrorResponse(
+            line=0,
+            field="file_type",
+            error=f"Tipo de archivo '{file_type}' no soportado. Tipos válidos: {', '.join(self.file_structures.keys())}"
+        )]
+    
     def _validate_json_file(self, file_path: str, file_type: str) -> List[ErrorResponse]:
         """Validar archivo JSON RIPS"""
         errors = []
@@ -463,7 +446,8 @@ class EnhancedDeterministicValidator:
             ))
             return errors
         
-        # Validar cada campo según sus reglas
+        # Validar cada campo según sus reglas (medido por campo si hay colector activo)
+        metrics = current_rule_metrics()
         field_names = list(field_rules.keys())
         for i, field_name in enumerate(field_names):
             if i >= len(fields):
@@ -472,7 +456,12 @@ class EnhancedDeterministicValidator:
             field_value = fields[i]
             rule = field_rules[field_name]
             
-            field_errors = self._validate_field_by_rule(field_value, field_name, rule, line_number)
+            if metrics is None:
+                field_errors = self._validate_field_by_rule(field_value, field_name, rule, line_number)
+            else:
+                start = perf_counter_ns()
+                field_errors = self._validate_field_by_rule(field_value, field_name, rule, line_number)
+                metrics.record(f"{file_type}.{field_name}", perf_counter_ns() - start, len(field_errors))
             errors.extend(field_errors)
         
         return errors
@@ -518,7 +507,7 @@ class EnhancedDeterministicValidator:
         
         # Validar valores permitidos
         allowed_values = rule.get("values", [])
-        if allowed_values and value not in allowed_values:
+        if allowed_values and value not in rule.get("value_set", allowed_values):
             errors.append(ErrorResponse(
                 line=line_number,
                 field=field_name,
@@ -622,6 +611,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("CRUZADA-US")
     def validate_cross_field_rules(self, fields: List[str], file_type: str, line_number: int) -> List[ErrorResponse]:
         """Validar reglas que involucran múltiples campos"""
         errors = []
@@ -684,6 +674,7 @@ class EnhancedDeterministicValidator:
     # REGLAS CIE11 - Resolución 1442/1657 de 2024
     # ========================================================================
     
+    @instrumented_rule("CIE11_001")
     def validate_cie11_001_transicion_cie10_cie11(self, codigo_cie: str, fecha_servicio: date, line_number: int) -> List[ErrorResponse]:
         """
         CIE11_001: Validar que los códigos CIE correspondan a CIE-10 o CIE-11 según fecha del servicio.
@@ -711,6 +702,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("CIE11_002")
     def validate_cie11_002_coexistencia(self, codigo_cie: str, fecha_servicio: date, line_number: int) -> List[ErrorResponse]:
         """
         CIE11_002: Permitir coexistencia de CIE-10 y CIE-11 hasta el 14/08/2027.
@@ -729,6 +721,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("CIE11_003")
     def validate_cie11_003_existencia_catalogo(self, codigo_cie: str, line_number: int) -> List[ErrorResponse]:
         """
         CIE11_003: Verificar que el código CIE exista en el catálogo oficial (CIE-10 o CIE-11).
@@ -744,6 +737,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("CIE11_004")
     def validate_cie11_004_compatibilidad_sexo(self, codigo_cie: str, sexo: str, line_number: int) -> List[ErrorResponse]:
         """
         CIE11_004: Validar que el diagnóstico principal sea compatible con el sexo del paciente.
@@ -770,6 +764,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("CIE11_005")
     def validate_cie11_005_correspondencia_cie_cups(self, codigo_cie: str, codigo_cups: str, line_number: int) -> List[ErrorResponse]:
         """
         CIE11_005: Verificar correspondencia entre diagnóstico (CIE) y procedimiento (CUPS).
@@ -796,6 +791,7 @@ class EnhancedDeterministicValidator:
     # REGLAS CUPS - Resolución 2641 de 2024
     # ========================================================================
     
+    @instrumented_rule("R2641-D001")
     def validate_r2641_d001_cups_existencia(self, codigo_cups: str, line_number: int) -> List[ErrorResponse]:
         """
         R2641-D001: Validar que el código CUPS exista en el catálogo oficial vigente.
@@ -811,6 +807,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("R2641-D002")
     def validate_r2641_d002_cups_vigencia(self, codigo_cups: str, fecha_servicio: date, line_number: int) -> List[ErrorResponse]:
         """
         R2641-D002: Verificar que el CUPS esté vigente en la fecha del servicio.
@@ -839,6 +836,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("R2641-D003")
     def validate_r2641_d003_cups_tipo_servicio(self, codigo_cups: str, tipo_servicio: str, line_number: int) -> List[ErrorResponse]:
         """
         R2641-D003: Validar que el CUPS pertenezca al tipo de servicio reportado.
@@ -857,6 +855,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("R2641-D005")
     def validate_r2641_d005_cups_grupo_etario(self, codigo_cups: str, edad: int, line_number: int) -> List[ErrorResponse]:
         """
         R2641-D005: Validar coherencia entre el grupo etario permitido y el CUPS.
@@ -884,6 +883,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("R2641-D006")
     def validate_r2641_d006_cups_sexo(self, codigo_cups: str, sexo: str, line_number: int) -> List[ErrorResponse]:
         """
         R2641-D006: Validar coherencia entre el sexo y el CUPS.
@@ -913,6 +913,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("R2641-D004")
     def validate_r2641_d004_cups_tarifa(self, codigo_cups: str, line_number: int) -> List[ErrorResponse]:
         """
         R2641-D004: Verificar que el CUPS tenga un valor tarifario definido en el catálogo.
@@ -932,6 +933,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("R2641-D007")
     def validate_r2641_d007_cups_cie_asociado(self, codigo_cups: str, codigo_cie: str, line_number: int) -> List[ErrorResponse]:
         """
         R2641-D007: Verificar que el CUPS esté asociado a un código CIE válido.
@@ -958,6 +960,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("R2641-D008")
     def validate_r2641_d008_cups_duplicados(self, registros: List[Dict], line_number: int) -> List[ErrorResponse]:
         """
         R2641-D008: Validar que el CUPS no se repita en un mismo episodio con igual fecha y diagnóstico.
@@ -969,6 +972,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("R2641-D009")
     def validate_r2641_d009_cups_finalidad(self, codigo_cups: str, line_number: int) -> List[ErrorResponse]:
         """
         R2641-D009: Validar que el CUPS reportado tenga tipo de finalidad asignado.
@@ -987,6 +991,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("R2641-D010")
     def validate_r2641_d010_cups_obligatorios(self, cups_presentes: List[str], tipo_evento: str, line_number: int) -> List[ErrorResponse]:
         """
         R2641-D010: Verificar que los CUPS obligatorios según tipo de evento estén presentes.
@@ -1018,6 +1023,7 @@ class EnhancedDeterministicValidator:
     # REGLAS DE CATÁLOGOS BÁSICOS - CUPS/CIE10/DANE
     # ========================================================================
     
+    @instrumented_rule("US-001")
     def validate_us001_tipo_documento_catalogo(self, tipo_documento: str, line_number: int) -> List[ErrorResponse]:
         """
         US-001: Validar que el tipo de documento esté en el catálogo DIAN/MinSalud.
@@ -1035,6 +1041,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("AC-012")
     def validate_ac012_diagnostico_principal_vigencia(self, codigo_cie: str, fecha_servicio: date, line_number: int) -> List[ErrorResponse]:
         """
         AC-012: Validar existencia y vigencia del diagnóstico principal CIE.
@@ -1073,6 +1080,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("AP-001")
     def validate_ap001_cups_existencia_vigencia(self, codigo_cups: str, fecha_servicio: date, line_number: int) -> List[ErrorResponse]:
         """
         AP-001: Validar existencia en catálogo CUPS y vigencia.
@@ -1112,6 +1120,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("AM-001")
     def validate_am001_codigo_producto_catalogo(self, codigo_producto: str, line_number: int) -> List[ErrorResponse]:
         """
         AM-001: Validar existencia del código de producto en catálogos POS/GTIN/Código IPS.
@@ -1144,6 +1153,7 @@ class EnhancedDeterministicValidator:
     # VALIDACIONES CRUZADAS ENTRE CAMPOS
     # ========================================================================
     
+    @instrumented_rule("CRUZADA-EDAD-SEXO-DX")
     def validate_edad_sexo_diagnostico(self, edad: int, sexo: str, codigo_cie: str, line_number: int) -> List[ErrorResponse]:
         """
         Validar coherencia entre edad, sexo y diagnóstico.
@@ -1180,6 +1190,7 @@ class EnhancedDeterministicValidator:
         
         return errors
     
+    @instrumented_rule("CRUZADA-DX-PROC")
     def validate_diagnostico_procedimiento(self, codigo_cie: str, codigo_cups: str, line_number: int) -> List[ErrorResponse]:
         """
         Validar coherencia entre diagnóstico y procedimiento.
@@ -1255,15 +1266,24 @@ class EnhancedDeterministicValidator:
         # Validación básica de formato CUPS (numérico de 3-7 dígitos)
         return bool(re.match(r'^\d{3,7}$', codigo))
     
+    @property
+    def catalog_version(self) -> str:
+        """Versión de los catálogos cargados; cambia al cargar un catálogo con otro contenido"""
+        if not self._catalog_fingerprints:
+            return "none"
+        return ",".join(f"{name}={fingerprint}" for name, fingerprint in sorted(self._catalog_fingerprints.items()))
+    
     def load_cie10_catalog(self, cie10_codes: set):
         """Cargar catálogo de códigos CIE-10"""
         self.codigos_cie10_validos = cie10_codes
         # Identificar códigos obstétricos (capítulo O)
         self.codigos_obstetricos = {code for code in cie10_codes if code.startswith('O')}
+        self._catalog_fingerprints["cie10"] = fingerprint_catalog(cie10_codes)
     
     def load_cie11_catalog(self, cie11_codes: set):
         """Cargar catálogo de códigos CIE-11"""
         self.codigos_cie11_validos = cie11_codes
+        self._catalog_fingerprints["cie11"] = fingerprint_catalog(cie11_codes)
     
     def load_cups_catalog(self, cups_data: Dict[str, Dict]):
         """
@@ -1271,6 +1291,7 @@ class EnhancedDeterministicValidator:
         cups_data: {código: {vigencia_inicio, vigencia_fin, tipo_servicio, edad_minima, edad_maxima, ...}}
         """
         self.codigos_cups_validos = cups_data
+        self._catalog_fingerprints["cups"] = fingerprint_catalog(cups_data)
     
     def load_cie_cups_mapping(self, mapping: Dict[str, List[str]]):
         """
@@ -1278,3 +1299,4 @@ class EnhancedDeterministicValidator:
         mapping: {codigo_cups: [lista_de_codigos_cie_compatibles]}
         """
         self.mapa_cie_cups = mapping
+        self._catalog_fingerprints["cie_cups"] = fingerprint_catalog(mapping)
@@ -0,0 +1,180 @@
+"""
+Instrumentación por regla de los validadores RIPS
+
+Registra para cada regla: número de invocaciones, invocaciones con hallazgos,
+total de hallazgos y tiempo acumulado con percentiles aproximados.
+
+El costo por invocación es de dos lecturas de reloj y una actualización de
+contadores, por lo que puede quedar activo en producción. Los tiempos se
+agrupan en buckets de potencias de dos (en nanosegundos), de modo que la
+memoria por regla es constante sin importar cuántas veces se ejecute.
+
+Uso:
+    with collect_rule_metrics() as metrics:
+        validator.validate_file(...)
+    metrics.snapshot()          # métricas de esta ejecución
+    rule_metrics.snapshot()     # métricas agregadas del proceso
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter_ns
+from typing import Any, Dict, Iterator, Optional
+
+# Número de buckets del histograma (2**63 ns cubre cualquier duración posible)
+HISTOGRAM_BUCKETS = 64
+
+PERCENTILES = (50, 95, 99)
+
+
+class RuleStats:
+    """Contadores e histograma de tiempos de una regla"""
+
+    __slots__ = ("count", "failures", "findings", "total_ns", "max_ns", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.findings = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+
+    def add(self, elapsed_ns: int, findings: int):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.histogram[min(elapsed_ns.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        if findings:
+            self.failures += 1
+            self.findings += findings
+
+    def merge(self, other: "RuleStats"):
+        self.count += other.count
+        self.failures += other.failures
+        self.findings += other.findings
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        for i, bucket_count in enumerate(other.histogram):
+            if bucket_count:
+                self.histogram[i] += bucket_count
+
+    def percentile_ns(self, percentile: float) -> int:
+        """Percentil aproximado (límite superior del bucket)"""
+        if not self.count:
+            return 0
+        threshold = self.count * percentile / 100
+        cumulative = 0
+        for i, bucket_count in enumerate(self.histogram):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                return min(1 << i, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "count": self.count,
+            "failures": self.failures,
+            "findings": self.findings,
+            "total_ms": round(self.total_ns / 1e6, 3),
+            "mean_ms": round(self.total_ns / self.count / 1e6, 6) if self.count else 0.0,
+            "max_ms": round(self.max_ns / 1e6, 6),
+        }
+        for percentile in PERCENTILES:
+            data[f"p{percentile}_ms"] = round(self.percentile_ns(percentile) / 1e6, 6)
+        return data
+
+
+class RuleMetrics:
+    """Conjunto de estadísticas por regla"""
+
+    def __init__(self):
+        self._stats: Dict[str, RuleStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, rule_id: str, elapsed_ns: int, findings: int = 0):
+        """Registrar una invocación (no es thread-safe; ver merge)"""
+        stats = self._stats.get(rule_id)
+        if stats is None:
+            stats = self._stats[rule_id] = RuleStats()
+        stats.add(elapsed_ns, findings)
+
+    def merge(self, other: "RuleMetrics"):
+        """Agregar las métricas de otra ejecución (thread-safe)"""
+        with self._lock:
+            for rule_id, stats in other._stats.items():
+                target = self._stats.get(rule_id)
+                if target is None:
+                    target = self._stats[rule_id] = RuleStats()
+                target.merge(stats)
+
+    def __getstate__(self):
+        # Sin el lock: las métricas de un proceso de trabajo se devuelven por pickle
+        with self._lock:
+            return {"_stats": self._stats}
+
+    def __setstate__(self, state):
+        self._stats = state["_stats"]
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas por regla ordenadas por tiempo acumulado (descendente)"""
+        with self._lock:
+            items = [(rule_id, stats.to_dict()) for rule_id, stats in self._stats.items()]
+        items.sort(key=lambda item: item[1]["total_ms"], reverse=True)
+        return dict(items)
+
+
+# Métricas agregadas de todas las ejecuciones del proceso
+rule_metrics = RuleMetrics()
+
+_current_metrics: ContextVar[Optional[RuleMetrics]] = ContextVar("rule_metrics", default=None)
+
+
+def current_rule_metrics() -> Optional[RuleMetrics]:
+    """Colector activo de la ejecución en curso (None si no hay)"""
+    return _current_metrics.get()
+
+
+@contextmanager
+def collect_rule_metrics() -> Iterator[RuleMetrics]:
+    """
+    Activar un colector para la ejecución en curso
+
+    Al salir, las métricas se agregan a rule_metrics.
+    """
+    metrics = RuleMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+        rule_metrics.merge(metrics)
+
+
+def instrumented_rule(rule_id: str):
+    """
+    Decorador para medir un método de regla que retorna List[ErrorResponse]
+
+    Si no hay colector activo la regla se ejecuta sin medir.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = _current_metrics.get()
+            if metrics is None:
+                return func(*args, **kwargs)
+            start = perf_counter_ns()
+            result = func(*args, **kwargs)
+            metrics.record(rule_id, perf_counter_ns() - start, len(result) if result else 0)
+            return result
+        wrapper.rule_id = rule_id
+        return wrapper
+    return decorator
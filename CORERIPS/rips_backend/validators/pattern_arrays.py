@@ -0,0 +1,71 @@
+"""
+Utilidades vectorizadas (NumPy) para las reglas de patrones entre registros
+
+Las reglas AI-PAT-001 y AI-PAT-002 trabajan sobre arreglos ordenados en lugar de
+diccionarios anidados:
+
+- las claves de texto (usuario, prestador, CUPS) se codifican como enteros en
+  orden de primera aparición (factorize)
+- las fechas se convierten una sola vez por valor distinto a ordinal (días)
+- las ventanas y conteos se resuelven con lexsort, np.diff y np.unique
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Fecha no válida (o vacía) en los arreglos de ordinales
+INVALID_DATE = -1
+
+_ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def parse_date_ordinal(date_str: str) -> int:
+    """
+    Ordinal de una fecha YYYY-MM-DD o DD/MM/YYYY (INVALID_DATE si no es válida)
+
+    Mismo criterio que datetime.strptime con '%Y-%m-%d' si el texto contiene '-'
+    y '%d/%m/%Y' en otro caso; el caso ISO exacto evita strptime.
+    """
+    try:
+        if '-' in date_str:
+            if _ISO_DATE.fullmatch(date_str):
+                return datetime(int(date_str[:4]), int(date_str[5:7]), int(date_str[8:10])).toordinal()
+            return datetime.strptime(date_str, '%Y-%m-%d').toordinal()
+        return datetime.strptime(date_str, '%d/%m/%Y').toordinal()
+    except ValueError:
+        return INVALID_DATE
+
+
+def date_ordinals(date_strings: Iterable) -> np.ndarray:
+    """
+    Ordinales de una secuencia de fechas, interpretando cada texto distinto una sola vez
+
+    Los valores que ya son ordinales (int, registros compactos) se usan tal cual.
+    """
+    memo: Dict[str, int] = {}
+    ordinals = []
+    for date_str in date_strings:
+        if type(date_str) is int:
+            ordinals.append(date_str)
+            continue
+        ordinal = memo.get(date_str)
+        if ordinal is None:
+            ordinal = memo[date_str] = parse_date_ordinal(date_str)
+        ordinals.append(ordinal)
+    return np.fromiter(ordinals, dtype=np.int64, count=len(ordinals))
+
+
+def factorize(values: Iterable) -> Tuple[np.ndarray, List]:
+    """
+    Codificar valores como enteros en orden de primera aparición
+
+    Returns:
+        (códigos int64, valores distintos en orden de primera aparición)
+    """
+    codes_by_value: Dict = {}
+    codes = [codes_by_value.setdefault(value, len(codes_by_value)) for value in values]
+    return np.fromiter(codes, dtype=np.int64, count=len(codes)), list(codes_by_value)
+
@@ -0,0 +1,115 @@
+"""
+Implementaciones de referencia de las reglas de patrones de IA (AI-PAT-001, AI-PAT-002)
+
+Versiones con diccionarios anidados y strptime contra las que se comparan las
+reglas vectorizadas de EnhancedAIValidator, más un generador de registros
+sintéticos. Las usan los tests de equivalencia y scripts/benchmark_ai_patterns.py.
+"""
+import random
+from collections import defaultdict
+from datetime import datetime, date
+
+from models.schemas import ErrorResponse
+
+
+def parse_date(date_str):
+    """Fecha YYYY-MM-DD o DD/MM/YYYY con strptime (ValueError si no es válida)"""
+    if '-' in date_str:
+        return datetime.strptime(date_str, '%Y-%m-%d').date()
+    return datetime.strptime(date_str, '%d/%m/%Y').date()
+
+
+def reference_duplicates(records):
+    """AI-PAT-001 en su versión anterior: diccionarios anidados por usuario y CUPS"""
+    errors = []
+    user_procedures = defaultdict(list)
+    for record in records:
+        user_key = f"{record.get('tipo_documento', '')}_{record.get('numero_documento', '')}"
+        procedure_code = record.get('codigo_cups', '')
+        date_str = record.get('fecha_procedimiento', record.get('fecha_consulta', ''))
+        if user_key and procedure_code and date_str:
+            user_procedures[user_key].append({'procedure': procedure_code, 'date': date_str, 'line': record.get('line_number', 0)})
+    for user_key, procedures in user_procedures.items():
+        procedure_dates = defaultdict(list)
+        for proc in procedures:
+            procedure_dates[proc['procedure']].append(proc)
+        for procedure_code, proc_list in procedure_dates.items():
+            if len(proc_list) > 1:
+                dates = []
+                for proc in proc_list:
+                    try:
+                        dates.append((parse_date(proc['date']), proc['line']))
+                    except ValueError:
+                        continue
+                dates.sort()
+                for i in range(1, len(dates)):
+                    days_diff = (dates[i][0] - dates[i-1][0]).days
+                    if days_diff <= 7:
+                        errors.append(ErrorResponse(
+                            line=dates[i][1], field="codigo_cups",
+                            error=f"Procedimiento duplicado ({procedure_code}) en {days_diff} días para el mismo usuario"
+                        ))
+    return errors
+
+
+def reference_volumes(records, threshold=50, provider_thresholds=None):
+    """Índice (prestador, día) -> [conteo, primera línea, última línea] con diccionarios"""
+    provider_thresholds = provider_thresholds or {}
+    errors = []
+    index = defaultdict(dict)
+    for record in records:
+        provider = record.get('codigo_prestador', '')
+        date_str = record.get('fecha_procedimiento', record.get('fecha_consulta', ''))
+        if provider and date_str:
+            try:
+                service_date = parse_date(date_str)
+            except ValueError:
+                continue
+            line = record.get('line_number', 0)
+            entry = index[provider].get(service_date)
+            if entry is None:
+                index[provider][service_date] = [1, line, line]
+            else:
+                entry[0] += 1
+                entry[1] = min(entry[1], line)
+                entry[2] = max(entry[2], line)
+    for provider, days in index.items():
+        limit = provider_thresholds.get(provider, threshold)
+        for service_date, (count, first_line, last_line) in days.items():
+            if count > limit:
+                errors.append(ErrorResponse(
+                    line=first_line, field="codigo_prestador",
+                    error=f"Volumen atípico: {count} servicios en un día ({service_date}) para prestador "
+                          f"{provider} (umbral: {limit}; líneas {first_line} a {last_line})"
+                ))
+    return errors
+
+
+def random_records(seed, n, users=40, providers=4, cups=6, days=40):
+    """Registros AP sintéticos con formatos de fecha mixtos, fechas inválidas y campos vacíos"""
+    rng = random.Random(seed)
+    base = date(2024, 1, 1).toordinal()
+    records = []
+    for line in range(1, n + 1):
+        service_date = date.fromordinal(base + rng.randrange(days))
+        style = rng.random()
+        if style < 0.75:
+            date_str = service_date.isoformat()
+        elif style < 0.9:
+            date_str = service_date.strftime('%d/%m/%Y')
+        elif style < 0.95:
+            date_str = f"{service_date.year}-{service_date.month}-{service_date.day}"  # sin ceros
+        else:
+            date_str = rng.choice(["", "2024-02-30", "sin fecha", "2024-13-01"])
+        record = {
+            "line_number": line,
+            "file_type": "AP",
+            "codigo_prestador": f"P{rng.randrange(providers)}" if rng.random() > 0.02 else "",
+            "tipo_documento": rng.choice(["CC", "TI"]),
+            "numero_documento": str(rng.randrange(users)),
+            "codigo_cups": f"C{rng.randrange(cups)}" if rng.random() > 0.02 else "",
+        }
+        key = "fecha_procedimiento" if rng.random() > 0.1 else "fecha_consulta"
+        record[key] = date_str
+        records.append(record)
+    return records
@@ -0,0 +1,144 @@
+"""
+Progreso de una validación en curso
+
+Los validadores informan el avance (fase, líneas procesadas, hallazgos) al
+seguimiento activo de la ejecución, si lo hay; sin seguimiento activo las
+llamadas no hacen nada. Los eventos se publican con limitación de frecuencia
+(a lo sumo uno cada PROGRESS_MIN_INTERVAL segundos, más los cambios de fase),
+así que el costo por línea es un par de comparaciones.
+
+Uso:
+    progress = ValidationProgress(publish)
+    with track_progress(progress):
+        validator.validate_parsed_file(...)
+    progress.finish()
+"""
+
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Any, Callable, Dict, Iterator, Optional
+
+PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", "0.5"))
+
+# Cada cuántas líneas se consulta el reloj para decidir si publicar
+PROGRESS_CHECK_EVERY = 256
+
+PHASE_COMPLETED = "completado"
+PHASE_ERROR = "error"
+TERMINAL_PHASES = (PHASE_COMPLETED, PHASE_ERROR)
+
+
+class ValidationProgress:
+    """Estado de avance de una validación y publicación limitada de eventos"""
+
+    def __init__(self, publish: Callable[[Dict[str, Any]], None], min_interval: float = PROGRESS_MIN_INTERVAL):
+        self.publish = publish
+        self.min_interval = min_interval
+        self.phase = "en_cola"
+        self.total_lines = 0
+        self.lines_processed = 0
+        self.detail: Optional[str] = None
+        self.started = monotonic()
+        self._phase_started = self.started
+        self._phase_lines = 0
+        self._done_findings = 0
+        self._phase_findings = 0
+        self._last_publish = 0.0
+        self._next_check = 0
+
+    @property
+    def findings(self) -> int:
+        return self._done_findings + self._phase_findings
+
+    def set_phase(self, phase: str, total_lines: Optional[int] = None):
+        """Empezar una fase (los hallazgos de la fase anterior quedan acumulados)"""
+        self._done_findings += self._phase_findings
+        self._phase_findings = 0
+        self.phase = phase
+        if total_lines is not None:
+            self.total_lines = total_lines
+        self._phase_started = monotonic()
+        self._phase_lines = self.lines_processed
+        self._emit()
+
+    def advance(self, lines_processed: int, findings: int = 0):
+        """
+        Avance dentro de la fase: líneas procesadas y hallazgos de la fase hasta ahora
+
+        Publica solo si pasó min_interval desde el último evento.
+        """
+        self.lines_processed = lines_processed
+        self._phase_findings = findings
+        if lines_processed < self._next_check:
+            return
+        self._next_check = lines_processed + PROGRESS_CHECK_EVERY
+        if monotonic() - self._last_publish >= self.min_interval:
+            self._emit()
+
+    def finish(self, phase: str = PHASE_COMPLETED, detail: Optional[str] = None, findings: Optional[int] = None):
+        """Publicar el evento final (completado o error)"""
+        if findings is not None:
+            self._done_findings, self._phase_findings = findings, 0
+        if phase == PHASE_COMPLETED:
+            self.lines_processed = max(self.lines_processed, self.total_lines)
+        self.phase = phase
+        self.detail = detail
+        self._emit()
+
+    def eta_seconds(self) -> Optional[float]:
+        """Tiempo restante estimado con el ritmo de la fase actual"""
+        processed = self.lines_processed - self._phase_lines
+        remaining = self.total_lines - self.lines_processed
+        if self.phase in TERMINAL_PHASES or processed <= 0 or remaining <= 0:
+            return None
+        return round((monotonic() - self._phase_started) / processed * remaining, 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "phase": self.phase,
+            "lines_processed": self.lines_processed,
+            "total_lines": self.total_lines,
+            "percent": round(100 * self.lines_processed / self.total_lines, 1) if self.total_lines else None,
+            "findings_total": self.findings,
+            "elapsed_s": round(monotonic() - self.started, 1),
+            "eta_s": self.eta_seconds(),
+            "detail": self.detail,
+        }
+
+    def _emit(self):
+        self._last_publish = monotonic()
+        self.publish(self.snapshot())
+
+
+_current_progress: ContextVar[Optional[ValidationProgress]] = ContextVar("validation_progress", default=None)
+
+
+def current_progress() -> Optional[ValidationProgress]:
+    """Seguimiento activo de la ejecución en curso (None si no hay)"""
+    return _current_progress.get()
+
+
+@contextmanager
+def track_progress(progress: ValidationProgress) -> Iterator[ValidationProgress]:
+    """Activar un seguimiento para la ejecución en curso"""
+    token = _current_progress.set(progress)
+    try:
+        yield progress
+    finally:
+        _current_progress.reset(token)
+
+
+def report_phase(phase: str, total_lines: Optional[int] = None):
+    """Informar el inicio de una fase al seguimiento activo, si lo hay"""
+    progress = _current_progress.get()
+    if progress is not None:
+        progress.set_phase(phase, total_lines)
+
+
+def report_findings(lines_processed: int, findings: int):
+    """Informar avance al seguimiento activo, si lo hay"""
+    progress = _current_progress.get()
+    if progress is not None:
+        progress.advance(lines_processed, findings)
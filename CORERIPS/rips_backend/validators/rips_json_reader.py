@@ -0,0 +1,123 @@
+"""
+Lectura en streaming de archivos RIPS JSON (FEV-RIPS: usuarios -> servicios)
+
+Convierte la estructura anidada en los mismos registros compactos que el
+validador de IA obtiene de los archivos de texto (validators.ai_records):
+
+- Con ijson instalado el arreglo "usuarios" se recorre usuario por usuario, sin
+  cargar el documento completo en memoria; sin ijson se usa json.load.
+- El sexo, la fecha de nacimiento y el documento del usuario se leen una vez
+  por usuario y se copian a cada uno de sus servicios.
+- Los archivos JSON no tienen líneas: line_number es la posición (1..n) del
+  servicio en el archivo, en el orden del documento.
+"""
+
+import io
+import json
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from validators.ai_records import AIRecord, RecordFactory
+
+try:
+    import ijson
+except ImportError:  # ijson es opcional: sin él se carga el documento completo
+    ijson = None
+
+JSON_FILE_EXTENSIONS = ["json"]
+
+# Tipo de servicio en "servicios" -> (tipo de archivo RIPS, campo JSON de la fecha, campo del registro -> campo JSON)
+SERVICE_FIELD_MAPPINGS: Dict[str, Tuple[str, str, Dict[str, str]]] = {
+    "consultas": ("AC", "fechaInicioAtencion", {
+        "codigo_prestador": "codPrestador",
+        "codigo_consulta": "codConsulta",
+        "diagnostico_principal": "codDiagnosticoPrincipal",
+        "diagnostico_relacionado": "codDiagnosticoRelacionado1",
+    }),
+    "procedimientos": ("AP", "fechaInicioAtencion", {
+        "codigo_prestador": "codPrestador",
+        "codigo_cups": "codProcedimiento",
+        "diagnostico_principal": "codDiagnosticoPrincipal",
+    }),
+    "urgencias": ("AU", "fechaIngreso", {
+        "codigo_prestador": "codPrestador",
+        "diagnostico_principal": "codDiagnosticoIngreso",
+    }),
+    "hospitalizaciones": ("AH", "fechaIngreso", {
+        "codigo_prestador": "codPrestador",
+        "diagnostico_principal": "codDiagnosticoIngreso",
+    }),
+}
+
+
+def is_json_file(file_path: str) -> bool:
+    """Verificar si el archivo se procesa como RIPS JSON"""
+    return file_path.lower().split('.')[-1] in JSON_FILE_EXTENSIONS
+
+
+def _text(value: Any) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def iter_usuarios(file_path: str, content: Optional[bytes] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Recorrer los usuarios del archivo uno a uno
+
+    Raises:
+        ValueError: si el JSON no es válido (json.JSONDecodeError o error de ijson)
+    """
+    if ijson is not None:
+        source = open(file_path, 'rb') if content is None else io.BytesIO(content)
+        with source:
+            try:
+                yield from ijson.items(source, 'usuarios.item')
+            except ijson.JSONError as e:
+                raise ValueError(f"Error de formato JSON: {str(e)}") from e
+        return
+
+    if content is not None:
+        data = json.loads(content.decode('utf-8'))
+    else:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    if isinstance(data, dict):
+        yield from data.get("usuarios") or []
+
+
+def iter_json_records(file_path: str, content: Optional[bytes] = None) -> Iterator[AIRecord]:
+    """
+    Registros compactos para el validador de IA, uno por servicio
+
+    Cada registro es del tipo de su servicio (AC, AP, AU o AH, ver
+    validators.ai_records) y lleva los datos del usuario (documento, sexo,
+    fecha de nacimiento) y los campos del servicio según SERVICE_FIELD_MAPPINGS.
+    Las fechas conservan solo YYYY-MM-DD (el JSON puede traer la hora) y
+    vrServicio se guarda como valor_servicio.
+    """
+    factory = RecordFactory()
+    line_number = 0
+    for usuario in iter_usuarios(file_path, content):
+        if not isinstance(usuario, dict):
+            continue
+        patient = {
+            "tipo_documento": _text(usuario.get("tipoDocumentoIdentificacion")),
+            "numero_documento": _text(usuario.get("numDocumentoIdentificacion")),
+            "sexo": _text(usuario.get("codSexo")),
+        }
+        birth_date = _text(usuario.get("fechaNacimiento"))[:10]
+        servicios = usuario.get("servicios") or {}
+
+        for service_key, (file_type, date_key, mapping) in SERVICE_FIELD_MAPPINGS.items():
+            for service in servicios.get(service_key) or []:
+                line_number += 1
+                values = dict(patient)
+                for field_name, json_key in mapping.items():
+                    values[field_name] = _text(service.get(json_key))
+                # El servicio puede traer su propio documento (p.ej. facturas consolidadas)
+                if service.get("numDocumentoIdentificacion"):
+                    values["tipo_documento"] = _text(service.get("tipoDocumentoIdentificacion")) or patient["tipo_documento"]
+                    values["numero_documento"] = _text(service.get("numDocumentoIdentificacion"))
+                yield factory.from_values(
+                    file_type, line_number, values,
+                    service_date=_text(service.get(date_key))[:10], birth_date=birth_date,
+                    service_value=service.get("vrServicio")
+                )
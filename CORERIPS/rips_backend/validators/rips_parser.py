@@ -0,0 +1,94 @@
+"""
+Lectura única de archivos RIPS de texto (formato pipe-delimited)
+
+El archivo se lee una sola vez y el resultado se comparte entre el validador
+determinístico y el validador de IA. El conteo de líneas y de registros se
+obtiene en la misma pasada.
+"""
+
+import io
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+# Extensiones que se procesan como texto delimitado por '|'
+TEXT_FILE_EXTENSIONS = ["txt", "csv"]
+
+
+class ParsedLine(NamedTuple):
+    """Línea no vacía del archivo con sus campos ya separados"""
+    line_number: int
+    text: str
+    fields: List[str]
+
+
+class ParsedRIPSFile:
+    """Resultado de leer un archivo RIPS de texto una sola vez"""
+
+    def __init__(self, file_path: str, lines: List[ParsedLine], raw_line_count: int):
+        self.file_path = file_path
+        self.lines = lines
+        self.raw_line_count = raw_line_count
+        self.total_records = sum(1 for line in lines if '|' in line.text)
+
+    @property
+    def is_empty(self) -> bool:
+        """El archivo no tiene ninguna línea (ni siquiera vacías)"""
+        return self.raw_line_count == 0
+
+    @property
+    def total_lines(self) -> int:
+        """Número de líneas no vacías"""
+        return len(self.lines)
+
+
+def is_text_file(file_path: str) -> bool:
+    """Verificar si el archivo se procesa como texto delimitado"""
+    return file_path.lower().split('.')[-1] in TEXT_FILE_EXTENSIONS
+
+
+def parse_text_file(file_path: str, content: Optional[bytes] = None) -> ParsedRIPSFile:
+    """
+    Leer archivo RIPS de texto en una sola pasada
+
+    Args:
+        file_path: Ruta del archivo
+        content: Contenido ya leído del archivo (evita volver a abrirlo)
+
+    Raises:
+        UnicodeDecodeError: si el archivo no está en UTF-8
+        OSError: si el archivo no se puede leer
+    """
+    lines = []
+    raw_line_count = 0
+
+    if content is not None:
+        source = io.TextIOWrapper(io.BytesIO(content), encoding='utf-8')
+    else:
+        source = open(file_path, 'r', encoding='utf-8')
+
+    with source as file:
+        for line_number, line in enumerate(file, 1):
+            raw_line_count += 1
+            line = line.strip()
+            if not line:
+                continue
+            lines.append(ParsedLine(line_number, line, line.split('|')))
+
+    return ParsedRIPSFile(file_path, lines, raw_line_count)
+
+
+def iter_text_fields(file_path: str) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Recorrer las líneas no vacías como (número de línea, campos) sin conservarlas
+
+    Para consumidores que solo necesitan una pasada (p.ej. el validador de IA
+    cuando valida un archivo por sí solo).
+
+    Raises:
+        UnicodeDecodeError: si el archivo no está en UTF-8
+        OSError: si el archivo no se puede leer
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if line:
+                yield line_number, line.split('|')
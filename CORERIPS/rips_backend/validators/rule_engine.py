@@ -0,0 +1,181 @@
+"""
+Motor de reglas compilado a partir de validators.rule_mappings
+
+El catálogo declarativo (RIPS_VALIDATION_RULES, AI_VALIDATION_RULES y el
+"layout" de RIPS_FILE_STRUCTURES) se compila una sola vez en:
+
+- índices por id, por tipo de archivo y por categoría (búsquedas O(1))
+- reglas ejecutables por campo para cada tipo de archivo, en el orden del layout
+
+El validador determinístico valida las líneas con estas reglas, de modo que
+agregar o ajustar una regla de campo es un cambio de datos en rule_mappings.
+
+Traducción de cada regla de campo:
+    data_type        -> type ("Numeric" -> "numeric", "Date" -> "date", ...)
+    min/max_length   -> min_len / max_len
+    mandatory        -> mandatory
+    allowed_values   -> values, solo si "enforce_allowed_values" es True (en el
+                        resto de reglas son una descripción del dominio)
+    allowed_values   -> format, para reglas de tipo Date
+"""
+
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from validators.rule_mappings import (
+    RIPS_VALIDATION_RULES,
+    AI_VALIDATION_RULES,
+    RIPS_FILE_STRUCTURES,
+    RuleCategory,
+)
+
+# Reglas que aplican a cualquier tipo de archivo
+ALL_FILE_TYPES = "ALL"
+
+DATE_FORMATS = ("YYYY-MM-DD", "DD/MM/YYYY")
+DEFAULT_DATE_FORMAT = "YYYY-MM-DD"
+
+_DATA_TYPES = {
+    "numeric": "numeric",
+    "date": "date",
+    "code": "code",
+    "string": "string",
+}
+
+
+def compile_field_rule(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """Convertir una regla del catálogo en la regla de campo que ejecuta el validador"""
+    data_type = _DATA_TYPES.get(str(rule.get("data_type", "String")).lower())
+    if data_type is None:
+        raise ValueError(f"Regla {rule['id']}: tipo de dato no soportado '{rule.get('data_type')}'")
+
+    compiled = {
+        "id": rule["id"],
+        "type": data_type,
+        "min_len": rule.get("min_length", 0),
+        "max_len": rule.get("max_length", float('inf')),
+        "mandatory": bool(rule.get("mandatory", False)),
+    }
+
+    allowed_values = list(rule.get("allowed_values") or [])
+    if data_type == "date":
+        compiled["format"] = next((value for value in allowed_values if value in DATE_FORMATS), DEFAULT_DATE_FORMAT)
+    elif rule.get("enforce_allowed_values") and allowed_values:
+        compiled["values"] = allowed_values
+        compiled["value_set"] = frozenset(allowed_values)
+
+    return compiled
+
+
+class CompiledFileRules:
+    """Reglas de campo de un tipo de archivo, en el orden del layout"""
+
+    __slots__ = ("file_type", "fields", "field_rules")
+
+    def __init__(self, file_type: str, fields: List[str], field_rules: Dict[str, Dict[str, Any]]):
+        self.file_type = file_type
+        self.fields = fields
+        self.field_rules = field_rules
+
+    @property
+    def min_fields(self) -> int:
+        """Número mínimo de campos que debe tener una línea"""
+        return len(self.fields)
+
+    def as_structure(self) -> Dict[str, Any]:
+        """Formato {"fields", "field_rules"} usado históricamente por file_structures"""
+        return {"fields": list(self.fields), "field_rules": self.field_rules}
+
+
+class RuleEngine:
+    """Catálogo de reglas compilado e indexado"""
+
+    def __init__(self, rules: Optional[Dict[str, Dict]] = None, ai_rules: Optional[Dict[str, Dict]] = None,
+                 file_structures: Optional[Dict[str, Dict]] = None):
+        self.rules = RIPS_VALIDATION_RULES if rules is None else rules
+        self.ai_rules = AI_VALIDATION_RULES if ai_rules is None else ai_rules
+        self.file_structures = RIPS_FILE_STRUCTURES if file_structures is None else file_structures
+
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_file_type: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_category: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        self._by_field: Dict[tuple, Dict[str, Any]] = {}
+        self._file_rules: Dict[str, CompiledFileRules] = {}
+        self._compile()
+
+    def _compile(self):
+        by_file_type = defaultdict(list)
+        common_rules = []
+
+        for rule_id, rule in self.rules.items():
+            self._by_id[rule_id] = rule
+            self._by_category[rule["category"]].append(rule)
+            if rule["file_type"] == ALL_FILE_TYPES:
+                common_rules.append(rule)
+            else:
+                by_file_type[rule["file_type"]].append(rule)
+            key = (rule["file_type"], rule["field"])
+            if key in self._by_field:
+                raise ValueError(f"Reglas duplicadas para {key}: {self._by_field[key]['id']} y {rule_id}")
+            self._by_field[key] = rule
+
+        for rule_id, rule in self.ai_rules.items():
+            self._by_id[rule_id] = rule
+            self._by_category[rule["rule_category"]].append(rule)
+
+        # Mismo orden que la consulta lineal: reglas del tipo o "ALL" (en orden del catálogo) y luego IA
+        file_types = set(by_file_type) | set(self.file_structures)
+        ai_rules = list(self.ai_rules.values())
+        for file_type in file_types:
+            self._by_file_type[file_type] = [
+                rule for rule in self.rules.values()
+                if rule["file_type"] in (file_type, ALL_FILE_TYPES)
+            ] + ai_rules
+        self._rules_for_unknown_type = common_rules + ai_rules
+
+        for file_type, structure in self.file_structures.items():
+            layout = structure.get("layout")
+            if not layout:
+                continue
+            field_rules = {}
+            for field_name in layout:
+                rule = self.rule_for_field(file_type, field_name)
+                if rule is None:
+                    raise ValueError(f"El layout de {file_type} usa el campo {field_name} sin regla en RIPS_VALIDATION_RULES")
+                field_rules[field_name] = compile_field_rule(rule)
+            self._file_rules[file_type] = CompiledFileRules(file_type, list(layout), field_rules)
+
+    def rule(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        """Regla por id (determinística o de IA)"""
+        return self._by_id.get(rule_id)
+
+    def rule_for_field(self, file_type: str, field_name: str) -> Optional[Dict[str, Any]]:
+        """Regla del campo en el tipo de archivo; si no hay, la regla común ("ALL") del campo"""
+        rule = self._by_field.get((file_type, field_name))
+        if rule is None:
+            rule = self._by_field.get((ALL_FILE_TYPES, field_name))
+        return rule
+
+    def rules_for_file_type(self, file_type: str) -> List[Dict[str, Any]]:
+        """Reglas del tipo de archivo, reglas "ALL" y reglas de IA"""
+        return list(self._by_file_type.get(file_type, self._rules_for_unknown_type))
+
+    def rules_for_category(self, category: RuleCategory) -> List[Dict[str, Any]]:
+        """Reglas (determinísticas y de IA) de una categoría"""
+        return list(self._by_category.get(category, []))
+
+    def file_rules(self, file_type: str) -> Optional[CompiledFileRules]:
+        """Reglas de campo compiladas del tipo de archivo (None si no tiene layout)"""
+        return self._file_rules.get(file_type)
+
+    @property
+    def supported_file_types(self) -> List[str]:
+        """Tipos de archivo con reglas de campo, en el orden de RIPS_FILE_STRUCTURES"""
+        return list(self._file_rules.keys())
+
+
+@lru_cache(maxsize=1)
+def get_rule_engine() -> RuleEngine:
+    """Motor compilado del catálogo del módulo (se construye una vez por proceso)"""
+    return RuleEngine()
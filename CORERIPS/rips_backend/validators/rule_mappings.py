@@ -36,6 +36,7 @@ RIPS_VALIDATION_RULES = {
         "cardinality": "1..1",
         "mandatory": True,
         "allowed_values": ["1"],
+        "enforce_allowed_values": True,
         "validation_rule": "Debe ser 1 (control)",
         "severity": ValidationSeverity.BLOQUEANTE,
         "type": ValidationType.DETERMINISTIC,
@@ -70,6 +71,7 @@ RIPS_VALIDATION_RULES = {
         "cardinality": "1..1",
         "mandatory": True,
         "allowed_values": ["CC", "TI", "RC", "CE", "PA", "NUIP", "MS"],
+        "enforce_allowed_values": True,
         "validation_rule": "Valor en catálogo DIAN/MinSalud",
         "severity": ValidationSeverity.BLOQUEANTE,
         "type": ValidationType.DETERMINISTIC,
@@ -94,6 +96,110 @@ RIPS_VALIDATION_RULES = {
         "normative_reference": "Lineamientos generación/validación/envío RIPS-FEV"
     },
     
+    "US-002": {
+        "id": "US-002",
+        "file_type": "US",
+        "field": "NUMERO_DOCUMENTO_USUARIO",
+        "data_type": "String",
+        "min_length": 1,
+        "max_length": 20,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["Número de documento"],
+        "validation_rule": "Obligatorio; coherente con tipo de documento",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.FORMAT,
+        "normative_reference": "Resolución 2275 de 2023 - Anexo Técnico (estructura RIPS/FEV)"
+    },
+    
+    "US-008": {
+        "id": "US-008",
+        "file_type": "US",
+        "field": "SEXO",
+        "data_type": "Code",
+        "min_length": 1,
+        "max_length": 1,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["M", "F"],
+        "enforce_allowed_values": True,
+        "validation_rule": "Valor en catálogo de sexo biológico",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.BUSINESS,
+        "normative_reference": "Catálogos oficiales DIAN/MinSalud"
+    },
+    
+    "AC-001": {
+        "id": "AC-001",
+        "file_type": "AC",
+        "field": "CODIGO_PRESTADOR",
+        "data_type": "Numeric",
+        "min_length": 12,
+        "max_length": 12,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["Código de habilitación REPS"],
+        "validation_rule": "12 dígitos; prestador habilitado",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.FORMAT,
+        "normative_reference": "Resolución 2275 de 2023 - Anexo Técnico (estructura RIPS/FEV)"
+    },
+    
+    "AC-004": {
+        "id": "AC-004",
+        "file_type": "AC",
+        "field": "TIPO_DOCUMENTO_USUARIO",
+        "data_type": "Code",
+        "min_length": 1,
+        "max_length": 2,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["CC", "TI", "RC", "CE", "PA", "NUIP", "MS"],
+        "enforce_allowed_values": True,
+        "validation_rule": "Valor en catálogo DIAN/MinSalud",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.BUSINESS,
+        "normative_reference": "Catálogos oficiales DIAN/MinSalud"
+    },
+    
+    "AC-005": {
+        "id": "AC-005",
+        "file_type": "AC",
+        "field": "NUMERO_DOCUMENTO_USUARIO",
+        "data_type": "String",
+        "min_length": 1,
+        "max_length": 20,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["Número de documento"],
+        "validation_rule": "Debe existir en archivo US",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.FORMAT,
+        "normative_reference": "Resolución 2275 de 2023 - Anexo Técnico (estructura RIPS/FEV)"
+    },
+    
+    "AC-010": {
+        "id": "AC-010",
+        "file_type": "AC",
+        "field": "FECHA_CONSULTA",
+        "data_type": "Date",
+        "min_length": 10,
+        "max_length": 10,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["YYYY-MM-DD"],
+        "validation_rule": "Formato fecha; <= fecha generación",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.FORMAT,
+        "normative_reference": "Resolución 2275 de 2023 - Anexo Técnico (estructura RIPS/FEV)"
+    },
+    
     "AC-012": {
         "id": "AC-012",
         "file_type": "AC",
@@ -128,6 +234,40 @@ RIPS_VALIDATION_RULES = {
         "normative_reference": "Catálogos oficiales CUPS MinSalud"
     },
     
+    "AP-002": {
+        "id": "AP-002",
+        "file_type": "AP",
+        "field": "CODIGO_PRESTADOR",
+        "data_type": "Numeric",
+        "min_length": 12,
+        "max_length": 12,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["Código de habilitación REPS"],
+        "validation_rule": "12 dígitos; prestador habilitado",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.FORMAT,
+        "normative_reference": "Resolución 2275 de 2023 - Anexo Técnico (estructura RIPS/FEV)"
+    },
+    
+    "AP-003": {
+        "id": "AP-003",
+        "file_type": "AP",
+        "field": "FECHA_PROCEDIMIENTO",
+        "data_type": "Date",
+        "min_length": 10,
+        "max_length": 10,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["YYYY-MM-DD"],
+        "validation_rule": "Formato fecha; <= fecha generación",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.FORMAT,
+        "normative_reference": "Resolución 2275 de 2023 - Anexo Técnico (estructura RIPS/FEV)"
+    },
+    
     "AM-001": {
         "id": "AM-001",
         "file_type": "AM",
@@ -145,6 +285,40 @@ RIPS_VALIDATION_RULES = {
         "normative_reference": "Catálogos oficiales medicamentos"
     },
     
+    "AM-002": {
+        "id": "AM-002",
+        "file_type": "AM",
+        "field": "CODIGO_PRESTADOR",
+        "data_type": "Numeric",
+        "min_length": 12,
+        "max_length": 12,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["Código de habilitación REPS"],
+        "validation_rule": "12 dígitos; prestador habilitado",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.FORMAT,
+        "normative_reference": "Resolución 2275 de 2023 - Anexo Técnico (estructura RIPS/FEV)"
+    },
+    
+    "AF-001": {
+        "id": "AF-001",
+        "file_type": "AF",
+        "field": "CODIGO_PRESTADOR",
+        "data_type": "Numeric",
+        "min_length": 12,
+        "max_length": 12,
+        "cardinality": "1..1",
+        "mandatory": True,
+        "allowed_values": ["Código de habilitación REPS"],
+        "validation_rule": "12 dígitos; prestador habilitado",
+        "severity": ValidationSeverity.BLOQUEANTE,
+        "type": ValidationType.DETERMINISTIC,
+        "category": RuleCategory.FORMAT,
+        "normative_reference": "Resolución 2275 de 2023 - Anexo Técnico (estructura RIPS/FEV)"
+    },
+    
     "AF-004": {
         "id": "AF-004",
         "file_type": "AF",
@@ -172,6 +346,7 @@ RIPS_VALIDATION_RULES = {
         "cardinality": "1..1",
         "mandatory": True,
         "allowed_values": ["NC", "ND"],
+        "enforce_allowed_values": True,
         "validation_rule": "Debe referenciar factura original; incluir motivo",
         "severity": ValidationSeverity.BLOQUEANTE,
         "type": ValidationType.DETERMINISTIC,
@@ -267,19 +442,23 @@ AI_VALIDATION_RULES = {
 }
 
 # Mapeo de tipos de archivo RIPS y sus campos principales
+# "layout": campos que se validan por posición en cada línea, en orden; la regla de
+# cada campo se toma de RIPS_VALIDATION_RULES (ver validators.rule_engine)
 RIPS_FILE_STRUCTURES = {
     "CT": {
         "name": "Control",
         "description": "Archivo de control con información general del lote",
         "required_fields": ["TIPO_REGISTRO", "FECHA_GENERACION", "VERSION_ANEXO_TECNICO"],
-        "optional_fields": ["NUMERO_LOTE", "OBSERVACIONES"]
+        "optional_fields": ["NUMERO_LOTE", "OBSERVACIONES"],
+        "layout": ["TIPO_REGISTRO", "FECHA_GENERACION", "VERSION_ANEXO_TECNICO"]
     },
     
     "US": {
         "name": "Usuarios",
         "description": "Información demográfica de usuarios",
         "required_fields": ["TIPO_DOCUMENTO_USUARIO", "NUMERO_DOCUMENTO_USUARIO", "FECHA_NACIMIENTO", "SEXO"],
-        "optional_fields": ["PRIMER_APELLIDO", "SEGUNDO_APELLIDO", "PRIMER_NOMBRE", "SEGUNDO_NOMBRE"]
+        "optional_fields": ["PRIMER_APELLIDO", "SEGUNDO_APELLIDO", "PRIMER_NOMBRE", "SEGUNDO_NOMBRE"],
+        "layout": ["TIPO_DOCUMENTO_USUARIO", "NUMERO_DOCUMENTO_USUARIO", "FECHA_NACIMIENTO", "SEXO"]
     },
     
     "AC": {
@@ -287,68 +466,53 @@ RIPS_FILE_STRUCTURES = {
         "description": "Registros de consultas médicas",
         "required_fields": ["CODIGO_PRESTADOR", "TIPO_DOCUMENTO_USUARIO", "NUMERO_DOCUMENTO_USUARIO", 
                            "FECHA_CONSULTA", "DIAGNOSTICO_PRINCIPAL_CIE"],
-        "optional_fields": ["DIAGNOSTICO_RELACIONADO", "CAUSA_EXTERNA", "FINALIDAD_CONSULTA"]
+        "optional_fields": ["DIAGNOSTICO_RELACIONADO", "CAUSA_EXTERNA", "FINALIDAD_CONSULTA"],
+        "layout": ["CODIGO_PRESTADOR", "TIPO_DOCUMENTO_USUARIO", "NUMERO_DOCUMENTO_USUARIO",
+                   "FECHA_CONSULTA", "DIAGNOSTICO_PRINCIPAL_CIE"]
     },
     
     "AP": {
         "name": "Procedimientos",
         "description": "Registros de procedimientos realizados",
         "required_fields": ["CODIGO_PRESTADOR", "CODIGO_CUPS", "FECHA_PROCEDIMIENTO"],
-        "optional_fields": ["DIAGNOSTICO_PRINCIPAL", "DIAGNOSTICO_RELACIONADO", "COMPLICACION"]
+        "optional_fields": ["DIAGNOSTICO_PRINCIPAL", "DIAGNOSTICO_RELACIONADO", "COMPLICACION"],
+        "layout": ["CODIGO_PRESTADOR", "CODIGO_CUPS", "FECHA_PROCEDIMIENTO"]
     },
     
     "AM": {
         "name": "Medicamentos",
         "description": "Registros de medicamentos dispensados",
         "required_fields": ["CODIGO_PRESTADOR", "CODIGO_PRODUCTO"],
-        "optional_fields": ["CANTIDAD", "VALOR_UNITARIO", "VALOR_TOTAL"]
+        "optional_fields": ["CANTIDAD", "VALOR_UNITARIO", "VALOR_TOTAL"],
+        "layout": ["CODIGO_PRESTADOR", "CODIGO_PRODUCTO"]
     },
     
     "AF": {
         "name": "Facturación",
         "description": "Información de facturación",
         "required_fields": ["CODIGO_PRESTADOR", "NUMERO_FACTURA"],
-        "optional_fields": ["CUV", "VALOR_TOTAL", "VALOR_COPAGO"]
+        "optional_fields": ["CUV", "VALOR_TOTAL", "VALOR_COPAGO"],
+        "layout": ["CODIGO_PRESTADOR", "CUV"]
     },
     
     "AD": {
         "name": "Ajustes",
         "description": "Notas de ajuste (crédito/débito)",
         "required_fields": ["TIPO_NOTA", "NUMERO_FACTURA_ORIGINAL"],
-        "optional_fields": ["MOTIVO_AJUSTE", "VALOR_AJUSTE"]
+        "optional_fields": ["MOTIVO_AJUSTE", "VALOR_AJUSTE"],
+        "layout": ["TIPO_NOTA"]
     }
 }
 
 def get_rules_by_file_type(file_type: str) -> List[Dict[str, Any]]:
-    """Obtener reglas específicas para un tipo de archivo"""
-    rules = []
-    
-    # Reglas determinísticas
-    for rule_id, rule in RIPS_VALIDATION_RULES.items():
-        if rule["file_type"] == file_type or rule["file_type"] == "ALL":
-            rules.append(rule)
-    
-    # Reglas de IA (aplican a todos los tipos de archivo)
-    for rule_id, rule in AI_VALIDATION_RULES.items():
-        rules.append(rule)
-    
-    return rules
+    """Obtener reglas específicas para un tipo de archivo (incluye reglas "ALL" y de IA)"""
+    from validators.rule_engine import get_rule_engine
+    return get_rule_engine().rules_for_file_type(file_type)
 
 def get_rules_by_category(category: RuleCategory) -> List[Dict[str, Any]]:
     """Obtener reglas por categoría"""
-    rules = []
-    
-    # Reglas determinísticas
-    for rule_id, rule in RIPS_VALIDATION_RULES.items():
-        if rule["category"] == category:
-            rules.append(rule)
-    
-    # Reglas de IA
-    for rule_id, rule in AI_VALIDATION_RULES.items():
-        if rule["rule_category"] == category:
-            rules.append(rule)
-    
-    return rules
+    from validators.rule_engine import get_rule_engine
+    return get_rule_engine().rules_for_category(category)
 
 def get_validation_summary() -> Dict[str, Any]:
     """Obtener resumen de todas las validaciones"""
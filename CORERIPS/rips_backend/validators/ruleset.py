@@ -0,0 +1,82 @@
+"""
+Versión del conjunto de reglas de validación
+
+La versión es una huella del código de los validadores, de los umbrales
+configurables por entorno que aplican y del catálogo declarativo de reglas:
+cambia automáticamente con cualquier modificación de reglas o de su
+configuración, sin depender de que alguien actualice un número a mano. La usan los
+cachés de resultados y el estado incremental para descartar lo calculado con
+reglas anteriores.
+"""
+
+import hashlib
+import importlib
+from functools import lru_cache
+from typing import Optional
+
+# Módulos cuyo contenido determina los hallazgos de una validación
+RULESET_MODULES = [
+    "validators.rips_parser",
+    "validators.rips_json_reader",
+    "validators.ai_records",
+    "validators.pattern_arrays",
+    "validators.ai_features",
+    "validators.anomaly_scorer",
+    "validators.rule_mappings",
+    "validators.rule_engine",
+    "validators.deterministic_enhanced",
+    "validators.ai_validator_enhanced",
+]
+
+# Configuración efectiva (ya leída del entorno) que cambia los hallazgos con el
+# mismo código: módulo -> atributos
+RULESET_SETTINGS = {
+    "validators.ai_validator_enhanced": [
+        "DUPLICATE_WINDOW_DAYS",
+        "VOLUME_DAILY_THRESHOLD",
+        "PROVIDER_VOLUME_THRESHOLDS",
+        "BASELINE_Z_THRESHOLD",
+        "BASELINE_MIN_DAYS",
+        "BASELINE_MIN_PROCEDURES",
+        "BASELINE_CUPS_MIN_SHARE",
+    ],
+    "validators.anomaly_scorer": [
+        "AI_ANOMALY_SCORER",
+        "ANOMALY_SCORE_THRESHOLD",
+        "ANOMALY_MIN_GROUP_SIZE",
+        "ANOMALY_MAX_FINDINGS",
+    ],
+}
+
+# Permite forzar una nueva versión (p.ej. por cambios en datos externos a estos módulos)
+RULESET_SALT = "1"
+
+
+@lru_cache(maxsize=1)
+def get_ruleset_version() -> str:
+    """Huella (hex) del código y la configuración de las reglas; se calcula una vez por proceso"""
+    digest = hashlib.blake2b(RULESET_SALT.encode('utf-8'), digest_size=12)
+    for module_name in RULESET_MODULES:
+        module = importlib.import_module(module_name)
+        digest.update(module_name.encode('utf-8'))
+        with open(module.__file__, 'rb') as source:
+            digest.update(source.read())
+    for module_name, attributes in RULESET_SETTINGS.items():
+        module = importlib.import_module(module_name)
+        for attribute in attributes:
+            value = getattr(module, attribute)
+            if isinstance(value, dict):
+                value = sorted(value.items())
+            digest.update(f"{module_name}.{attribute}={value!r}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def fingerprint_catalog(data: Optional[object]) -> str:
+    """Huella estable del contenido de un catálogo (set, dict o lista)"""
+    if not data:
+        return "empty"
+    if isinstance(data, dict):
+        items = sorted((str(key), repr(value)) for key, value in data.items())
+    else:
+        items = sorted(str(item) for item in data)
+    return hashlib.blake2b(repr(items).encode('utf-8'), digest_size=8).hexdigest()